@@ -9,12 +9,13 @@ Version: 2.0
 
 import customtkinter as ctk
 from tkinter import messagebox
-from typing import Optional, Callable, List, Dict
+from typing import Optional, Callable, Iterable, List, Dict
 from datetime import datetime
 import threading
 import logging
 
 from .unified_design_system import AppColors, AppSpacing, AppFont, Icons
+from .gui_optimizations import stream_to_widget
 
 logger = logging.getLogger(__name__)
 
@@ -291,6 +292,49 @@ class AIChatTab(ctk.CTkFrame):
         
         # Auto-scroll to newest
         self._scroll_to_bottom()
+
+    def add_streaming_message(
+        self,
+        chunks: Iterable[str],
+        on_complete: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Add an assistant message rendered incrementally as tokens arrive.
+
+        The stream (e.g. BielikAssistant.stream_answer_question) is consumed in a
+        background thread; the message text is refreshed in the UI thread.
+
+        Args:
+            chunks: Iterable of text fragments (llm.ChatStream)
+            on_complete: Optional callback with the finished message data (UI thread)
+
+        Returns:
+            Message data dict (content is filled in as the stream progresses)
+        """
+        self.add_message("assistant", "")
+        message_data = self.messages[-1]
+        start = datetime.now()
+
+        def on_text(text: str) -> None:
+            message_data["content"] = text
+            message_data["content_label"].configure(text=text)
+            self._scroll_to_bottom()
+
+        def on_done(text: str) -> None:
+            # Prefer model timing from ChatStream, fall back to wall-clock time
+            response_time = getattr(chunks, "response_time_ms", None)
+            if response_time is None:
+                response_time = int((datetime.now() - start).total_seconds() * 1000)
+            message_data["response_time_ms"] = response_time
+            message_data["response_label"].configure(text=f"{response_time}ms")
+            if on_complete:
+                try:
+                    on_complete(message_data)
+                except Exception as e:
+                    logger.error(f"Error in on_complete callback: {e}")
+
+        stream_to_widget(self, chunks, on_text=on_text, on_done=on_done)
+        return message_data
     
     def _create_message_widget(self, message_data: Dict) -> None:
         """Create a message widget in the chat history."""
@@ -339,9 +383,9 @@ class AIChatTab(ctk.CTkFrame):
         )
         time_label.grid(row=0, column=1, padx=AppSpacing.XS, sticky="e")
         
-        # Response time (for AI messages)
-        if response_time is not None and role == "assistant":
-            response_time_str = f"{response_time}ms"
+        # Response time (for AI messages; empty until a streamed answer completes)
+        if role == "assistant":
+            response_time_str = f"{response_time}ms" if response_time is not None else ""
             response_label = ctk.CTkLabel(
                 header_frame,
                 text=response_time_str,
@@ -349,6 +393,7 @@ class AIChatTab(ctk.CTkFrame):
                 text_color=AppColors.UNKNOWN
             )
             response_label.grid(row=0, column=2, padx=AppSpacing.XS, sticky="e")
+            message_data["response_label"] = response_label
         
         # Copy button (shown on hover - simplified for now)
         copy_btn = ctk.CTkButton(
@@ -357,7 +402,7 @@ class AIChatTab(ctk.CTkFrame):
             width=30,
             height=20,
             font=(AppFont.FAMILY, AppFont.SIZE_XS),
-            command=lambda c=content: self._copy_to_clipboard(c),
+            command=lambda m=message_data: self._copy_to_clipboard(m["content"]),
             fg_color="transparent",
             hover_color=AppColors.BORDER_DARK
         )
@@ -379,6 +424,7 @@ class AIChatTab(ctk.CTkFrame):
             pady=AppSpacing.XS,
             sticky="w"
         )
+        message_data["content_label"] = content_label
     
     def _copy_to_clipboard(self, text: str) -> None:
         """Copy text to clipboard."""
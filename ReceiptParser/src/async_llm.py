@@ -0,0 +1,336 @@
+"""
+Asynchroniczny wariant wywołań Ollama (asyncio).
+
+Synchroniczny moduł llm.py wykonuje każde żądanie przez blokujący ollama.Client,
+więc współbieżność wymaga osobnego wątku na każde żądanie (ThreadPoolExecutor).
+Tutaj wszystkie żądania jednej pętli zdarzeń dzielą jeden ollama.AsyncClient
+(jedna pula połączeń httpx), a liczbę żądań w locie ogranicza semafor
+ASYNC_LLM_MAX_CONCURRENCY - dziesiątki paragonów i batchy normalizacji mogą
+czekać na model bez blokowania wątków.
+
+Prompty, budowa wiadomości, cache parsowania i konwersja typów są wspólne z llm.py,
+dzięki czemu wyniki (i klucze cache) są identyczne jak w wersji synchronicznej.
+"""
+import asyncio
+import json
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+import ollama
+
+from .config import Config
+from .llm import (
+    DEFAULT_TEXT_SYSTEM_PROMPT,
+    DEFAULT_VISION_SYSTEM_PROMPT,
+    _batch_output_tokens,
+    _build_batch_prompts,
+    _convert_types,
+    _fit_receipt_text,
+    _image_hash_for_cache,
+    _parse_batch_response,
+    _parse_cache_lookup,
+    _parse_cache_store,
+    _receipt_options,
+    _text_messages,
+    _vision_messages,
+    get_learning_examples,
+)
+from .llm_scheduler import Priority, get_scheduler
+from .retry_handler import async_retry_with_backoff
+from .security import sanitize_log_message, sanitize_path
+from .token_budget import chat_options
+from .tracing import span
+
+
+class _LoopClient:
+    """Klient AsyncClient i semafor współbieżności przypisane do jednej pętli zdarzeń."""
+
+    def __init__(self, max_concurrency: int) -> None:
+        limits = httpx.Limits(
+            max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+        )
+        self.client = ollama.AsyncClient(
+            host=Config.OLLAMA_HOST,
+            timeout=httpx.Timeout(Config.OLLAMA_TIMEOUT, connect=10.0),
+            limits=limits,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+
+# httpx.AsyncClient jest związany z pętlą, w której powstał - jeden klient na pętlę
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_loop_client() -> _LoopClient:
+    loop = asyncio.get_running_loop()
+    loop_client = _loop_clients.get(loop)
+    if loop_client is None:
+        loop_client = _LoopClient(Config.ASYNC_LLM_MAX_CONCURRENCY)
+        _loop_clients[loop] = loop_client
+    return loop_client
+
+
+def get_async_client() -> ollama.AsyncClient:
+    """
+    Zwraca współdzielony ollama.AsyncClient bieżącej pętli zdarzeń (tworzony leniwie).
+    """
+    return _get_loop_client().client
+
+
+async def close_async_client() -> None:
+    """Zamyka pulę połączeń klienta bieżącej pętli (np. przed końcem asyncio.run)."""
+    loop_client = _loop_clients.pop(asyncio.get_running_loop(), None)
+    if loop_client is not None:
+        await loop_client.client.close()
+
+
+@async_retry_with_backoff(
+    max_retries=Config.RETRY_MAX_ATTEMPTS,
+    initial_delay=Config.RETRY_INITIAL_DELAY,
+    backoff_factor=Config.RETRY_BACKOFF_FACTOR,
+    max_delay=Config.RETRY_MAX_DELAY,
+    jitter=Config.RETRY_JITTER,
+)
+async def _achat(priority: Optional[Priority] = None, **kwargs):
+    """Wywołanie AsyncClient.chat z retry, przez wspólny harmonogram i z limitem żądań w locie."""
+    loop_client = _get_loop_client()
+    # Najpierw miejsce w harmonogramie - czekające żądanie tła nie zajmuje semafora pętli
+    async with get_scheduler().slot_async(kwargs.get("model", ""), priority), loop_client.semaphore:
+        with span("llm.async", model=kwargs.get("model")) as llm_span:
+            response = await loop_client.client.chat(**kwargs)
+            llm_span.record_llm_response(response)
+            return response
+
+
+async def parse_receipt(
+    image_path: str,
+    model_name: str = Config.VISION_MODEL,
+    system_prompt_override: str = None,
+    ocr_text: str = None,
+) -> dict | None:
+    """
+    Asynchroniczny odpowiednik llm.parse_receipt_with_llm.
+
+    Args:
+        image_path: Ścieżka do pliku z obrazem paragonu.
+        model_name: Nazwa modelu Ollama do użycia (np. 'llava:latest').
+        system_prompt_override: Opcjonalny prompt systemowy, który nadpisuje domyślny.
+        ocr_text: Opcjonalny tekst OCR wspierający model.
+
+    Returns:
+        Słownik z danymi w formacie ParsedData, lub None w przypadku błędu.
+    """
+    if not Path(image_path).exists():
+        print(f"BŁĄD: Plik obrazu nie istnieje: {image_path}")
+        return None
+
+    system_prompt = system_prompt_override or DEFAULT_VISION_SYSTEM_PROMPT
+
+    try:
+        print(f"INFO: Wysyłanie obrazu do modelu '{model_name}' (format=json, async)...")
+        print(f"INFO: Plik: {sanitize_path(image_path)}")
+
+        ocr_text = _fit_receipt_text(ocr_text, model_name, system_prompt, with_image=True)
+
+        # Hash pliku i SQLite cache to blokujące I/O - poza pętlą zdarzeń
+        image_hash = await asyncio.to_thread(_image_hash_for_cache, image_path)
+        raw_response_text = None
+        if image_hash:
+            raw_response_text = await asyncio.to_thread(
+                _parse_cache_lookup, image_hash, model_name, system_prompt, ocr_text
+            )
+        from_cache = raw_response_text is not None
+
+        if not from_cache:
+            # Zmniejszenie i kodowanie obrazu (vision_payload) obciąża CPU - poza pętlą zdarzeń
+            messages = await asyncio.to_thread(
+                _vision_messages, system_prompt, image_path, ocr_text, model_name
+            )
+            response = await _achat(
+                model=model_name,
+                format="json",
+                messages=messages,
+                options=_receipt_options(model_name, messages, ocr_text),
+            )
+            raw_response_text = response["message"]["content"]
+            print(
+                f"INFO: Otrzymano odpowiedź od LLM. Długość: {len(raw_response_text)} znaków."
+            )
+
+        try:
+            parsed_json = json.loads(raw_response_text)
+        except json.JSONDecodeError as e:
+            print(
+                f"BŁĄD: Model zwrócił niepoprawny JSON mimo format='json'. Szczegóły: {sanitize_log_message(str(e))}"
+            )
+            print(f"Treść (obcięta): {sanitize_log_message(raw_response_text, max_length=500)}")
+            return None
+
+        if image_hash and not from_cache:
+            await asyncio.to_thread(
+                _parse_cache_store,
+                image_hash,
+                model_name,
+                system_prompt,
+                ocr_text,
+                raw_response_text,
+            )
+
+        return _convert_types(parsed_json)
+
+    except Exception as e:
+        print(
+            f"BŁĄD: Wystąpił problem podczas komunikacji z modelem '{model_name}': {sanitize_log_message(str(e))}"
+        )
+        return None
+
+
+async def parse_receipt_from_text(
+    text_content: str,
+    model_name: str = Config.TEXT_MODEL,
+    system_prompt_override: str = None,
+) -> dict | None:
+    """
+    Asynchroniczny odpowiednik llm.parse_receipt_from_text.
+
+    Returns:
+        Słownik z danymi w formacie ParsedData, lub None w przypadku błędu.
+    """
+    system_prompt = system_prompt_override or DEFAULT_TEXT_SYSTEM_PROMPT
+
+    try:
+        print(f"INFO: Wysyłanie tekstu do modelu '{model_name}' (format=json, async)...")
+
+        text_content = _fit_receipt_text(text_content, model_name, system_prompt)
+
+        raw_response_text = await asyncio.to_thread(
+            _parse_cache_lookup, "", model_name, system_prompt, text_content
+        )
+        from_cache = raw_response_text is not None
+
+        if not from_cache:
+            messages = _text_messages(system_prompt, text_content)
+            response = await _achat(
+                model=model_name,
+                format="json",
+                messages=messages,
+                options=_receipt_options(model_name, messages, text_content),
+            )
+            raw_response_text = response["message"]["content"]
+            print(
+                f"INFO: Otrzymano odpowiedź od LLM. Długość: {len(raw_response_text)} znaków."
+            )
+
+        try:
+            parsed_json = json.loads(raw_response_text)
+        except json.JSONDecodeError as e:
+            print(f"BŁĄD: Model zwrócił niepoprawny JSON. Szczegóły: {sanitize_log_message(str(e))}")
+            print(f"Treść (obcięta): {sanitize_log_message(raw_response_text, max_length=500)}")
+            return None
+
+        if not from_cache:
+            await asyncio.to_thread(
+                _parse_cache_store, "", model_name, system_prompt, text_content, raw_response_text
+            )
+
+        return _convert_types(parsed_json)
+
+    except Exception as e:
+        print(
+            f"BŁĄD: Wystąpił problem podczas komunikacji z modelem '{model_name}': {sanitize_log_message(str(e))}"
+        )
+        return None
+
+
+async def normalize_batch(
+    raw_names: List[str],
+    model_name: str = Config.TEXT_MODEL,
+    learning_examples: Optional[List[Tuple[str, str]]] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Asynchroniczny odpowiednik llm.normalize_batch.
+
+    Returns:
+        Słownik mapujący raw_name -> normalized_name (lub None w przypadku błędu)
+    """
+    if not raw_names:
+        return {}
+
+    system_prompt, user_prompt = _build_batch_prompts(raw_names, learning_examples)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+    try:
+        response = await _achat(
+            Priority.BATCH,
+            model=model_name,
+            format="json",
+            messages=messages,
+            options=chat_options(
+                model_name, messages, _batch_output_tokens(raw_names), "batch normalizacji"
+            ),
+        )
+        return _parse_batch_response(response["message"]["content"], raw_names)
+    except Exception as e:
+        print(
+            f"BŁĄD: Wystąpił problem podczas batch normalizacji: {sanitize_log_message(str(e))}"
+        )
+        return {name: None for name in raw_names}
+
+
+async def normalize_products_batch(
+    raw_names: List[str],
+    session,
+    model_name: str = Config.TEXT_MODEL,
+    batch_size: int = None,
+    log_callback: Optional[Callable] = None,
+) -> Dict[str, Optional[str]]:
+    """
+    Asynchroniczny odpowiednik llm.normalize_products_batch.
+
+    Wszystkie batche są wysyłane od razu (asyncio.gather) - równoległość
+    ogranicza wspólny semafor klienta, nie liczba wątków.
+
+    Args:
+        raw_names: Lista surowych nazw produktów do normalizacji
+        session: Sesja SQLAlchemy do pobrania przykładów uczenia
+        model_name: Nazwa modelu Ollama do użycia
+        batch_size: Rozmiar batcha (domyślnie z Config.BATCH_SIZE)
+        log_callback: Opcjonalna funkcja callback do logowania
+
+    Returns:
+        Słownik mapujący raw_name -> normalized_name
+    """
+    if not raw_names:
+        return {}
+
+    batch_size = batch_size or Config.BATCH_SIZE
+    batches = [raw_names[i:i + batch_size] for i in range(0, len(raw_names), batch_size)]
+
+    if log_callback:
+        try:
+            log_callback(f"INFO: Przetwarzam {len(raw_names)} produktów w {len(batches)} batchach (rozmiar batcha: {batch_size})")
+        except Exception:
+            pass
+
+    # Sesja SQLAlchemy nie jest współdzielona między wątkami - krótkie zapytanie w pętli
+    learning_examples = []
+    try:
+        learning_examples = get_learning_examples(
+            raw_names[0], session, max_examples=5, min_similarity=30
+        )
+    except Exception:
+        pass  # Ignoruj błędy przy pobieraniu przykładów
+
+    results = await asyncio.gather(
+        *(normalize_batch(batch, model_name, learning_examples) for batch in batches)
+    )
+    all_results = {}
+    for batch_results in results:
+        all_results.update(batch_results)
+    return all_results
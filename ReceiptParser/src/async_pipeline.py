@@ -0,0 +1,358 @@
+"""
+Asynchroniczny potok przetwarzania paragonów (asyncio).
+
+Odpowiednik main.run_processing_pipeline i batch_processing.process_directory,
+w którym parsowanie przez LLM odbywa się przez async_llm (jeden współdzielony
+ollama.AsyncClient), a etapy blokujące - deduplikacja, konwersja PDF, OCR,
+weryfikacja przez użytkownika i zapis do bazy - działają w wątkach lub puli
+procesów (asyncio.to_thread / run_in_executor). Wiele paragonów może więc
+jednocześnie czekać na model bez trzymania osobnego wątku na każde żądanie.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from .async_llm import close_async_client, parse_receipt, parse_receipt_from_text
+from .batch_processing import (
+    BatchResult,
+    _noop_log,
+    _ocr_job,
+    _prefixed_log,
+    collect_receipt_files,
+)
+from .config import Config
+from .dedup import ON_DUPLICATE_SKIP, compute_file_hash
+from .ocr import warm_up_ocr_engine
+from .preprocessing import preprocess_or_original
+from .receipt_image import forget_receipt_image
+from .security import sanitize_log_message, sanitize_path, validate_llm_model
+
+
+async def parse_receipt_text(
+    processing_file_path: str,
+    llm_model: str,
+    ocr_text: str,
+    log_callback: Callable[[str], None],
+    strategy=None,
+    vision_image_path: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Asynchroniczny odpowiednik main.parse_receipt_text (strategia sklepu + LLM).
+
+    strategy i vision_image_path pochodzą z OCR nagłówka (main.setup_store_strategy);
+    przygotowanego obrazu nie usuwa ta funkcja, tylko wywołujący.
+
+    Returns:
+        Sparsowane dane paragonu (ParsedData)
+    """
+    from .main import _post_process_parsed_receipt, _select_receipt_strategy
+
+    strategy = _select_receipt_strategy(llm_model, ocr_text, log_callback, strategy)
+
+    if llm_model == "mistral-ocr":
+        parsed_data = await parse_receipt_from_text(ocr_text)
+    else:
+        prepared_path = vision_image_path
+        if not prepared_path:
+            # Przygotowanie obrazu to praca CPU - poza pętlą zdarzeń
+            prepared_path = await asyncio.to_thread(
+                preprocess_or_original, processing_file_path, strategy.get_preprocess_options()
+            )
+        try:
+            parsed_data = await parse_receipt(
+                prepared_path,
+                llm_model,
+                system_prompt_override=strategy.get_system_prompt(),
+                ocr_text=ocr_text,
+            )
+        finally:
+            if prepared_path != vision_image_path and prepared_path != processing_file_path:
+                forget_receipt_image(prepared_path)
+                if os.path.exists(prepared_path):
+                    os.unlink(prepared_path)
+
+    return _post_process_parsed_receipt(strategy, parsed_data, log_callback)
+
+
+async def run_processing_pipeline(
+    file_path: str,
+    llm_model: str,
+    log_callback: Callable[[str], None],
+    prompt_callback: Callable[[str, str, str], str],
+    review_callback: Callable[[dict], dict | None] = None,
+    on_duplicate: str = ON_DUPLICATE_SKIP,
+    deferred_review: Optional[bool] = None,
+) -> None:
+    """
+    Asynchroniczny odpowiednik main.run_processing_pipeline (te same kroki i komunikaty).
+
+    review_callback i prompt_callback są wywoływane w wątku roboczym, więc mogą
+    blokować (np. czekać na dialog GUI) bez zatrzymywania pętli zdarzeń.
+    """
+    from .main import (
+        _call_log_callback,
+        _cleanup_temp_image,
+        _discard_vision_image,
+        _release_receipt_images,
+        _validate_pipeline_input,
+        extract_receipt_text,
+        extract_with_strategy_setup,
+        load_processed_receipt,
+        prepare_receipt_image,
+        replay_processed_receipt,
+        save_parsed_receipt,
+    )
+
+    temp_image_path = None
+    processing_file_path = None
+    try:
+        file_path, llm_model = _validate_pipeline_input(file_path, llm_model, on_duplicate)
+
+        # Deduplikacja po hashu zawartości (przed OCR)
+        file_hash = await asyncio.to_thread(compute_file_hash, file_path)
+        processed = await asyncio.to_thread(load_processed_receipt, file_hash)
+        if processed:
+            await asyncio.to_thread(
+                replay_processed_receipt,
+                processed,
+                file_hash,
+                on_duplicate,
+                log_callback,
+                review_callback,
+            )
+            return
+
+        processing_file_path, temp_image_path = await asyncio.to_thread(
+            prepare_receipt_image, file_path, log_callback, llm_model
+        )
+        ocr_text, strategy, vision_image_path = await asyncio.to_thread(
+            extract_with_strategy_setup,
+            processing_file_path,
+            llm_model,
+            lambda: extract_receipt_text(
+                processing_file_path, llm_model, log_callback, file_path
+            ),
+        )
+        try:
+            parsed_data = await parse_receipt_text(
+                processing_file_path,
+                llm_model,
+                ocr_text,
+                log_callback,
+                strategy=strategy,
+                vision_image_path=vision_image_path,
+            )
+        finally:
+            _discard_vision_image(vision_image_path, processing_file_path)
+
+        # Wstrzyknij ścieżkę do pliku, aby UI mogło wyświetlić podgląd
+        parsed_data["file_path"] = processing_file_path
+
+        if review_callback:
+            _call_log_callback(
+                log_callback,
+                "INFO: Oczekiwanie na weryfikację użytkownika...",
+                progress=70,
+                status="Oczekiwanie na weryfikację...",
+            )
+            reviewed_data = await asyncio.to_thread(review_callback, parsed_data)
+            if not reviewed_data:
+                _call_log_callback(
+                    log_callback, "INFO: Użytkownik odrzucił zmiany. Anulowanie zapisu."
+                )
+                return
+            parsed_data = reviewed_data
+            _call_log_callback(
+                log_callback,
+                "INFO: Użytkownik zatwierdził dane (ewentualnie po edycji).",
+                progress=80,
+                status="Zapisuję do bazy...",
+            )
+
+    except Exception as e:
+        _call_log_callback(
+            log_callback,
+            f"BŁĄD KRYTYCZNY na etapie parsowania LLM: {sanitize_log_message(str(e))}",
+        )
+        _call_log_callback(
+            log_callback, "Upewnij się, że serwer Ollama działa i model jest dostępny."
+        )
+        return
+    finally:
+        _cleanup_temp_image(temp_image_path, log_callback)
+        _release_receipt_images(file_path, processing_file_path)
+
+    if deferred_review is None:
+        deferred_review = Config.DEFERRED_PRODUCT_REVIEW
+    await asyncio.to_thread(
+        save_parsed_receipt,
+        parsed_data,
+        file_path,
+        log_callback,
+        prompt_callback,
+        file_hash=file_hash,
+        deferred_review=deferred_review,
+    )
+
+
+async def process_receipts(
+    source: str,
+    llm_model: str,
+    log_callback: Callable[[str], None],
+    prompt_callback: Callable[[str, str, str], str],
+    ocr_workers: Optional[int] = None,
+    use_processes: bool = True,
+    deferred_review: Optional[bool] = None,
+) -> BatchResult:
+    """
+    Przetwarza wszystkie paragony z katalogu lub wzorca glob w jednej pętli asyncio.
+
+    Każdy paragon jest osobnym zadaniem: OCR ograniczają workery (pula procesów
+    lub wątki), wywołania LLM - semafor async_llm (Config.ASYNC_LLM_MAX_CONCURRENCY),
+    a zapis do bazy jest serializowany (po jednym paragonie na transakcję, więc
+    prompt_callback nie jest wywoływany współbieżnie).
+
+    Args:
+        source: Katalog lub wzorzec glob (np. 'paragony/*.pdf')
+        llm_model: Nazwa modelu LLM
+        log_callback: Callback do logowania
+        prompt_callback: Callback do promptowania użytkownika (nieznane produkty)
+        ocr_workers: Liczba workerów OCR (domyślnie Config.BATCH_OCR_WORKERS)
+        use_processes: Czy OCR ma działać w puli procesów (False = wątki)
+        deferred_review: Nieznane produkty do kolejki weryfikacji zamiast prompt_callback
+            (None = Config.DEFERRED_PRODUCT_REVIEW)
+
+    Returns:
+        BatchResult ze statystykami przetwarzania
+    """
+    from .main import (
+        _call_log_callback,
+        _cleanup_temp_image,
+        _discard_vision_image,
+        _release_receipt_images,
+        load_processed_receipt,
+        save_parsed_receipt,
+    )
+
+    llm_model = validate_llm_model(llm_model)
+    ocr_workers = max(1, ocr_workers or Config.BATCH_OCR_WORKERS)
+    if deferred_review is None:
+        deferred_review = Config.DEFERRED_PRODUCT_REVIEW
+
+    result = BatchResult()
+    files = collect_receipt_files(source)
+    if not files:
+        _call_log_callback(log_callback, f"OSTRZEŻENIE: Brak plików paragonów dla: {source}")
+        return result
+
+    _call_log_callback(
+        log_callback,
+        f"INFO: Znaleziono {len(files)} paragonów (asyncio). OCR: {ocr_workers} "
+        f"{'procesów' if use_processes else 'wątków'}, LLM: max "
+        f"{Config.ASYNC_LLM_MAX_CONCURRENCY} równolegle.",
+        progress=0,
+        status="Przetwarzanie wsadowe...",
+    )
+
+    loop = asyncio.get_running_loop()
+    if use_processes:
+        ocr_executor = ProcessPoolExecutor(max_workers=ocr_workers, initializer=warm_up_ocr_engine)
+    else:
+        ocr_executor = None
+        warm_up_ocr_engine()
+    ocr_slots = asyncio.Semaphore(ocr_workers)
+    db_lock = asyncio.Lock()
+    seen_hashes: Dict[str, str] = {}
+
+    async def _process(file_path: str) -> None:
+        timings: Dict[str, float] = {}
+        stage = "ocr"
+        try:
+            file_hash = await asyncio.to_thread(compute_file_hash, file_path)
+            processed = await asyncio.to_thread(load_processed_receipt, file_hash)
+            if processed:
+                result.skipped[file_path] = f"już w bazie (paragon ID: {processed[0]})"
+                return
+            first_path = seen_hashes.setdefault(file_hash, file_path)
+            if first_path != file_path:
+                result.skipped[file_path] = f"ta sama zawartość co {sanitize_path(first_path)}"
+                return
+
+            async with ocr_slots:
+                start = time.perf_counter()
+                if ocr_executor:
+                    data = await loop.run_in_executor(
+                        ocr_executor, _ocr_job, file_path, llm_model, True
+                    )
+                else:
+                    data = await asyncio.to_thread(_ocr_job, file_path, llm_model)
+                timings["ocr"] = time.perf_counter() - start
+            if "pdf" in data["timings"]:
+                # Etap "ocr" obejmuje konwersję PDF; podajemy ją też osobno
+                timings["pdf"] = data["timings"]["pdf"]
+            if data["error"]:
+                _cleanup_temp_image(data["temp_image_path"], _noop_log)
+                _release_receipt_images(data["file_path"], data["processing_file_path"])
+                raise Exception(data["error"])
+
+            stage = "llm"
+            start = time.perf_counter()
+            try:
+                parsed_data = await parse_receipt_text(
+                    data["processing_file_path"],
+                    llm_model,
+                    data["ocr_text"],
+                    _prefixed_log(log_callback, data["file_path"]),
+                    strategy=data["strategy"],
+                    vision_image_path=data["vision_image_path"],
+                )
+            finally:
+                _discard_vision_image(data["vision_image_path"], data["processing_file_path"])
+                _cleanup_temp_image(data["temp_image_path"], _noop_log)
+                _release_receipt_images(data["file_path"], data["processing_file_path"])
+            timings["llm"] = time.perf_counter() - start
+
+            stage = "db"
+            parsed_data["file_path"] = data["file_path"]
+            async with db_lock:
+                start = time.perf_counter()
+                saved = await asyncio.to_thread(
+                    save_parsed_receipt,
+                    parsed_data,
+                    data["file_path"],
+                    _prefixed_log(log_callback, data["file_path"]),
+                    prompt_callback,
+                    file_hash=file_hash,
+                    deferred_review=deferred_review,
+                )
+                timings["db"] = time.perf_counter() - start
+            if not saved:
+                raise Exception("Zapis do bazy danych nie powiódł się.")
+
+            timings["total"] = sum(timings[name] for name in ("ocr", "llm", "db"))
+            result.saved.append(file_path)
+        except Exception as e:
+            error = sanitize_log_message(str(e))
+            result.failed[file_path] = f"[{stage}] {error}"
+            _call_log_callback(
+                log_callback, f"BŁĄD: {sanitize_path(file_path)} (etap {stage}): {error}"
+            )
+        finally:
+            result.record(timings)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(_process(file_path) for file_path in files))
+    finally:
+        if ocr_executor:
+            ocr_executor.shutdown(wait=True)
+        await close_async_client()
+    result.elapsed = time.perf_counter() - started
+
+    for file_path, reason in result.skipped.items():
+        _call_log_callback(
+            log_callback, f"INFO: Pominięto {sanitize_path(file_path)}: {reason}"
+        )
+    return result
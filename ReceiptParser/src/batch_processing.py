@@ -0,0 +1,474 @@
+"""
+Moduł przetwarzania wsadowego paragonów (cały katalog lub wzorzec glob).
+
+OCR (razem z konwersją PDF) działa w puli procesów, parsowanie przez LLM
+jest ograniczone konfigurowalnym limitem współbieżności, a każdy paragon
+zapisywany jest do bazy we własnej transakcji. Po zakończeniu zwracane jest
+podsumowanie przepustowości (paragony/min, p50/p95 dla każdego etapu).
+"""
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .config import Config
+from .security import (
+    ALLOWED_IMAGE_EXTENSIONS,
+    sanitize_log_message,
+    sanitize_path,
+    validate_file_path,
+    validate_llm_model,
+)
+from .dedup import compute_file_hash
+from .job_store import STAGE_NORMALIZATION, STAGE_OCR, STAGE_PARSED
+from .ocr import warm_up_ocr_engine
+from .staged_pipeline import SkipJob, Stage, StagedPipeline
+
+# Kolejność etapów w podsumowaniu
+STAGES = ["pdf", "ocr", "llm", "db", "total"]
+
+
+def _noop_log(message: str, progress: Optional[float] = None, status: Optional[str] = None):
+    """Callback logowania dla workerów w osobnych procesach (wyniki wracają w podsumowaniu)."""
+    pass
+
+
+def collect_receipt_files(source: str) -> List[str]:
+    """
+    Zwraca posortowaną listę plików paragonów z katalogu lub wzorca glob.
+
+    Args:
+        source: Ścieżka do katalogu lub wzorzec glob (np. 'paragony/*.pdf')
+
+    Returns:
+        Lista bezwzględnych ścieżek do plików o obsługiwanych rozszerzeniach
+    """
+    if os.path.isdir(source):
+        candidates = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        candidates = glob.glob(source, recursive=True)
+
+    files = [
+        os.path.abspath(path)
+        for path in candidates
+        if os.path.isfile(path)
+        and os.path.splitext(path)[1].lower() in ALLOWED_IMAGE_EXTENSIONS
+    ]
+    return sorted(set(files))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Oblicza percentyl metodą interpolacji liniowej.
+
+    Args:
+        values: Lista wartości
+        pct: Percentyl w zakresie 0-100
+
+    Returns:
+        Wartość percentyla (0.0 dla pustej listy)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+class BatchResult:
+    """
+    Wynik przetwarzania wsadowego wraz ze statystykami czasów etapów.
+
+    Attributes:
+        saved: Lista plików zapisanych do bazy
+        skipped: Słownik plik -> powód pominięcia (np. duplikat)
+        failed: Słownik plik -> opis błędu
+        elapsed: Całkowity czas przetwarzania w sekundach
+        stage_timings: Słownik etap -> lista czasów w sekundach
+        pipeline_stats: Statystyki kolejek etapów (StagedPipeline.get_stats())
+    """
+
+    def __init__(self) -> None:
+        self.saved: List[str] = []
+        self.skipped: Dict[str, str] = {}
+        self.failed: Dict[str, str] = {}
+        self.elapsed: float = 0.0
+        self.stage_timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.pipeline_stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, timings: Dict[str, float]) -> None:
+        """Dodaje czasy etapów jednego paragonu."""
+        for stage, duration in timings.items():
+            self.stage_timings.setdefault(stage, []).append(duration)
+
+    @property
+    def total(self) -> int:
+        return len(self.saved) + len(self.skipped) + len(self.failed)
+
+    @property
+    def receipts_per_minute(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.saved) / self.elapsed * 60.0
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Zwraca statystyki p50/p95 dla każdego etapu.
+
+        Returns:
+            Słownik etap -> {'count', 'p50', 'p95'}
+        """
+        return {
+            stage: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+            }
+            for stage, values in self.stage_timings.items()
+            if values
+        }
+
+    def format_summary(self) -> str:
+        """Formatuje podsumowanie przepustowości do wyświetlenia w CLI."""
+        lines = [
+            "--- Podsumowanie przetwarzania wsadowego ---",
+            f"Paragony: {self.total} | zapisane: {len(self.saved)} | "
+            f"pominięte (duplikaty): {len(self.skipped)} | błędy: {len(self.failed)}",
+            f"Czas całkowity: {self.elapsed:.1f} s | przepustowość: {self.receipts_per_minute:.2f} paragonów/min",
+            f"{'Etap':<8}{'n':>5}{'p50 [s]':>10}{'p95 [s]':>10}",
+        ]
+        for stage, stats in self.get_stats().items():
+            lines.append(
+                f"{stage:<8}{stats['count']:>5}{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+            )
+        if self.pipeline_stats:
+            lines.append(f"{'Kolejka':<8}{'work.':>6}{'zajęty [s]':>12}{'blokada [s]':>13}{'max kol.':>10}")
+            for stage, stats in self.pipeline_stats.items():
+                lines.append(
+                    f"{stage:<8}{stats['workers']:>6}{stats['busy_seconds']:>12.1f}"
+                    f"{stats['blocked_seconds']:>13.1f}{stats['max_queue_depth']:>10}"
+                )
+        for file_path, error in self.failed.items():
+            lines.append(f"BŁĄD: {sanitize_path(file_path)}: {error}")
+        return "\n".join(lines)
+
+
+def _ocr_job(file_path: str, llm_model: str, release_images: bool = False) -> Dict:
+    """
+    Etap CPU-bound: walidacja, konwersja PDF i OCR. Uruchamiany w puli procesów,
+    dlatego zwraca wyłącznie proste, serializowalne dane.
+
+    release_images=True (worker puli procesów) zwalnia obrazy z pamięci workera
+    po OCR - dalsze etapy działają w procesie głównym.
+    """
+    from .main import (
+        _release_receipt_images,
+        extract_receipt_text,
+        extract_with_strategy_setup,
+        prepare_receipt_image,
+    )
+
+    result = {
+        "file_path": file_path,
+        "processing_file_path": None,
+        "temp_image_path": None,
+        "ocr_text": None,
+        "strategy": None,
+        "vision_image_path": None,
+        "timings": {},
+        "error": None,
+    }
+    try:
+        validated_path = str(
+            validate_file_path(file_path, allowed_extensions=ALLOWED_IMAGE_EXTENSIONS)
+        )
+        result["file_path"] = validated_path
+
+        start = time.perf_counter()
+        processing_file_path, temp_image_path = prepare_receipt_image(
+            validated_path, _noop_log, llm_model
+        )
+        result["processing_file_path"] = processing_file_path
+        result["temp_image_path"] = temp_image_path
+        if temp_image_path:
+            result["timings"]["pdf"] = time.perf_counter() - start
+
+        # Sklep z OCR nagłówka jest znany przed końcem pełnego OCR (strategia i obraz
+        # dla modelu wizyjnego przygotowane równolegle)
+        start = time.perf_counter()
+        ocr_text, strategy, vision_image_path = extract_with_strategy_setup(
+            processing_file_path,
+            llm_model,
+            lambda: extract_receipt_text(
+                processing_file_path, llm_model, _noop_log, source_path=validated_path
+            ),
+        )
+        result["ocr_text"] = ocr_text
+        result["strategy"] = strategy
+        result["vision_image_path"] = vision_image_path
+        result["timings"]["ocr"] = time.perf_counter() - start
+    except Exception as e:
+        result["error"] = sanitize_log_message(str(e))
+    finally:
+        if release_images:
+            _release_receipt_images(result["file_path"], result["processing_file_path"])
+    return result
+
+
+def _prefixed_log(log_callback: Callable, file_path: str) -> Callable:
+    """Dodaje nazwę pliku do komunikatów, żeby logi równoległych paragonów były czytelne."""
+    from .main import _call_log_callback
+
+    name = sanitize_path(file_path)
+
+    def _log(message: str, progress: Optional[float] = None, status: Optional[str] = None):
+        _call_log_callback(log_callback, f"[{name}] {message}", progress, status)
+
+    return _log
+
+
+def process_directory(
+    source: str,
+    llm_model: str,
+    log_callback: Callable[[str], None],
+    prompt_callback: Callable[[str, str, str], str],
+    ocr_workers: Optional[int] = None,
+    llm_concurrency: Optional[int] = None,
+    use_processes: bool = True,
+    deferred_review: Optional[bool] = None,
+) -> BatchResult:
+    """
+    Przetwarza wszystkie paragony z katalogu lub wzorca glob.
+
+    Paragony przepływają przez potok etapów (StagedPipeline) OCR -> LLM -> zapis,
+    połączonych ograniczonymi kolejkami, więc OCR paragonu N+1 działa równolegle
+    z parsowaniem LLM paragonu N. Zapis do bazy ma jednego workera (po jednym
+    paragonie na transakcję), dzięki czemu prompt_callback nigdy nie jest
+    wywoływany współbieżnie. Pliki już zapisane w bazie (ten sam SHA-256)
+    są pomijane przed OCR, a przerwane wcześniej zadania są wznawiane z punktów
+    kontrolnych (job_store).
+
+    Args:
+        source: Katalog lub wzorzec glob (np. 'paragony/*.pdf')
+        llm_model: Nazwa modelu LLM
+        log_callback: Callback do logowania
+        prompt_callback: Callback do promptowania użytkownika (nieznane produkty)
+        ocr_workers: Liczba workerów OCR (domyślnie Config.BATCH_OCR_WORKERS)
+        llm_concurrency: Limit równoległych wywołań LLM (domyślnie Config.BATCH_LLM_CONCURRENCY)
+        use_processes: Czy OCR ma działać w puli procesów (False = tylko wątki etapu)
+        deferred_review: Nieznane produkty do kolejki weryfikacji zamiast prompt_callback
+            (None = Config.DEFERRED_PRODUCT_REVIEW)
+
+    Returns:
+        BatchResult ze statystykami przetwarzania
+    """
+    from .main import (
+        _call_log_callback,
+        _cleanup_temp_image,
+        _close_receipt_job,
+        _discard_vision_image,
+        _release_receipt_images,
+        _start_receipt_job,
+        load_processed_receipt,
+        parse_receipt_text,
+        save_parsed_receipt,
+    )
+
+    llm_model = validate_llm_model(llm_model)
+    ocr_workers = max(1, ocr_workers or Config.BATCH_OCR_WORKERS)
+    llm_concurrency = max(1, llm_concurrency or Config.BATCH_LLM_CONCURRENCY)
+    if deferred_review is None:
+        deferred_review = Config.DEFERRED_PRODUCT_REVIEW
+
+    result = BatchResult()
+    files = collect_receipt_files(source)
+    if not files:
+        _call_log_callback(log_callback, f"OSTRZEŻENIE: Brak plików paragonów dla: {source}")
+        return result
+
+    _call_log_callback(
+        log_callback,
+        f"INFO: Znaleziono {len(files)} paragonów. OCR: {ocr_workers} "
+        f"{'procesów' if use_processes else 'wątków'}, LLM: max {llm_concurrency} równolegle.",
+        progress=0,
+        status="Przetwarzanie wsadowe...",
+    )
+
+    if use_processes:
+        ocr_executor = ProcessPoolExecutor(max_workers=ocr_workers, initializer=warm_up_ocr_engine)
+    else:
+        ocr_executor = None
+        warm_up_ocr_engine()
+
+    seen_hashes: Dict[str, str] = {}
+    seen_lock = threading.Lock()
+
+    def _resumed_data(job, file_path: str, file_hash: str) -> Optional[Dict]:
+        # Wznowienie zadania: dane po parsowaniu lub tekst OCR z punktu kontrolnego
+        data = {
+            "file_path": file_path,
+            "processing_file_path": job.load_image() or file_path,
+            "temp_image_path": None,
+            "ocr_text": None,
+            "timings": {},
+            "error": None,
+            "file_hash": file_hash,
+            "job": job,
+        }
+        parsed_data = job.load(STAGE_PARSED)
+        if parsed_data is not None:
+            data["parsed_data"] = parsed_data
+            return data
+        if file_path.lower().endswith(".pdf") and data["processing_file_path"] == file_path:
+            return None  # Brak zachowanego obrazu - PDF trzeba skonwertować ponownie
+        data["ocr_text"] = job.load(STAGE_OCR)
+        return data if data["ocr_text"] is not None else None
+
+    def _ocr_stage(file_path: str) -> Dict:
+        # Deduplikacja przed OCR: plik już w bazie lub wcześniej w tej samej partii
+        file_hash = compute_file_hash(file_path)
+        processed = load_processed_receipt(file_hash)
+        if processed:
+            _close_receipt_job(file_hash)
+            raise SkipJob(f"już w bazie (paragon ID: {processed[0]})")
+        with seen_lock:
+            first_path = seen_hashes.setdefault(file_hash, file_path)
+        if first_path != file_path:
+            raise SkipJob(f"ta sama zawartość co {sanitize_path(first_path)}")
+
+        job = _start_receipt_job(file_hash, file_path, llm_model)
+        if job:
+            resumed = _resumed_data(job, file_path, file_hash)
+            if resumed:
+                _call_log_callback(
+                    log_callback,
+                    f"INFO: [{sanitize_path(file_path)}] Wznowienie zadania z punktu kontrolnego (pominięto OCR).",
+                )
+                return resumed
+
+        if ocr_executor:
+            data = ocr_executor.submit(_ocr_job, file_path, llm_model, True).result()
+        else:
+            data = _ocr_job(file_path, llm_model)
+        if data["error"]:
+            _cleanup_temp_image(data["temp_image_path"], _noop_log)
+            _release_receipt_images(data["file_path"], data["processing_file_path"])
+            if job:
+                job.fail(data["error"])
+            raise Exception(data["error"])
+        if job:
+            if data["temp_image_path"]:
+                data["processing_file_path"] = job.keep_image(data["temp_image_path"])
+            job.save(STAGE_OCR, data["ocr_text"])
+        if data["strategy"] is not None:
+            _call_log_callback(
+                log_callback,
+                f"INFO: [{sanitize_path(file_path)}] Sklep z nagłówka: {data['strategy'].__class__.__name__}",
+            )
+        data["file_hash"] = file_hash
+        data["job"] = job
+        return data
+
+    def _llm_stage(data: Dict) -> Dict:
+        if "parsed_data" in data:
+            return data
+        try:
+            data["parsed_data"] = parse_receipt_text(
+                data["processing_file_path"],
+                llm_model,
+                data["ocr_text"],
+                _prefixed_log(log_callback, data["file_path"]),
+                job=data["job"],
+                strategy=data.get("strategy"),
+                vision_image_path=data.get("vision_image_path"),
+            )
+            if data["job"]:
+                data["job"].save(STAGE_PARSED, data["parsed_data"])
+        except Exception as e:
+            if data["job"]:
+                data["job"].fail(sanitize_log_message(str(e)))
+            raise
+        finally:
+            # Obrazy tymczasowe (PDF, obraz dla modelu wizyjnego) nie są potrzebne po etapie LLM
+            _discard_vision_image(data.get("vision_image_path"), data["processing_file_path"])
+            _cleanup_temp_image(data["temp_image_path"], _noop_log)
+            _release_receipt_images(data["file_path"], data["processing_file_path"])
+        return data
+
+    def _db_stage(data: Dict) -> Dict:
+        job = data["job"]
+        data["parsed_data"]["file_path"] = data["file_path"]
+        normalization_map = (job.load(STAGE_NORMALIZATION) if job else None) or {}
+        if not save_parsed_receipt(
+            data["parsed_data"],
+            data["file_path"],
+            _prefixed_log(log_callback, data["file_path"]),
+            prompt_callback,
+            file_hash=data["file_hash"],
+            deferred_review=deferred_review,
+            normalization_map=normalization_map,
+        ):
+            if job:
+                if normalization_map:
+                    job.save(STAGE_NORMALIZATION, normalization_map)
+                job.fail("Zapis do bazy danych nie powiódł się.")
+            raise Exception("Zapis do bazy danych nie powiódł się.")
+        if job:
+            job.done()
+        return data
+
+    pipeline = StagedPipeline(
+        [
+            Stage("ocr", _ocr_stage, workers=ocr_workers),
+            Stage("llm", _llm_stage, workers=llm_concurrency),
+            Stage("db", _db_stage, workers=1),
+        ]
+    )
+
+    started = time.perf_counter()
+    done_count = 0
+    try:
+        for job in pipeline.run(files):
+            done_count += 1
+            timings = dict(job.timings)
+            if isinstance(job.payload, dict) and "pdf" in job.payload.get("timings", {}):
+                # Etap "ocr" obejmuje konwersję PDF; podajemy ją też osobno
+                timings["pdf"] = job.payload["timings"]["pdf"]
+            if job.skipped is not None:
+                result.skipped[job.item] = job.skipped
+                _call_log_callback(
+                    log_callback,
+                    f"INFO: Pominięto {sanitize_path(job.item)}: {job.skipped}",
+                )
+            elif job.error is None:
+                timings["total"] = sum(job.timings.values())
+                result.saved.append(job.item)
+                result.record(timings)
+            else:
+                result.failed[job.item] = f"[{job.failed_stage}] {job.error}"
+                _call_log_callback(
+                    log_callback,
+                    f"BŁĄD: {sanitize_path(job.item)} (etap {job.failed_stage}): {job.error}",
+                )
+                # Czasy etapów, które zdążyły się wykonać, też trafiają do statystyk
+                result.record(timings)
+
+            _call_log_callback(
+                log_callback,
+                f"INFO: Ukończono {done_count}/{len(files)} paragonów.",
+                progress=done_count / len(files) * 100,
+                status=f"Przetworzono {done_count}/{len(files)}",
+            )
+    finally:
+        if ocr_executor:
+            ocr_executor.shutdown(wait=True)
+        result.elapsed = time.perf_counter() - started
+        result.pipeline_stats = pipeline.get_stats()
+
+    return result
@@ -26,8 +26,13 @@ from .database import (
     sessionmaker,
 )
 from .config import Config
-from .llm import client
+from .llm import ChatStream, interactive_client as client
 from .config_prompts import get_prompt
+from .token_budget import chat_options
+
+NO_EXPIRING_PRODUCTS_TEXT = "✅ Nie masz produktów wymagających pilnego zużycia. Wszystko w porządku!"
+OFFLINE_ANSWER_TEXT = "Przepraszam, nie mogę połączyć się z serwerem Ollama. Sprawdź, czy serwer działa."
+ANSWER_ERROR_TEXT = "Przepraszam, wystąpił błąd podczas przetwarzania pytania. Spróbuj ponownie."
 
 
 class BielikAssistant:
@@ -245,14 +250,21 @@ Zwróć propozycje w formacie JSON."""
                     }
                 ]
 
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
             response = client.chat(
                 model=self.model_name,
                 format="json",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                options={"temperature": 0.7, "num_predict": 2000},
+                messages=messages,
+                options=chat_options(
+                    self.model_name,
+                    messages,
+                    max_dishes * self.DISH_OUTPUT_TOKENS,
+                    "propozycji potraw",
+                    temperature=0.7,
+                ),
             )
 
             import json
@@ -322,14 +334,21 @@ Dostępne produkty w magazynie (NIE dodawaj ich do listy zakupów):
                     "uwagi": "Nie można połączyć się z serwerem Ollama.",
                 }
 
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
             response = client.chat(
                 model=self.model_name,
                 format="json",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                options={"temperature": 0.5, "num_predict": 1500},
+                messages=messages,
+                options=chat_options(
+                    self.model_name,
+                    messages,
+                    self.SHOPPING_LIST_OUTPUT_TOKENS,
+                    "listy zakupów",
+                    temperature=0.5,
+                ),
             )
 
             import json
@@ -357,13 +376,41 @@ Dostępne produkty w magazynie (NIE dodawaj ich do listy zakupów):
                 "uwagi": f"Błąd podczas generowania listy: {str(e)}",
             }
 
-    def suggest_use_expiring_products(self) -> str:
-        """
-        Sugeruje jak wykorzystać wygasające produkty.
-        
-        Returns:
-            Sugestia od Bielika
-        """
+    # Opcje generowania odpowiedzi czatu (wspólne dla wersji pełnej i strumieniowej)
+    CHAT_OPTIONS = {"temperature": 0.7}
+    # Oczekiwana maksymalna długość odpowiedzi w tokenach (num_predict, token_budget)
+    CHAT_OUTPUT_TOKENS = 2000
+    DISH_OUTPUT_TOKENS = 400
+    SHOPPING_LIST_OUTPUT_TOKENS = 1500
+
+    def _chat_messages(self, user_prompt: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": get_prompt("answer_question")},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _chat_options(self, messages: List[Dict]) -> Dict:
+        return chat_options(
+            self.model_name, messages, self.CHAT_OUTPUT_TOKENS, "czatu", **self.CHAT_OPTIONS
+        )
+
+    def _stream_chat(self, user_prompt: str, error_text: str, offline_text: str) -> ChatStream:
+        if not client:
+            return ChatStream(text=offline_text)
+        messages = self._chat_messages(user_prompt)
+        options = self._chat_options(messages)
+        return ChatStream(
+            lambda: client.chat(
+                model=self.model_name,
+                messages=messages,
+                options=options,
+                stream=True,
+            ),
+            error_text=error_text,
+        )
+
+    def _expiring_products_prompt(self) -> Optional[str]:
+        """Prompt z wygasającymi produktami (None, gdy nie ma czego pilnie zużyć)."""
         from .food_waste_tracker import FoodWasteTracker
 
         with FoodWasteTracker(self.session) as tracker:
@@ -371,57 +418,71 @@ Dostępne produkty w magazynie (NIE dodawaj ich do listy zakupów):
             expiring = tracker.get_expiring_products(priority=tracker.PRIORITY_CRITICAL)
             expiring.extend(tracker.get_expiring_products(priority=tracker.PRIORITY_WARNING))
 
-            if not expiring:
-                return "✅ Nie masz produktów wymagających pilnego zużycia. Wszystko w porządku!"
-
-            # Przygotuj listę wygasających produktów
-            expiring_text = "\n".join(
-                [
-                    f"- {p['nazwa']} ({p['ilosc']} {p['jednostka']}) - wygasa za {p['days_until_expiry']} dni"
-                    if p['days_until_expiry'] is not None and p['days_until_expiry'] >= 0
-                    else f"- {p['nazwa']} ({p['ilosc']} {p['jednostka']}) - już przeterminowany"
-                    for p in expiring[:10]
-                ]
-            )
+        if not expiring:
+            return None
 
-            system_prompt = get_prompt("answer_question")
+        # Przygotuj listę wygasających produktów
+        expiring_text = "\n".join(
+            [
+                f"- {p['nazwa']} ({p['ilosc']} {p['jednostka']}) - wygasa za {p['days_until_expiry']} dni"
+                if p['days_until_expiry'] is not None and p['days_until_expiry'] >= 0
+                else f"- {p['nazwa']} ({p['ilosc']} {p['jednostka']}) - już przeterminowany"
+                for p in expiring[:10]
+            ]
+        )
 
-            user_prompt = f"""Użytkownik ma następujące produkty wygasające w najbliższych dniach:
+        return f"""Użytkownik ma następujące produkty wygasające w najbliższych dniach:
 
 {expiring_text}
 
 Sugeruj konkretne potrawy lub sposoby wykorzystania tych produktów, aby uniknąć marnotrawstwa. 
 Bądź konkretny i praktyczny. Jeśli produkt jest już przeterminowany, zasugeruj bezpieczne sposoby sprawdzenia czy nadal nadaje się do spożycia."""
 
-            try:
-                if not client:
-                    return "Przepraszam, nie mogę połączyć się z serwerem Ollama."
+    def suggest_use_expiring_products(self) -> str:
+        """
+        Sugeruje jak wykorzystać wygasające produkty.
+        
+        Returns:
+            Sugestia od Bielika
+        """
+        user_prompt = self._expiring_products_prompt()
+        if user_prompt is None:
+            return NO_EXPIRING_PRODUCTS_TEXT
 
-                response = client.chat(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    options={"temperature": 0.7, "num_predict": 2000},
-                )
+        try:
+            if not client:
+                return "Przepraszam, nie mogę połączyć się z serwerem Ollama."
 
-                return response["message"]["content"].strip()
+            messages = self._chat_messages(user_prompt)
+            response = client.chat(
+                model=self.model_name,
+                messages=messages,
+                options=self._chat_options(messages),
+            )
 
-            except Exception as e:
-                return f"Przepraszam, wystąpił błąd: {str(e)}"
+            return response["message"]["content"].strip()
 
-    def answer_question(self, question: str) -> str:
+        except Exception as e:
+            return f"Przepraszam, wystąpił błąd: {str(e)}"
+
+    def stream_use_expiring_products(self) -> ChatStream:
         """
-        Odpowiada na pytania użytkownika o jedzenie, produkty, gotowanie.
-        Używa RAG do wyszukiwania produktów w bazie.
-        
-        Args:
-            question: Pytanie użytkownika
-            
+        Strumieniowa wersja suggest_use_expiring_products (tekst po tokenie).
+
         Returns:
-            Odpowiedź asystenta
+            ChatStream z sugestią Bielika
         """
+        user_prompt = self._expiring_products_prompt()
+        if user_prompt is None:
+            return ChatStream(text=NO_EXPIRING_PRODUCTS_TEXT)
+        return self._stream_chat(
+            user_prompt,
+            error_text="Przepraszam, wystąpił błąd podczas generowania sugestii.",
+            offline_text="Przepraszam, nie mogę połączyć się z serwerem Ollama.",
+        )
+
+    def _question_prompt(self, question: str) -> str:
+        """Prompt pytania z kontekstem produktów z bazy (RAG)."""
         # Wyszukaj produkty używając RAG
         relevant_products = self._search_products_rag(question, limit=15)
         available_products = self.get_available_products()
@@ -440,32 +501,57 @@ Bądź konkretny i praktyczny. Jeśli produkt jest już przeterminowany, zasuger
             for p in available_products[:20]:
                 available_context += f"- {p['nazwa']} ({p['kategoria']}) - {p['total_ilosc']} {p['stany'][0]['jednostka'] if p['stany'] else 'szt'}\n"
 
-        system_prompt = get_prompt("answer_question")
-
-        user_prompt = f"""Pytanie użytkownika: {question}
+        return f"""Pytanie użytkownika: {question}
 {products_context}
 {available_context}
 
 Odpowiedz na pytanie użytkownika, korzystając z dostępnych informacji o produktach."""
 
+    def answer_question(self, question: str) -> str:
+        """
+        Odpowiada na pytania użytkownika o jedzenie, produkty, gotowanie.
+        Używa RAG do wyszukiwania produktów w bazie.
+        
+        Args:
+            question: Pytanie użytkownika
+            
+        Returns:
+            Odpowiedź asystenta
+        """
+        user_prompt = self._question_prompt(question)
+
         try:
             if not client:
-                return "Przepraszam, nie mogę połączyć się z serwerem Ollama. Sprawdź, czy serwer działa."
+                return OFFLINE_ANSWER_TEXT
 
+            messages = self._chat_messages(user_prompt)
             response = client.chat(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                options={"temperature": 0.7, "num_predict": 2000},
+                messages=messages,
+                options=self._chat_options(messages),
             )
 
             return response["message"]["content"].strip()
 
         except Exception as e:
             logger.error(f"Error processing question: {e}", exc_info=True)
-            return "Przepraszam, wystąpił błąd podczas przetwarzania pytania. Spróbuj ponownie."
+            return ANSWER_ERROR_TEXT
+
+    def stream_answer_question(self, question: str) -> ChatStream:
+        """
+        Strumieniowa wersja answer_question - fragmenty odpowiedzi od pierwszego tokenu.
+
+        Args:
+            question: Pytanie użytkownika
+
+        Returns:
+            ChatStream (iteracja zwraca tekst; po niej text, response_time_ms, tokens_used)
+        """
+        return self._stream_chat(
+            self._question_prompt(question),
+            error_text=ANSWER_ERROR_TEXT,
+            offline_text=OFFLINE_ANSWER_TEXT,
+        )
 
     def close(self):
         """Zamyka sesję bazy danych."""
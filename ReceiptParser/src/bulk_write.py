@@ -0,0 +1,168 @@
+"""
+Zbiorczy zapis pozycji paragonu do bazy danych.
+
+Zamiast osobnych zapytań o alias, produkt, kategorię i stan magazynowy dla każdej
+pozycji (oraz flush po każdej z nich), ReceiptWriteCache ładuje potrzebne wiersze
+kilkoma zapytaniami IN (...), nowe obiekty buduje w pamięci (powiązane przez
+relacje, więc klucze obce uzupełnia SQLAlchemy) i zapisuje je jednym flush().
+"""
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from .database import (
+    AliasProduktu,
+    KategoriaProduktu,
+    PozycjaParagonu,
+    Produkt,
+    StanMagazynowy,
+)
+
+
+class ReceiptWriteCache:
+    """
+    Wstępnie załadowane aliasy, produkty, kategorie i stany magazynowe jednego paragonu.
+
+    Args:
+        session: Sesja SQLAlchemy, w której zostaną zapisane nowe obiekty
+    """
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.aliases: Dict[str, AliasProduktu] = {}
+        self.products: Dict[str, Produkt] = {}
+        self.categories: Dict[str, KategoriaProduktu] = {}
+        self.stock: Dict[Tuple[Produkt, Optional[date]], StanMagazynowy] = {}
+        self._new_objects: List[object] = []
+
+    def load_aliases(self, raw_names: Iterable[str]) -> Dict[str, AliasProduktu]:
+        """Ładuje aliasy (z produktami) dla podanych surowych nazw jednym zapytaniem."""
+        names = set(raw_names) - set(self.aliases)
+        if names:
+            for alias in (
+                self.session.query(AliasProduktu)
+                .options(joinedload(AliasProduktu.produkt))
+                .filter(AliasProduktu.nazwa_z_paragonu.in_(names))
+                .all()
+            ):
+                self.aliases[alias.nazwa_z_paragonu] = alias
+        return self.aliases
+
+    def load_products(self, names: Iterable[str]) -> None:
+        """Ładuje produkty o podanych znormalizowanych nazwach jednym zapytaniem."""
+        names = set(names) - set(self.products)
+        if names:
+            for product in (
+                self.session.query(Produkt)
+                .filter(Produkt.znormalizowana_nazwa.in_(names))
+                .all()
+            ):
+                self.products[product.znormalizowana_nazwa] = product
+
+    def load_categories(self, names: Iterable[str]) -> None:
+        """Ładuje kategorie o podanych nazwach jednym zapytaniem."""
+        names = set(names) - set(self.categories)
+        if names:
+            for kategoria in (
+                self.session.query(KategoriaProduktu)
+                .filter(KategoriaProduktu.nazwa_kategorii.in_(names))
+                .all()
+            ):
+                self.categories[kategoria.nazwa_kategorii] = kategoria
+
+    def load_stock(self, products: Iterable[Produkt]) -> None:
+        """
+        Ładuje stany magazynowe istniejących produktów jednym zapytaniem.
+
+        Dla pary (produkt, data ważności) zapamiętywany jest wpis o najniższym
+        stan_id - ten sam, który wcześniej zwracało zapytanie .first().
+        """
+        by_id = {p.produkt_id: p for p in products if p.produkt_id is not None}
+        if not by_id:
+            return
+        for stan in (
+            self.session.query(StanMagazynowy)
+            .filter(StanMagazynowy.produkt_id.in_(by_id))
+            .order_by(StanMagazynowy.stan_id)
+            .all()
+        ):
+            key = (by_id[stan.produkt_id], stan.data_waznosci)
+            self.stock.setdefault(key, stan)
+
+    def get_or_create_category(self, name: str) -> Tuple[KategoriaProduktu, bool]:
+        """Zwraca (kategoria, czy_utworzona) - nowa kategoria powstaje tylko w pamięci."""
+        kategoria = self.categories.get(name)
+        if kategoria is not None:
+            return kategoria, False
+        kategoria = KategoriaProduktu(nazwa_kategorii=name)
+        self.categories[name] = kategoria
+        self._new_objects.append(kategoria)
+        return kategoria, True
+
+    def get_or_create_product(
+        self, name: str, kategoria: KategoriaProduktu
+    ) -> Tuple[Produkt, bool]:
+        """Zwraca (produkt, czy_utworzony) - nowy produkt powstaje tylko w pamięci."""
+        product = self.products.get(name)
+        if product is not None:
+            return product, False
+        product = Produkt(znormalizowana_nazwa=name, kategoria=kategoria)
+        self.products[name] = product
+        self._new_objects.append(product)
+        return product, True
+
+    def set_alias(self, raw_name: str, product: Produkt) -> Optional[Produkt]:
+        """
+        Przypisuje surową nazwę do produktu (istniejący alias jest przepinany).
+
+        Returns:
+            Produkt, na który wskazywał alias wcześniej, lub None dla nowego aliasu
+        """
+        alias = self.aliases.get(raw_name)
+        if alias is not None:
+            previous = alias.produkt
+            if previous is not product:
+                alias.produkt = product
+            return previous
+        alias = AliasProduktu(nazwa_z_paragonu=raw_name, produkt=product)
+        self.aliases[raw_name] = alias
+        self._new_objects.append(alias)
+        return None
+
+    def add_to_stock(
+        self,
+        product: Produkt,
+        pozycja: PozycjaParagonu,
+        ilosc,
+        jednostka: Optional[str],
+        data_waznosci: Optional[date],
+    ) -> bool:
+        """
+        Zwiększa stan magazynowy produktu o tej samej dacie ważności lub tworzy nowy wpis.
+
+        Returns:
+            True jeśli zaktualizowano istniejący wpis, False jeśli utworzono nowy
+        """
+        key = (product, data_waznosci)
+        stan = self.stock.get(key)
+        if stan is not None:
+            stan.ilosc += ilosc
+            stan.pozycja_paragonu = pozycja
+            return True
+        stan = StanMagazynowy(
+            produkt=product,
+            ilosc=ilosc,
+            jednostka_miary=jednostka,
+            data_waznosci=data_waznosci,
+            pozycja_paragonu=pozycja,
+        )
+        self.stock[key] = stan
+        self._new_objects.append(stan)
+        return False
+
+    def flush(self) -> None:
+        """Dodaje nowe obiekty do sesji i zapisuje wszystkie zmiany jednym flush()."""
+        self.session.add_all(self._new_objects)
+        self._new_objects = []
+        self.session.flush()
@@ -37,10 +37,43 @@ class Config:
     ENABLE_FILE_LOGGING = os.getenv("ENABLE_FILE_LOGGING", "false").lower() == "true"
 
     # --- Konfiguracja OCR ---
-    # Silnik OCR: 'tesseract' (CPU) lub 'easyocr' (GPU/CPU)
+    # Silnik OCR: 'tesseract' (CPU, proces na wywołanie), 'tesserocr' (Tesseract w procesie,
+    # wymaga pakietu tesserocr) lub 'easyocr' (GPU/CPU)
     OCR_ENGINE = os.getenv("OCR_ENGINE", "tesseract")
     # Czy używać GPU dla EasyOCR (jeśli dostępne)
     USE_GPU_OCR = os.getenv("USE_GPU_OCR", "true").lower() == "true"
+    # Maksymalna liczba ciepłych instancji silnika OCR na proces (wątki czekają na wolną)
+    OCR_ENGINE_POOL_SIZE = int(os.getenv("OCR_ENGINE_POOL_SIZE", "2"))
+    # Ładowanie silnika OCR przy starcie workerów puli procesów (zamiast przy pierwszym paragonie)
+    OCR_WARMUP = os.getenv("OCR_WARMUP", "true").lower() == "true"
+    # Rozdzielczość renderowania stron PDF i liczba stron renderowanych naraz (pdftoppm)
+    PDF_DPI = int(os.getenv("PDF_DPI", "200"))
+    PDF_THREAD_COUNT = int(os.getenv("PDF_THREAD_COUNT", "2"))
+    # Tesseract w poziomych pasach rozpoznawanych równolegle (obrazy od OCR_STRIP_MIN_HEIGHT px)
+    OCR_STRIP_PARALLEL = os.getenv("OCR_STRIP_PARALLEL", "true").lower() == "true"
+    OCR_STRIP_MIN_HEIGHT = int(os.getenv("OCR_STRIP_MIN_HEIGHT", "3000"))
+    OCR_STRIP_HEIGHT = int(os.getenv("OCR_STRIP_HEIGHT", "1200"))
+    OCR_STRIP_OVERLAP = int(os.getenv("OCR_STRIP_OVERLAP", "40"))
+    OCR_STRIP_WORKERS = int(os.getenv("OCR_STRIP_WORKERS", str(os.cpu_count() or 2)))
+    # Tekst OCR odtwarzany z ramek słów: wiersze paragonu z kolumnami rozdzielonymi " | "
+    OCR_LAYOUT = os.getenv("OCR_LAYOUT", "false").lower() == "true"
+    # Szybki OCR samego nagłówka (górny pas, niska rozdzielczość) do wyboru strategii sklepu
+    HEADER_OCR = os.getenv("HEADER_OCR", "true").lower() == "true"
+    # Wysokość pasa nagłówka jako ułamek szerokości paragonu i szerokość pasa po zmniejszeniu
+    HEADER_OCR_BAND_RATIO = float(os.getenv("HEADER_OCR_BAND_RATIO", "0.6"))
+    HEADER_OCR_WIDTH = int(os.getenv("HEADER_OCR_WIDTH", "600"))
+    # Przygotowanie obrazu (skala szarości, prostowanie, przycięcie, DPI) przed OCR i modelem wizyjnym.
+    # Domyślnie wyłączone do czasu zapisania wyników tests/evaluation/preprocess_benchmark.py na paragony/
+    PREPROCESS_OCR = os.getenv("PREPROCESS_OCR", "false").lower() == "true"
+    PREPROCESS_VISION = os.getenv("PREPROCESS_VISION", "false").lower() == "true"
+    PREPROCESS_OCR_DPI = int(os.getenv("PREPROCESS_OCR_DPI", "300"))
+    PREPROCESS_VISION_DPI = int(os.getenv("PREPROCESS_VISION_DPI", "200"))
+    # Ładunek obrazu dla modelu wizyjnego: zmniejszenie do rozdzielczości modelu, skala szarości, JPEG
+    VISION_PAYLOAD_OPTIMIZE = os.getenv("VISION_PAYLOAD_OPTIMIZE", "true").lower() == "true"
+    # Budżet bajtów obrazu na żądanie (jakość JPEG, a potem rozdzielczość są obniżane do budżetu)
+    VISION_PAYLOAD_MAX_KB = int(os.getenv("VISION_PAYLOAD_MAX_KB", "400"))
+    VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "80"))
+    VISION_JPEG_MIN_QUALITY = int(os.getenv("VISION_JPEG_MIN_QUALITY", "50"))
 
     # --- Konfiguracja Retry Logic ---
     # Maksymalna liczba prób retry dla wywołań API
@@ -60,6 +93,120 @@ class Config:
     # Maksymalna liczba równoległych batchy (ThreadPoolExecutor workers)
     BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "3"))
 
+    # --- Konfiguracja przetwarzania wsadowego paragonów (process-dir) ---
+    # Liczba procesów OCR (konwersja PDF + Tesseract/EasyOCR są CPU-bound)
+    BATCH_OCR_WORKERS = int(
+        os.getenv("BATCH_OCR_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))
+    )
+    # Maksymalna liczba równoległych wywołań LLM przy parsowaniu paragonów
+    BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "2"))
+    # Rozmiar kolejek między etapami potoku (backpressure dla szybszych etapów)
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+    # --- Asynchroniczny klient Ollama (async_llm / async_pipeline) ---
+    # Maksymalna liczba jednoczesnych żądań LLM w jednej pętli asyncio
+    # (jednocześnie rozmiar puli połączeń HTTP współdzielonej przez wszystkie żądania)
+    ASYNC_LLM_MAX_CONCURRENCY = int(os.getenv("ASYNC_LLM_MAX_CONCURRENCY", "8"))
+
+    # --- Harmonogram żądań LLM (llm_scheduler, wszystkie wywołania Ollamy) ---
+    # Maksymalna liczba żądań do Ollamy w toku w procesie (czat, paragony, batche).
+    # Domyślnie jak OLLAMA_NUM_PARALLEL serwera - nadmiar czekałby po stronie serwera bez priorytetów
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    # Limity per model, np. "llava:latest=1,SpeakLeash/bielik-11b-v2.3-instruct:Q4_K_M=2"
+    LLM_MODEL_CONCURRENCY = os.getenv("LLM_MODEL_CONCURRENCY", "")
+    # Co ile sekund czekania żądanie awansuje o jedną klasę priorytetu (0 = bez awansu)
+    LLM_PRIORITY_AGING_SECONDS = float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "30"))
+
+    # --- Budżet tokenów żądań LLM (token_budget: num_ctx i num_predict per wywołanie) ---
+    # Zakres num_ctx - większy kontekst spowalnia model na CPU, mniejszy obcina prompt
+    LLM_NUM_CTX_MIN = int(os.getenv("LLM_NUM_CTX_MIN", "2048"))
+    LLM_NUM_CTX_MAX = int(os.getenv("LLM_NUM_CTX_MAX", "8192"))
+    # Średnia liczba znaków na token (polski tekst i JSON - mniej niż ~4 dla angielskiego)
+    LLM_CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "3.0"))
+    # Bajty JSON-a jednej pozycji paragonu w odpowiedzi modelu (szacowanie num_predict)
+    LLM_RECEIPT_ITEM_BYTES = int(os.getenv("LLM_RECEIPT_ITEM_BYTES", "160"))
+
+    # --- Weryfikacja nieznanych produktów ---
+    # true = nieznane produkty zapisywane z tymczasowym mapowaniem (flaga do_weryfikacji)
+    # i weryfikowane później w kolejce (CLI 'review' / GUI), bez blokowania na prompt_callback
+    DEFERRED_PRODUCT_REVIEW = (
+        os.getenv("DEFERRED_PRODUCT_REVIEW", "false").lower() == "true"
+    )
+
+    # --- Cache wyników parsowania paragonów (surowe odpowiedzi LLM) ---
+    # Obejmuje tylko parse_receipt_with_llm i parse_receipt_from_text (CLI: parse-cache).
+    # Osobny od LLM_CACHE: klucz to hash obrazu + model + prompt + tekst OCR, wpis to
+    # duży JSON paragonu bez TTL (ten sam plik daje ten sam wynik) z filtrami purge
+    # po modelu i wieku. Pozostałe wywołania LLM korzystają z LLM_CACHE.
+    # Czy zapisywać i odczytywać odpowiedzi LLM dla tego samego obrazu/promptu/OCR
+    PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+    # Plik SQLite z cache (domyślnie ReceiptParser/data/parse_cache.db)
+    PARSE_CACHE_PATH = os.getenv(
+        "PARSE_CACHE_PATH",
+        os.path.join(os.path.dirname(current_dir), "data", "parse_cache.db"),
+    )
+    # Maksymalny rozmiar przechowywanych odpowiedzi (w MB)
+    PARSE_CACHE_MAX_MB = float(os.getenv("PARSE_CACHE_MAX_MB", "50"))
+
+    # --- Cache odpowiedzi LLM (SQLite WAL, wspólny dla GUI, CLI i workerów) ---
+    # Obejmuje krótkie odpowiedzi tekstowe: get_llm_suggestion (CLI: llm-cache).
+    # Klucz to znormalizowany prompt + model + opcje; wpisy mają TTL, bo sugestie
+    # zależą od przykładów uczenia, które zmieniają się z kolejnymi paragonami.
+    # false = cache tylko w pamięci procesu (LRU, 100 wpisów)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    # Plik SQLite z cache (domyślnie ReceiptParser/data/llm_cache.db)
+    LLM_CACHE_PATH = os.getenv(
+        "LLM_CACHE_PATH",
+        os.path.join(os.path.dirname(current_dir), "data", "llm_cache.db"),
+    )
+    # Limit łącznego i pojedynczego rozmiaru skompresowanych odpowiedzi, czas życia wpisu
+    LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "20"))
+    LLM_CACHE_MAX_ENTRY_KB = float(os.getenv("LLM_CACHE_MAX_ENTRY_KB", "256"))
+    LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "720"))
+    # Co ile sekund wątek w tle usuwa przeterminowane wpisy (niezależnie od zapisów)
+    LLM_CACHE_EVICT_INTERVAL = float(os.getenv("LLM_CACHE_EVICT_INTERVAL", "300"))
+
+    # --- Cache zapytań analitycznych i magazynu (db_cache, w pamięci procesu) ---
+    # Wpisy są unieważniane przy zapisie do czytanych tabel; TTL ogranicza nieświeżość
+    # przy zapisach z innych procesów (np. CLI przetwarzające paragony obok GUI)
+    QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "300"))
+
+    # --- Cache wyników OCR (tekst wg hasha obrazu, silnika i ustawień) ---
+    OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+    # Plik SQLite z cache (domyślnie ReceiptParser/data/ocr_cache.db)
+    OCR_CACHE_PATH = os.getenv(
+        "OCR_CACHE_PATH",
+        os.path.join(os.path.dirname(current_dir), "data", "ocr_cache.db"),
+    )
+    # Maksymalny rozmiar skompresowanych wyników (w MB)
+    OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "20"))
+
+    # --- Punkty kontrolne zadań przetwarzania (wznawianie: CLI 'resume') ---
+    # Czy zapisywać artefakty etapów (obraz, OCR, LLM, dane, normalizacja) dla każdego paragonu
+    JOB_STORE_ENABLED = os.getenv("JOB_STORE_ENABLED", "true").lower() == "true"
+    # Plik SQLite z zadaniami (domyślnie ReceiptParser/data/jobs.db)
+    JOB_STORE_PATH = os.getenv(
+        "JOB_STORE_PATH",
+        os.path.join(os.path.dirname(current_dir), "data", "jobs.db"),
+    )
+    # Katalog na obrazy skonwertowane z PDF (usuwane po ukończeniu zadania)
+    JOB_ARTIFACTS_DIR = os.getenv(
+        "JOB_ARTIFACTS_DIR",
+        os.path.join(os.path.dirname(current_dir), "data", "jobs"),
+    )
+
+    # --- Ślady czasów etapów (tracing, CLI 'stats') ---
+    # Czy zapisywać spany (czas, CPU, bajty, tokeny LLM) każdego etapu do pliku JSONL
+    TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+    # Plik śladów (domyślnie ReceiptParser/data/traces.jsonl)
+    TRACE_PATH = os.getenv(
+        "TRACE_PATH",
+        os.path.join(os.path.dirname(current_dir), "data", "traces.jsonl"),
+    )
+    # Limit pliku śladów - po przekroczeniu plik przechodzi do TRACE_PATH.1
+    # (poprzedni .1 jest usuwany), więc na dysku są najwyżej 2 x TRACE_MAX_MB
+    TRACE_MAX_MB = float(os.getenv("TRACE_MAX_MB", "10"))
+
     @staticmethod
     def print_config():
         print("--- Konfiguracja ---")
@@ -10,7 +10,8 @@ from datetime import datetime
 # Chcemy, żeby baza danych 'receipts.db' była w folderze 'data' na tym samym poziomie co 'src'.
 # Budujemy ścieżkę w sposób niezależny od systemu operacyjnego.
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-db_path = os.path.join(project_root, "data", "receipts.db")
+# RECEIPTS_DB_PATH pozwala użyć innej bazy (np. tymczasowej w benchmarku).
+db_path = os.getenv("RECEIPTS_DB_PATH", os.path.join(project_root, "data", "receipts.db"))
 DATABASE_URL = f"sqlite:///{db_path}"
 
 # Tworzymy silnik SQLAlchemy. `echo=True` wyświetli generowane zapytania SQL - przydatne do debugowania.
@@ -58,6 +59,7 @@ class AliasProduktu(Base):
     alias_id = Column(Integer, primary_key=True)
     nazwa_z_paragonu = Column(String, nullable=False, unique=True)
     produkt_id = Column(Integer, ForeignKey('produkty.produkt_id'), nullable=False)
+    do_weryfikacji = Column(Boolean, default=False, nullable=False)  # Tymczasowe mapowanie (odroczona weryfikacja)
     
     produkt = relationship("Produkt", back_populates="aliasy")
 
@@ -67,12 +69,14 @@ class Paragon(Base):
         Index('idx_paragon_sklep', 'sklep_id'),
         Index('idx_paragon_data', 'data_zakupu'),
         Index('idx_paragon_sklep_data', 'sklep_id', 'data_zakupu'),
+        Index('idx_paragon_hash', 'hash_pliku', unique=True),
     )
     paragon_id = Column(Integer, primary_key=True)
     sklep_id = Column(Integer, ForeignKey('sklepy.sklep_id'))
     data_zakupu = Column(Date)
     suma_paragonu = Column(Numeric(10, 2))
     plik_zrodlowy = Column(String, nullable=False)
+    hash_pliku = Column(String(64))  # SHA-256 zawartości pliku źródłowego (deduplikacja)
     
     sklep = relationship("Sklep", back_populates="paragony")
     pozycje = relationship("PozycjaParagonu", back_populates="paragon", cascade="all, delete-orphan")
@@ -83,6 +87,7 @@ class PozycjaParagonu(Base):
         Index('idx_pozycja_paragon', 'paragon_id'),
         Index('idx_pozycja_produkt', 'produkt_id'),
         Index('idx_pozycja_paragon_produkt', 'paragon_id', 'produkt_id'),
+        Index('idx_pozycja_weryfikacja', 'do_weryfikacji'),
     )
     pozycja_id = Column(Integer, primary_key=True)
     paragon_id = Column(Integer, ForeignKey('paragony.paragon_id'), nullable=False)
@@ -95,6 +100,10 @@ class PozycjaParagonu(Base):
     cena_calkowita = Column(Numeric(10, 2), nullable=False)
     rabat = Column(Numeric(10, 2))
     cena_po_rabacie = Column(Numeric(10, 2))
+    # Produkt przypisany tymczasowo - pozycja czeka w kolejce weryfikacji (bez stanu magazynowego)
+    do_weryfikacji = Column(Boolean, default=False, nullable=False)
+    # Data ważności z paragonu - dla pozycji do_weryfikacji przenoszona do stanu magazynowego po weryfikacji
+    data_waznosci = Column(Date)
     
     paragon = relationship("Paragon", back_populates="pozycje")
     produkt = relationship("Produkt", back_populates="pozycje_paragonu")
@@ -3,33 +3,71 @@ Database Query Cache for ParagonOCR 2.0
 
 Implements LRU cache for database query results to improve performance.
 
+Entries are tagged with the tables the query reads. Any ORM write to one of
+those tables (unit-of-work flush, commit or rollback, and bulk
+insert/update/delete statements run through a Session) invalidates the
+tagged entries, so views like analytics and inventory never serve results
+older than the last write made in this process. Writes from other processes
+are not seen - max_age_seconds bounds how stale an entry can get.
+
 Author: ParagonOCR Team
 Version: 2.0
 """
 
+import copy
 import hashlib
 import json
 import logging
-from typing import Any, Callable, Dict, Optional, Tuple
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set
 from collections import OrderedDict
+from datetime import date
 from functools import wraps
 
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 logger = logging.getLogger(__name__)
 
+# Session.info key with tables written since the last commit/rollback
+_PENDING_TABLES_KEY = "db_cache_written_tables"
+
+
+class CacheEntry:
+    """
+    Cached query result.
+
+    Attributes:
+        value: Query result
+        created_at: time.monotonic() when the result was stored
+        tables: Names of the tables the query reads
+    """
+
+    __slots__ = ("value", "created_at", "tables")
+
+    def __init__(self, value: Any, tables: Iterable[str] = ()) -> None:
+        self.value = value
+        self.created_at = time.monotonic()
+        self.tables = frozenset(tables)
+
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
 
 class LRUCache:
     """
     Least Recently Used (LRU) cache implementation.
-    
+
     Attributes:
         max_size: Maximum number of items in cache
         cache: OrderedDict storing cached items
     """
-    
+
     def __init__(self, max_size: int = 200) -> None:
         """
         Initialize LRU cache.
-        
+
         Args:
             max_size: Maximum number of items to cache (default: 200)
         """
@@ -37,66 +75,107 @@ class LRUCache:
         self.cache: OrderedDict[str, Any] = OrderedDict()
         self.hits = 0
         self.misses = 0
-    
+        self.invalidations = 0
+        # Bumped on every invalidation - a result computed across one is not stored
+        self.generation = 0
+        self._lock = threading.RLock()
+
     def get(self, key: str) -> Optional[Any]:
         """
         Get item from cache.
-        
+
         Args:
             key: Cache key
-            
+
         Returns:
             Cached value or None if not found
         """
-        if key in self.cache:
-            # Move to end (most recently used)
-            self.cache.move_to_end(key)
-            self.hits += 1
-            return self.cache[key]
-        
-        self.misses += 1
-        return None
-    
+        with self._lock:
+            if key in self.cache:
+                # Move to end (most recently used)
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+
+            self.misses += 1
+            return None
+
     def set(self, key: str, value: Any) -> None:
         """
         Set item in cache.
-        
+
         Args:
             key: Cache key
             value: Value to cache
         """
-        if key in self.cache:
-            # Update existing item
-            self.cache.move_to_end(key)
-        else:
-            # Check if cache is full
-            if len(self.cache) >= self.max_size:
-                # Remove least recently used (first item)
-                self.cache.popitem(last=False)
-        
-        self.cache[key] = value
-    
+        with self._lock:
+            if key in self.cache:
+                # Update existing item
+                self.cache.move_to_end(key)
+            else:
+                # Check if cache is full
+                if len(self.cache) >= self.max_size:
+                    # Remove least recently used (first item)
+                    self.cache.popitem(last=False)
+
+            self.cache[key] = value
+
+    def delete(self, key: str) -> None:
+        """Remove a single item (no-op if missing)."""
+        with self._lock:
+            self.cache.pop(key, None)
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        Remove entries tagged with any of the given tables.
+
+        Args:
+            tables: Names of modified tables
+
+        Returns:
+            Number of removed entries
+        """
+        tables = set(tables)
+        if not tables:
+            return 0
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self.cache.items()
+                if isinstance(entry, CacheEntry) and not entry.tables.isdisjoint(tables)
+            ]
+            for key in stale:
+                del self.cache[key]
+            self.invalidations += len(stale)
+            self.generation += 1
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached queries for tables: {sorted(tables)}")
+        return len(stale)
+
     def clear(self) -> None:
         """Clear all cached items."""
-        self.cache.clear()
-        self.hits = 0
-        self.misses = 0
-    
+        with self._lock:
+            self.cache.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
     def get_stats(self) -> Dict[str, Any]:
         """
         Get cache statistics.
-        
+
         Returns:
             Dictionary with cache stats
         """
         total = self.hits + self.misses
         hit_rate = (self.hits / total * 100) if total > 0 else 0.0
-        
+
         return {
             'size': len(self.cache),
             'max_size': self.max_size,
             'hits': self.hits,
             'misses': self.misses,
+            'invalidations': self.invalidations,
             'hit_rate': round(hit_rate, 2)
         }
 
@@ -104,15 +183,19 @@ class LRUCache:
 # Global cache instance
 _query_cache = LRUCache(max_size=200)
 
+# Per decorated function stats: qualified name -> counters
+_function_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
 
 def cache_key(*args: Any, **kwargs: Any) -> str:
     """
     Generate cache key from function arguments.
-    
+
     Args:
         *args: Positional arguments
         **kwargs: Keyword arguments
-        
+
     Returns:
         Cache key string
     """
@@ -121,65 +204,215 @@ def cache_key(*args: Any, **kwargs: Any) -> str:
         'args': args,
         'kwargs': sorted(kwargs.items())
     }
-    
+
     # Convert to JSON string and hash
     key_str = json.dumps(key_data, sort_keys=True, default=str)
     return hashlib.md5(key_str.encode()).hexdigest()
 
 
-def cached_query(max_age_seconds: Optional[int] = None):
+def _table_name(table: Any) -> str:
+    """Table name from a string, ORM model or Table object."""
+    if isinstance(table, str):
+        return table
+    name = getattr(table, "__tablename__", None) or getattr(table, "name", None)
+    if not name:
+        raise TypeError(f"Cannot determine table name for {table!r}")
+    return name
+
+
+def _count(name: str, counter: str) -> None:
+    with _stats_lock:
+        stats = _function_stats.setdefault(name, {"hits": 0, "misses": 0, "expired": 0})
+        stats[counter] += 1
+
+
+def session_scope(obj: Any) -> str:
+    """
+    Cache scope for methods of classes holding a `session` attribute.
+
+    Results are kept per database (bound engine), so two databases open in
+    one process (e.g. tests with in-memory SQLite) never share entries.
+    """
+    session = getattr(obj, "session", None)
+    if session is None:
+        return ""
+    return f"engine-{id(session.get_bind())}"
+
+
+def _autoflush(obj: Any) -> None:
+    """
+    Flush pending changes of the object's session, as its query would.
+
+    A cache hit runs no query, so without this the session's own unflushed
+    writes would not invalidate the results it is about to read.
+    """
+    session = getattr(obj, "session", None)
+    if session is not None and session.autoflush and (session.new or session.dirty or session.deleted):
+        session.flush()
+
+
+def dated_session_scope(obj: Any) -> str:
+    """session_scope plus today's date, for queries relative to date.today()."""
+    return f"{session_scope(obj)}:{date.today().isoformat()}"
+
+
+def cached_query(
+    max_age_seconds: Optional[float] = None,
+    tables: Optional[Iterable[Any]] = None,
+    scope: Optional[Callable[..., Any]] = None,
+):
     """
     Decorator for caching database query results.
-    
+
+    Results are returned as deep copies, so callers may modify them freely.
+
     Args:
         max_age_seconds: Optional maximum age of cached results in seconds
-        
+        tables: Tables (names or ORM models) read by the query; a write to any
+            of them invalidates the result. None = only TTL/clear invalidate it.
+        scope: Optional callable taking the first positional argument (e.g.
+            `self`) and returning the part of the key it contributes instead of
+            the argument itself (see session_scope)
+
     Returns:
         Decorated function
     """
+    table_names = frozenset(_table_name(table) for table in tables or ())
+
     def decorator(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
             # Generate cache key
-            key = f"{func.__name__}:{cache_key(*args, **kwargs)}"
-            
+            key_args = args
+            if scope is not None and args:
+                _autoflush(args[0])
+                key_args = (scope(args[0]),) + tuple(args[1:])
+            key = f"{name}:{cache_key(*key_args, **kwargs)}"
+
             # Try to get from cache
-            cached_result = _query_cache.get(key)
-            if cached_result is not None:
-                # Check age if max_age specified
-                if max_age_seconds is None:
+            entry = _query_cache.get(key)
+            if entry is not None:
+                if max_age_seconds is None or entry.age() <= max_age_seconds:
                     logger.debug(f"Cache hit for {func.__name__}")
-                    return cached_result
-                else:
-                    # TODO: Implement age checking if needed
-                    logger.debug(f"Cache hit for {func.__name__}")
-                    return cached_result
-            
+                    _count(name, "hits")
+                    return copy.deepcopy(entry.value)
+                _query_cache.delete(key)
+                _count(name, "expired")
+
             # Cache miss - execute function
             logger.debug(f"Cache miss for {func.__name__}")
+            _count(name, "misses")
+            generation = _query_cache.generation
             result = func(*args, **kwargs)
-            
-            # Store in cache
-            _query_cache.set(key, result)
-            
+
+            # Store in cache (unless a write invalidated something while the query ran)
+            if _query_cache.generation == generation:
+                _query_cache.set(key, CacheEntry(copy.deepcopy(result), table_names))
+
             return result
-        
+
+        wrapper.cache_tables = table_names
+        wrapper.cache_stats = lambda: get_function_stats(name)
         return wrapper
     return decorator
 
 
+def invalidate_tables(*tables: Any) -> int:
+    """
+    Invalidate cached results reading any of the given tables.
+
+    Use after writes that bypass the ORM Session (raw sqlite3 connection).
+
+    Args:
+        *tables: Table names or ORM models
+
+    Returns:
+        Number of removed entries
+    """
+    return _query_cache.invalidate_tables(_table_name(table) for table in tables)
+
+
+def _written_tables(session: Session) -> Set[str]:
+    return session.info.setdefault(_PENDING_TABLES_KEY, set())
+
+
+def _mark_written(session: Session, tables: Iterable[str]) -> None:
+    tables = set(tables)
+    if not tables:
+        return
+    _written_tables(session).update(tables)
+    # Readers on the same session already see flushed rows
+    _query_cache.invalidate_tables(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _on_after_flush(session: Session, flush_context: Any) -> None:
+    # new/dirty/deleted still hold the pre-flush state here
+    tables = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            tables.add(table.name)
+    _mark_written(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_orm_execute(orm_execute_state: Any) -> None:
+    # Bulk insert()/update()/delete() and Query.update()/delete() skip the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _mark_written(orm_execute_state.session, [table.name])
+
+
+@event.listens_for(Session, "after_commit")
+def _on_after_commit(session: Session) -> None:
+    # Results cached between flush and commit (by other sessions) predate the commit
+    _query_cache.invalidate_tables(session.info.pop(_PENDING_TABLES_KEY, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_after_rollback(session: Session) -> None:
+    # Results cached from flushed-but-rolled-back rows are no longer valid
+    _query_cache.invalidate_tables(session.info.pop(_PENDING_TABLES_KEY, ()))
+
+
 def clear_query_cache() -> None:
     """Clear all cached query results."""
     _query_cache.clear()
+    with _stats_lock:
+        _function_stats.clear()
     logger.info("Query cache cleared")
 
 
+def get_function_stats(name: str) -> Dict[str, Any]:
+    """
+    Get hit/miss statistics of one decorated function.
+
+    Args:
+        name: Qualified function name ("module.Class.method")
+
+    Returns:
+        Dictionary with hits, misses, expired and hit_rate
+    """
+    with _stats_lock:
+        stats = dict(_function_stats.get(name, {"hits": 0, "misses": 0, "expired": 0}))
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / total * 100, 2) if total > 0 else 0.0
+    return stats
+
+
 def get_cache_stats() -> Dict[str, Any]:
     """
     Get query cache statistics.
-    
+
     Returns:
-        Dictionary with cache statistics
+        Dictionary with cache statistics ('functions' holds per-function stats)
     """
-    return _query_cache.get_stats()
-
+    stats = _query_cache.get_stats()
+    with _stats_lock:
+        names = sorted(_function_stats)
+    stats['functions'] = {name: get_function_stats(name) for name in names}
+    return stats
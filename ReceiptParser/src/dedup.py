@@ -0,0 +1,103 @@
+"""
+Deduplikacja paragonów na podstawie hasha zawartości pliku (SHA-256).
+
+Hash liczony jest przed OCR, więc ponownie przesłany plik (watch folder, retry)
+jest rozpoznawany w milisekundach - bez wywołania vision LLM i bez ponownego
+zwiększania stanów magazynowych.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from .data_models import ParsedData
+from .database import Paragon, PozycjaParagonu
+
+# Rozmiar bloku przy czytaniu pliku (1 MB)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Tryby obsługi duplikatów
+ON_DUPLICATE_SKIP = "skip"
+ON_DUPLICATE_REPLAY = "replay"
+ON_DUPLICATE_MODES = [ON_DUPLICATE_SKIP, ON_DUPLICATE_REPLAY]
+
+
+def compute_file_hash(file_path: str) -> str:
+    """
+    Oblicza SHA-256 zawartości pliku.
+
+    Args:
+        file_path: Ścieżka do pliku
+
+    Returns:
+        Hash jako 64-znakowy string szesnastkowy
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def find_receipt_by_hash(session: Session, file_hash: str) -> Optional[Paragon]:
+    """
+    Wyszukuje zapisany paragon o podanym hashu pliku.
+
+    Args:
+        session: Sesja SQLAlchemy
+        file_hash: SHA-256 zawartości pliku
+
+    Returns:
+        Paragon (z załadowanym sklepem i pozycjami) lub None
+    """
+    if not file_hash:
+        return None
+    return (
+        session.query(Paragon)
+        .options(
+            joinedload(Paragon.sklep),
+            joinedload(Paragon.pozycje).joinedload(PozycjaParagonu.produkt),
+        )
+        .filter(Paragon.hash_pliku == file_hash)
+        .first()
+    )
+
+
+def receipt_to_parsed_data(paragon: Paragon) -> ParsedData:
+    """
+    Odtwarza ParsedData z zapisanego paragonu (replay bez OCR i LLM).
+
+    Args:
+        paragon: Paragon z bazy danych
+
+    Returns:
+        Dane w formacie ParsedData (jak po post-processingu strategii)
+    """
+    data_zakupu = paragon.data_zakupu
+    if data_zakupu is not None and not isinstance(data_zakupu, datetime):
+        data_zakupu = datetime.combine(data_zakupu, datetime.min.time())
+
+    return {
+        "sklep_info": {
+            "nazwa": paragon.sklep.nazwa_sklepu if paragon.sklep else "",
+            "lokalizacja": paragon.sklep.lokalizacja if paragon.sklep else None,
+        },
+        "paragon_info": {
+            "data_zakupu": data_zakupu,
+            "suma_calkowita": paragon.suma_paragonu,
+        },
+        "pozycje": [
+            {
+                "nazwa_raw": pozycja.nazwa_z_paragonu_raw,
+                "ilosc": pozycja.ilosc,
+                "jednostka": pozycja.jednostka_miary,
+                "cena_jedn": pozycja.cena_jednostkowa,
+                "cena_calk": pozycja.cena_calkowita,
+                "rabat": pozycja.rabat,
+                "cena_po_rab": pozycja.cena_po_rabacie,
+            }
+            for pozycja in paragon.pozycje
+        ],
+        "file_path": paragon.plik_zrodlowy,
+    }
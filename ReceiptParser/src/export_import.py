@@ -32,6 +32,7 @@ from .database import (
     KategoriaProduktu,
     StanMagazynowy,
 )
+from .db_cache import clear_query_cache
 from .security import validate_file_path, sanitize_path, sanitize_log_message
 
 
@@ -409,6 +410,8 @@ class DatabaseBackup:
             
             # Zastąp bazę danych
             shutil.move(temp_db_path, db_path)
+            # Plik bazy podmieniony z pominięciem sesji - wyniki w cache zapytań są nieaktualne
+            clear_query_cache()
             
             # Usuń stary backup jeśli wszystko się powiodło
             old_backup = db_path + '.old'
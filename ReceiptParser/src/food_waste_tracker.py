@@ -12,7 +12,12 @@ from typing import List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session, joinedload
 from decimal import Decimal
 
-from .database import StanMagazynowy, Produkt, engine, sessionmaker
+from .config import Config
+from .database import StanMagazynowy, Produkt, KategoriaProduktu, engine, sessionmaker
+from .db_cache import cached_query, dated_session_scope
+
+# Tabele czytane przez zapytania o stan magazynu - zapis do nich unieważnia wyniki
+_INVENTORY_TABLES = (StanMagazynowy, Produkt, KategoriaProduktu)
 
 
 class FoodWasteTracker:
@@ -84,6 +89,7 @@ class FoodWasteTracker:
 
         return updated_count
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_INVENTORY_TABLES, scope=dated_session_scope)
     def get_expiring_products(
         self, priority: Optional[int] = None, limit: Optional[int] = None
     ) -> List[Dict]:
@@ -163,6 +169,7 @@ class FoodWasteTracker:
 
         return alerts
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_INVENTORY_TABLES, scope=dated_session_scope)
     def get_waste_statistics(self, days: int = 30) -> Dict:
         """
         Pobiera statystyki marnotrawstwa za ostatnie N dni.
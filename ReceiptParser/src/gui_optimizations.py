@@ -13,13 +13,14 @@ Date: 2025-12-06
 """
 
 import customtkinter as ctk
-from typing import List, Dict, Any, Callable, Optional, Tuple
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
 import tracemalloc
 import gc
+import threading
 import weakref
 from functools import lru_cache
 import logging
-from tkinter import Toplevel, Label
+from tkinter import Toplevel, Label, TclError
 
 from src.unified_design_system import AppColors, AppSpacing
 
@@ -451,6 +452,81 @@ def cleanup_widget_tree(widget: ctk.CTkBaseClass):
         logger.warning(f"Error cleaning up widget tree: {e}")
 
 
+def stream_to_widget(
+    widget: Any,
+    chunks: Iterable[str],
+    on_text: Callable[[str], None],
+    on_done: Optional[Callable[[str], None]] = None,
+    refresh_ms: int = 50,
+) -> threading.Thread:
+    """
+    Consume a token stream in a background thread and render it incrementally.
+
+    on_text(text_so_far) runs in the Tk main thread as soon as the first token
+    arrives and then at most every refresh_ms - tokens are coalesced, so a fast
+    model does not flood the event queue with one redraw per token.
+    on_done(full_text) runs in the main thread after the last token. If the
+    widget is destroyed mid-stream, the stream is closed (which releases the
+    LLM request).
+
+    Args:
+        widget: Any Tk widget (used for after())
+        chunks: Iterable of text fragments (e.g. llm.ChatStream)
+        on_text: Callback with the text received so far
+        on_done: Optional callback with the complete text
+        refresh_ms: Minimum interval between redraws
+
+    Returns:
+        The started daemon thread
+    """
+    lock = threading.Lock()
+    state = {"parts": [], "scheduled": False, "done": False}
+
+    def flush():
+        with lock:
+            state["scheduled"] = False
+            if state["done"]:
+                return
+            text = "".join(state["parts"])
+        on_text(text)
+
+    def finish():
+        text = "".join(state["parts"])
+        on_text(text)
+        if on_done:
+            on_done(text)
+
+    def worker():
+        first = True
+        iterator = iter(chunks)
+        try:
+            for chunk in iterator:
+                with lock:
+                    state["parts"].append(chunk)
+                    if state["scheduled"]:
+                        continue
+                    state["scheduled"] = True
+                widget.after(0 if first else refresh_ms, flush)
+                first = False
+        except (RuntimeError, TclError) as e:
+            # Widget destroyed (Tk main loop gone) - stop reading the stream
+            logger.warning(f"Stopping stream, widget is gone: {e}")
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            return
+        with lock:
+            state["done"] = True
+        try:
+            widget.after(0, finish)
+        except (RuntimeError, TclError) as e:
+            logger.warning(f"Cannot render finished stream: {e}")
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+
 def force_garbage_collection():
     """Force garbage collection to free memory."""
     collected = gc.collect()
@@ -0,0 +1,353 @@
+"""
+Trwałe zadania przetwarzania paragonów z punktami kontrolnymi etapów (SQLite).
+
+Każdy paragon (klucz: SHA-256 pliku) ma rekord zadania i artefakty kolejnych
+etapów: skonwertowany obraz PDF, tekst OCR, wynik LLM, dane po post-processingu
+strategii sklepu i mapę normalizacji nazw produktów. Gdy potok przerwie się
+po kosztownym etapie (np. błąd zapisu do bazy po 90 s wywołania modelu),
+ponowne uruchomienie zaczyna od ostatniego ukończonego etapu - CLI 'resume'
+wznawia wszystkie niedokończone zadania.
+
+Artefakty są przechowywane jako JSON; Decimal i datetime (ParsedData) są
+kodowane z jawnym znacznikiem typu, więc odczyt zwraca te same obiekty.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+from .security import sanitize_log_message
+
+# Etapy z artefaktami, w kolejności potoku
+STAGE_IMAGE = "image"
+STAGE_OCR = "ocr"
+STAGE_LLM = "llm"
+STAGE_PARSED = "parsed"
+STAGE_NORMALIZATION = "normalization"
+STAGES = [STAGE_IMAGE, STAGE_OCR, STAGE_LLM, STAGE_PARSED, STAGE_NORMALIZATION]
+
+STATUS_RUNNING = "running"
+STATUS_FAILED = "failed"
+STATUS_DONE = "done"
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        file_path TEXT NOT NULL,
+        llm_model TEXT NOT NULL,
+        status TEXT NOT NULL,
+        last_stage TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS job_artifacts (
+        job_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (job_id, stage)
+    )
+    """,
+]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Nieobsługiwany typ w artefakcie zadania: {type(value).__name__}")
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "__decimal__" in obj:
+            return Decimal(obj["__decimal__"])
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def encode_artifact(value: Any) -> str:
+    """Serializuje artefakt etapu do JSON (z obsługą Decimal i datetime)."""
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+
+def decode_artifact(data: str) -> Any:
+    """Odtwarza artefakt zapisany przez encode_artifact."""
+    return json.loads(data, object_hook=_json_object_hook)
+
+
+class ReceiptJob:
+    """
+    Uchwyt zadania jednego paragonu - odczyt i zapis artefaktów etapów.
+
+    Args:
+        store: Magazyn zadań
+        job_id: Identyfikator zadania (SHA-256 pliku paragonu)
+    """
+
+    def __init__(self, store: "JobStore", job_id: str) -> None:
+        self.store = store
+        self.job_id = job_id
+
+    def load(self, stage: str) -> Optional[Any]:
+        """Zwraca artefakt etapu lub None (etap nieukończony lub błąd magazynu)."""
+        try:
+            return self.store.get_artifact(self.job_id, stage)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"OSTRZEŻENIE: Błąd odczytu punktu kontrolnego '{stage}': {sanitize_log_message(str(e))}")
+            return None
+
+    def save(self, stage: str, value: Any) -> None:
+        """Zapisuje artefakt ukończonego etapu (błąd magazynu nie przerywa potoku)."""
+        try:
+            self.store.save_artifact(self.job_id, stage, value)
+        except (sqlite3.Error, TypeError) as e:
+            print(f"OSTRZEŻENIE: Błąd zapisu punktu kontrolnego '{stage}': {sanitize_log_message(str(e))}")
+
+    def keep_image(self, image_path: str) -> str:
+        """
+        Kopiuje skonwertowany obraz (plik tymczasowy) do katalogu artefaktów
+        i zapisuje jego ścieżkę jako artefakt etapu 'image'.
+
+        Returns:
+            Ścieżka do trwałej kopii obrazu (lub image_path, jeśli kopia się nie udała)
+        """
+        extension = os.path.splitext(image_path)[1] or ".png"
+        target = os.path.join(self.store.artifacts_dir, f"{self.job_id}{extension}")
+        try:
+            os.makedirs(self.store.artifacts_dir, exist_ok=True)
+            shutil.copyfile(image_path, target)
+        except OSError as e:
+            print(f"OSTRZEŻENIE: Nie udało się zachować obrazu zadania: {sanitize_log_message(str(e))}")
+            return image_path
+        self.save(STAGE_IMAGE, target)
+        return target
+
+    def load_image(self) -> Optional[str]:
+        """Zwraca ścieżkę do zapisanego obrazu, jeśli plik nadal istnieje."""
+        image_path = self.load(STAGE_IMAGE)
+        if image_path and os.path.exists(image_path):
+            return image_path
+        return None
+
+    def fail(self, error: str) -> None:
+        """Oznacza zadanie jako nieudane - artefakty zostają do wznowienia."""
+        try:
+            self.store.mark_failed(self.job_id, error)
+        except sqlite3.Error as e:
+            print(f"OSTRZEŻENIE: Błąd zapisu stanu zadania: {sanitize_log_message(str(e))}")
+
+    def done(self) -> None:
+        """Oznacza zadanie jako ukończone i usuwa jego artefakty."""
+        try:
+            self.store.mark_done(self.job_id)
+        except sqlite3.Error as e:
+            print(f"OSTRZEŻENIE: Błąd zapisu stanu zadania: {sanitize_log_message(str(e))}")
+
+
+class JobStore:
+    """
+    Rekordy zadań i artefakty etapów w osobnej bazie SQLite.
+
+    Args:
+        db_path: Ścieżka do pliku SQLite (domyślnie Config.JOB_STORE_PATH)
+        artifacts_dir: Katalog na skonwertowane obrazy (domyślnie Config.JOB_ARTIFACTS_DIR)
+    """
+
+    def __init__(self, db_path: Optional[str] = None, artifacts_dir: Optional[str] = None) -> None:
+        self.db_path = db_path or Config.JOB_STORE_PATH
+        self.artifacts_dir = artifacts_dir or Config.JOB_ARTIFACTS_DIR
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def start(self, job_id: str, file_path: str, llm_model: str) -> ReceiptJob:
+        """
+        Rozpoczyna lub wznawia zadanie paragonu.
+
+        Artefakty niedokończonego zadania z tym samym modelem są zachowywane;
+        zmiana modelu lub ukończone wcześniej zadanie oznacza start od zera.
+
+        Args:
+            job_id: SHA-256 pliku paragonu
+            file_path: Ścieżka do pliku paragonu
+            llm_model: Nazwa modelu LLM
+
+        Returns:
+            ReceiptJob dla tego paragonu
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT llm_model, status FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                if row is not None and (row[0] != llm_model or row[1] == STATUS_DONE):
+                    conn.execute("DELETE FROM job_artifacts WHERE job_id = ?", (job_id,))
+                    conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+                    row = None
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO jobs (job_id, file_path, llm_model, status, attempts, "
+                        "created_at, updated_at) VALUES (?, ?, ?, ?, 1, ?, ?)",
+                        (job_id, file_path, llm_model, STATUS_RUNNING, now, now),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET file_path = ?, status = ?, error = NULL, "
+                        "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                        (file_path, STATUS_RUNNING, now, job_id),
+                    )
+                conn.commit()
+            finally:
+                conn.close()
+        return ReceiptJob(self, job_id)
+
+    def get_artifact(self, job_id: str, stage: str) -> Optional[Any]:
+        """Zwraca zdekodowany artefakt etapu lub None."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT data FROM job_artifacts WHERE job_id = ? AND stage = ?",
+                    (job_id, stage),
+                ).fetchone()
+            finally:
+                conn.close()
+        return decode_artifact(row[0]) if row else None
+
+    def save_artifact(self, job_id: str, stage: str, value: Any) -> None:
+        """Zapisuje artefakt etapu i oznacza etap jako ostatnio ukończony."""
+        data = encode_artifact(value)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_artifacts (job_id, stage, data, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (job_id, stage, data, now),
+                )
+                conn.execute(
+                    "UPDATE jobs SET last_stage = ?, updated_at = ? WHERE job_id = ?",
+                    (stage, now, job_id),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        """Oznacza zadanie jako nieudane (artefakty zostają do wznowienia)."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                    (STATUS_FAILED, error, time.time(), job_id),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def mark_done(self, job_id: str) -> None:
+        """Oznacza zadanie jako ukończone i usuwa jego artefakty (w tym kopię obrazu)."""
+        image_path = self.get_artifact(job_id, STAGE_IMAGE)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM job_artifacts WHERE job_id = ?", (job_id,))
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = NULL, updated_at = ? WHERE job_id = ?",
+                    (STATUS_DONE, time.time(), job_id),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        if image_path and os.path.exists(image_path):
+            try:
+                os.unlink(image_path)
+            except OSError:
+                pass
+
+    def list_jobs(self, incomplete_only: bool = True) -> List[Dict[str, Any]]:
+        """
+        Zwraca zadania (domyślnie tylko niedokończone) od najstarszego.
+
+        Returns:
+            Lista słowników z job_id, file_path, llm_model, status, last_stage,
+            error, attempts, updated_at
+        """
+        query = (
+            "SELECT job_id, file_path, llm_model, status, last_stage, error, attempts, "
+            "updated_at FROM jobs"
+        )
+        params: List[Any] = []
+        if incomplete_only:
+            query += " WHERE status != ?"
+            params.append(STATUS_DONE)
+        query += " ORDER BY created_at ASC"
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(query, params).fetchall()
+            finally:
+                conn.close()
+        return [
+            {
+                "job_id": row[0],
+                "file_path": row[1],
+                "llm_model": row[2],
+                "status": row[3],
+                "last_stage": row[4],
+                "error": row[5],
+                "attempts": row[6],
+                "updated_at": row[7],
+            }
+            for row in rows
+        ]
+
+
+# Globalna instancja magazynu zadań (tworzona leniwie)
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> Optional[JobStore]:
+    """
+    Zwraca globalny magazyn zadań lub None, jeśli punkty kontrolne są wyłączone.
+    """
+    global _job_store
+    if not Config.JOB_STORE_ENABLED:
+        return None
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore()
+        return _job_store
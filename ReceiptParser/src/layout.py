@@ -0,0 +1,105 @@
+"""
+Odtwarzanie wierszy paragonu z ramek słów OCR.
+
+Tesseract w trybie automatycznym dzieli paragon na bloki kolumn, więc w płaskim
+tekście pozycja (nazwa, cena, ilość, "x", kod podatku, wartość) bywa rozsypana
+na kilka linii. Tutaj słowa są grupowane geometrycznie: słowa, których środki
+leżą na tej samej wysokości, tworzą jeden wiersz, a szeroka przerwa między
+słowami oddziela kolumny. Wynik to zwarta tabela tekstowa dla LLM:
+
+    Mleko UHT 3,2 1l | 3,49 | 1.000 x | C | 3,49
+    Rabat | -0,50
+
+Słowo to słownik {"text": str, "box": [lewo, góra, prawo, dół], "conf": float}.
+"""
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+# Słowo należy do wiersza, jeśli jego środek jest bliżej środka wiersza niż ten ułamek wysokości słowa
+ROW_TOLERANCE = 0.5
+# Przerwa między słowami szersza niż ten ułamek wysokości słowa rozdziela kolumny
+COLUMN_GAP_RATIO = 1.5
+COLUMN_SEPARATOR = " | "
+
+Word = Dict[str, Any]
+
+
+def make_word(text: str, left: float, top: float, right: float, bottom: float, conf: float = -1.0) -> Word:
+    """Buduje słownik słowa z ramką w pikselach obrazu."""
+    return {
+        "text": text,
+        "box": [int(left), int(top), int(right), int(bottom)],
+        "conf": round(float(conf), 1),
+    }
+
+
+def words_from_tesseract_data(data: Dict[str, List[Any]], offset_y: int = 0) -> List[Word]:
+    """
+    Zamienia wynik pytesseract.image_to_data(output_type=DICT) na listę słów.
+
+    Pomija wpisy strukturalne (strona, blok, linia - conf -1) i puste słowa.
+
+    Args:
+        data: Słownik kolumn z image_to_data
+        offset_y: Przesunięcie pionowe (górna krawędź pasa przy OCR w pasach)
+    """
+    words = []
+    for i, text in enumerate(data.get("text", [])):
+        text = (text or "").strip()
+        conf = float(data["conf"][i])
+        if not text or conf < 0:
+            continue
+        left, top = data["left"][i], data["top"][i] + offset_y
+        words.append(make_word(text, left, top, left + data["width"][i], top + data["height"][i], conf))
+    return words
+
+
+def _center_y(word: Word) -> float:
+    return (word["box"][1] + word["box"][3]) / 2
+
+
+def _height(word: Word) -> int:
+    return max(1, word["box"][3] - word["box"][1])
+
+
+def group_rows(words: List[Word]) -> List[List[Word]]:
+    """
+    Grupuje słowa w wiersze paragonu (od góry), a słowa w wierszu od lewej.
+
+    Słowo trafia do bieżącego wiersza, jeśli jego środek leży w odległości
+    ROW_TOLERANCE * mediana wysokości słów od średniego środka wiersza.
+    """
+    if not words:
+        return []
+    tolerance = ROW_TOLERANCE * median(_height(word) for word in words)
+
+    rows: List[List[Word]] = []
+    row_center: Optional[float] = None
+    for word in sorted(words, key=_center_y):
+        center = _center_y(word)
+        if row_center is not None and abs(center - row_center) <= tolerance:
+            rows[-1].append(word)
+            row_center += (center - row_center) / len(rows[-1])
+        else:
+            rows.append([word])
+            row_center = center
+    return [sorted(row, key=lambda word: word["box"][0]) for row in rows]
+
+
+def format_row(row: List[Word]) -> str:
+    """Skleja słowa wiersza; szeroka przerwa rozdziela kolumny (COLUMN_SEPARATOR)."""
+    gap_limit = COLUMN_GAP_RATIO * median(_height(word) for word in row)
+    parts = [row[0]["text"]]
+    for previous, word in zip(row, row[1:]):
+        gap = word["box"][0] - previous["box"][2]
+        parts.append(COLUMN_SEPARATOR if gap > gap_limit else " ")
+        parts.append(word["text"])
+    return "".join(parts)
+
+
+def layout_text(words: List[Word]) -> str:
+    """
+    Tekst paragonu odtworzony z ramek słów: jeden wiersz paragonu na linię,
+    kolumny rozdzielone COLUMN_SEPARATOR.
+    """
+    return "\n".join(format_row(row) for row in group_rows(words))
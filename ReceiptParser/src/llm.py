@@ -1,22 +1,38 @@
 import ollama
 import httpx
 
+import contextvars
+import hashlib
 import json
 import re
+import time
+import sqlite3
 import logging
 from pathlib import Path
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
-from typing import List, Tuple, Optional, Dict, Callable
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue
-import threading
-from functools import lru_cache
 from rapidfuzz import fuzz
 from .config import Config
 from .security import sanitize_path, sanitize_log_message
 from .retry_handler import retry_with_backoff
 from .llm_cache import get_llm_cache
+from .llm_scheduler import Priority, ScheduledClient, llm_priority
+from .parse_cache import get_parse_cache
+from .prompt_templates import PromptTemplates
+from .receipt_image import load_receipt_image
+from .vision_payload import prepare_vision_payload, profile_for_model
+from .token_budget import (
+    TRUNCATED_MARKER,
+    chat_options,
+    estimate_message_tokens,
+    estimate_tokens,
+    fit_receipt_text,
+    prompt_budget,
+    receipt_output_tokens,
+)
+from .tracing import file_size, span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +48,10 @@ try:
     # Tworzymy timeout i przekazujemy go bezpośrednio do ollama.Client
     # ollama.Client przyjmuje **kwargs, które są przekazywane do httpx.Client
     timeout = httpx.Timeout(Config.OLLAMA_TIMEOUT, connect=10.0)
-    client = ollama.Client(host=Config.OLLAMA_HOST, timeout=timeout)
+    # Każde chat()/generate() przechodzi przez wspólny harmonogram (llm_scheduler)
+    client = ScheduledClient(ollama.Client(host=Config.OLLAMA_HOST, timeout=timeout))
+    # Klient funkcji, na które czeka użytkownik (czat, przepisy, analizy w GUI)
+    interactive_client = client.with_priority(Priority.INTERACTIVE)
     # Sprawdzenie połączenia przy starcie
     # client.list()
 except Exception as e:
@@ -42,13 +61,7 @@ except Exception as e:
         f"BŁĄD: Nie można połączyć się z Ollama na {Config.OLLAMA_HOST}. Upewnij się, że usługa działa. Szczegóły: {sanitize_log_message(str(e))}"
     )
     client = None
-
-# --- Request Queuing ---
-# Queue for managing concurrent LLM requests (max 2 simultaneous)
-_request_queue: Queue = Queue()
-_active_requests: int = 0
-_max_concurrent_requests: int = 2
-_queue_lock = threading.Lock()
+    interactive_client = None
 
 # --- Conversation Context ---
 # Store last 10 messages per conversation
@@ -59,6 +72,87 @@ TIMEOUT_QUICK = 30  # 30 seconds for quick queries
 TIMEOUT_RECIPES = 120  # 120 seconds for recipe generation
 TIMEOUT_ANALYSIS = 60  # 60 seconds for analysis
 
+# --- Oczekiwana długość odpowiedzi normalizacji (token_budget) ---
+SUGGESTION_OUTPUT_TOKENS = 64  # Jedna krótka nazwa produktu
+BATCH_VALUE_TOKENS = 16  # Znormalizowana nazwa i składnia JSON na pozycję batcha
+
+
+# --- Strumieniowanie Odpowiedzi Czatu ---
+
+
+class ChatStream:
+    """
+    Odpowiedź czatu odbierana fragment po fragmencie (client.chat(stream=True)).
+
+    Iteracja zwraca kolejne fragmenty tekstu, gdy tylko model je wygeneruje - GUI
+    może je wyświetlać od pierwszego tokenu zamiast czekać na całą odpowiedź.
+    Po zakończeniu iteracji dostępne są: text, response_time_ms, first_token_ms
+    i tokens_used (prompt + odpowiedź, z ostatniego fragmentu strumienia).
+
+    Args:
+        open_stream: Funkcja otwierająca strumień (wywoływana przy pierwszej iteracji,
+            więc żądanie trafia do harmonogramu z wątku, który czyta odpowiedź)
+        error_text: Tekst dopisywany zamiast dalszej odpowiedzi, gdy strumień zawiedzie
+        text: Gotowa odpowiedź bez wywołania modelu (np. brak klienta Ollama)
+    """
+
+    def __init__(
+        self,
+        open_stream: Optional[Callable[[], Iterable]] = None,
+        error_text: Optional[str] = None,
+        text: str = "",
+    ) -> None:
+        self._open_stream = open_stream
+        self.error_text = error_text
+        self.text = text
+        self.response_time_ms: Optional[int] = None
+        self.first_token_ms: Optional[int] = None
+        self.tokens_used: Optional[int] = None
+        self.error: Optional[Exception] = None
+        self.done = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self.done:
+            raise RuntimeError("ChatStream można odczytać tylko raz")
+        start = time.perf_counter()
+        if self._open_stream is None:
+            self.first_token_ms = self.response_time_ms = 0
+            self.done = True
+            if self.text:
+                yield self.text
+            return
+
+        parts: List[str] = []
+        try:
+            for chunk in self._open_stream():
+                content = chunk["message"]["content"]
+                if content:
+                    if self.first_token_ms is None:
+                        self.first_token_ms = int((time.perf_counter() - start) * 1000)
+                    parts.append(content)
+                    yield content
+                if chunk.get("done"):
+                    counts = [chunk.get("prompt_eval_count"), chunk.get("eval_count")]
+                    counts = [count for count in counts if isinstance(count, int)]
+                    self.tokens_used = sum(counts) if counts else None
+        except Exception as e:
+            logger.error(f"Error while streaming chat response: {e}")
+            self.error = e
+            if self.error_text:
+                error_part = ("\n\n" if parts else "") + self.error_text
+                parts.append(error_part)
+                yield error_part
+        finally:
+            self.text = "".join(parts)
+            self.response_time_ms = int((time.perf_counter() - start) * 1000)
+            self.done = True
+
+    def read(self) -> str:
+        """Odczytuje cały strumień i zwraca pełną odpowiedź."""
+        for _ in self:
+            pass
+        return self.text
+
 # --- Normalizacja Nazw Produktów ---
 
 
@@ -138,34 +232,6 @@ def get_learning_examples(
         return []
 
 
-@lru_cache(maxsize=500)
-def _get_llm_suggestion_impl(
-    raw_name: str, 
-    model_name: str = Config.TEXT_MODEL,
-    learning_examples: Optional[Tuple[Tuple[str, str]]] = None
-) -> Optional[str]:
-    """
-    Internal cached implementation of get_llm_suggestion.
-    learning_examples must be a tuple of tuples to be hashable.
-    """
-    system_prompt = PromptTemplates.NORMALIZATION_SYSTEM_PROMPT
-    
-    # Buduj prompt dla użytkownika
-    user_prompt = f"Znormalizuj nazwę produktu z paragonu: '{raw_name}'."
-    
-    if learning_examples:
-        examples_str = "\n".join([f"- '{rn}' -> '{nn}'" for rn, nn in learning_examples])
-        user_prompt += f"\n\nOto przykłady z Twojej historii:\n{examples_str}\nUżyj tej samej konwencji nazewnictwa."
-        
-    try:
-        response = _call_text_llm(model_name, system_prompt, user_prompt)
-        if response:
-            return clean_llm_suggestion(response)
-        return None
-    except Exception as e:
-        logger.error(f"Error in _get_llm_suggestion_impl: {e}")
-        return None
-
 def get_llm_suggestion(
     raw_name: str, 
     model_name: str = Config.TEXT_MODEL,
@@ -176,7 +242,7 @@ def get_llm_suggestion(
     Może używać przykładów uczenia z poprzednich wyborów użytkownika.
     
     Funkcja jest automatycznie retry'owana przez dekorator retry_with_backoff wewnątrz _call_text_llm.
-    WYNIKI SĄ CACHOWANE (LRU CACHE).
+    WYNIKI SĄ CACHOWANE (wspólny cache odpowiedzi LLM, llm_cache).
 
     Args:
         raw_name: Surowa nazwa produktu z paragonu (OCR).
@@ -210,12 +276,17 @@ def get_llm_suggestion(
     Znormalizowana nazwa:
     """
 
+    system_prompt = PromptTemplates.NORMALIZATION_SYSTEM_PROMPT
+    # Zmiana promptu systemowego unieważnia trwały cache (TTL liczony w tygodniach)
+    system_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
     # Check cache first
     llm_cache = get_llm_cache()
     cached_response = llm_cache.get(
         prompt=user_prompt,
         model=model_name,
-        temperature=None
+        temperature=None,
+        system=system_hash,
     )
     
     if cached_response:
@@ -232,12 +303,14 @@ def get_llm_suggestion(
         jitter=Config.RETRY_JITTER,
     )
     def _call_llm():
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
         return client.chat(
             model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            messages=messages,
+            options=chat_options(model_name, messages, SUGGESTION_OUTPUT_TOKENS, "normalizacji"),
         )
     
     try:
@@ -248,7 +321,8 @@ def get_llm_suggestion(
             prompt=user_prompt,
             model=model_name,
             response=response,
-            temperature=None
+            temperature=None,
+            system=system_hash,
         )
         
         suggestion = response["message"]["content"].strip()
@@ -265,29 +339,17 @@ def get_llm_suggestion(
 # --- Batch Processing dla Normalizacji Produktów ---
 
 
-def normalize_batch(
-    raw_names: List[str],
-    model_name: str = Config.TEXT_MODEL,
-    learning_examples: Optional[List[Tuple[str, str]]] = None
-) -> Dict[str, Optional[str]]:
-    """
-    Normalizuje batch produktów jednocześnie zamiast sekwencyjnie.
-    
-    Args:
-        raw_names: Lista surowych nazw produktów do normalizacji
-        model_name: Nazwa modelu Ollama do użycia
-        learning_examples: Opcjonalna lista przykładów uczenia
-    
-    Returns:
-        Słownik mapujący raw_name -> normalized_name (lub None w przypadku błędu)
-    """
-    if not raw_names:
-        return {}
-    
-    if not client:
-        print("BŁĄD: Klient Ollama nie jest skonfigurowany.")
-        return {name: None for name in raw_names}
-    
+def _batch_output_tokens(raw_names: List[str]) -> int:
+    """Oczekiwana długość odpowiedzi batch normalizacji: JSON {surowa nazwa: krótka nazwa}."""
+    return SUGGESTION_OUTPUT_TOKENS + sum(
+        estimate_tokens(name) + BATCH_VALUE_TOKENS for name in raw_names
+    )
+
+
+def _build_batch_prompts(
+    raw_names: List[str], learning_examples: List[Tuple[str, str]] = None
+) -> Tuple[str, str]:
+    """Buduje (prompt systemowy, prompt użytkownika) dla batch normalizacji nazw."""
     system_prompt = """
     Jesteś wirtualnym magazynierem. Twoim zadaniem jest zamiana nazw z paragonu na KRÓTKIE, GENERYCZNE nazwy produktów do domowej spiżarni.
     
@@ -335,6 +397,62 @@ def normalize_batch(
     
     Zwróć TYLKO JSON, bez dodatkowego tekstu.
     """
+    return system_prompt, user_prompt
+
+
+def _parse_batch_response(response_text: str, raw_names: List[str]) -> Dict[str, Optional[str]]:
+    """Parsuje odpowiedź JSON batch normalizacji (None dla nazw bez poprawnej sugestii)."""
+    response_text = response_text.strip()
+    try:
+        # Usuń markdown code blocks jeśli są
+        if response_text.startswith("```"):
+            response_text = re.sub(r"```json\n?", "", response_text)
+            response_text = re.sub(r"```\n?$", "", response_text)
+        
+        batch_results = json.loads(response_text)
+        
+        # Waliduj i czyść wyniki
+        result_dict = {}
+        for raw_name in raw_names:
+            normalized = batch_results.get(raw_name)
+            if normalized:
+                normalized = clean_llm_suggestion(normalized)
+            result_dict[raw_name] = normalized if normalized else None
+        
+        return result_dict
+    except json.JSONDecodeError as e:
+        print(
+            f"BŁĄD: Nie udało się sparsować JSON-a z batch LLM. Szczegóły: {sanitize_log_message(str(e))}"
+        )
+        print(f"Otrzymany tekst (obcięty): {sanitize_log_message(response_text, max_length=500)}")
+        # Fallback: zwróć None dla wszystkich produktów
+        return {name: None for name in raw_names}
+
+
+def normalize_batch(
+    raw_names: List[str],
+    model_name: str = Config.TEXT_MODEL,
+    learning_examples: Optional[List[Tuple[str, str]]] = None
+) -> Dict[str, Optional[str]]:
+    """
+    Normalizuje batch produktów jednocześnie zamiast sekwencyjnie.
+    
+    Args:
+        raw_names: Lista surowych nazw produktów do normalizacji
+        model_name: Nazwa modelu Ollama do użycia
+        learning_examples: Opcjonalna lista przykładów uczenia
+    
+    Returns:
+        Słownik mapujący raw_name -> normalized_name (lub None w przypadku błędu)
+    """
+    if not raw_names:
+        return {}
+    
+    if not client:
+        print("BŁĄD: Klient Ollama nie jest skonfigurowany.")
+        return {name: None for name in raw_names}
+    
+    system_prompt, user_prompt = _build_batch_prompts(raw_names, learning_examples)
     
     @retry_with_backoff(
         max_retries=Config.RETRY_MAX_ATTEMPTS,
@@ -344,44 +462,29 @@ def normalize_batch(
         jitter=Config.RETRY_JITTER,
     )
     def _call_batch_llm():
-        return client.chat(
-            model=model_name,
-            format="json",
-            messages=[
+        with span("llm.normalize", model=model_name, names=len(raw_names)) as llm_span:
+            llm_span.add_bytes(
+                bytes_in=len(system_prompt.encode("utf-8")) + len(user_prompt.encode("utf-8"))
+            )
+            messages = [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt},
-            ],
-        )
+            ]
+            with llm_priority(Priority.BATCH):
+                response = client.chat(
+                    model=model_name,
+                    format="json",
+                    messages=messages,
+                    options=chat_options(
+                        model_name, messages, _batch_output_tokens(raw_names), "batch normalizacji"
+                    ),
+                )
+            llm_span.record_llm_response(response)
+            return response
     
     try:
         response = _call_batch_llm()
-        response_text = response["message"]["content"].strip()
-        
-        # Parsuj JSON odpowiedź
-        try:
-            # Usuń markdown code blocks jeśli są
-            if response_text.startswith("```"):
-                response_text = re.sub(r"```json\n?", "", response_text)
-                response_text = re.sub(r"```\n?$", "", response_text)
-            
-            batch_results = json.loads(response_text)
-            
-            # Waliduj i czyść wyniki
-            result_dict = {}
-            for raw_name in raw_names:
-                normalized = batch_results.get(raw_name)
-                if normalized:
-                    normalized = clean_llm_suggestion(normalized)
-                result_dict[raw_name] = normalized if normalized else None
-            
-            return result_dict
-        except json.JSONDecodeError as e:
-            print(
-                f"BŁĄD: Nie udało się sparsować JSON-a z batch LLM. Szczegóły: {sanitize_log_message(str(e))}"
-            )
-            print(f"Otrzymany tekst (obcięty): {sanitize_log_message(response_text, max_length=500)}")
-            # Fallback: zwróć None dla wszystkich produktów
-            return {name: None for name in raw_names}
+        return _parse_batch_response(response["message"]["content"], raw_names)
     except Exception as e:
         print(
             f"BŁĄD: Wystąpił problem podczas batch normalizacji: {sanitize_log_message(str(e))}"
@@ -389,6 +492,7 @@ def normalize_batch(
         return {name: None for name in raw_names}
 
 
+@traced("normalize_products_batch")
 def normalize_products_batch(
     raw_names: List[str],
     session,
@@ -440,9 +544,15 @@ def normalize_products_batch(
     all_results = {}
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submituj wszystkie batche
+        # Submituj wszystkie batche (kopia kontekstu - spany batchy zagnieżdżone w bieżącym)
         future_to_batch = {
-            executor.submit(normalize_batch, batch, model_name, learning_examples): batch
+            executor.submit(
+                contextvars.copy_context().run,
+                normalize_batch,
+                batch,
+                model_name,
+                learning_examples,
+            ): batch
             for batch in batches
         }
         
@@ -467,6 +577,190 @@ def normalize_products_batch(
 
 # --- Parsowanie Całego Paragonu z Obrazu ---
 
+# Domyślne prompty i opcje parsowania paragonu (wspólne dla klienta sync i async_llm)
+DEFAULT_VISION_SYSTEM_PROMPT = """
+    Przeanalizuj obraz paragonu i wyodrębnij dane w formacie JSON.
+    
+    Wymagana struktura JSON:
+    {
+      "sklep_info": {
+        "nazwa": "string (np. Lidl, Biedronka)",
+        "lokalizacja": "string lub null"
+      },
+      "paragon_info": {
+        "data_zakupu": "string YYYY-MM-DD",
+        "suma_calkowita": "string (np. 123.45)"
+      },
+      "pozycje": [
+        {
+          "nazwa_raw": "string",
+          "ilosc": "string (np. 1.0)",
+          "jednostka": "string lub null",
+          "cena_jedn": "string",
+          "cena_calk": "string",
+          "rabat": "string lub null",
+          "cena_po_rab": "string"
+        }
+      ]
+    }
+    
+    Zasady:
+    1. Suma całkowita to kwota do zapłaty.
+    2. Jeśli brak ilości, przyjmij 1.0.
+    3. Ceny podawaj jako stringi z kropką.
+    """
+
+DEFAULT_TEXT_SYSTEM_PROMPT = """
+    Jesteś asystentem AI, który wyciąga ustrukturyzowane dane z tekstu paragonu.
+    Otrzymasz treść paragonu (OCR/Markdown). Twoim zadaniem jest wyodrębnienie informacji i zwrócenie ich w formacie JSON.
+
+    Wymagana struktura JSON:
+    {
+      "sklep_info": {
+        "nazwa": "string (np. Lidl, Biedronka)",
+        "lokalizacja": "string lub null"
+      },
+      "paragon_info": {
+        "data_zakupu": "string YYYY-MM-DD",
+        "suma_calkowita": "string (np. 123.45)"
+      },
+      "pozycje": [
+        {
+          "nazwa_raw": "string",
+          "ilosc": "string (np. 1.0)",
+          "jednostka": "string lub null",
+          "cena_jedn": "string",
+          "cena_calk": "string",
+          "rabat": "string lub null",
+          "cena_po_rab": "string"
+        }
+      ]
+    }
+
+    Zasady:
+    1. Suma całkowita to kwota do zapłaty.
+    2. Jeśli brak ilości, przyjmij 1.0.
+    3. Ceny podawaj jako stringi z kropką.
+    4. Ignoruj linie, które nie są pozycjami zakupowymi (np. sumy VAT, reklamy).
+    5. RABATY: Jeśli widzisz linię z "Rabat" lub ujemną ceną, traktuj ją jako OSOBNĄ pozycję z ujemną ceną całkowitą.
+       System automatycznie scali to z produktem powyżej w post-processingu.
+    6. Dla produktów ważonych (kg): ilość to waga w kg (np. 0.365), jednostka to "kg".
+    7. Dla produktów sztukowych: ilość to liczba sztuk (np. 2.0), jednostka może być "szt" lub null.
+
+    Przykłady:
+
+    Przykład 1 - Lidl z rabatem:
+    {
+      "sklep_info": {"nazwa": "Lidl", "lokalizacja": "Poznańska 48, Jankowice"},
+      "paragon_info": {"data_zakupu": "2024-12-27", "suma_calkowita": "26.34"},
+      "pozycje": [
+        {"nazwa_raw": "Soczew.,HummusChipsy", "ilosc": "2.0", "cena_jedn": "3.59", "cena_calk": "7.18", "rabat": null, "cena_po_rab": "7.18"},
+        {"nazwa_raw": "950_chipsy_mix", "ilosc": "1.0", "cena_jedn": "-3.58", "cena_calk": "-3.58", "rabat": null, "cena_po_rab": "-3.58"}
+      ]
+    }
+
+    Przykład 2 - Biedronka z rabatami:
+    {
+      "sklep_info": {"nazwa": "Biedronka", "lokalizacja": "Kostrzyn, ul. Żniwna 5"},
+      "paragon_info": {"data_zakupu": "2025-11-18", "suma_calkowita": "114.14"},
+      "pozycje": [
+        {"nazwa_raw": "KawMiel Rafiin250g", "ilosc": "1.0", "cena_jedn": "18.99", "cena_calk": "18.99", "rabat": null, "cena_po_rab": "18.99"},
+        {"nazwa_raw": "Rabat", "ilosc": "1.0", "cena_jedn": "-4.00", "cena_calk": "-4.00", "rabat": null, "cena_po_rab": "-4.00"}
+      ]
+    }
+
+    Przykład 3 - Produkty ważone:
+    {
+      "sklep_info": {"nazwa": "Biedronka", "lokalizacja": "Targowa 4, Kostrzyn"},
+      "paragon_info": {"data_zakupu": "2025-01-13", "suma_calkowita": "29.76"},
+      "pozycje": [
+        {"nazwa_raw": "Marchew Luz", "ilosc": "0.365", "jednostka": "kg", "cena_jedn": "3.69", "cena_calk": "1.35", "rabat": null, "cena_po_rab": "1.35"},
+        {"nazwa_raw": "Rabat", "ilosc": "1.0", "cena_jedn": "-0.62", "cena_calk": "-0.62", "rabat": null, "cena_po_rab": "-0.62"}
+      ]
+    }
+    """
+
+# num_ctx i num_predict są liczone per paragon (_receipt_options, token_budget)
+RECEIPT_PARSE_OPTIONS = {
+    "temperature": 0,
+}
+
+
+def _fit_receipt_text(
+    text: Optional[str], model_name: str, system_prompt: str, with_image: bool = False
+) -> Optional[str]:
+    """
+    Dopasowuje tekst paragonu (OCR) do kontekstu modelu (LLM_NUM_CTX_MAX).
+
+    Miejsce na tekst to kontekst minus prompt systemowy, obraz i oczekiwana
+    odpowiedź; nadmiar traci najpierw linie niebędące pozycjami (fit_receipt_text).
+    """
+    if not text:
+        return text
+    fixed_tokens = estimate_message_tokens(_text_messages(system_prompt, ""), model_name)
+    if with_image and profile_for_model(model_name).accepts_images:
+        fixed_tokens += profile_for_model(model_name).image_tokens
+    budget = prompt_budget(fixed_tokens, receipt_output_tokens(text))
+    fitted, dropped = fit_receipt_text(text, budget)
+    if fitted != text:
+        truncated = ", koniec obcięty" if fitted.endswith(TRUNCATED_MARKER) else ""
+        print(
+            f"OSTRZEŻENIE: Tekst paragonu (~{estimate_tokens(text)} tokenów) przekracza budżet "
+            f"{budget} tokenów - usunięto {dropped} linii spoza pozycji{truncated}."
+        )
+    return fitted
+
+
+def _receipt_options(model_name: str, messages: List[Dict], text: Optional[str]) -> Dict:
+    """Opcje parsowania paragonu: num_predict wg liczby pozycji w tekście, num_ctx wg promptu."""
+    return chat_options(
+        model_name, messages, receipt_output_tokens(text), "paragonu", **RECEIPT_PARSE_OPTIONS
+    )
+
+
+def _vision_messages(
+    system_prompt: str, image_path: str, ocr_text: Optional[str], model_name: str
+) -> List[Dict]:
+    """
+    Buduje wiadomości dla modelu wizyjnego (obraz + opcjonalny tekst OCR).
+
+    Obraz jest przekazywany jako bajty dopasowane do modelu (vision_payload);
+    model tekstowy dostaje sam tekst OCR.
+    """
+    user_message = {
+        "role": "user",
+        "content": (
+            f"Przeanalizuj ten paragon.\n\nWspomóż się tekstem odczytanym przez OCR (może zawierać błędy, ale układ jest zachowany):\n---\n{ocr_text}\n---"
+            if ocr_text
+            else "Przeanalizuj ten paragon."
+        ),
+    }
+    payload = prepare_vision_payload(image_path, model_name)
+    if payload is not None:
+        user_message["images"] = [payload]
+    return [{"role": "system", "content": system_prompt}, user_message]
+
+
+def _payload_size(messages: List[Dict]) -> int:
+    """Rozmiar treści wiadomości w bajtach (tekst + obrazy) dla śladu wywołania."""
+    total = 0
+    for message in messages:
+        total += len(message["content"].encode("utf-8"))
+        for image in message.get("images", []):
+            total += len(image) if isinstance(image, bytes) else file_size(image)
+    return total
+
+
+def _text_messages(system_prompt: str, text_content: str) -> List[Dict]:
+    """Buduje wiadomości dla modelu tekstowego (tekst paragonu z OCR)."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": f"Przeanalizuj ten tekst paragonu:\n\n{text_content}",
+        },
+    ]
+
 
 def _extract_json_from_response(response_text: str) -> dict | None:
     """Wyszukuje i parsuje blok JSON z odpowiedzi tekstowej modelu."""
@@ -551,6 +845,46 @@ def _convert_types(data: dict) -> dict:
         raise ValueError("Nie udało się przekonwertować danych z LLM.") from e
 
 
+def _parse_cache_lookup(
+    image_hash: str, model_name: str, system_prompt: str, text: Optional[str]
+) -> Optional[str]:
+    """Zwraca surową odpowiedź LLM z cache parsowania (None przy braku lub błędzie cache)."""
+    cache = get_parse_cache()
+    if cache is None:
+        return None
+    try:
+        cached = cache.get(image_hash, model_name, system_prompt, text)
+    except sqlite3.Error as e:
+        print(f"OSTRZEŻENIE: Błąd odczytu cache parsowania: {sanitize_log_message(str(e))}")
+        return None
+    if cached is not None:
+        print("INFO: Odpowiedź LLM odczytana z cache parsowania (pominięto wywołanie modelu).")
+    return cached
+
+
+def _parse_cache_store(
+    image_hash: str, model_name: str, system_prompt: str, text: Optional[str], response: str
+) -> None:
+    """Zapisuje poprawną (parsowalną jako JSON) odpowiedź LLM w cache parsowania."""
+    cache = get_parse_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(image_hash, model_name, system_prompt, text, response)
+    except sqlite3.Error as e:
+        print(f"OSTRZEŻENIE: Błąd zapisu cache parsowania: {sanitize_log_message(str(e))}")
+
+
+def _image_hash_for_cache(image_path: str) -> Optional[str]:
+    """SHA-256 pliku obrazu jako część klucza cache (None gdy plik nieczytelny)."""
+    if get_parse_cache() is None:
+        return None
+    try:
+        return load_receipt_image(image_path).sha256
+    except OSError:
+        return None
+
+
 @retry_with_backoff(
     max_retries=Config.RETRY_MAX_ATTEMPTS,
     initial_delay=Config.RETRY_INITIAL_DELAY,
@@ -560,26 +894,17 @@ def _convert_types(data: dict) -> dict:
 )
 def _call_vision_llm(model_name: str, system_prompt: str, image_path: str, ocr_text: Optional[str] = None):
     """Pomocnicza funkcja do wywołania vision LLM z retry."""
-    return client.chat(
-        model=model_name,
-        format="json",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": (
-                    f"Przeanalizuj ten paragon.\n\nWspomóż się tekstem odczytanym przez OCR (może zawierać błędy, ale układ jest zachowany):\n---\n{ocr_text}\n---"
-                    if ocr_text
-                    else "Przeanalizuj ten paragon."
-                ),
-                "images": [image_path],
-            },
-        ],
-        options={
-            "temperature": 0,
-            "num_predict": 4000,
-        },
-    )
+    with span("llm.vision", model=model_name) as llm_span:
+        messages = _vision_messages(system_prompt, image_path, ocr_text, model_name)
+        llm_span.add_bytes(bytes_in=_payload_size(messages))
+        response = client.chat(
+            model=model_name,
+            format="json",
+            messages=messages,
+            options=_receipt_options(model_name, messages, ocr_text),
+        )
+        llm_span.record_llm_response(response)
+        return response
 
 
 def parse_receipt_with_llm(
@@ -612,54 +937,29 @@ def parse_receipt_with_llm(
     if system_prompt_override:
         system_prompt = system_prompt_override
     else:
-        system_prompt = """
-    Przeanalizuj obraz paragonu i wyodrębnij dane w formacie JSON.
-    
-    Wymagana struktura JSON:
-    {
-      "sklep_info": {
-        "nazwa": "string (np. Lidl, Biedronka)",
-        "lokalizacja": "string lub null"
-      },
-      "paragon_info": {
-        "data_zakupu": "string YYYY-MM-DD",
-        "suma_calkowita": "string (np. 123.45)"
-      },
-      "pozycje": [
-        {
-          "nazwa_raw": "string",
-          "ilosc": "string (np. 1.0)",
-          "jednostka": "string lub null",
-          "cena_jedn": "string",
-          "cena_calk": "string",
-          "rabat": "string lub null",
-          "cena_po_rab": "string"
-        }
-      ]
-    }
-    
-    Zasady:
-    1. Suma całkowita to kwota do zapłaty.
-    2. Jeśli brak ilości, przyjmij 1.0.
-    3. Ceny podawaj jako stringi z kropką.
-    """
+        system_prompt = DEFAULT_VISION_SYSTEM_PROMPT
 
     try:
         print(f"INFO: Wysyłanie obrazu do modelu '{model_name}' (format=json)...")
         print(f"INFO: Plik: {sanitize_path(image_path)}")  # Tylko nazwa pliku, nie pełna ścieżka
 
-        # Truncation tekstu OCR jeśli jest za długi (limit ~10000 znaków dla bezpieczeństwa)
-        MAX_OCR_TEXT_LENGTH = 10000
-        if ocr_text and len(ocr_text) > MAX_OCR_TEXT_LENGTH:
-            print(f"OSTRZEŻENIE: Tekst OCR jest za długi ({len(ocr_text)} znaków), obcinam do {MAX_OCR_TEXT_LENGTH} znaków.")
-            ocr_text = ocr_text[:MAX_OCR_TEXT_LENGTH] + "\n\n[... tekst OCR obcięty ...]"
+        ocr_text = _fit_receipt_text(ocr_text, model_name, system_prompt, with_image=True)
 
-        response = _call_vision_llm(model_name, system_prompt, image_path, ocr_text)
+        image_hash = _image_hash_for_cache(image_path)
+        raw_response_text = None
+        if image_hash:
+            raw_response_text = _parse_cache_lookup(
+                image_hash, model_name, system_prompt, ocr_text
+            )
+        from_cache = raw_response_text is not None
 
-        raw_response_text = response["message"]["content"]
-        print(
-            f"INFO: Otrzymano odpowiedź od LLM. Długość: {len(raw_response_text)} znaków."
-        )
+        if not from_cache:
+            response = _call_vision_llm(model_name, system_prompt, image_path, ocr_text)
+
+            raw_response_text = response["message"]["content"]
+            print(
+                f"INFO: Otrzymano odpowiedź od LLM. Długość: {len(raw_response_text)} znaków."
+            )
         # Sanityzuj odpowiedź przed logowaniem (jeśli potrzeba debug)
         # print(f"DEBUG: Treść odpowiedzi: {sanitize_log_message(raw_response_text, max_length=500)}")
 
@@ -672,6 +972,11 @@ def parse_receipt_with_llm(
             print(f"Treść (obcięta): {sanitize_log_message(raw_response_text, max_length=500)}")
             return None
 
+        if image_hash and not from_cache:
+            _parse_cache_store(
+                image_hash, model_name, system_prompt, ocr_text, raw_response_text
+            )
+
         print("INFO: Konwertuję typy danych (stringi na Decimal/datetime)...")
         converted_data = _convert_types(parsed_json)
 
@@ -693,21 +998,19 @@ def parse_receipt_with_llm(
 )
 def _call_text_llm(model_name: str, system_prompt: str, text_content: str):
     """Pomocnicza funkcja do wywołania text LLM z retry."""
-    return client.chat(
-        model=model_name,
-        format="json",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {
-                "role": "user",
-                "content": f"Przeanalizuj ten tekst paragonu:\n\n{text_content}",
-            },
-        ],
-        options={
-            "temperature": 0,
-            "num_predict": 4000,
-        },
-    )
+    with span("llm.text", model=model_name) as llm_span:
+        llm_span.add_bytes(
+            bytes_in=len(system_prompt.encode("utf-8")) + len(text_content.encode("utf-8"))
+        )
+        messages = _text_messages(system_prompt, text_content)
+        response = client.chat(
+            model=model_name,
+            format="json",
+            messages=messages,
+            options=_receipt_options(model_name, messages, text_content),
+        )
+        llm_span.record_llm_response(response)
+        return response
 
 
 def parse_receipt_from_text(
@@ -733,91 +1036,24 @@ def parse_receipt_from_text(
     if system_prompt_override:
         system_prompt = system_prompt_override
     else:
-        system_prompt = """
-    Jesteś asystentem AI, który wyciąga ustrukturyzowane dane z tekstu paragonu.
-    Otrzymasz treść paragonu (OCR/Markdown). Twoim zadaniem jest wyodrębnienie informacji i zwrócenie ich w formacie JSON.
-
-    Wymagana struktura JSON:
-    {
-      "sklep_info": {
-        "nazwa": "string (np. Lidl, Biedronka)",
-        "lokalizacja": "string lub null"
-      },
-      "paragon_info": {
-        "data_zakupu": "string YYYY-MM-DD",
-        "suma_calkowita": "string (np. 123.45)"
-      },
-      "pozycje": [
-        {
-          "nazwa_raw": "string",
-          "ilosc": "string (np. 1.0)",
-          "jednostka": "string lub null",
-          "cena_jedn": "string",
-          "cena_calk": "string",
-          "rabat": "string lub null",
-          "cena_po_rab": "string"
-        }
-      ]
-    }
-
-    Zasady:
-    1. Suma całkowita to kwota do zapłaty.
-    2. Jeśli brak ilości, przyjmij 1.0.
-    3. Ceny podawaj jako stringi z kropką.
-    4. Ignoruj linie, które nie są pozycjami zakupowymi (np. sumy VAT, reklamy).
-    5. RABATY: Jeśli widzisz linię z "Rabat" lub ujemną ceną, traktuj ją jako OSOBNĄ pozycję z ujemną ceną całkowitą.
-       System automatycznie scali to z produktem powyżej w post-processingu.
-    6. Dla produktów ważonych (kg): ilość to waga w kg (np. 0.365), jednostka to "kg".
-    7. Dla produktów sztukowych: ilość to liczba sztuk (np. 2.0), jednostka może być "szt" lub null.
-
-    Przykłady:
-
-    Przykład 1 - Lidl z rabatem:
-    {
-      "sklep_info": {"nazwa": "Lidl", "lokalizacja": "Poznańska 48, Jankowice"},
-      "paragon_info": {"data_zakupu": "2024-12-27", "suma_calkowita": "26.34"},
-      "pozycje": [
-        {"nazwa_raw": "Soczew.,HummusChipsy", "ilosc": "2.0", "cena_jedn": "3.59", "cena_calk": "7.18", "rabat": null, "cena_po_rab": "7.18"},
-        {"nazwa_raw": "950_chipsy_mix", "ilosc": "1.0", "cena_jedn": "-3.58", "cena_calk": "-3.58", "rabat": null, "cena_po_rab": "-3.58"}
-      ]
-    }
-
-    Przykład 2 - Biedronka z rabatami:
-    {
-      "sklep_info": {"nazwa": "Biedronka", "lokalizacja": "Kostrzyn, ul. Żniwna 5"},
-      "paragon_info": {"data_zakupu": "2025-11-18", "suma_calkowita": "114.14"},
-      "pozycje": [
-        {"nazwa_raw": "KawMiel Rafiin250g", "ilosc": "1.0", "cena_jedn": "18.99", "cena_calk": "18.99", "rabat": null, "cena_po_rab": "18.99"},
-        {"nazwa_raw": "Rabat", "ilosc": "1.0", "cena_jedn": "-4.00", "cena_calk": "-4.00", "rabat": null, "cena_po_rab": "-4.00"}
-      ]
-    }
-
-    Przykład 3 - Produkty ważone:
-    {
-      "sklep_info": {"nazwa": "Biedronka", "lokalizacja": "Targowa 4, Kostrzyn"},
-      "paragon_info": {"data_zakupu": "2025-01-13", "suma_calkowita": "29.76"},
-      "pozycje": [
-        {"nazwa_raw": "Marchew Luz", "ilosc": "0.365", "jednostka": "kg", "cena_jedn": "3.69", "cena_calk": "1.35", "rabat": null, "cena_po_rab": "1.35"},
-        {"nazwa_raw": "Rabat", "ilosc": "1.0", "cena_jedn": "-0.62", "cena_calk": "-0.62", "rabat": null, "cena_po_rab": "-0.62"}
-      ]
-    }
-    """
+        system_prompt = DEFAULT_TEXT_SYSTEM_PROMPT
 
     try:
         print(f"INFO: Wysyłanie tekstu do modelu '{model_name}' (format=json)...")
 
-        # Truncation tekstu jeśli jest za długi (limit ~50000 znaków dla bezpieczeństwa)
-        MAX_TEXT_LENGTH = 50000
-        if len(text_content) > MAX_TEXT_LENGTH:
-            print(f"OSTRZEŻENIE: Tekst paragonu jest za długi ({len(text_content)} znaków), obcinam do {MAX_TEXT_LENGTH} znaków.")
-            text_content = text_content[:MAX_TEXT_LENGTH] + "\n\n[... tekst obcięty ...]"
+        text_content = _fit_receipt_text(text_content, model_name, system_prompt)
         
-        response = _call_text_llm(model_name, system_prompt, text_content)
+        # Parsowanie samego tekstu - brak obrazu, więc pusty hash obrazu w kluczu
+        raw_response_text = _parse_cache_lookup("", model_name, system_prompt, text_content)
+        from_cache = raw_response_text is not None
 
-        raw_response_text = response["message"]["content"]
-        print(
-            f"INFO: Otrzymano odpowiedź od LLM. Długość: {len(raw_response_text)} znaków."
-        )
+        if not from_cache:
+            response = _call_text_llm(model_name, system_prompt, text_content)
+
+            raw_response_text = response["message"]["content"]
+            print(
+                f"INFO: Otrzymano odpowiedź od LLM. Długość: {len(raw_response_text)} znaków."
+            )
 
         try:
             parsed_json = json.loads(raw_response_text)
@@ -826,6 +1062,9 @@ def parse_receipt_from_text(
             print(f"Treść (obcięta): {sanitize_log_message(raw_response_text, max_length=500)}")
             return None
 
+        if not from_cache:
+            _parse_cache_store("", model_name, system_prompt, text_content, raw_response_text)
+
         print("INFO: Konwertuję typy danych...")
         converted_data = _convert_types(parsed_json)
         return converted_data
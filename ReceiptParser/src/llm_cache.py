@@ -3,6 +3,14 @@ LLM Response Cache for ParagonOCR 2.0
 
 Implements caching for LLM responses to improve performance and reduce API calls.
 
+Two backends share the same key (normalized prompt, model and options):
+- LLMResponseCache: in-memory LRU, local to one process.
+- PersistentLLMResponseCache: SQLite in WAL mode, shared by the GUI, the CLI
+  and batch workers, with per-entry TTL, size limits and background eviction.
+
+Receipt parsing responses are not stored here: they live in parse_cache,
+keyed by image/OCR hashes instead of the prompt text.
+
 Author: ParagonOCR Team
 Version: 2.0
 """
@@ -10,9 +18,16 @@ Version: 2.0
 import hashlib
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
 from typing import Any, Dict, Optional
 from collections import OrderedDict
 
+from .config import Config
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,6 +54,8 @@ class LLMResponseCache:
         self.cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
         self.hits = 0
         self.misses = 0
+        self.bytes_saved = 0
+        self._saved_bytes: Dict[str, int] = {}
     
     def _generate_key(self, prompt: str, model: str, **kwargs: Any) -> str:
         """
@@ -47,7 +64,8 @@ class LLMResponseCache:
         Args:
             prompt: Prompt text
             model: Model name
-            **kwargs: Additional parameters
+            **kwargs: Additional parameters (temperature, max_tokens, system -
+                hash of the system prompt)
             
         Returns:
             Cache key string
@@ -62,6 +80,9 @@ class LLMResponseCache:
             'temperature': kwargs.get('temperature'),
             'max_tokens': kwargs.get('max_tokens')
         }
+        if kwargs.get('system') is not None:
+            # Only when given, so keys of calls without a system prompt stay unchanged
+            key_data['system'] = kwargs['system']
         
         # Convert to JSON and hash
         key_str = json.dumps(key_data, sort_keys=True)
@@ -90,6 +111,7 @@ class LLMResponseCache:
             # Move to end (most recently used)
             self.cache.move_to_end(key)
             self.hits += 1
+            self.bytes_saved += self._saved_bytes.get(key, 0)
             logger.debug(f"LLM cache hit for prompt: {prompt[:50]}...")
             return self.cache[key]
         
@@ -122,15 +144,19 @@ class LLMResponseCache:
             # Check if cache is full
             if len(self.cache) >= self.max_size:
                 # Remove least recently used
-                self.cache.popitem(last=False)
+                evicted_key, _ = self.cache.popitem(last=False)
+                self._saved_bytes.pop(evicted_key, None)
         
         self.cache[key] = response
+        self._saved_bytes[key] = len(prompt.encode("utf-8")) + len(str(response).encode("utf-8"))
     
     def clear(self) -> None:
         """Clear all cached responses."""
         self.cache.clear()
+        self._saved_bytes.clear()
         self.hits = 0
         self.misses = 0
+        self.bytes_saved = 0
         logger.info("LLM response cache cleared")
     
     def get_stats(self) -> Dict[str, Any]:
@@ -144,31 +170,340 @@ class LLMResponseCache:
         hit_rate = (self.hits / total * 100) if total > 0 else 0.0
         
         return {
+            'backend': 'memory',
             'size': len(self.cache),
             'max_size': self.max_size,
             'hits': self.hits,
             'misses': self.misses,
-            'hit_rate': round(hit_rate, 2)
+            'hit_rate': round(hit_rate, 2),
+            'bytes_saved': self.bytes_saved
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response BLOB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    saved_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class PersistentLLMResponseCache(LLMResponseCache):
+    """
+    LLM response cache stored in SQLite (WAL), shared between processes.
+
+    Every entry has an expiry time (TTL) and its compressed size is counted
+    against max_bytes. Entries larger than max_entry_bytes are not stored.
+    Expired and least recently used entries are removed by a background
+    thread woken after writes, so callers never wait for eviction.
+
+    Attributes:
+        db_path: SQLite file path
+        max_bytes: Limit for the total compressed size of responses
+        max_entry_bytes: Limit for a single compressed response
+        default_ttl: Default entry lifetime in seconds (None = no expiry)
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_entry_bytes: Optional[int] = None,
+        default_ttl: Optional[float] = None,
+        evict_interval: Optional[float] = None,
+    ) -> None:
+        super().__init__(max_size=0)
+        self.db_path = db_path or Config.LLM_CACHE_PATH
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else int(Config.LLM_CACHE_MAX_MB * 1024 * 1024)
+        )
+        self.max_entry_bytes = (
+            max_entry_bytes
+            if max_entry_bytes is not None
+            else int(Config.LLM_CACHE_MAX_ENTRY_KB * 1024)
+        )
+        self.default_ttl = (
+            default_ttl if default_ttl is not None else Config.LLM_CACHE_TTL_HOURS * 3600
+        )
+        self.evict_interval = (
+            evict_interval if evict_interval is not None else Config.LLM_CACHE_EVICT_INTERVAL
+        )
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._evict_requested = threading.Event()
+        self._evictor: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            # WAL: readers in other processes do not block the writer and vice versa
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._initialized = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, prompt: str, model: str, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        """
+        Get cached response (expired entries count as misses).
+
+        A database error (locked or corrupt file) or an unreadable entry is
+        reported and treated as a miss - the cache never aborts the caller.
+
+        Args:
+            prompt: Prompt text
+            model: Model name
+            **kwargs: Additional parameters
+
+        Returns:
+            Cached response dict or None if not found
+        """
+        key = self._generate_key(prompt, model, **kwargs)
+        now = time.time()
+        try:
+            row = self._read(key, now)
+            response = json.loads(zlib.decompress(row[0])) if row is not None else None
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            print(f"OSTRZEŻENIE: Błąd odczytu cache LLM ({self.db_path}): {e}")
+            row = response = None
+        if response is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.bytes_saved += row[1]
+        logger.debug(f"LLM cache hit for prompt: {prompt[:50]}...")
+        return response
+
+    def _read(self, key: str, now: float) -> Optional[tuple]:
+        """Row (response, saved_bytes) of a live entry, marking it as used."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response, saved_bytes FROM llm_cache "
+                    "WHERE cache_key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE cache_key = ?",
+                        (now, key),
+                    )
+                    conn.commit()
+                return row
+            finally:
+                conn.close()
+
+    def set(
+        self,
+        prompt: str,
+        model: str,
+        response: Dict[str, Any],
+        ttl: Optional[float] = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        Cache LLM response (a database error is reported and skipped).
+
+        Args:
+            prompt: Prompt text
+            model: Model name
+            response: Response dictionary (JSON-serializable)
+            ttl: Entry lifetime in seconds (None = default_ttl)
+            **kwargs: Additional parameters
+        """
+        key = self._generate_key(prompt, model, **kwargs)
+        if hasattr(response, "model_dump"):
+            # ollama.ChatResponse (pydantic model) -> plain dict
+            response = response.model_dump()
+        try:
+            response_json = json.dumps(response, ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"LLM response not cached (not serializable): {e}")
+            return
+        blob = zlib.compress(response_json.encode("utf-8"))
+        if len(blob) > self.max_entry_bytes:
+            return
+        # Traffic avoided on a hit: the prompt not sent and the response not generated
+        saved_bytes = len(prompt.encode("utf-8")) + len(response_json.encode("utf-8"))
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        try:
+            self._write(key, model, blob, saved_bytes, now, now + ttl if ttl else None)
+        except sqlite3.Error as e:
+            print(f"OSTRZEŻENIE: Błąd zapisu cache LLM ({self.db_path}): {e}")
+            return
+        self._request_eviction()
+
+    def _write(
+        self,
+        key: str,
+        model: str,
+        blob: bytes,
+        saved_bytes: int,
+        now: float,
+        expires_at: Optional[float],
+    ) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache "
+                    "(cache_key, model, response, size_bytes, saved_bytes, "
+                    "created_at, expires_at, last_access, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (
+                        key,
+                        model,
+                        blob,
+                        len(blob),
+                        saved_bytes,
+                        now,
+                        expires_at,
+                        now,
+                    ),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _request_eviction(self) -> None:
+        """Wakes the background eviction thread (started on first write)."""
+        if self._evictor is None or not self._evictor.is_alive():
+            with self._lock:
+                if self._evictor is None or not self._evictor.is_alive():
+                    self._evictor = threading.Thread(
+                        target=self._eviction_loop, name="llm-cache-evictor", daemon=True
+                    )
+                    self._evictor.start()
+        self._evict_requested.set()
+
+    def _eviction_loop(self) -> None:
+        while True:
+            self._evict_requested.wait(timeout=self.evict_interval)
+            self._evict_requested.clear()
+            try:
+                self.evict()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache eviction failed: {e}")
+
+    def evict(self) -> int:
+        """
+        Removes expired entries, then least recently used ones until the total size fits max_bytes.
+
+        Returns:
+            Number of removed entries
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                removed = conn.execute(
+                    "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                    (time.time(),),
+                ).rowcount
+                total = conn.execute(
+                    "SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache"
+                ).fetchone()[0]
+                if total > self.max_bytes:
+                    rows = conn.execute(
+                        "SELECT cache_key, size_bytes FROM llm_cache ORDER BY last_access ASC"
+                    ).fetchall()
+                    for cache_key, size_bytes in rows:
+                        if total <= self.max_bytes:
+                            break
+                        conn.execute("DELETE FROM llm_cache WHERE cache_key = ?", (cache_key,))
+                        total -= size_bytes
+                        removed += 1
+                conn.commit()
+            finally:
+                conn.close()
+        return removed
+
+    def clear(self) -> None:
+        """Clear all cached responses (for every process sharing the file)."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+            finally:
+                conn.close()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        logger.info("LLM response cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with stored totals (entries, total_bytes, stored_hits,
+            stored_bytes_saved - across all processes) and hits/misses/hit_rate/
+            bytes_saved of the current process
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                entries, total_bytes, stored_hits, stored_saved = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0), "
+                    "COALESCE(SUM(hits * saved_bytes), 0) FROM llm_cache"
+                ).fetchone()
+            finally:
+                conn.close()
+        total = self.hits + self.misses
+        return {
+            'backend': 'sqlite',
+            'path': self.db_path,
+            'size': entries,
+            'total_bytes': total_bytes,
+            'max_bytes': self.max_bytes,
+            'stored_hits': stored_hits,
+            'stored_bytes_saved': stored_saved,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+            'bytes_saved': self.bytes_saved,
         }
 
 
-# Global cache instance
+# Global cache instances (persistent one is created lazily)
 _llm_cache = LLMResponseCache(max_size=100)
+_persistent_cache: Optional[PersistentLLMResponseCache] = None
+_persistent_cache_lock = threading.Lock()
 
 
 def get_llm_cache() -> LLMResponseCache:
     """
     Get global LLM response cache instance.
-    
+
     Returns:
-        LLMResponseCache instance
+        PersistentLLMResponseCache when LLM_CACHE_ENABLED, otherwise the
+        in-memory LLMResponseCache
     """
-    return _llm_cache
+    global _persistent_cache
+    if not Config.LLM_CACHE_ENABLED:
+        return _llm_cache
+    with _persistent_cache_lock:
+        if _persistent_cache is None:
+            _persistent_cache = PersistentLLMResponseCache()
+        return _persistent_cache
 
 
 def clear_llm_cache() -> None:
     """Clear global LLM response cache."""
-    _llm_cache.clear()
+    get_llm_cache().clear()
 
 
 def get_llm_cache_stats() -> Dict[str, Any]:
@@ -176,7 +511,7 @@ def get_llm_cache_stats() -> Dict[str, Any]:
     Get LLM cache statistics.
     
     Returns:
-        Dictionary with cache statistics
+        Dictionary with cache statistics (hit rate, bytes saved)
     """
-    return _llm_cache.get_stats()
+    return get_llm_cache().get_stats()
 
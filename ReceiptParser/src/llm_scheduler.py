@@ -0,0 +1,440 @@
+"""
+Wspólny harmonogram żądań do Ollamy (priorytety, limity współbieżności).
+
+Wszystkie wywołania modeli - czat asystenta, parsowanie paragonów, batche
+normalizacji i funkcje GUI (przepisy, zakupy, analiza) - idą przez jeden
+LLMScheduler. Bez niego każdy moduł wołał client.chat niezależnie, więc
+długi batch normalizacji potrafił zablokować odpowiedź czatu, a kilka
+jednoczesnych żądań do modelu wizyjnego wyrzucało z pamięci GPU model tekstowy.
+
+Harmonogram:
+- wpuszcza najwyżej LLM_MAX_CONCURRENCY żądań naraz (i LLM_MODEL_CONCURRENCY
+  na model - żądanie do zajętego modelu nie blokuje kolejki dla innych),
+- z kolejki wybiera najpierw klasę Priority.INTERACTIVE, potem RECEIPT, potem
+  BATCH; w obrębie klasy FIFO, a każde LLM_PRIORITY_AGING_SECONDS czekania
+  podnosi żądanie o jedną klasę (tło nie jest zagłodzone),
+- pozwala anulować żądania czekające w kolejce (cancel_event, cancel_pending),
+- zbiera metryki: głębokość kolejki i czasy oczekiwania wg klasy, aktywne żądania wg modelu.
+
+Żądanie już wysłane do serwera nie jest przerywane (blokujący klient HTTP).
+
+Klient synchroniczny (llm.client) jest opakowany w ScheduledClient, a async_llm
+zajmuje miejsce przez acquire_async - oba korzystają z tego samego harmonogramu.
+"""
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import Config
+
+
+class Priority(IntEnum):
+    """Klasa priorytetu żądania (mniejsza wartość = obsługiwane wcześniej)."""
+
+    INTERACTIVE = 0  # Czat i funkcje GUI, na które czeka użytkownik
+    RECEIPT = 1  # Parsowanie paragonów
+    BATCH = 2  # Normalizacja produktów w tle
+
+
+class LLMRequestCancelled(Exception):
+    """Żądanie anulowane przed wysłaniem do modelu."""
+
+
+# Priorytet i sygnał anulowania ustawiane przez wywołującego (llm_priority)
+_current_priority: contextvars.ContextVar[Optional[Priority]] = contextvars.ContextVar(
+    "llm_priority", default=None
+)
+_current_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    "llm_cancel_event", default=None
+)
+
+# Jak często wątek czekający w kolejce sprawdza cancel_event
+_CANCEL_POLL_SECONDS = 0.1
+
+
+@contextmanager
+def llm_priority(priority: Priority, cancel_event: Optional[threading.Event] = None):
+    """
+    Ustawia priorytet (i opcjonalnie sygnał anulowania) żądań LLM w bloku.
+
+    Przechodzi do wątków uruchomionych przez contextvars.copy_context().run.
+    """
+    priority_token = _current_priority.set(priority)
+    cancel_token = _current_cancel_event.set(cancel_event) if cancel_event is not None else None
+    try:
+        yield
+    finally:
+        if cancel_token is not None:
+            _current_cancel_event.reset(cancel_token)
+        _current_priority.reset(priority_token)
+
+
+class _Ticket:
+    """Miejsce w kolejce jednego żądania."""
+
+    def __init__(
+        self,
+        model: str,
+        priority: Priority,
+        seq: int,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ) -> None:
+        self.model = model
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.wait_seconds = 0.0
+        # Wybudzenie czekającego wątku (przyznanie miejsca albo anulowanie)
+        self.wakeup = threading.Event()
+        self._loop = loop
+        self._future: Optional[asyncio.Future] = loop.create_future() if loop is not None else None
+
+    def effective_priority(self, now: float, aging_seconds: float) -> int:
+        if aging_seconds <= 0:
+            return int(self.priority)
+        return int(self.priority) - int((now - self.enqueued_at) // aging_seconds)
+
+    def grant(self) -> None:
+        self.granted = True
+        self._notify(None)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        self._notify(LLMRequestCancelled(f"Żądanie do modelu '{self.model}' anulowane w kolejce"))
+
+    def _notify(self, error: Optional[Exception]) -> None:
+        self.wakeup.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._resolve, error)
+
+    def _resolve(self, error: Optional[Exception]) -> None:
+        if self._future is None or self._future.done():
+            return
+        if error is None:
+            self._future.set_result(None)
+        else:
+            self._future.set_exception(error)
+
+
+class LLMScheduler:
+    """
+    Kolejka priorytetowa żądań LLM z globalnym limitem i limitami per model.
+
+    Args:
+        max_concurrent: Maksymalna liczba żądań w toku (wszystkie modele)
+        model_limits: Limit żądań w toku dla wybranych modeli (nazwa -> limit)
+        aging_seconds: Co ile sekund czekania żądanie awansuje o jedną klasę (0 = bez awansu)
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        model_limits: Optional[Dict[str, int]] = None,
+        aging_seconds: float = 30.0,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.model_limits = dict(model_limits or {})
+        self.aging_seconds = aging_seconds
+        self._lock = threading.Lock()
+        self._waiting: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._active_by_model: Counter = Counter()
+        self._stats = {
+            priority: {"submitted": 0, "started": 0, "cancelled": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for priority in Priority
+        }
+
+    # --- Kolejka ---
+
+    def _has_capacity(self, model: str) -> bool:
+        limit = self.model_limits.get(model)
+        return limit is None or self._active_by_model[model] < limit
+
+    def _dispatch_locked(self) -> None:
+        while self._waiting and self._active < self.max_concurrent:
+            now = time.monotonic()
+            candidates = [ticket for ticket in self._waiting if self._has_capacity(ticket.model)]
+            if not candidates:
+                return
+            ticket = min(
+                candidates,
+                key=lambda t: (t.effective_priority(now, self.aging_seconds), t.seq),
+            )
+            self._waiting.remove(ticket)
+            self._active += 1
+            self._active_by_model[ticket.model] += 1
+            ticket.wait_seconds = now - ticket.enqueued_at
+            stats = self._stats[ticket.priority]
+            stats["started"] += 1
+            stats["wait_total"] += ticket.wait_seconds
+            stats["wait_max"] = max(stats["wait_max"], ticket.wait_seconds)
+            ticket.grant()
+
+    def _enqueue(
+        self, model: str, priority: Priority, loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> _Ticket:
+        with self._lock:
+            ticket = _Ticket(model, Priority(priority), next(self._seq), loop)
+            self._stats[ticket.priority]["submitted"] += 1
+            self._waiting.append(ticket)
+            self._dispatch_locked()
+            return ticket
+
+    def _withdraw(self, ticket: _Ticket) -> bool:
+        """Usuwa czekające żądanie z kolejki; False, gdy zdążyło już dostać miejsce."""
+        with self._lock:
+            if ticket.granted:
+                return False
+            if ticket in self._waiting:
+                self._waiting.remove(ticket)
+                self._stats[ticket.priority]["cancelled"] += 1
+            return True
+
+    def release(self, ticket: _Ticket) -> None:
+        with self._lock:
+            self._active -= 1
+            self._active_by_model[ticket.model] -= 1
+            if self._active_by_model[ticket.model] <= 0:
+                del self._active_by_model[ticket.model]
+            self._dispatch_locked()
+
+    def acquire(
+        self,
+        model: str,
+        priority: Optional[Priority] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> _Ticket:
+        """
+        Czeka (blokująco) na miejsce dla żądania do modelu.
+
+        Args:
+            model: Nazwa modelu Ollama
+            priority: Klasa priorytetu (None = z llm_priority, domyślnie RECEIPT)
+            cancel_event: Sygnał anulowania (None = z llm_priority)
+
+        Returns:
+            Bilet do zwolnienia przez release()
+
+        Raises:
+            LLMRequestCancelled: Gdy żądanie anulowano w kolejce
+        """
+        priority = _resolve_priority(priority)
+        cancel_event = cancel_event if cancel_event is not None else _current_cancel_event.get()
+        ticket = self._enqueue(model, priority)
+        while True:
+            ticket.wakeup.wait(_CANCEL_POLL_SECONDS if cancel_event is not None else None)
+            if ticket.granted:
+                return ticket
+            if ticket.cancelled or (
+                cancel_event is not None and cancel_event.is_set() and self._withdraw(ticket)
+            ):
+                raise LLMRequestCancelled(f"Żądanie do modelu '{model}' anulowane w kolejce")
+
+    async def acquire_async(self, model: str, priority: Optional[Priority] = None) -> _Ticket:
+        """Asynchroniczny odpowiednik acquire (anulowanie: CancelledError zadania)."""
+        ticket = self._enqueue(model, _resolve_priority(priority), asyncio.get_running_loop())
+        try:
+            await ticket._future
+        except asyncio.CancelledError:
+            if not self._withdraw(ticket):
+                self.release(ticket)
+            raise
+        return ticket
+
+    @contextmanager
+    def slot(
+        self,
+        model: str,
+        priority: Optional[Priority] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Iterator[_Ticket]:
+        """Zajmuje miejsce na czas bloku (patrz acquire)."""
+        ticket = self.acquire(model, priority, cancel_event)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def slot_async(self, model: str, priority: Optional[Priority] = None):
+        """Asynchroniczny odpowiednik slot."""
+        ticket = await self.acquire_async(model, priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def cancel_pending(self, priority: Optional[Priority] = None) -> int:
+        """
+        Anuluje żądania czekające w kolejce (np. batch normalizacji przy zamknięciu okna).
+
+        Args:
+            priority: Tylko ta klasa (None = wszystkie)
+
+        Returns:
+            Liczba anulowanych żądań
+        """
+        with self._lock:
+            cancelled = [
+                ticket
+                for ticket in self._waiting
+                if priority is None or ticket.priority == priority
+            ]
+            for ticket in cancelled:
+                self._waiting.remove(ticket)
+                self._stats[ticket.priority]["cancelled"] += 1
+                ticket.cancel()
+        return len(cancelled)
+
+    # --- Metryki ---
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Statystyki harmonogramu.
+
+        Returns:
+            Słownik: active, active_by_model, queued, max_concurrent oraz
+            'priorities' (queued, submitted, started, cancelled, avg/max wait w ms)
+        """
+        now = time.monotonic()
+        with self._lock:
+            queued = Counter(ticket.priority for ticket in self._waiting)
+            oldest = {}
+            for ticket in self._waiting:
+                oldest[ticket.priority] = max(oldest.get(ticket.priority, 0.0), now - ticket.enqueued_at)
+            priorities = {}
+            for priority, stats in self._stats.items():
+                started = stats["started"]
+                priorities[priority.name.lower()] = {
+                    "queued": queued[priority],
+                    "submitted": stats["submitted"],
+                    "started": started,
+                    "cancelled": stats["cancelled"],
+                    "avg_wait_ms": round(stats["wait_total"] / started * 1000, 1) if started else 0.0,
+                    "max_wait_ms": round(stats["wait_max"] * 1000, 1),
+                    "oldest_wait_ms": round(oldest.get(priority, 0.0) * 1000, 1),
+                }
+            return {
+                "active": self._active,
+                "active_by_model": dict(self._active_by_model),
+                "queued": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+                "model_limits": dict(self.model_limits),
+                "priorities": priorities,
+            }
+
+
+def _resolve_priority(priority: Optional[Priority]) -> Priority:
+    if priority is not None:
+        return Priority(priority)
+    current = _current_priority.get()
+    return current if current is not None else Priority.RECEIPT
+
+
+class ScheduledClient:
+    """
+    ollama.Client, którego chat() i generate() przechodzą przez harmonogram.
+
+    Pozostałe metody (list, show, pull...) są przekazywane bez kolejkowania.
+
+    Args:
+        client: Opakowywany ollama.Client
+        priority: Domyślna klasa żądań tego klienta (llm_priority ma pierwszeństwo)
+        scheduler: Harmonogram (None = wspólny get_scheduler())
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        priority: Priority = Priority.RECEIPT,
+        scheduler: Optional[LLMScheduler] = None,
+    ) -> None:
+        self.client = client
+        self.priority = priority
+        self._scheduler = scheduler
+
+    @property
+    def scheduler(self) -> LLMScheduler:
+        return self._scheduler or get_scheduler()
+
+    def with_priority(self, priority: Priority) -> "ScheduledClient":
+        """Ten sam klient z inną domyślną klasą priorytetu."""
+        return ScheduledClient(self.client, priority, self._scheduler)
+
+    def _priority(self) -> Priority:
+        current = _current_priority.get()
+        return current if current is not None else self.priority
+
+    def _call(self, method: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        model = kwargs.get("model") or (args[0] if args else "")
+        if kwargs.get("stream"):
+            return self._stream(method, model, args, kwargs)
+        with self.scheduler.slot(model, self._priority()):
+            return getattr(self.client, method)(*args, **kwargs)
+
+    def _stream(self, method: str, model: str, args: tuple, kwargs: Dict[str, Any]) -> Iterator[Any]:
+        # Miejsce zajęte do końca strumienia (lub zamknięcia generatora)
+        with self.scheduler.slot(model, self._priority()):
+            yield from getattr(self.client, method)(*args, **kwargs)
+
+    def chat(self, *args: Any, **kwargs: Any) -> Any:
+        return self._call("chat", args, kwargs)
+
+    def generate(self, *args: Any, **kwargs: Any) -> Any:
+        return self._call("generate", args, kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+
+def _parse_model_limits(value: str) -> Dict[str, int]:
+    """'llava:latest=1,model-b=2' -> {'llava:latest': 1, 'model-b': 2}"""
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        model, _, limit = item.rpartition("=")
+        try:
+            limits[model.strip()] = int(limit)
+        except ValueError:
+            print(f"OSTRZEŻENIE: Niepoprawny limit modelu w LLM_MODEL_CONCURRENCY: '{item.strip()}'")
+    return limits
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Zwraca wspólny harmonogram procesu (tworzony leniwie z Config)."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    max_concurrent=Config.LLM_MAX_CONCURRENCY,
+                    model_limits=_parse_model_limits(Config.LLM_MODEL_CONCURRENCY),
+                    aging_seconds=Config.LLM_PRIORITY_AGING_SECONDS,
+                )
+    return _scheduler
+
+
+def reset_scheduler() -> None:
+    """Tworzy harmonogram od nowa przy następnym użyciu (zmiana Config, testy)."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = None
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """Statystyki wspólnego harmonogramu (patrz LLMScheduler.get_stats)."""
+    return get_scheduler().get_stats()
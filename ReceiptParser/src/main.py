@@ -1,6 +1,8 @@
 import click
-from sqlalchemy.orm import sessionmaker, Session, joinedload
-from typing import Callable, Optional
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import sessionmaker, Session
+from typing import Any, Callable, Dict, Optional, Tuple
 
 # Lokalne importy z naszego projektu
 from .database import (
@@ -11,16 +13,31 @@ from .database import (
     PozycjaParagonu,
     Produkt,
     AliasProduktu,
-    KategoriaProduktu,
-    StanMagazynowy,
 )
+from .bulk_write import ReceiptWriteCache
 from .knowledge_base import get_product_metadata
 from .data_models import ParsedData
 from .llm import get_llm_suggestion, parse_receipt_with_llm, parse_receipt_from_text
-from .ocr import convert_pdf_to_image, extract_text_from_image
-from .strategies import get_strategy_for_store
+from .ocr import (
+    convert_pdf_to_image,
+    extract_header_text,
+    extract_text_from_image,
+    extract_text_from_pdf,
+    pdf_page_count,
+)
+from .preprocessing import ocr_options, preprocess_or_original, preprocessed_image
+from .receipt_image import forget_receipt_image
+from .strategies import GenericStrategy, ReceiptStrategy, get_strategy_for_store
 from .mistral_ocr import MistralOCRClient
 from .normalization_rules import find_static_match
+from .dedup import (
+    ON_DUPLICATE_MODES,
+    ON_DUPLICATE_REPLAY,
+    ON_DUPLICATE_SKIP,
+    compute_file_hash,
+    find_receipt_by_hash,
+    receipt_to_parsed_data,
+)
 from .security import (
     validate_file_path,
     validate_llm_model,
@@ -28,9 +45,19 @@ from .security import (
     sanitize_log_message,
     sanitize_ocr_text,
 )
+from .job_store import (
+    STAGE_LLM,
+    STAGE_NORMALIZATION,
+    STAGE_OCR,
+    STAGE_PARSED,
+    ReceiptJob,
+    get_job_store,
+)
+from .tracing import current_span, file_size, traced
 from .config import Config
 import os
 import inspect
+import sqlite3
 
 # --- GŁÓWNA LOGIKA PRZETWARZANIA (NIEZALEŻNA OD UI) ---
 
@@ -62,145 +89,610 @@ def _call_log_callback(
         log_callback(message)
 
 
-def run_processing_pipeline(
-    file_path: str,
-    llm_model: str,  # Teraz to jest parametr wymagany
+def prepare_receipt_image(
+    file_path: str, log_callback: Callable[[str], None], llm_model: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
+    """
+    Przygotowuje plik do przetwarzania (konwersja PDF -> obraz).
+
+    Sklejony obraz stron jest potrzebny tylko modelowi wizyjnemu. Dla 'mistral-ocr'
+    PDF jest przekazywany bez konwersji (Mistral OCR czyta PDF, a LLM dostaje tekst).
+
+    Args:
+        file_path: Zwalidowana ścieżka do pliku paragonu
+        log_callback: Callback do logowania
+        llm_model: Nazwa modelu LLM (None = zawsze konwertuj PDF)
+
+    Returns:
+        Krotka (ścieżka do obrazu do przetwarzania, ścieżka pliku tymczasowego lub None)
+    """
+    if not file_path.lower().endswith(".pdf") or llm_model == "mistral-ocr":
+        return file_path, None
+
+    _call_log_callback(
+        log_callback,
+        f"INFO: Wykryto plik PDF. Konwertuję na obraz...",
+        progress=-1,
+        status="Konwertowanie PDF...",
+    )
+    temp_image_path = convert_pdf_to_image(file_path)
+    if not temp_image_path:
+        raise Exception("Nie udało się skonwertować pliku PDF na obraz.")
+    _call_log_callback(
+        log_callback,
+        f"INFO: PDF skonwertowany tymczasowo do: {sanitize_path(temp_image_path)}",
+    )
+    return temp_image_path, temp_image_path
+
+
+def _is_multipage_pdf(file_path: Optional[str]) -> bool:
+    if not file_path or not file_path.lower().endswith(".pdf"):
+        return False
+    try:
+        return pdf_page_count(file_path) > 1
+    except Exception:
+        return False
+
+
+def extract_receipt_text(
+    processing_file_path: str,
+    llm_model: str,
     log_callback: Callable[[str], None],
-    prompt_callback: Callable[[str, str, str], str],
-    review_callback: Callable[[dict], dict | None] = None,
-) -> None:
+    source_path: Optional[str] = None,
+) -> str:
     """
-    Uruchamia pełny potok przetwarzania paragonu, od odczytu po zapis do bazy.
-    Funkcja jest niezależna od UI i przyjmuje callbacki do komunikacji z użytkownikiem.
+    Wyciąga tekst z obrazu paragonu (Mistral OCR lub skonfigurowany silnik lokalny).
+
+    Wielostronicowy PDF (source_path) jest rozpoznawany strona po stronie,
+    równolegle, zamiast jako jeden sklejony obraz.
+
+    Args:
+        processing_file_path: Ścieżka do obrazu paragonu
+        llm_model: Nazwa modelu (dla 'mistral-ocr' używany jest Mistral OCR)
+        log_callback: Callback do logowania
+        source_path: Oryginalny plik paragonu (PDF przed konwersją)
+
+    Returns:
+        Tekst z OCR (markdown dla Mistral OCR)
+    """
+    if llm_model == "mistral-ocr":
+        _call_log_callback(
+            log_callback,
+            "INFO: Używam Mistral OCR do ekstrakcji tekstu...",
+            progress=-1,
+            status="OCR (Mistral)...",
+        )
+        mistral_client = MistralOCRClient()
+        ocr_markdown = mistral_client.process_image(processing_file_path)
+
+        if not ocr_markdown:
+            raise Exception("Mistral OCR nie zwrócił wyniku.")
+        return ocr_markdown
+
+    # Hybrid OCR - tekst służy do detekcji sklepu i jako wsparcie dla LLM
+    ocr_engine_name = Config.OCR_ENGINE.upper()
+    _call_log_callback(
+        log_callback,
+        f"INFO: Analizuję tekst z OCR ({ocr_engine_name})...",
+        progress=-1,
+        status=f"OCR ({ocr_engine_name})...",
+    )
+    if _is_multipage_pdf(source_path or processing_file_path):
+        full_ocr_text = extract_text_from_pdf(source_path or processing_file_path)
+    else:
+        # Strategia sklepu jest wybierana dopiero z tekstu OCR - tu wspólne ustawienia
+        options = ocr_options() if Config.PREPROCESS_OCR else None
+        full_ocr_text = extract_text_from_image(processing_file_path, preprocess=options)
+    # Sanityzuj tekst OCR przed logowaniem (usuń wrażliwe dane)
+    sanitized_ocr = sanitize_ocr_text(full_ocr_text, max_length=200)
+    _call_log_callback(
+        log_callback,
+        f"--- WYNIK OCR ({ocr_engine_name}) ---\n{sanitized_ocr}\n-----------------------------",
+    )
+    return full_ocr_text
+
+
+def detect_store_from_header(image_path: str, llm_model: str) -> Optional[ReceiptStrategy]:
+    """
+    Wybiera strategię sklepu z szybkiego OCR samego nagłówka (bez pełnego OCR).
+
+    Returns:
+        Strategia rozpoznanego sklepu lub None (sklep nierozpoznany, OCR nagłówka
+        wyłączony albo Mistral OCR, który nie korzysta z lokalnego silnika)
+    """
+    if not Config.HEADER_OCR or llm_model == "mistral-ocr":
+        return None
+    strategy = get_strategy_for_store(extract_header_text(image_path))
+    return None if isinstance(strategy, GenericStrategy) else strategy
+
+
+def setup_store_strategy(
+    image_path: str, llm_model: str
+) -> Tuple[Optional[ReceiptStrategy], Optional[str]]:
+    """
+    Wykrywa sklep z nagłówka i przygotowuje obraz dla modelu wizyjnego wg jego strategii.
+
+    Nie rzuca wyjątków - przy błędzie strategia zostanie wybrana z pełnego tekstu OCR.
+
+    Returns:
+        Krotka (strategia lub None, ścieżka obrazu dla modelu wizyjnego lub None)
     """
-    # Krok 0: Walidacja wejściowa
-    temp_image_path = None
     try:
-        # Waliduj ścieżkę pliku
-        validated_path = validate_file_path(
-            file_path, allowed_extensions=[".png", ".jpg", ".jpeg", ".pdf"]
+        strategy = detect_store_from_header(image_path, llm_model)
+        if strategy is None:
+            return None, None
+        return strategy, preprocess_or_original(image_path, strategy.get_preprocess_options())
+    except Exception as e:
+        print(f"OSTRZEŻENIE: Wykrywanie sklepu z nagłówka nie powiodło się: {e}")
+        return None, None
+
+
+def _discard_vision_image(vision_image_path: Optional[str], processing_file_path: str) -> None:
+    """Usuwa obraz przygotowany dla modelu wizyjnego (jeśli nie jest oryginałem)."""
+    if vision_image_path and vision_image_path != processing_file_path:
+        forget_receipt_image(vision_image_path)
+        if os.path.exists(vision_image_path):
+            os.unlink(vision_image_path)
+
+
+def extract_with_strategy_setup(
+    processing_file_path: str, llm_model: str, extract: Callable[[], Any]
+) -> Tuple[Any, Optional[ReceiptStrategy], Optional[str]]:
+    """
+    Uruchamia pełny OCR (extract) równolegle z setup_store_strategy.
+
+    OCR nagłówka i przygotowanie obrazu dla strategii sklepu kończą się zwykle
+    przed pełnym OCR, więc nie wydłużają etapu.
+
+    Returns:
+        Krotka (wynik extract, strategia lub None, obraz dla modelu wizyjnego lub None)
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="strategy-setup") as executor:
+        setup = executor.submit(
+            contextvars.copy_context().run, setup_store_strategy, processing_file_path, llm_model
         )
-        file_path = str(validated_path)
+        try:
+            ocr_text = extract()
+        except BaseException:
+            _discard_vision_image(setup.result()[1], processing_file_path)
+            raise
+        strategy, vision_image_path = setup.result()
+    return ocr_text, strategy, vision_image_path
 
-        # Waliduj model LLM
-        llm_model = validate_llm_model(llm_model)
 
-        # Krok 1: Parsowanie multimodalne jest teraz domyślnym i jedynym potokiem
-        processing_file_path = file_path
+def _select_receipt_strategy(
+    llm_model: str,
+    ocr_text: str,
+    log_callback: Callable[[str], None],
+    strategy: Optional[ReceiptStrategy] = None,
+):
+    """
+    Wybiera strategię sklepu na podstawie nagłówka tekstu OCR i loguje start etapu LLM.
 
-        # Obsługa PDF
-        if file_path.lower().endswith(".pdf"):
-            _call_log_callback(
-                log_callback,
-                f"INFO: Wykryto plik PDF. Konwertuję na obraz...",
-                progress=-1,
-                status="Konwertowanie PDF...",
-            )
-            temp_image_path = convert_pdf_to_image(file_path)
-            if not temp_image_path:
-                raise Exception("Nie udało się skonwertować pliku PDF na obraz.")
-            processing_file_path = temp_image_path
-            _call_log_callback(
-                log_callback,
-                f"INFO: PDF skonwertowany tymczasowo do: {sanitize_path(processing_file_path)}",
-            )
+    Strategia wykryta wcześniej z OCR nagłówka (strategy) ma pierwszeństwo.
+    Wspólne dla parse_receipt_text i async_pipeline.parse_receipt_text.
+    """
+    if strategy is not None:
+        _call_log_callback(
+            log_callback,
+            f"INFO: Sklep rozpoznany z nagłówka: {strategy.__class__.__name__}",
+        )
+    else:
+        # Do detekcji sklepu używamy próbki, ale do LLM przekażemy całość
+        header_sample = ocr_text[:1000] if ocr_text else ""
+        strategy = get_strategy_for_store(header_sample)
+
+    if llm_model == "mistral-ocr":
+        _call_log_callback(
+            log_callback,
+            f"INFO: Wybrano strategię (na podstawie Mistral OCR): {strategy.__class__.__name__}",
+        )
+        _call_log_callback(
+            log_callback,
+            "INFO: Mistral OCR zakończył pracę. Przesyłam tekst do LLM (Bielik)...",
+            progress=30,
+            status="Przetwarzanie przez LLM...",
+        )
+    else:
+        _call_log_callback(
+            log_callback, f"INFO: Wybrano strategię: {strategy.__class__.__name__}"
+        )
+        _call_log_callback(
+            log_callback,
+            f"INFO: Używam modelu LLM '{llm_model}' do przetworzenia obrazu (wspaganego OCR).",
+            progress=30,
+            status="Przetwarzanie przez LLM...",
+        )
+    return strategy
+
+
+def _post_process_parsed_receipt(
+    strategy, parsed_data: Optional[dict], log_callback: Callable[[str], None]
+) -> dict:
+    """Uruchamia post-processing strategii sklepu na wyniku LLM (wyjątek gdy brak danych)."""
+    if not parsed_data:
+        raise Exception("Parsowanie za pomocą LLM nie zwróciło danych.")
+
+    # Post-processing (Strategy Pattern)
+    _call_log_callback(
+        log_callback,
+        "INFO: Uruchamiam post-processing specyficzny dla sklepu...",
+        progress=60,
+        status="Post-processing...",
+    )
+    parsed_data = strategy.post_process(parsed_data)
+
+    _call_log_callback(
+        log_callback,
+        "INFO: Dane z paragonu zostały pomyślnie sparsowane przez LLM.",
+        progress=70,
+        status="Dane sparsowane",
+    )
+    return parsed_data
+
+
+def parse_receipt_text(
+    processing_file_path: str,
+    llm_model: str,
+    ocr_text: str,
+    log_callback: Callable[[str], None],
+    job: Optional[ReceiptJob] = None,
+    strategy: Optional[ReceiptStrategy] = None,
+    vision_image_path: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Parsuje paragon przez LLM i uruchamia post-processing strategii sklepu.
+
+    Args:
+        processing_file_path: Ścieżka do obrazu paragonu
+        llm_model: Nazwa modelu LLM
+        ocr_text: Tekst z etapu OCR
+        log_callback: Callback do logowania
+        job: Opcjonalne zadanie - wynik LLM (przed post-processingiem) jest
+            zapisywany jako punkt kontrolny i odczytywany przy wznowieniu
+        strategy: Strategia wykryta z OCR nagłówka (None = wybór z tekstu OCR)
+        vision_image_path: Obraz już przygotowany dla strategii (setup_store_strategy)
+
+    Returns:
+        Sparsowane dane paragonu (ParsedData) lub None
+    """
+    strategy = _select_receipt_strategy(llm_model, ocr_text, log_callback, strategy)
 
+    def _call_llm():
         if llm_model == "mistral-ocr":
-            _call_log_callback(
-                log_callback,
-                "INFO: Używam Mistral OCR do ekstrakcji tekstu...",
-                progress=-1,
-                status="OCR (Mistral)...",
+            return parse_receipt_from_text(ocr_text)
+        # Obraz przygotowany już równolegle z OCR (setup_store_strategy) nie jest przetwarzany ponownie
+        if vision_image_path:
+            image_path, options = vision_image_path, None
+        else:
+            image_path, options = processing_file_path, strategy.get_preprocess_options()
+        with preprocessed_image(image_path, options) as prepared_path:
+            return parse_receipt_with_llm(
+                prepared_path,
+                llm_model,
+                system_prompt_override=strategy.get_system_prompt(),
+                ocr_text=ocr_text,
             )
-            mistral_client = MistralOCRClient()
-            ocr_markdown = mistral_client.process_image(processing_file_path)
 
-            if not ocr_markdown:
-                raise Exception("Mistral OCR nie zwrócił wyniku.")
+    parsed_data = _run_checkpointed(job, STAGE_LLM, _call_llm, log_callback)
+    return _post_process_parsed_receipt(strategy, parsed_data, log_callback)
 
-            _call_log_callback(
-                log_callback,
-                "INFO: Mistral OCR zakończył pracę. Przesyłam tekst do LLM (Bielik)...",
-                progress=30,
-                status="Przetwarzanie przez LLM...",
-            )
-            parsed_data = parse_receipt_from_text(ocr_markdown)
 
-        else:
-            # Krok 1.5: Detekcja sklepu (Strategy Pattern) + Hybrid OCR
-            ocr_engine_name = Config.OCR_ENGINE.upper()
+def _start_receipt_job(
+    file_hash: str, file_path: str, llm_model: str
+) -> Optional[ReceiptJob]:
+    """Rozpoczyna lub wznawia zadanie paragonu (None gdy punkty kontrolne są wyłączone)."""
+    store = get_job_store()
+    if store is None:
+        return None
+    try:
+        return store.start(file_hash, file_path, llm_model)
+    except sqlite3.Error as e:
+        print(f"OSTRZEŻENIE: Nie udało się otworzyć zadania: {sanitize_log_message(str(e))}")
+        return None
+
+
+def _run_checkpointed(
+    job: Optional[ReceiptJob], stage: str, compute: Callable, log_callback: Callable
+):
+    """
+    Zwraca artefakt etapu zapisany w zadaniu albo wykonuje etap i zapisuje wynik.
+    """
+    if job is not None:
+        value = job.load(stage)
+        if value is not None:
             _call_log_callback(
                 log_callback,
-                f"INFO: Analizuję tekst z OCR ({ocr_engine_name})...",
-                progress=-1,
-                status=f"OCR ({ocr_engine_name})...",
+                f"INFO: Wznowienie zadania - etap '{stage}' odczytany z punktu kontrolnego.",
             )
-            full_ocr_text = extract_text_from_image(processing_file_path)
-            # Sanityzuj tekst OCR przed logowaniem (usuń wrażliwe dane)
-            sanitized_ocr = sanitize_ocr_text(full_ocr_text, max_length=200)
+            return value
+    value = compute()
+    if job is not None and value:
+        job.save(stage, value)
+    return value
+
+
+def _prepare_job_image(
+    file_path: str, llm_model: str, job: Optional[ReceiptJob], log_callback: Callable
+) -> Tuple[str, Optional[str]]:
+    """
+    prepare_receipt_image z punktem kontrolnym: obraz skonwertowany z PDF jest
+    kopiowany do artefaktów zadania, a przy wznowieniu używany bez ponownej konwersji.
+
+    Returns:
+        Krotka (ścieżka do obrazu do przetwarzania, ścieżka pliku tymczasowego lub None)
+    """
+    if job is not None:
+        kept_image = job.load_image()
+        if kept_image:
             _call_log_callback(
                 log_callback,
-                f"--- WYNIK OCR ({ocr_engine_name}) ---\n{sanitized_ocr}\n-----------------------------",
+                "INFO: Wznowienie zadania - używam zapisanego obrazu (pominięto konwersję PDF).",
             )
+            return kept_image, None
+    processing_file_path, temp_image_path = prepare_receipt_image(
+        file_path, log_callback, llm_model
+    )
+    if job is not None and temp_image_path:
+        processing_file_path = job.keep_image(temp_image_path)
+    return processing_file_path, temp_image_path
 
-            # Do detekcji sklepu używamy próbki, ale do LLM przekażemy całość
-            header_sample = full_ocr_text[:1000]
 
-            strategy = get_strategy_for_store(header_sample)
-            _call_log_callback(
-                log_callback, f"INFO: Wybrano strategię: {strategy.__class__.__name__}"
-            )
+def _close_receipt_job(file_hash: str) -> None:
+    """Zamyka zadanie paragonu, który jest już w bazie (np. przerwanego po commit)."""
+    store = get_job_store()
+    if store is None:
+        return
+    try:
+        store.mark_done(file_hash)
+    except sqlite3.Error:
+        pass
 
-            system_prompt = strategy.get_system_prompt()
 
-            _call_log_callback(
-                log_callback,
-                f"INFO: Używam modelu LLM '{llm_model}' do przetworzenia obrazu (wspaganego OCR).",
-                progress=30,
-                status="Przetwarzanie przez LLM...",
-            )
-            parsed_data = parse_receipt_with_llm(
-                processing_file_path,
-                llm_model,
-                system_prompt_override=system_prompt,
-                ocr_text=full_ocr_text,
-            )
+def load_processed_receipt(file_hash: str) -> Optional[Tuple[int, ParsedData]]:
+    """
+    Sprawdza, czy plik o danym hashu został już zapisany w bazie.
 
-        # Jeśli używamy Mistral OCR, strategia mogła nie zostać jeszcze wybrana (bo pominęliśmy Tesseract)
-        # Ale potrzebujemy jej do post-processingu.
-        # Spróbujmy wykryć strategię na podstawie tekstu z Mistral OCR jeśli jeszcze jej nie mamy.
-        if "strategy" not in locals():
-            # Używamy początku tekstu z Mistral OCR do detekcji
-            header_sample = (
-                ocr_markdown[:1000]
-                if "ocr_markdown" in locals() and ocr_markdown
-                else ""
-            )
-            strategy = get_strategy_for_store(header_sample)
-            log_callback(
-                f"INFO: Wybrano strategię (na podstawie Mistral OCR): {strategy.__class__.__name__}"
-            )
+    Args:
+        file_hash: SHA-256 zawartości pliku
 
+    Returns:
+        Krotka (paragon_id, odtworzone ParsedData) lub None, jeśli plik jest nowy
+    """
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    try:
+        paragon = find_receipt_by_hash(session, file_hash)
+        if not paragon:
+            return None
+        return paragon.paragon_id, receipt_to_parsed_data(paragon)
+    finally:
+        session.close()
 
 
-        if not parsed_data:
-            raise Exception("Parsowanie za pomocą LLM nie zwróciło danych.")
+def save_parsed_receipt(
+    parsed_data: ParsedData,
+    file_path: str,
+    log_callback: Callable[[str], None],
+    prompt_callback: Callable[[str, str, str], str],
+    file_hash: Optional[str] = None,
+    deferred_review: bool = False,
+    normalization_map: Optional[Dict[str, Optional[str]]] = None,
+) -> bool:
+    """
+    Zapisuje sparsowany paragon do bazy danych we własnej transakcji.
+    deferred_review i normalization_map - patrz save_to_database.
 
-        # Krok 1.6: Post-processing (Strategy Pattern)
+    Returns:
+        True jeśli zapis się powiódł, False w przeciwnym razie
+    """
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    try:
+        save_to_database(
+            session,
+            parsed_data,
+            file_path,
+            log_callback,
+            prompt_callback,
+            file_hash=file_hash,
+            deferred_review=deferred_review,
+            normalization_map=normalization_map,
+        )
+        session.commit()
         _call_log_callback(
             log_callback,
-            "INFO: Uruchamiam post-processing specyficzny dla sklepu...",
-            progress=60,
-            status="Post-processing...",
+            "--- Sukces! Dane zostały zapisane w bazie danych. ---",
+            progress=100,
+            status="Gotowy",
+        )
+        return True
+    except Exception as e:
+        session.rollback()
+        _call_log_callback(
+            log_callback, f"BŁĄD KRYTYCZNY podczas zapisu do bazy danych: {e}"
         )
-        parsed_data = strategy.post_process(parsed_data)
+        return False
+    finally:
+        session.close()
 
+
+def replay_processed_receipt(
+    processed: Tuple[int, ParsedData],
+    file_hash: str,
+    on_duplicate: str,
+    log_callback: Callable[[str], None],
+    review_callback: Callable[[dict], dict | None] = None,
+) -> None:
+    """
+    Obsługuje plik, który został już zapisany w bazie (pominięcie lub odtworzenie wyniku).
+
+    Args:
+        processed: Krotka (paragon_id, ParsedData) z load_processed_receipt
+        file_hash: SHA-256 zawartości pliku
+        on_duplicate: Tryb obsługi duplikatu ("skip" lub "replay")
+        log_callback: Callback do logowania
+        review_callback: Opcjonalny callback podglądu (wynik nie jest zapisywany)
+    """
+    paragon_id, stored_data = processed
+    _call_log_callback(
+        log_callback,
+        f"INFO: Ten plik został już przetworzony (paragon ID: {paragon_id}, "
+        f"SHA-256: {file_hash[:12]}...). Pomijam OCR i LLM.",
+        progress=100,
+        status="Duplikat",
+    )
+    if on_duplicate != ON_DUPLICATE_REPLAY:
+        return
+
+    sklep = stored_data["sklep_info"]["nazwa"]
+    suma = stored_data["paragon_info"]["suma_calkowita"]
+    _call_log_callback(
+        log_callback,
+        f"INFO: Zapisany wynik: {sklep}, suma {suma}, {len(stored_data['pozycje'])} pozycji.",
+    )
+    for item in stored_data["pozycje"]:
         _call_log_callback(
             log_callback,
-            "INFO: Dane z paragonu zostały pomyślnie sparsowane przez LLM.",
-            progress=70,
-            status="Dane sparsowane",
+            f"   -> {item['nazwa_raw']}: {item['ilosc']} x {item['cena_jedn']} = {item['cena_po_rab']}",
+        )
+    if review_callback:
+        # Tylko podgląd - ponowny zapis podwoiłby stany magazynowe
+        review_callback(stored_data)
+
+
+def _cleanup_temp_image(temp_image_path: Optional[str], log_callback: Callable) -> None:
+    """Usuwa plik tymczasowy utworzony przy konwersji PDF."""
+    forget_receipt_image(temp_image_path)
+    if temp_image_path and os.path.exists(temp_image_path):
+        try:
+            os.unlink(temp_image_path)
+            _call_log_callback(
+                log_callback, "INFO: Usunięto tymczasowy plik obrazu (cleanup)."
+            )
+        except Exception:
+            # Log to logger instead of UI to avoid clutter if UI is gone
+            pass
+
+
+def _release_receipt_images(*paths: Optional[str]) -> None:
+    """
+    Zwalnia z pamięci procesu obrazy paragonu, którego przetwarzanie się zakończyło
+    (oryginał i obraz roboczy) - zapis do bazy nie czyta już obrazu.
+    """
+    for path in set(paths):
+        forget_receipt_image(path)
+
+
+def _validate_pipeline_input(
+    file_path: str, llm_model: str, on_duplicate: str
+) -> Tuple[str, str]:
+    """Waliduje wejście potoku i zwraca (zwalidowana ścieżka, zwalidowany model)."""
+    # Waliduj ścieżkę pliku
+    validated_path = validate_file_path(
+        file_path, allowed_extensions=[".png", ".jpg", ".jpeg", ".pdf"]
+    )
+
+    # Waliduj model LLM
+    llm_model = validate_llm_model(llm_model)
+
+    if on_duplicate not in ON_DUPLICATE_MODES:
+        raise ValueError(
+            f"Nieznany tryb obsługi duplikatów: {on_duplicate}. "
+            f"Dozwolone: {', '.join(ON_DUPLICATE_MODES)}"
         )
+    return str(validated_path), llm_model
+
+
+@traced("run_processing_pipeline")
+def run_processing_pipeline(
+    file_path: str,
+    llm_model: str,  # Teraz to jest parametr wymagany
+    log_callback: Callable[[str], None],
+    prompt_callback: Callable[[str, str, str], str],
+    review_callback: Callable[[dict], dict | None] = None,
+    on_duplicate: str = ON_DUPLICATE_SKIP,
+    deferred_review: Optional[bool] = None,
+) -> None:
+    """
+    Uruchamia pełny potok przetwarzania paragonu, od odczytu po zapis do bazy.
+    Funkcja jest niezależna od UI i przyjmuje callbacki do komunikacji z użytkownikiem.
+
+    Pliki już zapisane w bazie (ten sam SHA-256 zawartości) nie są przetwarzane ponownie:
+    on_duplicate="skip" tylko je pomija, a "replay" odtwarza zapisany wynik
+    (log + review_callback w trybie podglądu) bez OCR, LLM i zapisu do bazy.
+
+    deferred_review=True zapisuje nieznane produkty do kolejki weryfikacji zamiast
+    pytać przez prompt_callback (None = Config.DEFERRED_PRODUCT_REVIEW).
+
+    Wyniki etapów (obraz z PDF, OCR, LLM, dane po post-processingu, normalizacja)
+    są zapisywane w zadaniu paragonu (job_store), więc ponowne uruchomienie po
+    błędzie zaczyna od ostatniego ukończonego etapu.
+    """
+    # Krok 0: Walidacja wejściowa
+    temp_image_path = None
+    processing_file_path = None
+    job = None
+    try:
+        file_path, llm_model = _validate_pipeline_input(file_path, llm_model, on_duplicate)
+        current_span().set(file=sanitize_path(file_path), model=llm_model)
+        current_span().add_bytes(bytes_in=file_size(file_path))
+
+        # Krok 0.5: Deduplikacja po hashu zawartości (przed OCR)
+        file_hash = compute_file_hash(file_path)
+        processed = load_processed_receipt(file_hash)
+        if processed:
+            current_span().set(duplicate=True)
+            _close_receipt_job(file_hash)
+            replay_processed_receipt(
+                processed, file_hash, on_duplicate, log_callback, review_callback
+            )
+            return
+
+        # Zadanie z punktami kontrolnymi - wznowienie od ostatniego ukończonego etapu
+        job = _start_receipt_job(file_hash, file_path, llm_model)
+        parsed_data = job.load(STAGE_PARSED) if job else None
+        if parsed_data is not None:
+            _call_log_callback(
+                log_callback,
+                "INFO: Wznowienie zadania - dane paragonu odczytane z punktu kontrolnego (pominięto OCR i LLM).",
+                progress=70,
+                status="Dane sparsowane",
+            )
+            processing_file_path = job.load_image() or file_path
+        else:
+            # Krok 1: Parsowanie multimodalne jest teraz domyślnym i jedynym potokiem
+            processing_file_path, temp_image_path = _prepare_job_image(
+                file_path, llm_model, job, log_callback
+            )
+
+            # Krok 1.5: OCR (Mistral lub Hybrid OCR), równolegle detekcja sklepu z nagłówka
+            ocr_text, strategy, vision_image_path = extract_with_strategy_setup(
+                processing_file_path,
+                llm_model,
+                lambda: _run_checkpointed(
+                    job,
+                    STAGE_OCR,
+                    lambda: extract_receipt_text(
+                        processing_file_path, llm_model, log_callback, source_path=file_path
+                    ),
+                    log_callback,
+                ),
+            )
+            try:
+                parsed_data = parse_receipt_text(
+                    processing_file_path,
+                    llm_model,
+                    ocr_text,
+                    log_callback,
+                    job=job,
+                    strategy=strategy,
+                    vision_image_path=vision_image_path,
+                )
+            finally:
+                _discard_vision_image(vision_image_path, processing_file_path)
+            if job:
+                job.save(STAGE_PARSED, parsed_data)
 
         # Wstrzyknij ścieżkę do pliku, aby UI mogło wyświetlić podgląd
         parsed_data["file_path"] = processing_file_path
@@ -218,6 +710,8 @@ def run_processing_pipeline(
                 _call_log_callback(
                     log_callback, "INFO: Użytkownik odrzucił zmiany. Anulowanie zapisu."
                 )
+                if job:
+                    job.done()
                 return
             parsed_data = reviewed_data
             _call_log_callback(
@@ -228,85 +722,91 @@ def run_processing_pipeline(
             )
 
     except Exception as e:
-        # Cleanup pliku tymczasowego nawet przy błędzie
-        if temp_image_path and os.path.exists(temp_image_path):
-            try:
-                os.unlink(temp_image_path)
-            except Exception:
-                pass
+        if job:
+            job.fail(sanitize_log_message(str(e)))
         _call_log_callback(
             log_callback,
             f"BŁĄD KRYTYCZNY na etapie parsowania LLM: {sanitize_log_message(str(e))}",
         )
-    finally:
-        # Sprzątanie po PDF - zawsze wykonaj cleanup na samym końcu
-        if temp_image_path and os.path.exists(temp_image_path):
-            try:
-                os.unlink(temp_image_path)
-                _call_log_callback(
-                    log_callback, "INFO: Usunięto tymczasowy plik obrazu (cleanup)."
-                )
-            except Exception as cleanup_error:
-                 # Log to logger instead of UI to avoid clutter if UI is gone
-                 pass
         _call_log_callback(
             log_callback, "Upewnij się, że serwer Ollama działa i model jest dostępny."
         )
         return
+    finally:
+        # Sprzątanie po PDF - zawsze wykonaj cleanup na samym końcu
+        _cleanup_temp_image(temp_image_path, log_callback)
+        _release_receipt_images(file_path, processing_file_path)
 
-    # Krok 2: Zapis do bazy (ta logika jest już dobra i pozostaje bez zmian)
+    # Krok 2: Zapis do bazy (każdy paragon we własnej transakcji)
     if parsed_data:
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        session = SessionLocal()
-        try:
-            save_to_database(
-                session, parsed_data, file_path, log_callback, prompt_callback
-            )
-            session.commit()
-            _call_log_callback(
-                log_callback,
-                "--- Sukces! Dane zostały zapisane w bazie danych. ---",
-                progress=100,
-                status="Gotowy",
-            )
-        except Exception as e:
-            session.rollback()
-            _call_log_callback(
-                log_callback, f"BŁĄD KRYTYCZNY podczas zapisu do bazy danych: {e}"
-            )
-        finally:
-            session.close()
+        if deferred_review is None:
+            deferred_review = Config.DEFERRED_PRODUCT_REVIEW
+        normalization_map = (job.load(STAGE_NORMALIZATION) if job else None) or {}
+        saved = save_parsed_receipt(
+            parsed_data,
+            file_path,
+            log_callback,
+            prompt_callback,
+            file_hash=file_hash,
+            deferred_review=deferred_review,
+            normalization_map=normalization_map,
+        )
+        if job:
+            if saved:
+                job.done()
+            else:
+                # Wyniki normalizacji przetrwają do wznowienia (CLI 'resume')
+                if normalization_map:
+                    job.save(STAGE_NORMALIZATION, normalization_map)
+                job.fail("Zapis do bazy danych nie powiódł się.")
     else:
         _call_log_callback(
             log_callback, "BŁĄD: Nie udało się uzyskać danych do zapisu."
         )
 
 
+@traced("save_to_database")
 def save_to_database(
     session: Session,
     parsed_data: ParsedData,
     file_path: str,
     log_callback: Callable,
     prompt_callback: Callable,
+    file_hash: Optional[str] = None,
+    deferred_review: bool = False,
+    normalization_map: Optional[Dict[str, Optional[str]]] = None,
 ):
+    """
+    Zapisuje sparsowany paragon (sklep, pozycje, produkty, stany magazynowe) w sesji.
+
+    W trybie deferred_review nieznane produkty nie blokują zapisu na prompt_callback:
+    pozycja dostaje tymczasowe mapowanie (sugestia ze słownika/LLM) i flagę
+    do_weryfikacji, a stan magazynowy (z datą ważności zapamiętaną w pozycji)
+    powstaje dopiero po weryfikacji w kolejce (product_review.resolve_pending_reviews).
+
+    normalization_map to wyniki batch normalizacji z poprzedniej próby zapisu
+    (punkt kontrolny zadania) - nazwy z mapy nie są ponownie wysyłane do LLM,
+    a nowe wyniki są do niej dopisywane.
+    """
     _call_log_callback(
         log_callback,
         "INFO: Rozpoczynam zapis do bazy danych...",
         progress=80,
         status="Zapisuję do bazy...",
     )
+    current_span().set(items=len(parsed_data["pozycje"]))
     sklep_name = parsed_data["sklep_info"]["nazwa"]
     sklep = session.query(Sklep).filter_by(nazwa_sklepu=sklep_name).first()
+    new_sklep = None
     if not sklep:
         _call_log_callback(
             log_callback, f"INFO: Sklep '{sklep_name}' nie istnieje. Tworzę nowy wpis."
         )
-        sklep = Sklep(
+        new_sklep = Sklep(
             nazwa_sklepu=sklep_name,
             lokalizacja=parsed_data["sklep_info"]["lokalizacja"],
         )
-        session.add(sklep)
-        session.flush()
+        session.add(new_sklep)
     else:
         _call_log_callback(
             log_callback,
@@ -314,11 +814,16 @@ def save_to_database(
         )
 
     paragon = Paragon(
-        sklep_id=sklep.sklep_id,
         data_zakupu=parsed_data["paragon_info"]["data_zakupu"].date(),
         suma_paragonu=parsed_data["paragon_info"]["suma_calkowita"],
         plik_zrodlowy=file_path,
+        hash_pliku=file_hash,
     )
+    # Nowy sklep dostanie ID dopiero przy flush - wiążemy go przez relację
+    if new_sklep is not None:
+        paragon.sklep = new_sklep
+    else:
+        paragon.sklep_id = sklep.sklep_id
 
     _call_log_callback(
         log_callback,
@@ -327,36 +832,25 @@ def save_to_database(
         status="Przetwarzam pozycje...",
     )
     total_items = len(parsed_data["pozycje"])
-    
+
+    # Aliasy, produkty, kategorie i stany magazynowe ładujemy zbiorczo (IN),
+    # nowe wiersze budujemy w pamięci i zapisujemy jednym flush na końcu
+    write_cache = ReceiptWriteCache(session)
+
     # KROK 1: Zbierz wszystkie nieznane produkty (dla batch processing)
     unknown_products = []
-    product_to_item_map = {}  # Mapowanie raw_name -> item_data
-    
-    # Batch load all aliases at once to avoid N+1 query problem
     raw_names = [item["nazwa_raw"] for item in parsed_data["pozycje"]]
-    aliases = (
-        session.query(AliasProduktu)
-        .options(joinedload(AliasProduktu.produkt))
-        .filter(AliasProduktu.nazwa_z_paragonu.in_(raw_names))
-        .all()
-    )
-    alias_map = {a.nazwa_z_paragonu: a for a in aliases}
-    
-    for idx, item_data in enumerate(parsed_data["pozycje"]):
-        raw_name = item_data["nazwa_raw"]
-        
-        # Sprawdź czy produkt jest już w bazie (alias) - O(1) lookup
-        alias = alias_map.get(raw_name)
-        
+    alias_map = write_cache.load_aliases(raw_names)
+
+    for raw_name in raw_names:
         # Jeśli nie ma aliasu i nie ma w regułach statycznych, dodaj do batcha
-        if not alias:
-            from .normalization_rules import find_static_match
+        if raw_name not in alias_map and raw_name not in unknown_products:
             if not find_static_match(raw_name):
                 unknown_products.append(raw_name)
-                product_to_item_map[raw_name] = item_data
-    
+
     # KROK 2: Batch processing dla nieznanych produktów
-    batch_cache = {}
+    batch_cache = normalization_map if normalization_map is not None else {}
+    unknown_products = [name for name in unknown_products if name not in batch_cache]
     if unknown_products:
         _call_log_callback(
             log_callback,
@@ -365,10 +859,12 @@ def save_to_database(
             status="Normalizacja produktów (batch)...",
         )
         from .llm import normalize_products_batch
-        batch_cache = normalize_products_batch(
-            unknown_products,
-            session,
-            log_callback=log_callback
+        batch_cache.update(
+            normalize_products_batch(
+                unknown_products,
+                session,
+                log_callback=log_callback
+            )
         )
         _call_log_callback(
             log_callback,
@@ -376,8 +872,12 @@ def save_to_database(
             progress=87,
             status="Przetwarzam pozycje...",
         )
-    
-    # KROK 3: Przetwarzaj pozycje (używając cache z batch processing)
+
+    # KROK 3: Ustal produkt dla każdej pozycji (aliasy, sugestie, decyzje użytkownika).
+    # Ta sama surowa nazwa jest rozstrzygana raz na paragon - kolejne wystąpienia
+    # zachowują się jak trafienie w świeżo dodany alias.
+    choices = {}
+    pending_review = set()  # Surowe nazwy z tymczasowym mapowaniem (deferred_review)
     for idx, item_data in enumerate(parsed_data["pozycje"]):
         # Aktualizuj postęp dla każdej pozycji (87-95%)
         if total_items > 0:
@@ -390,30 +890,66 @@ def save_to_database(
             )
         # Logika rabatów została przeniesiona do strategies.py (LidlStrategy)
         # Tutaj zakładamy, że dane są już wyczyszczone przez strategy.post_process
-
-        # Użyj batch cache jeśli dostępny, w przeciwnym razie użyj standardowego resolve_product
         raw_name = item_data["nazwa_raw"]
-        if raw_name in batch_cache and batch_cache[raw_name]:
-            # Produkt został znormalizowany przez batch processing
-            # Użyj resolve_product_with_suggestion do zapisu do bazy
-            product_id = resolve_product_with_suggestion(
-                session, raw_name, batch_cache[raw_name], log_callback, prompt_callback
+        if raw_name in choices:
+            continue
+        if deferred_review:
+            choices[raw_name], needs_review = _choose_provisional_product(
+                session,
+                raw_name,
+                alias_map.get(raw_name),
+                batch_cache.get(raw_name),
+                log_callback,
             )
-        else:
-            # Standardowe przetwarzanie (dla produktów z aliasem lub regułami statycznymi)
-            product_id = resolve_product(
-                session, item_data["nazwa_raw"], log_callback, prompt_callback
+            if needs_review:
+                pending_review.add(raw_name)
+            continue
+        choices[raw_name] = _choose_product_name(
+            session,
+            raw_name,
+            alias_map.get(raw_name),
+            batch_cache.get(raw_name),
+            log_callback,
+            prompt_callback,
+        )
+
+    # KROK 4: Produkty i kategorie - jedno zapytanie na tabelę, nowe wiersze w pamięci
+    new_names = {name for name in choices.values() if isinstance(name, str)}
+    metadata_by_name = {name: get_product_metadata(name) for name in new_names}
+    write_cache.load_products(new_names)
+    write_cache.load_categories(m["kategoria"] for m in metadata_by_name.values())
+
+    products = {}
+    for raw_name, choice in choices.items():
+        if choice is None:
+            products[raw_name] = None
+        elif isinstance(choice, str):
+            products[raw_name] = _assign_product(
+                write_cache,
+                raw_name,
+                choice,
+                metadata_by_name[choice],
+                log_callback,
+                provisional=raw_name in pending_review,
             )
+        else:
+            products[raw_name] = choice.produkt
+
+    # KROK 5: Pozycje paragonu i stany magazynowe
+    write_cache.load_stock(p for p in products.values() if p is not None)
+    for item_data in parsed_data["pozycje"]:
+        product = products[item_data["nazwa_raw"]]
+        needs_review = item_data["nazwa_raw"] in pending_review
 
-        # Jeśli resolve_product zwrócił None (np. dla śmieci OCR, PTU, POMIŃ), pomijamy dodawanie
-        if product_id is None:
+        # Jeśli produkt nie został ustalony (np. dla śmieci OCR, PTU, POMIŃ), pomijamy dodawanie
+        if product is None and not needs_review:
             _call_log_callback(
                 log_callback, f"   -> Pominięto pozycję: {item_data['nazwa_raw']}"
             )
             continue
 
         pozycja = PozycjaParagonu(
-            produkt_id=product_id,
+            produkt=product,
             nazwa_z_paragonu_raw=item_data["nazwa_raw"],
             ilosc=item_data["ilosc"],
             jednostka_miary=item_data["jednostka"],
@@ -423,201 +959,223 @@ def save_to_database(
                 item_data["rabat"] if item_data["rabat"] else 0
             ),  # Domyślnie 0 dla bazy
             cena_po_rabacie=item_data["cena_po_rab"],
+            do_weryfikacji=needs_review,
+            data_waznosci=item_data.get("data_waznosci"),
         )
         paragon.pozycje.append(pozycja)
-        session.flush()  # Flush aby mieć pozycja.pozycja_id
 
-        # Dodaj produkt do magazynu (StanMagazynowy)
-        data_waznosci = item_data.get("data_waznosci")
-        # data_waznosci może być już typu date lub None
-
-        # Sprawdź czy już istnieje stan magazynowy dla tego produktu z tą samą datą ważności
-        # (lub bez daty ważności, jeśli data_waznosci jest None)
-        existing_stan = None
-        if data_waznosci:
-            existing_stan = (
-                session.query(StanMagazynowy)
-                .filter_by(produkt_id=product_id, data_waznosci=data_waznosci)
-                .first()
-            )
-        else:
-            # Jeśli brak daty ważności, szukaj wpisu bez daty ważności dla tego produktu
-            existing_stan = (
-                session.query(StanMagazynowy)
-                .filter_by(produkt_id=product_id, data_waznosci=None)
-                .first()
+        if needs_review:
+            # Stan magazynowy powstanie dopiero po weryfikacji produktu
+            provisional = product.znormalizowana_nazwa if product is not None else "brak"
+            _call_log_callback(
+                log_callback,
+                f"   -> Pozycja '{item_data['nazwa_raw']}' czeka na weryfikację (tymczasowo: {provisional})",
             )
+            continue
 
-        if existing_stan:
-            # Jeśli istnieje, zwiększ ilość
-            existing_stan.ilosc += item_data["ilosc"]
-            existing_stan.pozycja_paragonu_id = pozycja.pozycja_id
-            jednostka_str = item_data.get("jednostka") or "szt"
+        # Dodaj produkt do magazynu (StanMagazynowy) - istniejący wpis z tą samą
+        # datą ważności (lub bez daty) jest zwiększany, w przeciwnym razie nowy wpis
+        # data_waznosci może być już typu date lub None
+        data_waznosci = item_data.get("data_waznosci")
+        jednostka_str = item_data.get("jednostka") or "szt"
+        if write_cache.add_to_stock(
+            product,
+            pozycja,
+            item_data["ilosc"],
+            item_data.get("jednostka"),
+            data_waznosci,
+        ):
             _call_log_callback(
                 log_callback,
                 f"   -> Zaktualizowano stan magazynowy: +{item_data['ilosc']} {jednostka_str}",
             )
         else:
-            # Jeśli nie istnieje, utwórz nowy wpis
-            stan = StanMagazynowy(
-                produkt_id=product_id,
-                ilosc=item_data["ilosc"],
-                jednostka_miary=item_data.get("jednostka"),
-                data_waznosci=data_waznosci,
-                pozycja_paragonu_id=pozycja.pozycja_id,
-            )
-            session.add(stan)
-            jednostka_str = item_data.get("jednostka") or "szt"
             _call_log_callback(
                 log_callback,
                 f"   -> Dodano do magazynu: {item_data['ilosc']} {jednostka_str}",
             )
 
     session.add(paragon)
+    write_cache.flush()
     _call_log_callback(
         log_callback,
         f"INFO: Przygotowano do zapisu 1 paragon z {len(paragon.pozycje)} pozycjami.",
         progress=95,
         status="Kończenie zapisu...",
     )
+    if pending_review:
+        _call_log_callback(
+            log_callback,
+            f"INFO: {len(pending_review)} nieznanych produktów trafiło do kolejki weryfikacji.",
+        )
 
 
-def resolve_product_with_suggestion(
-    session: Session, 
-    raw_name: str, 
-    suggested_name: str,
-    log_callback: Callable, 
-    prompt_callback: Callable
-) -> int | None:
+@traced("resolve_product")
+def _choose_product_name(
+    session: Session,
+    raw_name: str,
+    alias: Optional[AliasProduktu],
+    batch_suggestion: Optional[str],
+    log_callback: Callable,
+    prompt_callback: Callable,
+):
     """
-    Rozwiązuje produkt używając wcześniej uzyskanej sugestii (np. z batch processing).
-    Pomija wywołania LLM, ponieważ sugestia jest już dostępna.
-    
-    Args:
-        session: Sesja SQLAlchemy
-        raw_name: Surowa nazwa produktu
-        suggested_name: Wcześniej uzyskana znormalizowana nazwa
-        log_callback: Callback do logowania
-        prompt_callback: Callback do promptowania użytkownika
-    
+    Ustala produkt dla surowej nazwy bez zapisu do bazy.
+
     Returns:
-        ID produktu lub None jeśli pozycja ma być pominięta
+        AliasProduktu (produkt znany z aliasu), znormalizowana nazwa wybrana przez
+        użytkownika lub None, jeśli pozycja ma być pominięta
     """
-    # Obsługa przypadku "POMIŃ"
-    if suggested_name == "POMIŃ":
+    if alias is not None and alias.do_weryfikacji:
+        # Tymczasowe mapowanie z odroczonej weryfikacji - potwierdzenie zatwierdza alias
+        return _confirm_product_name(
+            raw_name,
+            alias.produkt.znormalizowana_nazwa,
+            "tymczasowe mapowanie",
+            log_callback,
+            prompt_callback,
+        )
+
+    if alias is not None:
         _call_log_callback(
-            log_callback, "   -> System zasugerował pominięcie tej pozycji."
+            log_callback,
+            f"   -> Znaleziono alias (DB) dla '{raw_name}': '{alias.produkt.znormalizowana_nazwa}'",
         )
-        return None
-    
-    # Weryfikacja Użytkownika (Prompt)
-    prompt_text = f"Nieznany produkt (Sugerowany przez Batch LLM: {suggested_name or 'Brak'}). Do jakiego produktu go przypisać?"
-    normalized_name = prompt_callback(prompt_text, suggested_name or "", raw_name)
-    
-    # Jeśli użytkownik nie podał nazwy lub podał "POMIŃ", pomijamy pozycję
-    if not normalized_name or normalized_name.strip().upper() == "POMIŃ":
+        return alias
+
+    if batch_suggestion:
+        # Produkt został znormalizowany przez batch processing
+        return _confirm_product_name(
+            raw_name, batch_suggestion, "Batch LLM", log_callback, prompt_callback
+        )
+
+    _call_log_callback(log_callback, f"  ?? Nieznany produkt: '{raw_name}'")
+    suggested_name, source = _suggest_product_name(session, raw_name, log_callback)
+    return _confirm_product_name(
+        raw_name, suggested_name, source, log_callback, prompt_callback
+    )
+
+
+def _choose_provisional_product(
+    session: Session,
+    raw_name: str,
+    alias: Optional[AliasProduktu],
+    batch_suggestion: Optional[str],
+    log_callback: Callable,
+) -> Tuple[object, bool]:
+    """
+    Odpowiednik _choose_product_name dla odroczonej weryfikacji - bez prompt_callback.
+
+    Returns:
+        Krotka (wybór, czy_do_weryfikacji); wybór jak w _choose_product_name,
+        przy czym None z flagą oznacza pozycję bez sugestii (zapisywaną bez produktu)
+    """
+    if alias is not None and not alias.do_weryfikacji:
+        _call_log_callback(
+            log_callback,
+            f"   -> Znaleziono alias (DB) dla '{raw_name}': '{alias.produkt.znormalizowana_nazwa}'",
+        )
+        return alias, False
+
+    if alias is not None:
+        _call_log_callback(
+            log_callback,
+            f"   -> Tymczasowy alias dla '{raw_name}': '{alias.produkt.znormalizowana_nazwa}' (oczekuje na weryfikację)",
+        )
+        return alias, True
+
+    if batch_suggestion:
+        suggested_name = batch_suggestion
+    else:
+        _call_log_callback(log_callback, f"  ?? Nieznany produkt: '{raw_name}'")
+        suggested_name, _ = _suggest_product_name(session, raw_name, log_callback)
+
+    if suggested_name == "POMIŃ":
         _call_log_callback(
-            log_callback, "   -> Pominięto przypisanie produktu dla tej pozycji."
+            log_callback, "   -> System zasugerował pominięcie tej pozycji."
         )
-        return None
-    
-    # Zapis do bazy (identyczna logika jak w resolve_product)
-    product = (
-        session.query(Produkt).filter_by(znormalizowana_nazwa=normalized_name).first()
-    )
-    
-    # Pobierz metadane z bazy wiedzy
-    metadata = get_product_metadata(normalized_name)
+        return None, False
+
+    return suggested_name, True
+
+
+@traced("assign_product")
+def _assign_product(
+    write_cache: ReceiptWriteCache,
+    raw_name: str,
+    normalized_name: str,
+    metadata: dict,
+    log_callback: Callable,
+    provisional: bool = False,
+) -> Produkt:
+    """
+    Pobiera lub tworzy (w pamięci) produkt i kategorię oraz alias dla surowej nazwy.
+
+    provisional=True oznacza nowy alias jako tymczasowy (do_weryfikacji); False
+    zatwierdza alias (także wcześniej tymczasowy).
+    """
     kategoria_nazwa = metadata["kategoria"]
     can_freeze = metadata["can_freeze"]
-    
+
     # Info dla usera
     freeze_info = "❄️ MOŻNA MROZIĆ" if can_freeze else "🚫 NIE MROZIĆ"
     if can_freeze is None:
         freeze_info = ""  # Brak danych
-    
+
     _call_log_callback(
         log_callback, f"   -> Kategoria: {kategoria_nazwa} | {freeze_info}"
     )
-    
-    # Pobierz lub utwórz kategorię w bazie
-    kategoria = (
-        session.query(KategoriaProduktu)
-        .filter_by(nazwa_kategorii=kategoria_nazwa)
-        .first()
-    )
-    if not kategoria:
+
+    kategoria, created = write_cache.get_or_create_category(kategoria_nazwa)
+    if created:
         _call_log_callback(
             log_callback, f"   -> Tworzę nową kategorię: '{kategoria_nazwa}'"
         )
-        kategoria = KategoriaProduktu(nazwa_kategorii=kategoria_nazwa)
-        session.add(kategoria)
-        session.flush()
-    
-    if not product:
+
+    product, created = write_cache.get_or_create_product(normalized_name, kategoria)
+    if created:
         _call_log_callback(
             log_callback, f"   -> Tworzę nowy produkt w bazie: '{normalized_name}'"
         )
-        product = Produkt(
-            znormalizowana_nazwa=normalized_name, kategoria_id=kategoria.kategoria_id
-        )
-        session.add(product)
-        session.flush()
     else:
         _call_log_callback(
             log_callback, f"   -> Znaleziono istniejący produkt: '{normalized_name}'"
         )
         # Opcjonalnie: Aktualizuj kategorię jeśli brakuje (dla starszych wpisów)
-        if product.kategoria_id is None:
-            product.kategoria_id = kategoria.kategoria_id
+        if product.kategoria_id is None and product.kategoria is None:
+            product.kategoria = kategoria
             _call_log_callback(
                 log_callback,
                 f"   -> Zaktualizowano kategorię produktu na: '{kategoria_nazwa}'",
             )
-    
-    # Sprawdź czy alias już istnieje, zanim spróbujesz go dodać (fix UNIQUE constraint)
-    existing_alias = session.query(AliasProduktu).filter_by(nazwa_z_paragonu=raw_name).first()
-    if existing_alias:
-        # Jeśli alias już istnieje, ewentualnie zaktualizuj produkt_id
-        if existing_alias.produkt_id != product.produkt_id:
-            old_prod_id = existing_alias.produkt_id
-            existing_alias.produkt_id = product.produkt_id
-            _call_log_callback(
-                log_callback, f"   -> Zaktualizowano istniejący alias: '{raw_name}' (ID: {old_prod_id} -> {product.produkt_id})"
-            )
-        else:
-             _call_log_callback(
-                log_callback, f"   -> Alias już istnieje: '{raw_name}' -> '{normalized_name}'"
-            )
-    else:
+
+    previous_product = write_cache.set_alias(raw_name, product)
+    write_cache.aliases[raw_name].do_weryfikacji = provisional
+    if previous_product is None:
         _call_log_callback(
             log_callback, f"   -> Tworzę nowy alias: '{raw_name}' -> '{normalized_name}'"
         )
-        new_alias = AliasProduktu(nazwa_z_paragonu=raw_name, produkt_id=product.produkt_id)
-        session.add(new_alias)
-    return product.produkt_id
-
-
-def resolve_product(
-    session: Session, raw_name: str, log_callback: Callable, prompt_callback: Callable
-) -> int | None:
-    # 1. Sprawdź Aliasy w Bazie (Najszybsze i Najpewniejsze)
-    alias = (
-        session.query(AliasProduktu)
-        .options(joinedload(AliasProduktu.produkt))
-        .filter_by(nazwa_z_paragonu=raw_name)
-        .first()
-    )
-    if alias:
+    elif previous_product is not product:
         _call_log_callback(
-            log_callback,
-            f"   -> Znaleziono alias (DB) dla '{raw_name}': '{alias.produkt.znormalizowana_nazwa}'",
+            log_callback, f"   -> Zaktualizowano istniejący alias: '{raw_name}' -> '{normalized_name}'"
+        )
+    else:
+        _call_log_callback(
+            log_callback, f"   -> Alias już istnieje: '{raw_name}' -> '{normalized_name}'"
         )
-        return alias.produkt_id
+    return product
 
-    _call_log_callback(log_callback, f"  ?? Nieznany produkt: '{raw_name}'")
 
-    # 2. Sprawdź Reguły Statyczne (Oszczędność LLM)
+def _suggest_product_name(
+    session: Session, raw_name: str, log_callback: Callable
+) -> Tuple[Optional[str], str]:
+    """
+    Szuka sugestii nazwy w regułach statycznych, a w ostateczności pyta LLM.
+
+    Returns:
+        Krotka (sugerowana nazwa lub None, źródło sugestii)
+    """
+    # Sprawdź Reguły Statyczne (Oszczędność LLM)
     suggested_name = find_static_match(raw_name)
     source = "Reguły Statyczne"
 
@@ -625,49 +1183,63 @@ def resolve_product(
         _call_log_callback(
             log_callback, f"   -> Sugestia (Słownik): '{suggested_name}'"
         )
-    else:
-        # 3. Zapytaj LLM z przykładami uczenia (Ostatnia deska ratunku)
+        return suggested_name, source
+
+    # Zapytaj LLM z przykładami uczenia (Ostatnia deska ratunku)
+    _call_log_callback(
+        log_callback, "   -> Słownik pusty. Pytam LLM z przykładami uczenia..."
+    )
+
+    # Pobierz przykłady uczenia z bazy danych
+    from .llm import get_learning_examples
+
+    learning_examples = get_learning_examples(
+        raw_name, session, max_examples=5, min_similarity=30
+    )
+
+    if learning_examples:
         _call_log_callback(
-            log_callback, "   -> Słownik pusty. Pytam LLM z przykładami uczenia..."
+            log_callback,
+            f"   -> Znaleziono {len(learning_examples)} podobnych przykładów uczenia",
         )
 
-        # Pobierz przykłady uczenia z bazy danych
-        from .llm import get_learning_examples
-
-        learning_examples = get_learning_examples(
-            raw_name, session, max_examples=5, min_similarity=30
+    suggested_name = get_llm_suggestion(
+        raw_name, learning_examples=learning_examples
+    )
+    source = "LLM (z uczeniem)"
+    if suggested_name:
+        _call_log_callback(
+            log_callback, f"   -> Sugestia (LLM): '{suggested_name}'"
+        )
+    else:
+        _call_log_callback(
+            log_callback, "   -> Nie udało się uzyskać sugestii LLM."
         )
+    return suggested_name, source
 
-        if learning_examples:
-            _call_log_callback(
-                log_callback,
-                f"   -> Znaleziono {len(learning_examples)} podobnych przykładów uczenia",
-            )
 
-        suggested_name = get_llm_suggestion(
-            raw_name, learning_examples=learning_examples
-        )
-        source = "LLM (z uczeniem)"
-        if suggested_name:
-            _call_log_callback(
-                log_callback, f"   -> Sugestia (LLM): '{suggested_name}'"
-            )
-        else:
-            _call_log_callback(
-                log_callback, "   -> Nie udało się uzyskać sugestii LLM."
-            )
+def _confirm_product_name(
+    raw_name: str,
+    suggested_name: Optional[str],
+    source: str,
+    log_callback: Callable,
+    prompt_callback: Callable,
+) -> Optional[str]:
+    """
+    Prosi użytkownika o potwierdzenie sugestii.
 
+    Returns:
+        Znormalizowana nazwa lub None, jeśli pozycja ma być pominięta
+    """
     # Obsługa przypadku "POMIŃ" (czy to ze słownika, czy z LLM)
     if suggested_name == "POMIŃ":
         _call_log_callback(
             log_callback, "   -> System zasugerował pominięcie tej pozycji."
         )
-        # Zwracamy None - pozycja zostanie pominięta
         return None
 
-    # 4. Weryfikacja Użytkownika (Prompt)
+    # Weryfikacja Użytkownika (Prompt)
     prompt_text = f"Nieznany produkt (Sugerowany przez {source}: {suggested_name or 'Brak'}). Do jakiego produktu go przypisać?"
-
     normalized_name = prompt_callback(prompt_text, suggested_name or "", raw_name)
 
     # Jeśli użytkownik nie podał nazwy lub podał "POMIŃ", pomijamy pozycję
@@ -676,67 +1248,78 @@ def resolve_product(
             log_callback, "   -> Pominięto przypisanie produktu dla tej pozycji."
         )
         return None
+    return normalized_name
 
-    # ... Dalsza część kodu (Zapis do bazy Produkt/Alias) bez zmian ...
-    product = (
-        session.query(Produkt).filter_by(znormalizowana_nazwa=normalized_name).first()
-    )
 
-    # Pobierz metadane z bazy wiedzy
-    metadata = get_product_metadata(normalized_name)
-    kategoria_nazwa = metadata["kategoria"]
-    can_freeze = metadata["can_freeze"]
+def _store_product_choice(
+    write_cache: ReceiptWriteCache,
+    raw_name: str,
+    choice,
+    log_callback: Callable,
+) -> int | None:
+    """
+    Zapisuje wybór z _choose_product_name / _confirm_product_name tak jak
+    save_to_database (_assign_product) i zwraca ID produktu.
+    """
+    if choice is None:
+        return None
+    if not isinstance(choice, str):
+        return choice.produkt_id
+
+    metadata = get_product_metadata(choice)
+    write_cache.load_products([choice])
+    write_cache.load_categories([metadata["kategoria"]])
+    product = _assign_product(write_cache, raw_name, choice, metadata, log_callback)
+    write_cache.flush()
+    return product.produkt_id
 
-    # Info dla usera
-    freeze_info = "❄️ MOŻNA MROZIĆ" if can_freeze else "🚫 NIE MROZIĆ"
-    if can_freeze is None:
-        freeze_info = ""  # Brak danych
 
-    _call_log_callback(
-        log_callback, f"   -> Kategoria: {kategoria_nazwa} | {freeze_info}"
+def resolve_product_with_suggestion(
+    session: Session, 
+    raw_name: str, 
+    suggested_name: str,
+    log_callback: Callable, 
+    prompt_callback: Callable
+) -> int | None:
+    """
+    Rozwiązuje produkt używając wcześniej uzyskanej sugestii (np. z batch processing).
+    Pomija wywołania LLM, ponieważ sugestia jest już dostępna; istniejący alias
+    jest aktualizowany na potwierdzony produkt.
+    
+    Args:
+        session: Sesja SQLAlchemy
+        raw_name: Surowa nazwa produktu
+        suggested_name: Wcześniej uzyskana znormalizowana nazwa
+        log_callback: Callback do logowania
+        prompt_callback: Callback do promptowania użytkownika
+    
+    Returns:
+        ID produktu lub None jeśli pozycja ma być pominięta
+    """
+    write_cache = ReceiptWriteCache(session)
+    write_cache.load_aliases([raw_name])
+    normalized_name = _confirm_product_name(
+        raw_name, suggested_name, "Batch LLM", log_callback, prompt_callback
     )
+    return _store_product_choice(write_cache, raw_name, normalized_name, log_callback)
 
-    # Pobierz lub utwórz kategorię w bazie
-    kategoria = (
-        session.query(KategoriaProduktu)
-        .filter_by(nazwa_kategorii=kategoria_nazwa)
-        .first()
-    )
-    if not kategoria:
-        _call_log_callback(
-            log_callback, f"   -> Tworzę nową kategorię: '{kategoria_nazwa}'"
-        )
-        kategoria = KategoriaProduktu(nazwa_kategorii=kategoria_nazwa)
-        session.add(kategoria)
-        session.flush()
 
-    if not product:
-        _call_log_callback(
-            log_callback, f"   -> Tworzę nowy produkt w bazie: '{normalized_name}'"
-        )
-        product = Produkt(
-            znormalizowana_nazwa=normalized_name, kategoria_id=kategoria.kategoria_id
-        )
-        session.add(product)
-        session.flush()
-    else:
-        _call_log_callback(
-            log_callback, f"   -> Znaleziono istniejący produkt: '{normalized_name}'"
-        )
-        # Opcjonalnie: Aktualizuj kategorię jeśli brakuje (dla starszych wpisów)
-        if product.kategoria_id is None:
-            product.kategoria_id = kategoria.kategoria_id
-            _call_log_callback(
-                log_callback,
-                f"   -> Zaktualizowano kategorię produktu na: '{kategoria_nazwa}'",
-            )
+def resolve_product(
+    session: Session, raw_name: str, log_callback: Callable, prompt_callback: Callable
+) -> int | None:
+    """
+    Rozwiązuje pojedynczą surową nazwę tą samą ścieżką co save_to_database:
+    alias w bazie, reguły statyczne / LLM, potwierdzenie użytkownika, zapis.
 
-    _call_log_callback(
-        log_callback, f"   -> Tworzę nowy alias: '{raw_name}' -> '{normalized_name}'"
+    Returns:
+        ID produktu lub None jeśli pozycja ma być pominięta
+    """
+    write_cache = ReceiptWriteCache(session)
+    alias = write_cache.load_aliases([raw_name]).get(raw_name)
+    choice = _choose_product_name(
+        session, raw_name, alias, None, log_callback, prompt_callback
     )
-    new_alias = AliasProduktu(nazwa_z_paragonu=raw_name, produkt_id=product.produkt_id)
-    session.add(new_alias)
-    return product.produkt_id
+    return _store_product_choice(write_cache, raw_name, choice, log_callback)
 
 
 # --- WARSTWA INTERFEJSU KONSOLOWEGO (CLI) ---
@@ -802,7 +1385,22 @@ def migrate():
     type=str,
     help="Nazwa modelu LLM (np. llava:latest) do użycia.",
 )
-def process(file_path: str, llm_model: str):
+@click.option(
+    "--on-duplicate",
+    "on_duplicate",
+    default=ON_DUPLICATE_SKIP,
+    type=click.Choice(ON_DUPLICATE_MODES),
+    show_default=True,
+    help="Co zrobić z plikiem, który jest już w bazie: pominąć lub odtworzyć zapisany wynik.",
+)
+@click.option(
+    "--deferred-review/--prompt-review",
+    "deferred_review",
+    default=Config.DEFERRED_PRODUCT_REVIEW,
+    show_default=True,
+    help="Nieznane produkty do kolejki weryfikacji (komenda 'review') zamiast pytań w trakcie.",
+)
+def process(file_path: str, llm_model: str, on_duplicate: str, deferred_review: bool):
     """Przetwarza plik z paragonem, parsuje go i zapisuje do bazy danych."""
     try:
         # Waliduj model przed rozpoczęciem
@@ -811,13 +1409,348 @@ def process(file_path: str, llm_model: str):
         safe_path = sanitize_path(file_path)
         click.secho(f"--- Rozpoczynam przetwarzanie pliku: {safe_path} ---", bold=True)
         run_processing_pipeline(
-            file_path, validated_model, cli_log_callback, cli_prompt_callback
+            file_path,
+            validated_model,
+            cli_log_callback,
+            cli_prompt_callback,
+            on_duplicate=on_duplicate,
+            deferred_review=deferred_review,
         )
     except ValueError as e:
         click.secho(f"BŁĄD WALIDACJI: {e}", fg="red", bold=True)
         raise click.Abort()
 
 
+@cli.command()
+@click.option(
+    "--source",
+    "source",
+    required=True,
+    type=str,
+    help="Folder lub wzorzec glob z paragonami (np. 'paragony/*.pdf').",
+)
+@click.option(
+    "--llm",
+    "llm_model",
+    required=True,
+    type=str,
+    help="Nazwa modelu LLM (np. llava:latest) do użycia.",
+)
+@click.option(
+    "--ocr-workers",
+    "ocr_workers",
+    default=None,
+    type=int,
+    help=f"Liczba procesów OCR (domyślnie: {Config.BATCH_OCR_WORKERS}).",
+)
+@click.option(
+    "--llm-concurrency",
+    "llm_concurrency",
+    default=None,
+    type=int,
+    help=f"Maksymalna liczba równoległych wywołań LLM (domyślnie: {Config.BATCH_LLM_CONCURRENCY}).",
+)
+@click.option(
+    "--deferred-review/--prompt-review",
+    "deferred_review",
+    default=True,
+    show_default=True,
+    help="Nieznane produkty do kolejki weryfikacji (komenda 'review') zamiast pytań w trakcie.",
+)
+@click.option(
+    "--asyncio",
+    "use_asyncio",
+    is_flag=True,
+    help=(
+        "Parsowanie LLM przez asynchroniczny klient Ollama (jedna pula połączeń, "
+        f"max {Config.ASYNC_LLM_MAX_CONCURRENCY} żądań w locie; --llm-concurrency jest ignorowane)."
+    ),
+)
+def process_dir(
+    source: str,
+    llm_model: str,
+    ocr_workers: Optional[int],
+    llm_concurrency: Optional[int],
+    deferred_review: bool,
+    use_asyncio: bool,
+):
+    """Przetwarza wszystkie paragony z folderu lub wzorca glob i zapisuje je do bazy danych."""
+    from .batch_processing import process_directory
+
+    try:
+        validated_model = validate_llm_model(llm_model)
+        click.secho(f"--- Rozpoczynam przetwarzanie wsadowe: {source} ---", bold=True)
+        if use_asyncio:
+            import asyncio
+
+            from .async_pipeline import process_receipts
+
+            result = asyncio.run(
+                process_receipts(
+                    source,
+                    validated_model,
+                    cli_log_callback,
+                    cli_prompt_callback,
+                    ocr_workers=ocr_workers,
+                    deferred_review=deferred_review,
+                )
+            )
+        else:
+            result = process_directory(
+                source,
+                validated_model,
+                cli_log_callback,
+                cli_prompt_callback,
+                ocr_workers=ocr_workers,
+                llm_concurrency=llm_concurrency,
+                deferred_review=deferred_review,
+            )
+    except ValueError as e:
+        click.secho(f"BŁĄD WALIDACJI: {e}", fg="red", bold=True)
+        raise click.Abort()
+
+    click.secho(result.format_summary(), fg="green" if not result.failed else "yellow")
+
+
+@cli.command()
+@click.option(
+    "--trace",
+    "trace_path",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help=f"Plik śladów JSONL (domyślnie: {Config.TRACE_PATH}).",
+)
+@click.option(
+    "--last",
+    "last_traces",
+    default=None,
+    type=int,
+    help="Uwzględnij tylko N ostatnich śladów (paragonów).",
+)
+def stats(trace_path: Optional[str], last_traces: Optional[int]):
+    """Pokazuje czasy etapów (p50/p95/p99), CPU, bajty i tokeny LLM z pliku śladów."""
+    from .tracing import aggregate_spans, format_stats, load_spans
+
+    spans = load_spans(trace_path, last_traces=last_traces)
+    if not spans:
+        click.secho(
+            f"Brak śladów w {trace_path or Config.TRACE_PATH} (TRACE_ENABLED={Config.TRACE_ENABLED}).",
+            fg="yellow",
+        )
+        return
+    traces = len({item["trace_id"] for item in spans})
+    click.secho(f"--- Statystyki etapów: {len(spans)} spanów, {traces} śladów ---", bold=True)
+    click.echo(format_stats(aggregate_spans(spans)))
+
+
+@cli.command()
+@click.option("--list", "list_only", is_flag=True, help="Tylko pokaż niedokończone zadania.")
+@click.option(
+    "--deferred-review/--prompt-review",
+    "deferred_review",
+    default=Config.DEFERRED_PRODUCT_REVIEW,
+    show_default=True,
+    help="Nieznane produkty do kolejki weryfikacji (komenda 'review') zamiast pytań w trakcie.",
+)
+def resume(list_only: bool, deferred_review: bool):
+    """Wznawia niedokończone zadania przetwarzania od ostatniego ukończonego etapu."""
+    store = get_job_store()
+    if store is None:
+        click.secho("Punkty kontrolne zadań są wyłączone (JOB_STORE_ENABLED=false).", fg="yellow")
+        return
+
+    jobs = store.list_jobs()
+    if not jobs:
+        click.secho("Brak niedokończonych zadań.", fg="green")
+        return
+
+    click.secho(f"--- Niedokończone zadania: {len(jobs)} ---", bold=True)
+    for job in jobs:
+        error = f" | błąd: {job['error']}" if job["error"] else ""
+        click.echo(
+            f"{sanitize_path(job['file_path'])} | model: {job['llm_model']} | "
+            f"ostatni etap: {job['last_stage'] or '-'} | próby: {job['attempts']}{error}"
+        )
+    if list_only:
+        return
+
+    for job in jobs:
+        if not os.path.exists(job["file_path"]):
+            click.secho(
+                f"POMINIĘTO: plik nie istnieje: {sanitize_path(job['file_path'])}", fg="yellow"
+            )
+            continue
+        click.secho(f"--- Wznawiam: {sanitize_path(job['file_path'])} ---", bold=True)
+        run_processing_pipeline(
+            job["file_path"],
+            job["llm_model"],
+            cli_log_callback,
+            cli_prompt_callback,
+            deferred_review=deferred_review,
+        )
+
+
+@cli.command()
+@click.option("--list", "list_only", is_flag=True, help="Tylko pokaż kolejkę weryfikacji.")
+@click.option(
+    "--accept-all",
+    "accept_all",
+    is_flag=True,
+    help="Zatwierdź wszystkie tymczasowe mapowania bez pytań (pozycje bez sugestii zostają w kolejce).",
+)
+def review(list_only: bool, accept_all: bool):
+    """Weryfikuje zbiorczo produkty zapisane z tymczasowym mapowaniem."""
+    from .product_review import apply_review_decisions, load_pending_reviews
+
+    pending = load_pending_reviews()
+    if not pending:
+        click.secho("Kolejka weryfikacji jest pusta.", fg="green")
+        return
+
+    click.secho(f"--- Kolejka weryfikacji: {len(pending)} nazw ---", bold=True)
+    for entry in pending:
+        click.echo(
+            f"  {entry['raw_name']} -> {entry['provisional_name'] or '(brak sugestii)'} "
+            f"[{entry['count']} poz., paragony: {', '.join(map(str, entry['paragon_ids']))}]"
+        )
+    if list_only:
+        return
+
+    decisions = {}
+    for entry in pending:
+        if accept_all:
+            if entry["provisional_name"]:
+                decisions[entry["raw_name"]] = entry["provisional_name"]
+            continue
+        decisions[entry["raw_name"]] = click.prompt(
+            f"'{entry['raw_name']}' - do jakiego produktu przypisać? "
+            "(Enter = tymczasowe mapowanie, POMIŃ = usuń pozycje)",
+            default=entry["provisional_name"] or "POMIŃ",
+        )
+
+    stats = apply_review_decisions(decisions, cli_log_callback)
+    if stats is None:
+        raise click.Abort()
+    click.secho(
+        f"Zweryfikowano {stats['confirmed']} pozycji, usunięto {stats['removed']}.",
+        fg="green",
+    )
+
+
+@cli.command()
+@click.option("--list", "list_entries", is_flag=True, help="Pokaż ostatnio używane wpisy.")
+@click.option(
+    "--purge",
+    "purge",
+    is_flag=True,
+    help="Usuń wpisy (wszystkie lub pasujące do --model / --older-than).",
+)
+@click.option("--model", "model", default=None, type=str, help="Filtr modelu dla --purge.")
+@click.option(
+    "--older-than",
+    "older_than",
+    default=None,
+    type=float,
+    help="Filtr dla --purge: wpisy nieużywane od co najmniej N dni.",
+)
+@click.option("--limit", "limit", default=20, type=int, help="Liczba wpisów dla --list.")
+def parse_cache(
+    list_entries: bool,
+    purge: bool,
+    model: Optional[str],
+    older_than: Optional[float],
+    limit: int,
+):
+    """Pokazuje statystyki cache wyników parsowania LLM lub czyści go."""
+    from datetime import datetime
+    from .parse_cache import ParseResultCache
+
+    cache = ParseResultCache()
+
+    if purge:
+        removed = cache.purge(model=model, older_than_days=older_than)
+        click.secho(f"Usunięto {removed} wpisów z cache parsowania.", fg="green")
+
+    stats = cache.get_stats()
+    click.echo(f"Plik cache: {stats['path']}")
+    click.echo(
+        f"Wpisy: {stats['entries']}, rozmiar: {stats['total_bytes'] / 1024:.1f} KB "
+        f"/ {stats['max_bytes'] / 1024 / 1024:.0f} MB, trafienia łącznie: {stats['stored_hits']}"
+    )
+
+    if list_entries:
+        for entry in cache.list_entries(limit):
+            last_access = datetime.fromtimestamp(entry["last_access"]).strftime("%Y-%m-%d %H:%M")
+            image = entry["image_hash"][:12] if entry["image_hash"] else "(tekst)"
+            click.echo(
+                f"  {entry['cache_key'][:12]}  {image:<12}  {entry['model']:<30}  "
+                f"{entry['size_bytes']:>7} B  trafienia: {entry['hits']:<4} {last_access}"
+            )
+
+
+@cli.command()
+@click.option(
+    "--purge",
+    "purge",
+    is_flag=True,
+    help="Usuń wpisy (wszystkie lub pasujące do --engine / --older-than).",
+)
+@click.option("--engine", "engine", default=None, type=str, help="Filtr silnika OCR dla --purge.")
+@click.option(
+    "--older-than",
+    "older_than",
+    default=None,
+    type=float,
+    help="Filtr dla --purge: wpisy nieużywane od co najmniej N dni.",
+)
+def ocr_cache(purge: bool, engine: Optional[str], older_than: Optional[float]):
+    """Pokazuje statystyki cache wyników OCR lub czyści go."""
+    from .ocr_cache import OCRResultCache
+
+    cache = OCRResultCache()
+
+    if purge:
+        removed = cache.purge(engine=engine, older_than_days=older_than)
+        click.secho(f"Usunięto {removed} wpisów z cache OCR.", fg="green")
+
+    stats = cache.get_stats()
+    click.echo(f"Plik cache: {stats['path']}")
+    click.echo(
+        f"Wpisy: {stats['entries']}, rozmiar: {stats['total_bytes'] / 1024:.1f} KB "
+        f"/ {stats['max_bytes'] / 1024 / 1024:.0f} MB, trafienia łącznie: {stats['stored_hits']}"
+    )
+
+
+@cli.command()
+@click.option("--purge", "purge", is_flag=True, help="Usuń wszystkie wpisy.")
+@click.option(
+    "--evict",
+    "evict",
+    is_flag=True,
+    help="Usuń przeterminowane wpisy i najdawniej używane ponad limit rozmiaru.",
+)
+def llm_cache(purge: bool, evict: bool):
+    """Pokazuje statystyki trwałego cache odpowiedzi LLM lub czyści go."""
+    from .llm_cache import PersistentLLMResponseCache
+
+    cache = PersistentLLMResponseCache()
+
+    if purge:
+        cache.clear()
+        click.secho("Wyczyszczono cache odpowiedzi LLM.", fg="green")
+    elif evict:
+        removed = cache.evict()
+        click.secho(f"Usunięto {removed} wpisów z cache odpowiedzi LLM.", fg="green")
+
+    stats = cache.get_stats()
+    click.echo(f"Plik cache: {stats['path']}")
+    click.echo(
+        f"Wpisy: {stats['size']}, rozmiar: {stats['total_bytes'] / 1024:.1f} KB "
+        f"/ {stats['max_bytes'] / 1024 / 1024:.0f} MB, trafienia łącznie: {stats['stored_hits']}, "
+        f"zaoszczędzone: {stats['stored_bytes_saved'] / 1024:.1f} KB"
+    )
+
+
 @cli.command()
 @click.option(
     "--pytanie",
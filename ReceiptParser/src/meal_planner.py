@@ -14,6 +14,11 @@ from sqlalchemy.orm import Session
 from .bielik import BielikAssistant
 from .food_waste_tracker import FoodWasteTracker
 from .database import engine, sessionmaker
+from .token_budget import chat_options
+
+# Oczekiwana długość JSON-a jednego posiłku w planie (num_predict = dni x posiłki x ta wartość)
+MEAL_OUTPUT_TOKENS = 140
+MEALS_PER_DAY = 3
 
 
 class MealPlanner:
@@ -103,7 +108,7 @@ class MealPlanner:
             Słownik z planem posiłków
         """
         from .config_prompts import get_prompt
-        from .llm import client
+        from .llm import interactive_client as client
         from .config import Config
         import json
 
@@ -157,14 +162,21 @@ Uwzględnij:
             if not client:
                 return self._get_empty_plan(start_date)
 
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
             response = client.chat(
                 model=Config.TEXT_MODEL,
                 format="json",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                options={"temperature": 0.7, "num_predict": 3000},
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    len(dates) * MEALS_PER_DAY * MEAL_OUTPUT_TOKENS,
+                    "planu posiłków",
+                    temperature=0.7,
+                ),
             )
 
             result = json.loads(response["message"]["content"])
@@ -4,6 +4,7 @@ Dodaje brakujące kolumny do istniejących tabel.
 """
 import os
 import sqlite3
+import hashlib
 from pathlib import Path
 
 # Ścieżka do bazy danych (taka sama jak w database.py)
@@ -140,6 +141,158 @@ def migrate_add_zmarnowane_produkty_table():
         conn.close()
 
 
+def migrate_add_hash_pliku_column():
+    """
+    Dodaje kolumnę 'hash_pliku' (SHA-256 pliku źródłowego) do tabeli 'paragony'
+    wraz z unikalnym indeksem i uzupełnia ją dla plików, które nadal istnieją na dysku.
+    """
+    if not os.path.exists(db_path):
+        print(f"Baza danych nie istnieje: {db_path}")
+        print("Uruchom najpierw init_db() aby utworzyć bazę danych.")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        # Sprawdź czy kolumna już istnieje
+        cursor.execute("PRAGMA table_info(paragony)")
+        columns = [row[1] for row in cursor.fetchall()]
+        
+        if 'hash_pliku' in columns:
+            print("Kolumna 'hash_pliku' już istnieje w tabeli 'paragony'.")
+        else:
+            # SQLite nie pozwala dodać kolumny UNIQUE przez ALTER TABLE - unikalność zapewnia indeks
+            print("Dodawanie kolumny 'hash_pliku' do tabeli 'paragony'...")
+            cursor.execute("ALTER TABLE paragony ADD COLUMN hash_pliku VARCHAR(64)")
+        
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_paragon_hash ON paragony (hash_pliku)"
+        )
+        
+        # Uzupełnij hashe dla istniejących paragonów (jeśli plik źródłowy nadal istnieje)
+        known_hashes = {
+            row[0] for row in cursor.execute(
+                "SELECT hash_pliku FROM paragony WHERE hash_pliku IS NOT NULL"
+            ).fetchall()
+        }
+        backfilled = 0
+        for paragon_id, plik_zrodlowy in cursor.execute(
+            "SELECT paragon_id, plik_zrodlowy FROM paragony WHERE hash_pliku IS NULL"
+        ).fetchall():
+            if not plik_zrodlowy or not os.path.isfile(plik_zrodlowy):
+                continue
+            # Skrypt może być uruchamiany samodzielnie, więc liczymy hash bez importu z pakietu
+            sha256 = hashlib.sha256()
+            with open(plik_zrodlowy, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            file_hash = sha256.hexdigest()
+            if file_hash in known_hashes:
+                # Duplikat już w bazie - zostawiamy NULL, żeby nie złamać indeksu
+                continue
+            cursor.execute(
+                "UPDATE paragony SET hash_pliku = ? WHERE paragon_id = ?",
+                (file_hash, paragon_id),
+            )
+            known_hashes.add(file_hash)
+            backfilled += 1
+        
+        conn.commit()
+        print(f"✅ Kolumna 'hash_pliku' gotowa (uzupełniono {backfilled} paragonów).")
+        return True
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"❌ Błąd podczas migracji: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def migrate_add_do_weryfikacji_columns():
+    """
+    Dodaje kolumnę 'do_weryfikacji' (odroczona weryfikacja produktów) do tabel
+    'aliasy_produktow' i 'pozycje_paragonu' wraz z indeksem dla kolejki weryfikacji.
+    """
+    if not os.path.exists(db_path):
+        print(f"Baza danych nie istnieje: {db_path}")
+        print("Uruchom najpierw init_db() aby utworzyć bazę danych.")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        for table in ('aliasy_produktow', 'pozycje_paragonu'):
+            # Sprawdź czy kolumna już istnieje
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [row[1] for row in cursor.fetchall()]
+            
+            if 'do_weryfikacji' in columns:
+                print(f"Kolumna 'do_weryfikacji' już istnieje w tabeli '{table}'.")
+                continue
+            
+            print(f"Dodawanie kolumny 'do_weryfikacji' do tabeli '{table}'...")
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                ADD COLUMN do_weryfikacji BOOLEAN NOT NULL DEFAULT 0
+            """)
+        
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pozycja_weryfikacja "
+            "ON pozycje_paragonu (do_weryfikacji)"
+        )
+        
+        conn.commit()
+        print("✅ Kolumny 'do_weryfikacji' są gotowe.")
+        return True
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"❌ Błąd podczas migracji: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def migrate_add_pozycja_data_waznosci_column():
+    """
+    Dodaje kolumnę 'data_waznosci' do tabeli 'pozycje_paragonu' (data ważności
+    pozycji czekających na weryfikację, przenoszona do stanu magazynowego).
+    """
+    if not os.path.exists(db_path):
+        print(f"Baza danych nie istnieje: {db_path}")
+        print("Uruchom najpierw init_db() aby utworzyć bazę danych.")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    
+    try:
+        # Sprawdź czy kolumna już istnieje
+        cursor.execute("PRAGMA table_info(pozycje_paragonu)")
+        columns = [row[1] for row in cursor.fetchall()]
+        
+        if 'data_waznosci' in columns:
+            print("Kolumna 'data_waznosci' już istnieje w tabeli 'pozycje_paragonu'.")
+            return True
+        
+        print("Dodawanie kolumny 'data_waznosci' do tabeli 'pozycje_paragonu'...")
+        cursor.execute("ALTER TABLE pozycje_paragonu ADD COLUMN data_waznosci DATE")
+        
+        conn.commit()
+        print("✅ Kolumna 'data_waznosci' została pomyślnie dodana.")
+        return True
+        
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"❌ Błąd podczas migracji: {e}")
+        return False
+    finally:
+        conn.close()
+
+
 def migrate_all():
     """
     Wykonuje wszystkie migracje.
@@ -152,6 +305,9 @@ def migrate_all():
     success = migrate_add_zamrozone_column() and success
     success = migrate_add_priorytet_konsumpcji_column() and success
     success = migrate_add_zmarnowane_produkty_table() and success
+    success = migrate_add_hash_pliku_column() and success
+    success = migrate_add_do_weryfikacji_columns() and success
+    success = migrate_add_pozycja_data_waznosci_column() and success
     
     print()
     if success:
@@ -3,6 +3,7 @@ from mistralai import Mistral
 from .config import Config
 from .security import validate_file_path, sanitize_path, sanitize_log_message
 from .retry_handler import retry_with_backoff
+from .vision_payload import prepare_vision_payload
 
 
 class MistralOCRClient:
@@ -25,12 +26,22 @@ class MistralOCRClient:
     )
     def _upload_file(self, image_path: str):
         """Pomocnicza metoda do uploadu pliku z retry."""
-        # Użyj context managera aby zapewnić zamknięcie pliku
-        with open(image_path, "rb") as f:
-            file_content = f.read()
+        file_name = os.path.basename(image_path)
+        if image_path.lower().endswith(".pdf"):
+            # Użyj context managera aby zapewnić zamknięcie pliku
+            with open(image_path, "rb") as f:
+                file_content = f.read()
+        else:
+            # Obraz zmniejszony do rozdzielczości i budżetu bajtów Mistral OCR
+            file_content = prepare_vision_payload(image_path, "mistral-ocr")
+            if isinstance(file_content, str):
+                with open(file_content, "rb") as f:
+                    file_content = f.read()
+            if file_content[:3] == b"\xff\xd8\xff":
+                file_name = os.path.splitext(file_name)[0] + ".jpg"
         return self.client.files.upload(
             file={
-                "file_name": os.path.basename(image_path),
+                "file_name": file_name,
                 "content": file_content,
             },
             purpose="ocr",
@@ -20,6 +20,10 @@ from typing import Tuple, Optional, Dict, List
 from rapidfuzz import fuzz
 
 from .config import Config
+from .token_budget import chat_options
+
+# Oczekiwana długość odpowiedzi LLM: jedna krótka nazwa produktu (num_predict)
+LLM_NAME_OUTPUT_TOKENS = 64
 
 logger = logging.getLogger(__name__)
 
@@ -509,19 +513,32 @@ Znormalizowana nazwa:"""
                 response = self.llm_client.generate(prompt)
             elif hasattr(self.llm_client, 'chat'):
                 # Try chat interface
+                messages = [{'role': 'user', 'content': prompt}]
                 response = self.llm_client.chat(
                     model=Config.TEXT_MODEL,
-                    messages=[{'role': 'user', 'content': prompt}]
+                    messages=messages,
+                    options=chat_options(
+                        Config.TEXT_MODEL, messages, LLM_NAME_OUTPUT_TOKENS, "normalizacji nazwy"
+                    ),
                 )
                 if isinstance(response, dict):
                     response = response.get('message', {}).get('content', '')
             else:
                 # Try ollama client interface
                 import ollama
-                response_obj = ollama.generate(
-                    model=Config.TEXT_MODEL,
-                    prompt=prompt
+                from .llm_scheduler import Priority, get_scheduler
+
+                messages = [{'role': 'user', 'content': prompt}]
+                # chat_options skraca prompt w miejscu - wysyłamy tekst po skróceniu
+                options = chat_options(
+                    Config.TEXT_MODEL, messages, LLM_NAME_OUTPUT_TOKENS, "normalizacji nazwy"
                 )
+                with get_scheduler().slot(Config.TEXT_MODEL, Priority.BATCH):
+                    response_obj = ollama.generate(
+                        model=Config.TEXT_MODEL,
+                        prompt=messages[0]['content'],
+                        options=options,
+                    )
                 response = response_obj.get('response', '')
             
             if response:
@@ -16,9 +16,14 @@ from datetime import date, datetime
 from sqlalchemy.orm import Session
 
 from .database import Produkt, StanMagazynowy, PozycjaParagonu
-from .llm import client, TIMEOUT_ANALYSIS
+from .llm import interactive_client as client, TIMEOUT_ANALYSIS
 from .prompt_templates import PromptTemplates
 from .config import Config
+from .token_budget import chat_options
+
+# Expected LLM answer lengths in tokens (num_predict, see token_budget)
+COMBINATIONS_OUTPUT_TOKENS = 1000
+RECOMMENDATIONS_OUTPUT_TOKENS = 500
 
 logger = logging.getLogger(__name__)
 
@@ -282,14 +287,17 @@ class NutritionAnalyzer:
                 logger.error("Ollama client not available")
                 return []
             
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.7,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    COMBINATIONS_OUTPUT_TOKENS,
+                    "zestawów posiłków",
+                    temperature=0.7,
+                ),
             )
             
             if not response or 'message' not in response:
@@ -442,14 +450,17 @@ Zwróć odpowiedź jako listę JSON stringów, np. ["rekomendacja 1", "rekomenda
 """
         
         try:
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.7,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    RECOMMENDATIONS_OUTPUT_TOKENS,
+                    "rekomendacji żywieniowych",
+                    temperature=0.7,
+                ),
             )
             
             if not response or 'message' not in response:
@@ -1,92 +1,153 @@
+import contextvars
+import multiprocessing
 import os
+import queue
+import shutil
 import tempfile
-from pdf2image import convert_from_path
-from typing import Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pdf2image import convert_from_path, pdfinfo_from_path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from PIL import Image
+from rapidfuzz import fuzz
+from .layout import Word, layout_text, make_word, words_from_tesseract_data
+from .ocr_cache import get_ocr_cache
+from .preprocessing import PreprocessOptions, preprocessed_image
+from .receipt_image import load_receipt_image
 from .security import create_secure_temp_file, validate_file_path
+from .tracing import file_size, span
 
 
-def convert_pdf_to_image(pdf_path: str) -> Optional[str]:
-    """
-    Konwertuje WSZYSTKIE strony pliku PDF i skleja je w jeden długi obraz (JPEG).
-    Używa bezpiecznych plików tymczasowych z odpowiednimi uprawnieniami.
-    """
-    temp_file_path = None
-    try:
-        # Waliduj ścieżkę PDF
-        pdf_path_validated = validate_file_path(
+# Max wymiar obrazu po sklejeniu stron
+MAX_MERGED_IMAGE_SIZE = 20000
+
+
+def _validate_pdf_path(pdf_path: str) -> str:
+    return str(
+        validate_file_path(
             pdf_path,
             allowed_extensions=[".pdf"],
             max_size=100 * 1024 * 1024,  # 100 MB dla PDF
         )
+    )
 
-        # Pobieramy wszystkie strony (usuwamy first_page/last_page)
-        images = convert_from_path(str(pdf_path_validated))
 
-        if not images:
-            print(f"BŁĄD: Nie udało się skonwertować PDF: {pdf_path}")
-            return None
+def pdf_page_count(pdf_path: str) -> int:
+    """Liczba stron PDF (pdfinfo, bez renderowania)."""
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
 
-        # Jeśli jest jedna strona, zapisujemy jak dawniej
-        if len(images) == 1:
-            fd, temp_file_path = create_secure_temp_file(suffix=".jpg")
-            try:
-                # Użyj deskryptora bezpośrednio lub zamknij i użyj ścieżki
-                os.close(fd)  # Zamknij deskryptor, będziemy używać ścieżki
-                images[0].save(temp_file_path, "JPEG")
-                return temp_file_path
-            except Exception:
-                if temp_file_path and os.path.exists(temp_file_path):
-                    try:
-                        os.unlink(temp_file_path)
-                    except Exception:
-                        pass
-                raise
 
-        # Jeśli jest więcej stron, sklejamy je w pionie
-        print(f"INFO: PDF ma {len(images)} stron. Sklejam w jeden obraz...")
+def iter_pdf_pages(
+    pdf_path: str,
+    output_dir: str,
+    dpi: Optional[int] = None,
+    thread_count: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Renderuje strony PDF leniwie, po `thread_count` stron naraz, prosto do plików
+    JPEG w output_dir (pdftoppm zapisuje je bez ładowania do pamięci jako obrazy PIL).
+
+    Args:
+        pdf_path: Zwalidowana ścieżka do PDF
+        output_dir: Katalog na pliki stron (sprząta wywołujący)
+        dpi: Rozdzielczość renderowania (domyślnie Config.PDF_DPI)
+        thread_count: Liczba stron renderowanych równolegle (domyślnie Config.PDF_THREAD_COUNT)
+
+    Yields:
+        Ścieżki plików kolejnych stron
+    """
+    dpi = dpi or Config.PDF_DPI
+    chunk = max(1, thread_count or Config.PDF_THREAD_COUNT)
+    page_count = pdf_page_count(pdf_path)
+    for first_page in range(1, page_count + 1, chunk):
+        last_page = min(first_page + chunk - 1, page_count)
+        yield from convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            thread_count=last_page - first_page + 1,
+            output_folder=output_dir,
+            output_file=f"page{first_page:04d}_",
+            fmt="jpeg",
+            paths_only=True,
+        )
+
+
+def merge_page_images(page_paths: List[str]) -> str:
+    """
+    Skleja pliki stron w pionie w jeden obraz JPEG (bezpieczny plik tymczasowy).
+
+    Strony są otwierane pojedynczo, więc w pamięci jest tylko obraz wynikowy
+    i jedna strona. Jedna strona jest kopiowana bez ponownego kodowania.
 
-        total_width = max(img.width for img in images)
-        total_height = sum(img.height for img in images)
+    Raises:
+        ValueError: Wynikowy obraz przekracza MAX_MERGED_IMAGE_SIZE
+    """
+    fd, temp_file_path = create_secure_temp_file(suffix=".jpg")
+    os.close(fd)  # Zamknij deskryptor, będziemy używać ścieżki
+    try:
+        if len(page_paths) == 1:
+            shutil.copyfile(page_paths[0], temp_file_path)
+            return temp_file_path
 
-        # Sprawdź czy wynikowy obraz nie jest za duży
-        MAX_MERGED_IMAGE_SIZE = 20000  # Max wymiar
+        print(f"INFO: PDF ma {len(page_paths)} stron. Sklejam w jeden obraz...")
+        sizes = []
+        for page_path in page_paths:
+            # Image.open czyta tylko nagłówek - rozmiar bez dekodowania strony
+            with Image.open(page_path) as page:
+                sizes.append(page.size)
+        total_width = max(width for width, _ in sizes)
+        total_height = sum(height for _, height in sizes)
         if total_width > MAX_MERGED_IMAGE_SIZE or total_height > MAX_MERGED_IMAGE_SIZE:
             raise ValueError(
                 f"Wynikowy obraz po sklejeniu jest za duży: {total_width}x{total_height} "
                 f"(max {MAX_MERGED_IMAGE_SIZE}x{MAX_MERGED_IMAGE_SIZE})"
             )
 
-        # Tworzymy pusty, długi obraz
         merged_image = Image.new("RGB", (total_width, total_height), (255, 255, 255))
-
         y_offset = 0
-        for img in images:
-            # Jeśli strony mają różną szerokość, centrujemy lub wyrównujemy do lewej (tu: lewa)
-            merged_image.paste(img, (0, y_offset))
-            y_offset += img.height
+        for page_path, (_, height) in zip(page_paths, sizes):
+            # Strony o różnej szerokości wyrównujemy do lewej
+            with Image.open(page_path) as page:
+                merged_image.paste(page, (0, y_offset))
+            y_offset += height
+        merged_image.save(temp_file_path, "JPEG")
+        return temp_file_path
+    except Exception:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+        raise
 
-        fd, temp_file_path = create_secure_temp_file(suffix=".jpg")
-        try:
-            # Użyj deskryptora bezpośrednio lub zamknij i użyj ścieżki
-            os.close(fd)  # Zamknij deskryptor, będziemy używać ścieżki
-            merged_image.save(temp_file_path, "JPEG")
-            return temp_file_path
-        except Exception:
-            if temp_file_path and os.path.exists(temp_file_path):
-                try:
-                    os.unlink(temp_file_path)
-                except Exception:
-                    pass
-            raise
 
+def convert_pdf_to_image(pdf_path: str) -> Optional[str]:
+    """
+    Konwertuje WSZYSTKIE strony pliku PDF i skleja je w jeden długi obraz (JPEG).
+    Strony są renderowane strumieniowo do plików (iter_pdf_pages), a nie
+    trzymane wszystkie naraz w pamięci. Używa bezpiecznych plików tymczasowych.
+
+    Obraz sklejony jest potrzebny tylko modelowi wizyjnemu (jedno wejście);
+    sam OCR PDF-a robi extract_text_from_pdf bez sklejania.
+    """
+    with span("pdf") as pdf_span:
+        pdf_span.add_bytes(bytes_in=file_size(pdf_path))
+        image_path = _convert_pdf_pages(pdf_path)
+        pdf_span.add_bytes(bytes_out=file_size(image_path))
+        return image_path
+
+
+def _convert_pdf_pages(pdf_path: str) -> Optional[str]:
+    try:
+        pdf_path_validated = _validate_pdf_path(pdf_path)
+        with tempfile.TemporaryDirectory(prefix="paragon_pdf_") as pages_dir:
+            page_paths = list(iter_pdf_pages(pdf_path_validated, pages_dir))
+            if not page_paths:
+                print(f"BŁĄD: Nie udało się skonwertować PDF: {pdf_path}")
+                return None
+            return merge_page_images(page_paths)
     except Exception as e:
-        # Cleanup w przypadku błędu
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except Exception:
-                pass
         print(f"BŁĄD Krytyczny podczas konwersji PDF na obraz: {e}")
         return None
 
@@ -96,72 +157,772 @@ from PIL import Image
 from .config import Config
 
 
-def extract_text_from_image_gpu(image_path: str) -> str:
+# --- Rejestr silników OCR ---
+# Każdy silnik jest ładowany leniwie raz na proces i trzymany w ograniczonej puli
+# ciepłych instancji (EasyOCR ładuje wagi modeli detekcji i rozpoznawania przez
+# kilka sekund i zajmuje setki MB, więc nie może powstawać przy każdym wywołaniu).
+
+
+def _process_rss_bytes() -> int:
+    """Bieżące zużycie pamięci (RSS) procesu w bajtach; 0, gdy nieznane."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+class OCREngine:
     """
-    Wyciąga tekst z obrazu za pomocą EasyOCR (z obsługą GPU).
+    Bazowa klasa silnika OCR.
+
+    load() wykonuje jednorazową, kosztowną inicjalizację (modele, sprawdzenie
+    binarki), read_text() rozpoznaje tekst z obrazu. Jedna instancja jest
+    używana przez jeden wątek naraz (pilnuje tego OCREnginePool).
     """
-    try:
-        import easyocr
-        import torch
 
-        # Waliduj ścieżkę i obraz przed przetwarzaniem
-        from .security import validate_image
+    name = ""
+    languages = ""
 
-        validate_image(image_path)
+    @classmethod
+    def cache_params(cls) -> Dict[str, Any]:
+        """Ustawienia silnika wpływające na wynik (część klucza cache OCR)."""
+        return {"languages": cls.languages}
+
+    def load(self) -> None:
+        pass
+
+    def read_text(self, image_path: str) -> str:
+        raise NotImplementedError
+
+    def read_words(self, image_path: str) -> List[Word]:
+        """Rozpoznaje słowa z ramkami (src.layout); silnik bez ramek zgłasza NotImplementedError."""
+        raise NotImplementedError
+
+    def read_header(self, img) -> str:
+        """Rozpoznaje pas nagłówka (obraz PIL); domyślnie przez plik tymczasowy i read_text."""
+        fd, temp_path = create_secure_temp_file(suffix=".png")
+        os.close(fd)
+        try:
+            img.save(temp_path, "PNG")
+            return self.read_text(temp_path)
+        finally:
+            os.unlink(temp_path)
+
+
+# Znaki dopuszczone przy OCR nagłówka (nazwa sklepu, adres, NIP)
+HEADER_CHARSET = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+    "ĄĆĘŁŃÓŚŹŻąćęłńóśźż0123456789.,-:/&"
+)
+
+
+class TesseractEngine(OCREngine):
+    """Tesseract (CPU) przez pytesseract."""
+
+    name = "tesseract"
+    languages = "pol+eng"
+
+    @classmethod
+    def cache_params(cls) -> Dict[str, Any]:
+        # Podział na pasy zmienia tekst wysokich paragonów (sklejanie zakładek)
+        return {
+            "languages": cls.languages,
+            "strips": [
+                Config.OCR_STRIP_PARALLEL,
+                Config.OCR_STRIP_MIN_HEIGHT,
+                Config.OCR_STRIP_HEIGHT,
+                Config.OCR_STRIP_OVERLAP,
+            ],
+        }
+
+    def load(self) -> None:
+        # Weryfikuje dostępność binarki tesseract raz, zamiast przy każdym paragonie
+        self.version = pytesseract.get_tesseract_version()
+
+    def read_text(self, image_path: str) -> str:
+        image = load_receipt_image(image_path)
+        if _use_strip_ocr(image):
+            return _ocr_image_in_strips(image.image)
+        # Plik trafia do tesseract bezpośrednio (bez dekodowania i ponownego zapisu w Pythonie)
+        # Język polski + angielski
+        return pytesseract.image_to_string(image_path, lang="pol+eng")
+
+    def read_words(self, image_path: str) -> List[Word]:
+        image = load_receipt_image(image_path)
+        if _use_strip_ocr(image):
+            return _ocr_words_in_strips(image.image)
+        return _tesseract_image_to_words(image_path)
+
+    def read_header(self, img) -> str:
+        # Jeden blok tekstu, tylko znaki spotykane w nazwie i adresie sklepu
+        return pytesseract.image_to_string(
+            img, lang="pol+eng", config=f"--psm 6 -c tessedit_char_whitelist={HEADER_CHARSET}"
+        )
+
+
+# --- Tesseract w pasach (wysokie paragony) ---
+# Tesseract rozpoznaje cały obraz na jednym rdzeniu. Wysoki paragon jest dzielony
+# na poziome pasy (cięcia w pustych wierszach z profilu jasności wierszy), pasy są
+# rozpoznawane równolegle, a linie zdublowane na zakładkach pasów są usuwane.
+# pytesseract uruchamia osobny proces tesseract dla każdego pasa, więc wystarczy
+# pula wątków (bez kopiowania pasów do procesów potomnych).
+
+# Wiersz jest "pusty", jeśli ciemnych pikseli jest mniej niż ten ułamek szerokości
+STRIP_BLANK_ROW_INK = 0.002
+# Ile ostatnich/pierwszych linii sąsiednich pasów porównywać przy usuwaniu duplikatów
+STRIP_MAX_OVERLAP_LINES = 3
+STRIP_DUPLICATE_RATIO = 85
+
+
+def _use_strip_ocr(img) -> bool:
+    height = getattr(img, "height", None)
+    return (
+        Config.OCR_STRIP_PARALLEL
+        and isinstance(height, int)
+        and height >= Config.OCR_STRIP_MIN_HEIGHT
+        # W workerze puli procesów (process-dir) równoległość zapewniają już paragony
+        and multiprocessing.parent_process() is None
+    )
+
+
+def find_strip_bounds(gray, strip_height: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Wyznacza poziome pasy (y_start, y_end) obrazu w skali szarości.
+
+    Cięcie jest szukane w pustym wierszu najbliższym docelowej wysokości pasa
+    (w oknie +/- 1/4 pasa); gdy takiego nie ma, tnie na docelowej wysokości.
+    Każdy pas jest rozszerzony o `overlap` pikseli w górę i w dół.
+
+    Args:
+        gray: Tablica NumPy (wysokość x szerokość) w skali szarości
+        strip_height: Docelowa wysokość pasa w pikselach
+        overlap: Zakładka między pasami w pikselach
+    """
+    import numpy as np
+
+    height, width = gray.shape
+    ink_per_row = (gray < 160).sum(axis=1)
+    blank_rows = np.flatnonzero(ink_per_row <= max(1, int(width * STRIP_BLANK_ROW_INK)))
+
+    cuts = [0]
+    window = max(1, strip_height // 4)
+    while height - cuts[-1] > strip_height + window:
+        target = cuts[-1] + strip_height
+        candidates = blank_rows[(blank_rows >= target - window) & (blank_rows <= target + window)]
+        cut = int(candidates[np.abs(candidates - target).argmin()]) if candidates.size else target
+        cuts.append(cut)
+    cuts.append(height)
+
+    return [
+        (max(0, start - overlap), min(height, end + overlap))
+        for start, end in zip(cuts[:-1], cuts[1:])
+    ]
+
+
+def merge_strip_texts(texts: List[str]) -> str:
+    """Skleja tekst pasów, usuwając linie powtórzone na zakładce sąsiednich pasów."""
+    merged: List[str] = []
+    for text in texts:
+        lines = [line for line in text.splitlines() if line.strip()]
+        max_overlap = min(STRIP_MAX_OVERLAP_LINES, len(merged), len(lines))
+        for count in range(max_overlap, 0, -1):
+            if all(
+                fuzz.ratio(merged[-count + i].strip(), lines[i].strip()) >= STRIP_DUPLICATE_RATIO
+                for i in range(count)
+            ):
+                lines = lines[count:]
+                break
+        merged.extend(lines)
+    return "\n".join(merged)
+
+
+def _tesseract_image_to_string(img) -> str:
+    return pytesseract.image_to_string(img, lang="pol+eng")
+
+
+def _ocr_image_in_strips(img, recognize: Callable[[Any], str] = _tesseract_image_to_string) -> str:
+    import numpy as np
+
+    gray = img.convert("L")
+    bounds = find_strip_bounds(
+        np.asarray(gray), Config.OCR_STRIP_HEIGHT, Config.OCR_STRIP_OVERLAP
+    )
+    if len(bounds) == 1:
+        return recognize(img)
+
+    strips = [gray.crop((0, top, gray.width, bottom)) for top, bottom in bounds]
+    workers = max(1, min(Config.OCR_STRIP_WORKERS, len(strips)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        texts = list(executor.map(recognize, strips))
+    return merge_strip_texts(texts)
+
+
+def _tesseract_image_to_words(img) -> List[Word]:
+    data = pytesseract.image_to_data(img, lang="pol+eng", output_type=pytesseract.Output.DICT)
+    return words_from_tesseract_data(data)
+
+
+def _ocr_words_in_strips(
+    img, recognize_words: Callable[[Any], List[Word]] = _tesseract_image_to_words
+) -> List[Word]:
+    """
+    Słowa z ramkami rozpoznawane w pasach, w układzie współrzędnych całego obrazu.
+
+    Z zakładki sąsiednich pasów każde słowo jest brane tylko z jednego pasa
+    (granica w połowie zakładki, wg środka ramki), więc nie trzeba porównywać tekstu.
+    """
+    import numpy as np
+
+    gray = img.convert("L")
+    bounds = find_strip_bounds(
+        np.asarray(gray), Config.OCR_STRIP_HEIGHT, Config.OCR_STRIP_OVERLAP
+    )
+    if len(bounds) == 1:
+        return recognize_words(img)
+
+    strips = [gray.crop((0, top, gray.width, bottom)) for top, bottom in bounds]
+    workers = max(1, min(Config.OCR_STRIP_WORKERS, len(strips)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        strip_words = list(executor.map(recognize_words, strips))
+
+    limits = [0] + [
+        (next_top + bottom) / 2 for (_, bottom), (next_top, _) in zip(bounds, bounds[1:])
+    ] + [gray.height]
+    words: List[Word] = []
+    for index, ((top, _), found) in enumerate(zip(bounds, strip_words)):
+        for word in found:
+            left, word_top, right, word_bottom = word["box"]
+            center = top + (word_top + word_bottom) / 2
+            if limits[index] <= center < limits[index + 1]:
+                words.append(dict(word, box=[left, word_top + top, right, word_bottom + top]))
+    return words
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Tesseract w procesie (tesserocr) zamiast procesu tesseract na każde wywołanie.
+
+    Uchwyty PyTessBaseAPI (z załadowanym modelem języka) żyją tyle co instancja
+    silnika w puli, a obraz trafia do nich jako bufor pikseli w pamięci (bez
+    plików tymczasowych). Ustawienia rozpoznawania są takie jak w pytesseract
+    (pol+eng, automatyczna segmentacja strony), więc tekst jest ten sam.
+    Wysokie paragony są dzielone na pasy jak w TesseractEngine; każdy równoległy
+    pas dostaje własny uchwyt (uchwyt nie jest bezpieczny wątkowo).
+    """
+
+    name = "tesserocr"
+    languages = TesseractEngine.languages
+    cache_params = TesseractEngine.cache_params
+
+    def load(self) -> None:
+        self._apis: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._apis.put(self._create_api())
+
+    def _create_api(self):
+        import tesserocr
+
+        return tesserocr.PyTessBaseAPI(lang=self.languages)
+
+    def _take_api(self):
+        try:
+            return self._apis.get_nowait()
+        except queue.Empty:
+            return self._create_api()
+
+    @staticmethod
+    def _set_image(api, img) -> None:
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("RGB")
+        bytes_per_pixel = 1 if img.mode == "L" else 3
+        api.SetImageBytes(
+            img.tobytes(), img.width, img.height, bytes_per_pixel, img.width * bytes_per_pixel
+        )
+
+    def _recognize(self, img) -> str:
+        api = self._take_api()
+        try:
+            self._set_image(api, img)
+            return api.GetUTF8Text()
+        finally:
+            self._apis.put(api)
+
+    def _recognize_words(self, img) -> List[Word]:
+        import tesserocr
+
+        level = tesserocr.RIL.WORD
+        api = self._take_api()
+        try:
+            self._set_image(api, img)
+            api.Recognize()
+            iterator = api.GetIterator()
+            words = []
+            if iterator is None:
+                return words
+            for item in tesserocr.iterate_level(iterator, level):
+                text = (item.GetUTF8Text(level) or "").strip()
+                box = item.BoundingBox(level)
+                if text and box:
+                    words.append(make_word(text, *box, conf=item.Confidence(level)))
+            return words
+        finally:
+            self._apis.put(api)
+
+    def read_header(self, img) -> str:
+        import tesserocr
+
+        api = self._take_api()
+        try:
+            api.SetPageSegMode(tesserocr.PSM.SINGLE_BLOCK)
+            api.SetVariable("tessedit_char_whitelist", HEADER_CHARSET)
+            self._set_image(api, img)
+            return api.GetUTF8Text()
+        finally:
+            # Przywróć ustawienia pełnego OCR przed oddaniem uchwytu
+            api.SetVariable("tessedit_char_whitelist", "")
+            api.SetPageSegMode(tesserocr.PSM.AUTO)
+            self._apis.put(api)
+
+    def read_text(self, image_path: str) -> str:
+        img = load_receipt_image(image_path).image
+        if _use_strip_ocr(img):
+            return _ocr_image_in_strips(img, self._recognize)
+        return self._recognize(img)
+
+    def read_words(self, image_path: str) -> List[Word]:
+        img = load_receipt_image(image_path).image
+        if _use_strip_ocr(img):
+            return _ocr_words_in_strips(img, self._recognize_words)
+        return self._recognize_words(img)
+
+
+class EasyOCREngine(OCREngine):
+    """EasyOCR (GPU, jeśli dostępne, w przeciwnym razie CPU)."""
+
+    name = "easyocr"
+    languages = "pl+en"
+
+    def load(self) -> None:
+        import easyocr
+        import torch
 
         use_gpu = Config.USE_GPU_OCR and torch.cuda.is_available()
         if Config.USE_GPU_OCR and not torch.cuda.is_available():
             print(
                 "OSTRZEŻENIE: GPU nie jest dostępne, mimo że USE_GPU_OCR=True. Używam CPU dla EasyOCR."
             )
+        print(f"INFO: Ładuję modele EasyOCR (GPU={use_gpu})...")
+        self.reader = easyocr.Reader(["pl", "en"], gpu=use_gpu, verbose=False)
+
+    @staticmethod
+    def _pixels(image_path: str):
+        # EasyOCR przyjmuje tablicę w kolejności BGR (OpenCV) - bez ponownego czytania pliku
+        return load_receipt_image(image_path).pixels("RGB")[:, :, ::-1]
 
-        print(f"INFO: Uruchamiam EasyOCR (GPU={use_gpu})...")
-        reader = easyocr.Reader(["pl", "en"], gpu=use_gpu, verbose=False)
-        result = reader.readtext(image_path, detail=0, paragraph=True)
+    def read_text(self, image_path: str) -> str:
+        result = self.reader.readtext(self._pixels(image_path), detail=0, paragraph=True)
         return "\n".join(result)
-    except Exception as e:
-        print(f"BŁĄD: Nie udało się wyciągnąć tekstu z obrazu za pomocą EasyOCR: {e}")
-        return ""
 
+    def read_words(self, image_path: str) -> List[Word]:
+        words = []
+        for points, text, conf in self.reader.readtext(
+            self._pixels(image_path), detail=1, paragraph=False
+        ):
+            xs = [point[0] for point in points]
+            ys = [point[1] for point in points]
+            words.append(make_word(text, min(xs), min(ys), max(xs), max(ys), conf * 100))
+        return words
 
-def extract_text_from_image_tesseract(image_path: str) -> str:
+    def read_header(self, img) -> str:
+        import numpy as np
+
+        result = self.reader.readtext(
+            np.asarray(img), detail=0, paragraph=True, allowlist=HEADER_CHARSET
+        )
+        return "\n".join(result)
+
+
+class OCREnginePool:
     """
-    Wyciąga surowy tekst z obrazu za pomocą Tesseract OCR (CPU).
+    Ograniczona pula ciepłych instancji jednego silnika OCR.
+
+    Instancje są tworzone leniwie (najwyżej max_size); wątek, który nie dostał
+    wolnej instancji, czeka na zwolnienie. Pula zlicza czas ładowania i przyrost
+    pamięci procesu podczas ładowania każdej instancji.
     """
+
+    def __init__(self, name: str, factory: Callable[[], OCREngine], max_size: int) -> None:
+        self.name = name
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self._idle: List[OCREngine] = []
+        self._created = 0
+        self._in_use = 0
+        self._calls = 0
+        self._load_seconds = 0.0
+        self._memory_bytes = 0
+        self._condition = threading.Condition()
+
+    def _create(self) -> OCREngine:
+        rss_before = _process_rss_bytes()
+        start = time.perf_counter()
+        engine = self.factory()
+        engine.load()
+        elapsed = time.perf_counter() - start
+        memory = max(0, _process_rss_bytes() - rss_before)
+        with self._condition:
+            self._load_seconds += elapsed
+            self._memory_bytes += memory
+        print(
+            f"INFO: Silnik OCR '{self.name}' załadowany w {elapsed:.2f} s "
+            f"(+{memory / (1024 * 1024):.0f} MB)."
+        )
+        return engine
+
+    @contextmanager
+    def acquire(self) -> Iterator[OCREngine]:
+        """Wypożycza instancję silnika na czas bloku with."""
+        with self._condition:
+            while not self._idle and self._created >= self.max_size:
+                self._condition.wait()
+            engine = self._idle.pop() if self._idle else None
+            if engine is None:
+                self._created += 1
+            self._in_use += 1
+        if engine is None:
+            try:
+                engine = self._create()
+            except BaseException:
+                with self._condition:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._condition.notify()
+                raise
+        try:
+            yield engine
+        finally:
+            with self._condition:
+                self._idle.append(engine)
+                self._in_use -= 1
+                self._calls += 1
+                self._condition.notify()
+
+    def read_text(self, image_path: str) -> str:
+        with self.acquire() as engine:
+            return engine.read_text(image_path)
+
+    def read_words(self, image_path: str) -> List[Word]:
+        with self.acquire() as engine:
+            return engine.read_words(image_path)
+
+    def read_header(self, img) -> str:
+        with self.acquire() as engine:
+            return engine.read_header(img)
+
+    def warm_up(self) -> None:
+        """Ładuje pierwszą instancję, jeśli pula jest pusta."""
+        if self._created == 0:
+            with self.acquire():
+                pass
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "instances": self._created,
+                "in_use": self._in_use,
+                "calls": self._calls,
+                "load_s": round(self._load_seconds, 3),
+                "memory_mb": round(self._memory_bytes / (1024 * 1024), 1),
+            }
+
+
+_engine_factories: Dict[str, Callable[[], OCREngine]] = {
+    TesseractEngine.name: TesseractEngine,
+    TesserocrEngine.name: TesserocrEngine,
+    EasyOCREngine.name: EasyOCREngine,
+}
+_engine_pools: Dict[str, OCREnginePool] = {}
+_engine_pools_lock = threading.Lock()
+
+
+def register_engine(name: str, factory: Callable[[], OCREngine]) -> None:
+    """Rejestruje silnik OCR pod nazwą (np. nowy backend); usuwa istniejącą pulę."""
+    with _engine_pools_lock:
+        _engine_factories[name.lower()] = factory
+        _engine_pools.pop(name.lower(), None)
+
+
+def get_engine(name: Optional[str] = None) -> OCREnginePool:
+    """
+    Zwraca pulę ciepłych instancji silnika OCR (jedna pula na proces).
+
+    Args:
+        name: Nazwa silnika (domyślnie Config.OCR_ENGINE)
+
+    Raises:
+        ValueError: Nieznany silnik
+    """
+    name = (name or Config.OCR_ENGINE).lower()
+    with _engine_pools_lock:
+        pool = _engine_pools.get(name)
+        if pool is None:
+            if name not in _engine_factories:
+                raise ValueError(f"Nieznany silnik OCR: '{name}'")
+            pool = OCREnginePool(name, _engine_factories[name], Config.OCR_ENGINE_POOL_SIZE)
+            _engine_pools[name] = pool
+        return pool
+
+
+def warm_up_ocr_engine(name: Optional[str] = None) -> None:
+    """
+    Ładuje silnik OCR z wyprzedzeniem (np. jako initializer puli procesów), żeby
+    pierwszy paragon nie płacił za wczytanie modeli. Błędy są tylko logowane.
+    """
+    if not Config.OCR_WARMUP:
+        return
+    try:
+        get_engine(name).warm_up()
+    except Exception as e:
+        print(f"OSTRZEŻENIE: Nie udało się załadować silnika OCR: {e}")
+
+
+def get_engine_stats() -> Dict[str, Dict[str, float]]:
+    """Statystyki pul silników OCR w tym procesie (instancje, wywołania, czas ładowania, pamięć)."""
+    with _engine_pools_lock:
+        pools = list(_engine_pools.values())
+    return {pool.name: pool.get_stats() for pool in pools}
+
+
+def reset_engines() -> None:
+    """Zwalnia wszystkie pule (np. po zmianie USE_GPU_OCR w ustawieniach)."""
+    with _engine_pools_lock:
+        _engine_pools.clear()
+
+
+def _read_text_with_engine(name: str, image_path: str, label: str) -> str:
+    """Waliduje obraz i rozpoznaje tekst instancją z puli silnika (pusty string przy błędzie)."""
     try:
         # Waliduj ścieżkę i obraz przed przetwarzaniem
         from .security import validate_image
 
         validate_image(image_path)
 
-        # Otwieramy obraz
-        img = Image.open(image_path)
-        # Używamy pytesseract do ekstrakcji tekstu (język polski + angielski)
-        text = pytesseract.image_to_string(img, lang="pol+eng")
-        return text
+        return get_engine(name).read_text(image_path)
     except Exception as e:
-        print(f"BŁĄD: Nie udało się wyciągnąć tekstu z obrazu za pomocą Tesseract: {e}")
+        print(f"BŁĄD: Nie udało się wyciągnąć tekstu z obrazu za pomocą {label}: {e}")
         return ""
 
 
-def extract_text_from_image(image_path: str) -> str:
+def _read_words_with_engine(name: str, image_path: str) -> Optional[List[Word]]:
+    """Słowa z ramkami z puli silnika lub None (silnik bez ramek albo błąd OCR)."""
+    try:
+        from .security import validate_image
+
+        validate_image(image_path)
+
+        return get_engine(name).read_words(image_path)
+    except NotImplementedError:
+        print(f"OSTRZEŻENIE: Silnik OCR '{name}' nie zwraca ramek słów. Używam zwykłego tekstu.")
+    except Exception as e:
+        print(f"BŁĄD: Nie udało się rozpoznać układu paragonu silnikiem {name}: {e}")
+    return None
+
+
+def extract_text_from_image_gpu(image_path: str) -> str:
+    """
+    Wyciąga tekst z obrazu za pomocą EasyOCR (z obsługą GPU).
+    """
+    return _read_text_with_engine(EasyOCREngine.name, image_path, "EasyOCR")
+
+
+def extract_text_from_image_tesseract(image_path: str) -> str:
+    """
+    Wyciąga surowy tekst z obrazu za pomocą Tesseract OCR (CPU).
+    """
+    return _read_text_with_engine(TesseractEngine.name, image_path, "Tesseract")
+
+
+def _ocr_cache_params(
+    engine: str, preprocess: Optional[PreprocessOptions], layout: bool = False
+) -> Dict[str, Any]:
+    factory = _engine_factories.get(engine)
+    cache_params = getattr(factory, "cache_params", None)
+    params = cache_params() if callable(cache_params) else {}
+    params["preprocess"] = preprocess.as_dict() if preprocess is not None else None
+    if layout:
+        params["layout"] = True
+    return params
+
+
+def _image_hash_for_cache(image_path: str) -> Optional[str]:
+    try:
+        return load_receipt_image(image_path).sha256
+    except OSError:
+        return None
+
+
+def _read_text_cached(
+    engine: str,
+    image_path: str,
+    read: Callable[[str], str],
+    preprocess: Optional[PreprocessOptions] = None,
+    layout: bool = False,
+) -> Tuple[str, bool]:
+    """
+    Rozpoznaje tekst przez read() z cache OCR (klucz: hash obrazu przed przygotowaniem,
+    silnik, ustawienia silnika i przygotowania) - przy trafieniu bez przygotowania i OCR.
+
+    Przy layout=True tekst jest odtwarzany z ramek słów (src.layout), a ramki
+    trafiają do cache razem z tekstem; silnik bez ramek daje zwykły tekst read().
+
+    Returns:
+        Krotka (tekst, czy z cache)
+    """
+    cache = get_ocr_cache()
+    image_hash = _image_hash_for_cache(image_path) if cache is not None else None
+    params = _ocr_cache_params(engine, preprocess, layout)
+    if image_hash:
+        cached = cache.get(image_hash, engine, params)
+        if cached is not None:
+            return cached["text"], True
+
+    words = None
+    with preprocessed_image(image_path, preprocess) as ocr_image_path:
+        if layout:
+            words = _read_words_with_engine(
+                engine if engine in _engine_factories else TesseractEngine.name, ocr_image_path
+            )
+        text = layout_text(words) if words else read(ocr_image_path)
+    # Pusty tekst to zwykle błąd silnika - nie zapamiętujemy go
+    if image_hash and isinstance(text, str) and text.strip():
+        cache.set(image_hash, engine, params, text, words or None)
+    return text, False
+
+
+def _read_with_configured_engine(engine: str, image_path: str) -> str:
+    if engine == "easyocr":
+        return extract_text_from_image_gpu(image_path)
+    if engine == "tesseract":
+        return extract_text_from_image_tesseract(image_path)
+    if engine in _engine_factories:
+        return _read_text_with_engine(engine, image_path, engine)
+    # Domyślnie Tesseract (bezpieczniejszy fallback)
+    print(f"OSTRZEŻENIE: Nieznany silnik OCR '{engine}'. Używam Tesseract.")
+    return extract_text_from_image_tesseract(image_path)
+
+
+def extract_text_from_image(image_path: str, preprocess: Optional[PreprocessOptions] = None) -> str:
     """
     Wyciąga surowy tekst z obrazu używając skonfigurowanego silnika OCR.
     Służy do wstępnej analizy nagłówka paragonu (wykrywanie sklepu).
 
+    Wynik jest zapamiętywany w cache OCR (ocr_cache), więc ponowne przetworzenie
+    tego samego obrazu tym samym silnikiem i ustawieniami nie uruchamia OCR.
+
+    Przy OCR_LAYOUT=true tekst jest odtwarzany z ramek słów: jeden wiersz paragonu
+    na linię, kolumny (nazwa, cena, ilość, kod podatku, wartość) rozdzielone " | ".
+
     Args:
         image_path: Ścieżka do pliku obrazu.
+        preprocess: Ustawienia przygotowania obrazu przed OCR (None = oryginał)
 
     Returns:
         Wyciągnięty tekst jako string.
     """
     engine = Config.OCR_ENGINE.lower()
 
-    if engine == "easyocr":
-        return extract_text_from_image_gpu(image_path)
-    elif engine == "tesseract":
-        return extract_text_from_image_tesseract(image_path)
-    else:
-        # Domyślnie Tesseract (bezpieczniejszy fallback)
+    with span("ocr", engine=engine) as ocr_span:
+        ocr_span.add_bytes(bytes_in=file_size(image_path))
+        text, from_cache = _read_text_cached(
+            engine,
+            image_path,
+            lambda path: _read_with_configured_engine(engine, path),
+            preprocess,
+            layout=Config.OCR_LAYOUT,
+        )
+        ocr_span.set(cache_hit=from_cache)
+        if isinstance(text, str):
+            ocr_span.add_bytes(bytes_out=len(text.encode("utf-8")))
+        return text
+
+
+def header_band(img):
+    """
+    Górny pas paragonu w skali szarości i niskiej rozdzielczości.
+
+    Wysokość pasa zależy od szerokości (HEADER_OCR_BAND_RATIO), a nie od długości
+    paragonu, więc nagłówek długiego paragonu kosztuje tyle samo co krótkiego.
+    """
+    gray = img.convert("L")
+    band_height = min(gray.height, max(1, int(gray.width * Config.HEADER_OCR_BAND_RATIO)))
+    band = gray.crop((0, 0, gray.width, band_height))
+    if band.width > Config.HEADER_OCR_WIDTH:
+        scaled_height = max(1, round(band.height * Config.HEADER_OCR_WIDTH / band.width))
+        band = band.resize((Config.HEADER_OCR_WIDTH, scaled_height), Image.BILINEAR)
+    return band
+
+
+def extract_header_text(image_path: str) -> str:
+    """
+    Szybki OCR samego nagłówka paragonu (wykrywanie sklepu przed pełnym OCR).
+
+    Returns:
+        Tekst nagłówka (pusty string przy błędzie)
+    """
+    engine = Config.OCR_ENGINE.lower()
+    if engine not in _engine_factories:
+        engine = TesseractEngine.name
+
+    with span("ocr_header", engine=engine) as header_span:
+        try:
+            from .security import validate_image
+
+            validate_image(image_path)
+            band = header_band(load_receipt_image(image_path).image)
+            text = get_engine(engine).read_header(band)
+        except Exception as e:
+            print(f"OSTRZEŻENIE: Nie udało się rozpoznać nagłówka paragonu: {e}")
+            return ""
+        header_span.add_bytes(bytes_out=len(text.encode("utf-8")))
+        return text
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """
+    Wyciąga tekst z PDF bez sklejania stron: strony są renderowane strumieniowo
+    i każda trafia do OCR zaraz po wyrenderowaniu, równolegle na tylu wątkach,
+    ile ciepłych instancji ma pula silnika (OCR_ENGINE_POOL_SIZE).
+
+    Returns:
+        Tekst stron w kolejności stron (pusty string przy błędzie)
+    """
+    engine = Config.OCR_ENGINE.lower()
+    if engine not in _engine_factories:
         print(f"OSTRZEŻENIE: Nieznany silnik OCR '{engine}'. Używam Tesseract.")
-        return extract_text_from_image_tesseract(image_path)
+        engine = TesseractEngine.name
+
+    with span("ocr", engine=engine) as ocr_span:
+        ocr_span.add_bytes(bytes_in=file_size(pdf_path))
+        try:
+            pdf_path_validated = _validate_pdf_path(pdf_path)
+            with tempfile.TemporaryDirectory(prefix="paragon_pdf_") as pages_dir:
+                with ThreadPoolExecutor(max_workers=max(1, Config.OCR_ENGINE_POOL_SIZE)) as executor:
+                    futures = [
+                        executor.submit(
+                            contextvars.copy_context().run,
+                            _read_text_cached,
+                            engine,
+                            page_path,
+                            lambda path: _read_text_with_engine(engine, path, engine),
+                            layout=Config.OCR_LAYOUT,
+                        )
+                        for page_path in iter_pdf_pages(pdf_path_validated, pages_dir)
+                    ]
+                    pages_text = [future.result()[0] for future in futures]
+        except Exception as e:
+            print(f"BŁĄD: Nie udało się wyciągnąć tekstu z PDF: {e}")
+            return ""
+        ocr_span.set(pages=len(pages_text))
+        text = "\n".join(pages_text)
+        ocr_span.add_bytes(bytes_out=len(text.encode("utf-8")))
+        return text
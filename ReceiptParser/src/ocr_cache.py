@@ -0,0 +1,264 @@
+"""
+Trwały cache wyników OCR (SQLite).
+
+Klucz łączy hash zawartości obrazu, nazwę silnika i jego ustawienia wpływające
+na wynik (języki, OCR w pasach, parametry przygotowania obrazu), więc zmiana
+któregokolwiek z nich daje nowy wpis. Tekst (i opcjonalne ramki słów) są
+przechowywane skompresowane zlib.
+
+Rozmiar bazy jest ograniczony (OCR_CACHE_MAX_MB); po przekroczeniu limitu
+usuwane są najdawniej używane wpisy.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_cache (
+    cache_key TEXT PRIMARY KEY,
+    image_hash TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    params_hash TEXT NOT NULL,
+    text BLOB NOT NULL,
+    boxes BLOB,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def _compress_json(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+class OCRResultCache:
+    """
+    Cache tekstu rozpoznanego przez silniki OCR (ocr.extract_text_from_image, strony PDF).
+
+    Args:
+        db_path: Ścieżka do pliku SQLite (domyślnie Config.OCR_CACHE_PATH)
+        max_bytes: Limit sumarycznego rozmiaru skompresowanych wpisów w bajtach
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+        self.db_path = db_path or Config.OCR_CACHE_PATH
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else Config.OCR_CACHE_MAX_MB * 1024 * 1024
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def make_key(image_hash: str, engine: str, params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Buduje składowe klucza cache.
+
+        Args:
+            image_hash: SHA-256 pliku obrazu
+            engine: Nazwa silnika OCR
+            params: Ustawienia wpływające na wynik (serializowalne do JSON)
+
+        Returns:
+            Słownik z cache_key, image_hash, engine, params_hash
+        """
+        params_json = json.dumps(params or {}, sort_keys=True, ensure_ascii=False)
+        params_hash = hashlib.sha256(params_json.encode("utf-8")).hexdigest()
+        cache_key = hashlib.sha256(f"{image_hash}|{engine}|{params_hash}".encode("utf-8")).hexdigest()
+        return {
+            "cache_key": cache_key,
+            "image_hash": image_hash,
+            "engine": engine,
+            "params_hash": params_hash,
+        }
+
+    def get(
+        self, image_hash: str, engine: str, params: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Zwraca zapisany wynik OCR lub None.
+
+        Returns:
+            Słownik {"text": str, "boxes": lista ramek słów lub None}
+        """
+        key = self.make_key(image_hash, engine, params)["cache_key"]
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT text, boxes FROM ocr_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute(
+                    "UPDATE ocr_cache SET last_access = ?, hits = hits + 1 WHERE cache_key = ?",
+                    (time.time(), key),
+                )
+                conn.commit()
+                self.hits += 1
+            finally:
+                conn.close()
+        return {
+            "text": zlib.decompress(row[0]).decode("utf-8"),
+            "boxes": json.loads(zlib.decompress(row[1])) if row[1] is not None else None,
+        }
+
+    def set(
+        self,
+        image_hash: str,
+        engine: str,
+        params: Optional[Dict[str, Any]],
+        text: str,
+        boxes: Optional[List[Any]] = None,
+    ) -> None:
+        """
+        Zapisuje wynik OCR (tekst i opcjonalne ramki słów) i w razie potrzeby usuwa najstarsze wpisy.
+        """
+        key = self.make_key(image_hash, engine, params)
+        text_blob = zlib.compress(text.encode("utf-8"))
+        boxes_blob = _compress_json(boxes) if boxes is not None else None
+        size_bytes = len(text_blob) + len(boxes_blob or b"")
+        if size_bytes > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ocr_cache "
+                    "(cache_key, image_hash, engine, params_hash, text, boxes, "
+                    "size_bytes, created_at, last_access, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (
+                        key["cache_key"],
+                        key["image_hash"],
+                        key["engine"],
+                        key["params_hash"],
+                        text_blob,
+                        boxes_blob,
+                        size_bytes,
+                        now,
+                        now,
+                    ),
+                )
+                self._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Usuwa najdawniej używane wpisy, aż rozmiar zmieści się w limicie."""
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM ocr_cache").fetchone()[0]
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        rows = conn.execute(
+            "SELECT cache_key, size_bytes FROM ocr_cache ORDER BY last_access ASC"
+        ).fetchall()
+        for cache_key, size_bytes in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM ocr_cache WHERE cache_key = ?", (cache_key,))
+            total -= size_bytes
+            removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Zwraca statystyki cache.
+
+        Returns:
+            Słownik z entries, total_bytes, max_bytes, stored_hits (łącznie w bazie)
+            oraz hits/misses/hit_rate bieżącego procesu
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                entries, total_bytes, stored_hits = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0) "
+                    "FROM ocr_cache"
+                ).fetchone()
+            finally:
+                conn.close()
+        total = self.hits + self.misses
+        return {
+            "path": self.db_path,
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "stored_hits": stored_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 2) if total else 0.0,
+        }
+
+    def purge(self, engine: Optional[str] = None, older_than_days: Optional[float] = None) -> int:
+        """
+        Usuwa wpisy pasujące do filtrów (bez filtrów - wszystkie).
+
+        Args:
+            engine: Usuń tylko wpisy danego silnika
+            older_than_days: Usuń tylko wpisy nieużywane od co najmniej tylu dni
+
+        Returns:
+            Liczba usuniętych wpisów
+        """
+        conditions = []
+        params: List[Any] = []
+        if engine:
+            conditions.append("engine = ?")
+            params.append(engine)
+        if older_than_days is not None:
+            conditions.append("last_access < ?")
+            params.append(time.time() - older_than_days * 86400)
+        query = "DELETE FROM ocr_cache"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                removed = conn.execute(query, params).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        return removed
+
+
+# Globalna instancja cache (tworzona leniwie)
+_ocr_cache: Optional[OCRResultCache] = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OCRResultCache]:
+    """
+    Zwraca globalny cache wyników OCR lub None, jeśli jest wyłączony.
+    """
+    global _ocr_cache
+    if not Config.OCR_CACHE_ENABLED:
+        return None
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = OCRResultCache()
+        return _ocr_cache
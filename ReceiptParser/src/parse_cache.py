@@ -0,0 +1,298 @@
+"""
+Trwały cache wyników parsowania paragonów przez LLM (SQLite).
+
+Klucz łączy hash obrazu, nazwę modelu, hash promptu systemowego i hash tekstu
+OCR, więc zmiana strategii/promptu lub modelu automatycznie daje nowy wpis.
+Przechowywana jest surowa odpowiedź JSON modelu - konwersja typów
+(_convert_types) wykonywana jest przy każdym odczycie, tak jak po wywołaniu LLM.
+
+Rozmiar bazy jest ograniczony (PARSE_CACHE_MAX_MB); po przekroczeniu limitu
+usuwane są najdawniej używane wpisy.
+
+Odpowiedzi pozostałych wywołań LLM (sugestie nazw produktów) trafiają do
+llm_cache.PersistentLLMResponseCache - ten moduł dotyczy tylko paragonów.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    cache_key TEXT PRIMARY KEY,
+    image_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    ocr_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def _sha256_text(text: Optional[str]) -> str:
+    """Zwraca SHA-256 tekstu (pusty string dla None)."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class ParseResultCache:
+    """
+    Cache surowych odpowiedzi LLM dla parse_receipt_with_llm / parse_receipt_from_text.
+
+    Args:
+        db_path: Ścieżka do pliku SQLite (domyślnie Config.PARSE_CACHE_PATH)
+        max_bytes: Limit sumarycznego rozmiaru odpowiedzi w bajtach
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None) -> None:
+        self.db_path = db_path or Config.PARSE_CACHE_PATH
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else Config.PARSE_CACHE_MAX_MB * 1024 * 1024
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    @staticmethod
+    def make_key(
+        image_hash: str, model: str, system_prompt: Optional[str], ocr_text: Optional[str]
+    ) -> Dict[str, str]:
+        """
+        Buduje składowe klucza cache.
+
+        Args:
+            image_hash: SHA-256 pliku obrazu ("" dla parsowania samego tekstu)
+            model: Nazwa modelu LLM
+            system_prompt: Prompt systemowy wysłany do modelu
+            ocr_text: Tekst OCR wysłany do modelu (po obcięciu)
+
+        Returns:
+            Słownik z cache_key, image_hash, model, prompt_hash, ocr_hash
+        """
+        prompt_hash = _sha256_text(system_prompt)
+        ocr_hash = _sha256_text(ocr_text)
+        cache_key = _sha256_text(f"{image_hash}|{model}|{prompt_hash}|{ocr_hash}")
+        return {
+            "cache_key": cache_key,
+            "image_hash": image_hash,
+            "model": model,
+            "prompt_hash": prompt_hash,
+            "ocr_hash": ocr_hash,
+        }
+
+    def get(
+        self,
+        image_hash: str,
+        model: str,
+        system_prompt: Optional[str],
+        ocr_text: Optional[str],
+    ) -> Optional[str]:
+        """
+        Zwraca zapisaną surową odpowiedź modelu lub None.
+        """
+        key = self.make_key(image_hash, model, system_prompt, ocr_text)["cache_key"]
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response FROM parse_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute(
+                    "UPDATE parse_cache SET last_access = ?, hits = hits + 1 WHERE cache_key = ?",
+                    (time.time(), key),
+                )
+                conn.commit()
+                self.hits += 1
+                return row[0]
+            finally:
+                conn.close()
+
+    def set(
+        self,
+        image_hash: str,
+        model: str,
+        system_prompt: Optional[str],
+        ocr_text: Optional[str],
+        response: str,
+    ) -> None:
+        """
+        Zapisuje surową odpowiedź modelu i w razie potrzeby usuwa najstarsze wpisy.
+        """
+        key = self.make_key(image_hash, model, system_prompt, ocr_text)
+        size_bytes = len(response.encode("utf-8"))
+        if size_bytes > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO parse_cache "
+                    "(cache_key, image_hash, model, prompt_hash, ocr_hash, response, "
+                    "size_bytes, created_at, last_access, hits) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (
+                        key["cache_key"],
+                        key["image_hash"],
+                        key["model"],
+                        key["prompt_hash"],
+                        key["ocr_hash"],
+                        response,
+                        size_bytes,
+                        now,
+                        now,
+                    ),
+                )
+                self._evict(conn)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Usuwa najdawniej używane wpisy, aż rozmiar zmieści się w limicie."""
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM parse_cache"
+        ).fetchone()[0]
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        rows = conn.execute(
+            "SELECT cache_key, size_bytes FROM parse_cache ORDER BY last_access ASC"
+        ).fetchall()
+        for cache_key, size_bytes in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM parse_cache WHERE cache_key = ?", (cache_key,))
+            total -= size_bytes
+            removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Zwraca statystyki cache.
+
+        Returns:
+            Słownik z entries, total_bytes, max_bytes, stored_hits (łącznie w bazie)
+            oraz hits/misses/hit_rate bieżącego procesu
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                entries, total_bytes, stored_hits = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0) "
+                    "FROM parse_cache"
+                ).fetchone()
+            finally:
+                conn.close()
+        total = self.hits + self.misses
+        return {
+            "path": self.db_path,
+            "entries": entries,
+            "total_bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "stored_hits": stored_hits,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 2) if total else 0.0,
+        }
+
+    def list_entries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Zwraca ostatnio używane wpisy (bez treści odpowiedzi).
+
+        Args:
+            limit: Maksymalna liczba wpisów
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT cache_key, image_hash, model, size_bytes, created_at, "
+                    "last_access, hits FROM parse_cache ORDER BY last_access DESC LIMIT ?",
+                    (limit,),
+                ).fetchall()
+            finally:
+                conn.close()
+        return [
+            {
+                "cache_key": row[0],
+                "image_hash": row[1],
+                "model": row[2],
+                "size_bytes": row[3],
+                "created_at": row[4],
+                "last_access": row[5],
+                "hits": row[6],
+            }
+            for row in rows
+        ]
+
+    def purge(self, model: Optional[str] = None, older_than_days: Optional[float] = None) -> int:
+        """
+        Usuwa wpisy pasujące do filtrów (bez filtrów - wszystkie).
+
+        Args:
+            model: Usuń tylko wpisy danego modelu
+            older_than_days: Usuń tylko wpisy nieużywane od co najmniej tylu dni
+
+        Returns:
+            Liczba usuniętych wpisów
+        """
+        conditions = []
+        params: List[Any] = []
+        if model:
+            conditions.append("model = ?")
+            params.append(model)
+        if older_than_days is not None:
+            conditions.append("last_access < ?")
+            params.append(time.time() - older_than_days * 86400)
+        query = "DELETE FROM parse_cache"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                removed = conn.execute(query, params).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        return removed
+
+
+# Globalna instancja cache (tworzona leniwie)
+_parse_cache: Optional[ParseResultCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParseResultCache]:
+    """
+    Zwraca globalny cache wyników parsowania lub None, jeśli jest wyłączony.
+    """
+    global _parse_cache
+    if not Config.PARSE_CACHE_ENABLED:
+        return None
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseResultCache()
+        return _parse_cache
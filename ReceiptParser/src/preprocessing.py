@@ -0,0 +1,340 @@
+"""
+Przygotowanie zdjęcia paragonu przed OCR i modelem wizyjnym (NumPy, bez pętli po pikselach).
+
+Kroki (każdy można wyłączyć w PreprocessOptions):
+1. Skala szarości.
+2. Wykrycie papieru - jasny obszar odcinający się od ciemnego tła (stół pod
+   zdjęciem paragonu) albo cały obraz, gdy jego brzegi są jasne (skan, PDF).
+   Próg jasności (jak dalej próg tuszu) wyznacza metoda Otsu z histogramu obrazu.
+3. Prostowanie (deskew) - kąt z profilu projekcji wierszy: dla każdego kandydata
+   kąta piksele tuszu są rzutowane na oś Y (ścinanie zamiast obrotu), a wybierany
+   jest kąt o największej wariancji profilu (ostre linie tekstu).
+4. Przycięcie marginesów do obszaru z tuszem.
+5. Zmniejszenie do docelowego DPI - szerokość tekstu po przycięciu odpowiada
+   szerokości druku (RECEIPT_PRINT_WIDTH_MM), więc DPI = szerokość px / cale.
+   Tylko gdy papier został wykryty - inaczej szerokość tuszu nie jest szerokością
+   druku (np. tło zdjęcia) i zmniejszenie mogłoby zejść znacznie poniżej target_dpi.
+6. Binaryzacja adaptacyjna - próg = średnia z otoczenia (sumy skumulowane) - offset.
+
+Obraz wynikowy (PNG) jest mniejszy, szybciej rozpoznawany przez Tesseract
+i zmniejsza ładunek wysyłany do _call_vision_llm.
+"""
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from PIL import Image
+
+from .config import Config
+from .receipt_image import forget_receipt_image, load_receipt_image
+from .security import create_secure_temp_file
+from .tracing import file_size, span
+
+# Typowa szerokość obszaru druku paragonu z drukarki 80 mm
+RECEIPT_PRINT_WIDTH_MM = 72.0
+# Próg tuszu (0-255), gdy histogram nie ma dwóch wyraźnych klas (np. pusty obraz)
+INK_THRESHOLD = 128
+# Brzeg obrazu co najmniej tak jasny (ułamek pikseli) - cały obraz jest papierem
+PAPER_BORDER_RATIO = 0.9
+# Wykryty papier: jasnych pikseli w środku co najmniej / poza nim co najwyżej
+PAPER_MIN_INSIDE = 0.6
+PAPER_MAX_OUTSIDE = 0.2
+
+
+class PreprocessOptions:
+    """
+    Ustawienia przygotowania obrazu.
+
+    Attributes:
+        grayscale: Konwersja do skali szarości
+        binarize: Binaryzacja adaptacyjna (dla OCR; model wizyjny lepiej widzi odcienie)
+        deskew: Prostowanie na podstawie profilu projekcji
+        crop_margins: Przycięcie marginesów bez tuszu
+        target_dpi: Docelowe DPI (None = bez zmniejszania; obraz nigdy nie jest powiększany;
+            wymaga crop_margins i wykrytego papieru)
+        max_skew: Maksymalny szukany kąt pochylenia w stopniach
+        block_size: Rozmiar otoczenia binaryzacji w pikselach
+        offset: O ile piksel musi być ciemniejszy od średniej otoczenia, by był tuszem
+        only_if_smaller: Użyj oryginału, jeśli wynik nie jest mniejszy (ładunek dla modelu wizyjnego)
+    """
+
+    def __init__(
+        self,
+        grayscale: bool = True,
+        binarize: bool = True,
+        deskew: bool = True,
+        crop_margins: bool = True,
+        target_dpi: Optional[int] = 300,
+        max_skew: float = 5.0,
+        block_size: int = 31,
+        offset: int = 10,
+        only_if_smaller: bool = False,
+    ) -> None:
+        self.grayscale = grayscale
+        self.binarize = binarize
+        self.deskew = deskew
+        self.crop_margins = crop_margins
+        self.target_dpi = target_dpi
+        self.max_skew = max_skew
+        self.block_size = block_size
+        self.offset = offset
+        self.only_if_smaller = only_if_smaller
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Ustawienia jako słownik (np. do klucza cache OCR)."""
+        return dict(vars(self))
+
+
+def ocr_options() -> PreprocessOptions:
+    """Ustawienia dla OCR (sklep nie jest jeszcze znany, więc wspólne dla wszystkich strategii)."""
+    return PreprocessOptions(binarize=True, target_dpi=Config.PREPROCESS_OCR_DPI)
+
+
+def vision_options() -> PreprocessOptions:
+    """Domyślne ustawienia dla modelu wizyjnego (bez binaryzacji, niższe DPI)."""
+    return PreprocessOptions(
+        binarize=False, target_dpi=Config.PREPROCESS_VISION_DPI, only_if_smaller=True
+    )
+
+
+def adaptive_binarize(gray, block_size: int = 31, offset: int = 10):
+    """
+    Binaryzacja adaptacyjna średnią z otoczenia block_size x block_size.
+
+    Średnie liczone z sum skumulowanych (cumsum), więc koszt nie zależy od block_size.
+
+    Returns:
+        Tablica uint8 z wartościami 0 (tusz) i 255 (tło)
+    """
+    import numpy as np
+
+    height, width = gray.shape
+    radius = max(1, block_size // 2)
+    rows = np.arange(height)
+    cols = np.arange(width)
+    top, bottom = np.clip(rows - radius, 0, height), np.clip(rows + radius + 1, 0, height)
+    left, right = np.clip(cols - radius, 0, width), np.clip(cols + radius + 1, 0, width)
+
+    # Sumy okien rozdzielnie: najpierw w wierszach, potem w kolumnach
+    row_cumsum = np.pad(gray.astype(np.int64).cumsum(axis=1), ((0, 0), (1, 0)))
+    row_sums = row_cumsum[:, right] - row_cumsum[:, left]
+    col_cumsum = np.pad(row_sums.cumsum(axis=0), ((1, 0), (0, 0)))
+    window_sum = col_cumsum[bottom] - col_cumsum[top]
+    window_mean = window_sum / ((bottom - top)[:, None] * (right - left)[None, :])
+    return np.where(gray > window_mean - offset, 255, 0).astype(np.uint8)
+
+
+def otsu_threshold(gray) -> int:
+    """
+    Próg jasności metodą Otsu (maksymalna wariancja międzyklasowa histogramu).
+
+    Returns:
+        Próg t - piksele ciemniejsze niż t są tuszem; INK_THRESHOLD, gdy obraz
+        ma jeden poziom jasności
+    """
+    import numpy as np
+
+    hist = np.bincount(np.asarray(gray, dtype=np.uint8).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_dark = hist.cumsum()
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = (hist * levels).cumsum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_dark = sum_dark / weight_dark
+        mean_light = (sum_dark[-1] - sum_dark) / weight_light
+        between = np.nan_to_num(weight_dark * weight_light * (mean_dark - mean_light) ** 2)
+    if between.max() <= 0:
+        return INK_THRESHOLD
+    # Przy pustych poziomach między klasami maksimum jest płaskie - środek przedziału
+    best = np.flatnonzero(between >= between.max() * (1 - 1e-9))
+    return int(best.mean()) + 1
+
+
+def find_paper(gray, threshold: Optional[int] = None) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Szuka papieru paragonu: jasnego prostokąta na ciemniejszym tle.
+
+    Returns:
+        (góra, dół, lewo, prawo) - cały obraz, gdy jego brzegi są jasne (skan),
+        albo None, gdy papieru nie da się jednoznacznie oddzielić od tła
+    """
+    import numpy as np
+
+    threshold = otsu_threshold(gray) if threshold is None else threshold
+    light = gray >= threshold
+    height, width = light.shape
+    border = np.concatenate((light[0], light[-1], light[:, 0], light[:, -1]))
+    if border.mean() >= PAPER_BORDER_RATIO:
+        return 0, height, 0, width
+
+    col_light = light.mean(axis=0)
+    cols = np.flatnonzero(col_light >= col_light.max() / 2)
+    if cols.size == 0 or col_light.max() == 0:
+        return None
+    left, right = int(cols[0]), int(cols[-1]) + 1
+    row_light = light[:, left:right].mean(axis=1)
+    rows = np.flatnonzero(row_light >= row_light.max() / 2)
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+
+    inside = light[top:bottom, left:right]
+    outside_area = height * width - inside.size
+    outside_light = int(light.sum()) - int(inside.sum())
+    if inside.mean() < PAPER_MIN_INSIDE:
+        return None
+    if outside_area and outside_light / outside_area > PAPER_MAX_OUTSIDE:
+        return None
+    return top, bottom, left, right
+
+
+def estimate_skew(
+    gray, max_angle: float = 5.0, step: float = 0.25, threshold: Optional[int] = None
+) -> float:
+    """
+    Szacuje kąt pochylenia tekstu (stopnie, dodatni = obrót przeciwnie do wskazówek zegara).
+
+    Piksele tuszu (ciemniejsze niż threshold, domyślnie próg Otsu; próbka do
+    200 000) są rzutowane na oś Y dla każdego kąta jednocześnie; wygrywa kąt
+    z największą wariancją profilu wierszy.
+    """
+    import numpy as np
+
+    threshold = otsu_threshold(gray) if threshold is None else threshold
+    ys, xs = np.nonzero(gray < threshold)
+    if ys.size == 0:
+        return 0.0
+    if ys.size > 200_000:
+        pick = np.linspace(0, ys.size - 1, 200_000).astype(np.int64)
+        ys, xs = ys[pick], xs[pick]
+
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    # Wiersz każdego piksela po wyprostowaniu o dany kąt (kąty x piksele)
+    projected = np.rint(ys[None, :] + xs[None, :] * np.tan(np.radians(angles))[:, None]).astype(np.int64)
+    projected -= projected.min()
+    length = int(projected.max()) + 1
+    offsets = (np.arange(len(angles)) * length)[:, None]
+    profiles = np.bincount((projected + offsets).ravel(), minlength=len(angles) * length)
+    scores = profiles.reshape(len(angles), length).astype(np.float64).var(axis=1)
+
+    best = float(angles[int(scores.argmax())])
+    # Bez wyraźnej różnicy względem 0 stopni nie obracamy (szum profilu)
+    zero_index = int(np.abs(angles).argmin())
+    if scores[zero_index] >= scores.max() * 0.98:
+        return 0.0
+    return best
+
+
+def crop_to_ink(gray, pad: int = 10, threshold: Optional[int] = None):
+    """
+    Przycina marginesy bez tuszu (zostawia pad pikseli zapasu).
+
+    Tusz to piksele ciemniejsze niż threshold (domyślnie próg Otsu obrazu).
+    """
+    import numpy as np
+
+    threshold = otsu_threshold(gray) if threshold is None else threshold
+    ink = gray < threshold
+    rows = np.flatnonzero(ink.sum(axis=1) > 1)
+    cols = np.flatnonzero(ink.sum(axis=0) > 1)
+    if rows.size == 0 or cols.size == 0:
+        return gray
+    height, width = gray.shape
+    return gray[
+        max(0, rows[0] - pad) : min(height, rows[-1] + pad + 1),
+        max(0, cols[0] - pad) : min(width, cols[-1] + pad + 1),
+    ]
+
+
+def downscale_to_dpi(img: Image.Image, target_dpi: int) -> Image.Image:
+    """Zmniejsza obraz tak, by szerokość druku miała target_dpi (nigdy nie powiększa)."""
+    target_width = int(RECEIPT_PRINT_WIDTH_MM / 25.4 * target_dpi)
+    if img.width <= target_width:
+        return img
+    target_height = max(1, round(img.height * target_width / img.width))
+    return img.resize((target_width, target_height), Image.LANCZOS)
+
+
+def preprocess(img: Image.Image, options: PreprocessOptions) -> Image.Image:
+    """Wykonuje kroki przygotowania na obrazie PIL i zwraca nowy obraz."""
+    import numpy as np
+
+    if options.grayscale or options.binarize or options.deskew or options.crop_margins:
+        img = img.convert("L")
+    elif img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+
+    # Szerokość druku jest znana tylko po przycięciu tekstu na wykrytym papierze
+    print_width_known = False
+    if options.crop_margins:
+        paper = find_paper(np.asarray(img))
+        if paper is not None:
+            top, bottom, left, right = paper
+            img = img.crop((left, top, right, bottom))
+            print_width_known = True
+
+    if options.deskew:
+        angle = estimate_skew(np.asarray(img), options.max_skew)
+        if angle:
+            img = img.rotate(-angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+    if options.crop_margins:
+        img = Image.fromarray(crop_to_ink(np.asarray(img)))
+
+    if options.target_dpi and print_width_known:
+        img = downscale_to_dpi(img, options.target_dpi)
+
+    if options.binarize:
+        img = Image.fromarray(adaptive_binarize(np.asarray(img), options.block_size, options.offset))
+
+    return img
+
+
+def preprocess_image_file(image_path: str, options: PreprocessOptions) -> str:
+    """
+    Przygotowuje obraz z pliku i zapisuje wynik jako PNG w bezpiecznym pliku tymczasowym.
+
+    Returns:
+        Ścieżka do pliku tymczasowego (usuwa wywołujący)
+    """
+    with span("preprocess", binarize=options.binarize) as preprocess_span:
+        preprocess_span.add_bytes(bytes_in=file_size(image_path))
+        result = preprocess(load_receipt_image(image_path).image, options)
+        fd, temp_file_path = create_secure_temp_file(suffix=".png")
+        os.close(fd)
+        try:
+            result.save(temp_file_path, "PNG", optimize=True)
+        except Exception:
+            os.unlink(temp_file_path)
+            raise
+        preprocess_span.add_bytes(bytes_out=file_size(temp_file_path))
+        return temp_file_path
+
+
+def preprocess_or_original(image_path: str, options: Optional[PreprocessOptions]) -> str:
+    """
+    Zwraca ścieżkę przygotowanego obrazu albo oryginalną, gdy przygotowanie jest
+    wyłączone (options=None) lub się nie uda - przetwarzanie paragonu nie może
+    się przez to zatrzymać. Plik różny od image_path usuwa wywołujący.
+    """
+    if options is None:
+        return image_path
+    try:
+        prepared_path = preprocess_image_file(image_path, options)
+    except Exception as e:
+        print(f"OSTRZEŻENIE: Nie udało się przygotować obrazu, używam oryginału: {e}")
+        return image_path
+    if options.only_if_smaller and os.path.getsize(prepared_path) >= os.path.getsize(image_path):
+        os.unlink(prepared_path)
+        return image_path
+    return prepared_path
+
+
+@contextmanager
+def preprocessed_image(image_path: str, options: Optional[PreprocessOptions]) -> Iterator[str]:
+    """Udostępnia preprocess_or_original na czas bloku with (plik tymczasowy jest usuwany)."""
+    prepared_path = preprocess_or_original(image_path, options)
+    try:
+        yield prepared_path
+    finally:
+        if prepared_path != image_path and os.path.exists(prepared_path):
+            forget_receipt_image(prepared_path)
+            os.unlink(prepared_path)
@@ -0,0 +1,237 @@
+"""
+Kolejka odroczonej weryfikacji nieznanych produktów.
+
+W trybie deferred_review (save_to_database) pozycje z nieznanymi produktami są
+zapisywane z tymczasowym mapowaniem i flagą do_weryfikacji, bez stanu
+magazynowego. Ten moduł grupuje je po surowej nazwie z paragonu i rozstrzyga
+zbiorczo: zatwierdza lub przepina aliasy, przypisuje produkty do pozycji,
+dodaje stany magazynowe albo usuwa pozycje pominięte, a tymczasowe produkty,
+do których nic się już nie odwołuje, usuwa - wszystko w jednej transakcji.
+"""
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import column, inspect, select, table
+from sqlalchemy.orm import Session, joinedload, sessionmaker
+
+from .bulk_write import ReceiptWriteCache
+from .database import AliasProduktu, PozycjaParagonu, Produkt, StanMagazynowy, engine
+from .knowledge_base import get_product_metadata
+
+
+def _noop_log(message: str, *args, **kwargs) -> None:
+    pass
+
+
+def get_pending_reviews(session: Session) -> List[Dict]:
+    """
+    Zwraca kolejkę weryfikacji pogrupowaną po surowej nazwie produktu.
+
+    Returns:
+        Lista słowników {raw_name, provisional_name (None gdy brak sugestii),
+        count (liczba pozycji), paragon_ids} w kolejności zapisu
+    """
+    pozycje = (
+        session.query(PozycjaParagonu)
+        .options(joinedload(PozycjaParagonu.produkt))
+        .filter(PozycjaParagonu.do_weryfikacji.is_(True))
+        .order_by(PozycjaParagonu.pozycja_id)
+        .all()
+    )
+    groups: Dict[str, Dict] = {}
+    for pozycja in pozycje:
+        group = groups.setdefault(
+            pozycja.nazwa_z_paragonu_raw,
+            {
+                "raw_name": pozycja.nazwa_z_paragonu_raw,
+                "provisional_name": None,
+                "count": 0,
+                "paragon_ids": [],
+            },
+        )
+        group["count"] += 1
+        if pozycja.produkt is not None:
+            # Najnowsze tymczasowe mapowanie wygrywa (jak alias)
+            group["provisional_name"] = pozycja.produkt.znormalizowana_nazwa
+        if pozycja.paragon_id not in group["paragon_ids"]:
+            group["paragon_ids"].append(pozycja.paragon_id)
+    return list(groups.values())
+
+
+def _delete_orphan_products(session: Session, candidates: Iterable[Produkt]) -> List[str]:
+    """
+    Usuwa produkty, do których nie odwołuje się żadna pozycja, alias, stan
+    magazynowy ani wpis w zmarnowane_produkty (bez commit).
+
+    Returns:
+        Znormalizowane nazwy usuniętych produktów
+    """
+    by_id = {p.produkt_id: p for p in candidates if p.produkt_id is not None}
+    if not by_id:
+        return []
+
+    referenced = set()
+    for model in (PozycjaParagonu, AliasProduktu, StanMagazynowy):
+        referenced.update(
+            produkt_id
+            for (produkt_id,) in session.query(model.produkt_id)
+            .filter(model.produkt_id.in_(by_id))
+            .distinct()
+        )
+    # zmarnowane_produkty nie ma modelu ORM (tworzy ją migrate_db)
+    if inspect(session.connection()).has_table("zmarnowane_produkty"):
+        produkt_id = column("produkt_id")
+        referenced.update(
+            session.execute(
+                select(produkt_id)
+                .select_from(table("zmarnowane_produkty"))
+                .where(produkt_id.in_(by_id))
+            ).scalars()
+        )
+
+    deleted = []
+    for produkt_id, product in by_id.items():
+        if produkt_id not in referenced:
+            session.delete(product)
+            deleted.append(product.znormalizowana_nazwa)
+    session.flush()
+    return deleted
+
+
+def resolve_pending_reviews(
+    session: Session,
+    decisions: Dict[str, Optional[str]],
+    log_callback: Callable = _noop_log,
+) -> Dict[str, int]:
+    """
+    Rozstrzyga pozycje z kolejki weryfikacji (bez commit - robi to wywołujący).
+
+    Args:
+        session: Sesja SQLAlchemy
+        decisions: Surowa nazwa -> znormalizowana nazwa produktu; None, pusty
+            string lub "POMIŃ" usuwa pozycje i tymczasowy alias. Nazwy spoza
+            słownika pozostają w kolejce.
+        log_callback: Callback do logowania
+
+    Returns:
+        Statystyki {confirmed, removed, products} - liczba zatwierdzonych
+        pozycji, usuniętych pozycji i rozstrzygniętych nazw z produktem
+    """
+    from .main import _assign_product, _call_log_callback
+
+    if not decisions:
+        return {"confirmed": 0, "removed": 0, "products": 0}
+
+    raw_names = list(decisions)
+    pozycje = (
+        session.query(PozycjaParagonu)
+        .filter(PozycjaParagonu.do_weryfikacji.is_(True))
+        .filter(PozycjaParagonu.nazwa_z_paragonu_raw.in_(raw_names))
+        .order_by(PozycjaParagonu.pozycja_id)
+        .all()
+    )
+
+    confirmed_names = {}
+    for raw_name, name in decisions.items():
+        name = (name or "").strip()
+        if name and name.upper() != "POMIŃ":
+            confirmed_names[raw_name] = name
+
+    write_cache = ReceiptWriteCache(session)
+    write_cache.load_aliases(raw_names)
+    metadata_by_name = {
+        name: get_product_metadata(name) for name in set(confirmed_names.values())
+    }
+    write_cache.load_products(metadata_by_name.keys())
+    write_cache.load_categories(m["kategoria"] for m in metadata_by_name.values())
+
+    # Tymczasowe produkty sprzed weryfikacji - po przepięciu mogą zostać bez odwołań
+    provisional_products = {p.produkt for p in pozycje if p.produkt is not None}
+    provisional_products.update(
+        alias.produkt
+        for alias in write_cache.aliases.values()
+        if alias.do_weryfikacji and alias.produkt is not None
+    )
+
+    products = {}
+    for raw_name in raw_names:
+        if raw_name in confirmed_names:
+            _call_log_callback(
+                log_callback, f"INFO: Weryfikacja '{raw_name}' -> '{confirmed_names[raw_name]}'"
+            )
+            products[raw_name] = _assign_product(
+                write_cache,
+                raw_name,
+                confirmed_names[raw_name],
+                metadata_by_name[confirmed_names[raw_name]],
+                log_callback,
+            )
+            continue
+        # Pominięcie - usuń tymczasowy alias, zatwierdzonych nie ruszamy
+        alias = write_cache.aliases.get(raw_name)
+        if alias is not None and alias.do_weryfikacji:
+            session.delete(alias)
+        _call_log_callback(log_callback, f"INFO: Weryfikacja '{raw_name}' -> pominięto")
+
+    write_cache.load_stock(products.values())
+    stats = {"confirmed": 0, "removed": 0, "products": len(products)}
+    for pozycja in pozycje:
+        product = products.get(pozycja.nazwa_z_paragonu_raw)
+        if product is None:
+            session.delete(pozycja)
+            stats["removed"] += 1
+            continue
+        pozycja.produkt = product
+        pozycja.do_weryfikacji = False
+        write_cache.add_to_stock(
+            product, pozycja, pozycja.ilosc, pozycja.jednostka_miary, pozycja.data_waznosci
+        )
+        stats["confirmed"] += 1
+
+    write_cache.flush()
+    for name in _delete_orphan_products(
+        session, provisional_products - set(products.values())
+    ):
+        _call_log_callback(log_callback, f"INFO: Usunięto nieużywany tymczasowy produkt '{name}'")
+    return stats
+
+
+def apply_review_decisions(
+    decisions: Dict[str, Optional[str]],
+    log_callback: Callable = _noop_log,
+) -> Optional[Dict[str, int]]:
+    """
+    Rozstrzyga kolejkę weryfikacji w jednej transakcji (własna sesja).
+
+    Returns:
+        Statystyki z resolve_pending_reviews lub None, jeśli transakcja została wycofana
+    """
+    from .main import _call_log_callback
+
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    try:
+        stats = resolve_pending_reviews(session, decisions, log_callback)
+        session.commit()
+        _call_log_callback(
+            log_callback,
+            f"INFO: Zweryfikowano {stats['confirmed']} pozycji, usunięto {stats['removed']}.",
+        )
+        return stats
+    except Exception as e:
+        session.rollback()
+        _call_log_callback(
+            log_callback, f"BŁĄD KRYTYCZNY podczas weryfikacji produktów: {e}"
+        )
+        return None
+    finally:
+        session.close()
+
+
+def load_pending_reviews() -> List[Dict]:
+    """Zwraca kolejkę weryfikacji (własna sesja) - dla CLI i GUI."""
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = SessionLocal()
+    try:
+        return get_pending_reviews(session)
+    finally:
+        session.close()
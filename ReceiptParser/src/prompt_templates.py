@@ -17,6 +17,12 @@ class PromptTemplates:
     Provides consistent, well-structured prompts for different
     types of queries to improve AI response quality.
     """
+
+    # System prompt for product name normalization (llm.get_llm_suggestion)
+    NORMALIZATION_SYSTEM_PROMPT = """Jesteś asystentem normalizującym nazwy produktów z polskich paragonów.
+Zwróć wyłącznie krótką, ogólną nazwę produktu w języku polskim, bez marki, gramatury i opakowania.
+Dla pozycji, które nie są produktami (reklamówki, kaucje, opłaty, śmieci OCR), zwróć dokładnie: POMIŃ.
+Nie dodawaj wyjaśnień, cudzysłowów ani prefiksów."""
     
     @staticmethod
     def product_info(products_context: str, query: str) -> str:
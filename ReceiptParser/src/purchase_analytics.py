@@ -17,6 +17,12 @@ from .database import (
     KategoriaProduktu,
     sessionmaker,
 )
+from .config import Config
+from .db_cache import cached_query, dated_session_scope
+
+# Tabele czytane przez zapytania analityczne - zapis do nich unieważnia wyniki
+_RECEIPT_TABLES = (Paragon, Sklep)
+_ITEM_TABLES = (Paragon, PozycjaParagonu, Produkt, KategoriaProduktu, Sklep)
 
 
 class PurchaseAnalytics:
@@ -31,6 +37,7 @@ class PurchaseAnalytics:
         """
         self.session = session or sessionmaker(bind=engine)()
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_ITEM_TABLES, scope=dated_session_scope)
     def get_total_statistics(self) -> Dict:
         """
         Zwraca ogólne statystyki zakupów.
@@ -66,6 +73,7 @@ class PurchaseAnalytics:
             "newest_date": newest.isoformat() if newest else None,
         }
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_RECEIPT_TABLES, scope=dated_session_scope)
     def get_spending_by_store(self, limit: int = 10) -> List[Tuple[str, float]]:
         """
         Zwraca wydatki według sklepów.
@@ -90,6 +98,7 @@ class PurchaseAnalytics:
         
         return [(row[0], float(row[1])) for row in results]
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_ITEM_TABLES, scope=dated_session_scope)
     def get_spending_by_category(self, limit: int = 10) -> List[Tuple[str, float]]:
         """
         Zwraca wydatki według kategorii produktów.
@@ -116,6 +125,7 @@ class PurchaseAnalytics:
         
         return [(row[0] or "Brak kategorii", float(row[1] or 0)) for row in results]
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_ITEM_TABLES, scope=dated_session_scope)
     def get_top_products(self, limit: int = 10) -> List[Tuple[str, int, float]]:
         """
         Zwraca najczęściej kupowane produkty.
@@ -143,6 +153,7 @@ class PurchaseAnalytics:
             (row[0], row[1], float(row[2] or 0)) for row in results
         ]
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_RECEIPT_TABLES, scope=dated_session_scope)
     def get_spending_over_time(
         self, days: int = 30, group_by: str = "day"
     ) -> List[Tuple[str, float]]:
@@ -188,6 +199,7 @@ class PurchaseAnalytics:
         
         return formatted_results
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_RECEIPT_TABLES, scope=dated_session_scope)
     def get_monthly_statistics(self) -> List[Dict]:
         """
         Zwraca statystyki miesięczne.
@@ -225,6 +237,7 @@ class PurchaseAnalytics:
         
         return stats
 
+    @cached_query(Config.QUERY_CACHE_TTL_SECONDS, tables=_ITEM_TABLES, scope=dated_session_scope)
     def get_receipts(
         self, 
         limit: int = 50, 
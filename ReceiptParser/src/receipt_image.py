@@ -0,0 +1,155 @@
+"""
+Obraz paragonu wczytywany i dekodowany raz na cały potok.
+
+Ten sam plik obrazu trafia kolejno do walidacji, OCR nagłówka, przygotowania
+obrazu, pełnego OCR, cache (hash), modelu wizyjnego i okna weryfikacji.
+Wcześniej każdy z tych etapów czytał plik z dysku i dekodował go na nowo.
+
+load_receipt_image() zwraca wspólny obiekt ReceiptImage dla danej ścieżki
+(ograniczony cache LRU w procesie, klucz: ścieżka, czas modyfikacji i rozmiar
+pliku, więc zmieniony plik jest wczytywany ponownie). Obiekt trzyma bajty pliku
+(hash, wysyłka do Ollamy) oraz leniwie zdekodowany obraz PIL i tablice pikseli.
+Obraz i tablice są współdzielone między wątkami - tylko do odczytu.
+Po zakończeniu paragonu potoki (także workery OCR) zwalniają jego obrazy
+przez forget_receipt_image, więc LRU nie trzyma dużych zdjęć między paragonami.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+# Ile ostatnio używanych obrazów trzymać w pamięci procesu
+RECEIPT_IMAGE_CACHE_SIZE = 4
+
+
+class ReceiptImage:
+    """
+    Plik obrazu paragonu: bajty czytane raz, dekodowanie leniwe i jednokrotne.
+
+    Args:
+        path: Ścieżka do pliku obrazu
+        data: Zawartość pliku
+    """
+
+    def __init__(self, path: str, data: bytes) -> None:
+        self.path = path
+        self.data = data
+        self._sha256: Optional[str] = None
+        self._size: Optional[Tuple[int, int]] = None
+        self._image: Optional[Image.Image] = None
+        self._pixels: Dict[str, Any] = {}
+        self._derived: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path: str) -> "ReceiptImage":
+        with open(path, "rb") as f:
+            return cls(path, f.read())
+
+    @property
+    def sha256(self) -> str:
+        """SHA-256 zawartości pliku (taki sam jak dedup.compute_file_hash)."""
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.data).hexdigest()
+        return self._sha256
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Wymiary (szerokość, wysokość) z nagłówka pliku, bez dekodowania pikseli."""
+        if self._size is None:
+            if self._image is not None:
+                self._size = self._image.size
+            else:
+                with Image.open(io.BytesIO(self.data)) as img:
+                    self._size = img.size
+        return self._size
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def image(self) -> Image.Image:
+        """Zdekodowany obraz PIL (wspólny - nie modyfikować w miejscu)."""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    img = Image.open(io.BytesIO(self.data))
+                    img.load()
+                    self._image = img
+        return self._image
+
+    def pixels(self, mode: str = "L"):
+        """Tablica NumPy pikseli w danym trybie PIL (wspólna, tylko do odczytu)."""
+        import numpy as np
+
+        array = self._pixels.get(mode)
+        if array is None:
+            img = self.image
+            array = np.asarray(img if img.mode == mode else img.convert(mode))
+            array.setflags(write=False)
+            self._pixels[mode] = array
+        return array
+
+    def derived(self, key: Any, factory: Callable[["ReceiptImage"], Any]) -> Any:
+        """Wynik factory(self) liczony raz dla klucza (np. ładunek dla modelu wizyjnego)."""
+        if key not in self._derived:
+            self._derived[key] = factory(self)
+        return self._derived[key]
+
+
+_images: "OrderedDict[Tuple[str, int, int], ReceiptImage]" = OrderedDict()
+_images_lock = threading.Lock()
+
+
+def _cache_key(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_mtime_ns, stat.st_size
+
+
+def load_receipt_image(path: str) -> ReceiptImage:
+    """
+    Zwraca wspólny ReceiptImage dla pliku (czyta plik tylko przy pierwszym użyciu).
+
+    Raises:
+        OSError: Gdy pliku nie da się odczytać
+    """
+    key = _cache_key(path)
+    with _images_lock:
+        image = _images.get(key)
+        if image is not None:
+            _images.move_to_end(key)
+            return image
+
+    image = ReceiptImage.from_path(path)
+    with _images_lock:
+        # Inny wątek mógł wczytać ten sam plik w międzyczasie - używamy jednego obiektu
+        image = _images.setdefault(key, image)
+        _images.move_to_end(key)
+        while len(_images) > RECEIPT_IMAGE_CACHE_SIZE:
+            _images.popitem(last=False)
+    return image
+
+
+def forget_receipt_image(path: Optional[str]) -> None:
+    """Usuwa z pamięci obraz pliku (np. tymczasowego, który zaraz zostanie skasowany)."""
+    if not path:
+        return
+    real_path = os.path.realpath(path)
+    with _images_lock:
+        for key in [key for key in _images if key[0] == real_path]:
+            del _images[key]
+
+
+def clear_receipt_images() -> None:
+    """Czyści cache obrazów (testy, zwolnienie pamięci)."""
+    with _images_lock:
+        _images.clear()
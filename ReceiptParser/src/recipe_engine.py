@@ -16,9 +16,14 @@ from sqlalchemy.orm import Session, joinedload
 from datetime import date, timedelta
 
 from .database import Produkt, StanMagazynowy
-from .llm import client, TIMEOUT_RECIPES
+from .llm import interactive_client as client, TIMEOUT_RECIPES
 from .prompt_templates import PromptTemplates
 from .config import Config
+from .token_budget import chat_options
+
+# Expected LLM answer lengths in tokens (num_predict, see token_budget)
+RECIPE_SUGGESTIONS_OUTPUT_TOKENS = 1250  # Up to 5 recipes
+RECIPE_DETAILS_OUTPUT_TOKENS = 1200
 
 logger = logging.getLogger(__name__)
 
@@ -129,14 +134,17 @@ class RecipeEngine:
                 return []
             
             # Use LLM to generate recipes
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.7,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    RECIPE_SUGGESTIONS_OUTPUT_TOKENS,
+                    "propozycji przepisów",
+                    temperature=0.7,
+                ),
             )
             
             if not response or 'message' not in response:
@@ -224,14 +232,17 @@ Zwróć odpowiedź w formacie JSON z następującymi polami:
                 logger.error("Ollama client not available")
                 return {}
             
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.5,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    RECIPE_DETAILS_OUTPUT_TOKENS,
+                    "szczegółów przepisu",
+                    temperature=0.5,
+                ),
             )
             
             if not response or 'message' not in response:
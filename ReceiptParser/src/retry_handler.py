@@ -4,10 +4,11 @@ Moduł obsługi retry z exponential backoff dla wywołań API.
 Zapewnia automatyczne ponawianie prób dla błędów sieciowych z exponential backoff
 i jitter, zwiększając niezawodność aplikacji z 99.5% do 99.9%.
 """
+import asyncio
 import time
 import random
 import functools
-from typing import Callable, TypeVar, Optional, List, Type, Union
+from typing import Awaitable, Callable, TypeVar, Optional, List, Type, Union
 import httpx
 from .config import Config
 from .security import sanitize_log_message
@@ -97,6 +98,40 @@ def is_retryable_exception(exception: Exception) -> bool:
     return False
 
 
+def _notify_retry(
+    func_name: str,
+    exception: Exception,
+    attempt: int,
+    max_retries: int,
+    delay: float,
+    on_retry: Optional[Callable[[Exception, int], None]],
+) -> None:
+    """Wywołuje callback on_retry i loguje kolejną próbę (wspólne dla wersji sync i async)."""
+    # Wywołaj callback jeśli dostępny
+    if on_retry:
+        try:
+            on_retry(exception, attempt + 1)
+        except Exception:
+            pass  # Ignoruj błędy w callbacku
+    
+    # Loguj retry (jeśli dostępny logger)
+    try:
+        from .logger import get_logger
+        logger = get_logger(__name__)
+        logger.warning(
+            f"Retry {attempt + 1}/{max_retries - 1} dla {func_name} "
+            f"po błędzie: {sanitize_log_message(str(exception))}. "
+            f"Oczekiwanie {delay:.2f}s..."
+        )
+    except Exception:
+        # Fallback do print jeśli logger nie jest dostępny
+        print(
+            f"OSTRZEŻENIE: Retry {attempt + 1}/{max_retries - 1} dla {func_name} "
+            f"po błędzie: {sanitize_log_message(str(exception))}. "
+            f"Oczekiwanie {delay:.2f}s..."
+        )
+
+
 def retry_with_backoff(
     max_retries: int = RETRY_MAX_ATTEMPTS,
     initial_delay: float = RETRY_INITIAL_DELAY,
@@ -149,29 +184,7 @@ def retry_with_backoff(
                         attempt, initial_delay, backoff_factor, max_delay, jitter
                     )
                     
-                    # Wywołaj callback jeśli dostępny
-                    if on_retry:
-                        try:
-                            on_retry(e, attempt + 1)
-                        except Exception:
-                            pass  # Ignoruj błędy w callbacku
-                    
-                    # Loguj retry (jeśli dostępny logger)
-                    try:
-                        from .logger import get_logger
-                        logger = get_logger(__name__)
-                        logger.warning(
-                            f"Retry {attempt + 1}/{max_retries - 1} dla {func.__name__} "
-                            f"po błędzie: {sanitize_log_message(str(e))}. "
-                            f"Oczekiwanie {delay:.2f}s..."
-                        )
-                    except Exception:
-                        # Fallback do print jeśli logger nie jest dostępny
-                        print(
-                            f"OSTRZEŻENIE: Retry {attempt + 1}/{max_retries - 1} dla {func.__name__} "
-                            f"po błędzie: {sanitize_log_message(str(e))}. "
-                            f"Oczekiwanie {delay:.2f}s..."
-                        )
+                    _notify_retry(func.__name__, e, attempt, max_retries, delay, on_retry)
                     
                     # Czekaj przed kolejną próbą
                     time.sleep(delay)
@@ -186,3 +199,52 @@ def retry_with_backoff(
         return wrapper
     return decorator
 
+
+
+def async_retry_with_backoff(
+    max_retries: int = RETRY_MAX_ATTEMPTS,
+    initial_delay: float = RETRY_INITIAL_DELAY,
+    backoff_factor: float = RETRY_BACKOFF_FACTOR,
+    max_delay: float = RETRY_MAX_DELAY,
+    jitter: bool = RETRY_JITTER,
+    on_retry: Optional[Callable[[Exception, int], None]] = None,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    Wersja retry_with_backoff dla korutyn - czeka przez asyncio.sleep,
+    więc nie blokuje pętli zdarzeń między próbami.
+    
+    Przykład:
+        @async_retry_with_backoff(max_retries=3, initial_delay=1.0)
+        async def api_call():
+            return await client.chat(...)
+    """
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> T:
+            last_exception = None
+            
+            for attempt in range(max_retries):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    last_exception = e
+                    
+                    if not is_retryable_exception(e):
+                        raise
+                    
+                    if attempt == max_retries - 1:
+                        break
+                    
+                    delay = calculate_delay(
+                        attempt, initial_delay, backoff_factor, max_delay, jitter
+                    )
+                    _notify_retry(func.__name__, e, attempt, max_retries, delay, on_retry)
+                    await asyncio.sleep(delay)
+            
+            if last_exception:
+                raise last_exception
+            
+            raise RuntimeError(f"Funkcja {func.__name__} nie zwróciła wartości po {max_retries} próbach")
+        
+        return wrapper
+    return decorator
@@ -6,7 +6,6 @@ import stat
 import tempfile
 from pathlib import Path
 from typing import Optional, List
-from PIL import Image
 
 
 # --- Stałe bezpieczeństwa ---
@@ -96,15 +95,16 @@ def validate_image(image_path: str) -> None:
         max_size=MAX_IMAGE_SIZE
     )
     
-    # Sprawdź wymiary obrazu
+    # Sprawdź wymiary obrazu (nagłówek wspólnego obrazu - kolejne etapy nie czytają pliku ponownie)
     try:
-        with Image.open(path) as img:
-            width, height = img.size
-            if width > MAX_IMAGE_DIMENSIONS[0] or height > MAX_IMAGE_DIMENSIONS[1]:
-                raise ValueError(
-                    f"Obraz za duży: {width}x{height} "
-                    f"(max {MAX_IMAGE_DIMENSIONS[0]}x{MAX_IMAGE_DIMENSIONS[1]})"
-                )
+        from .receipt_image import load_receipt_image
+
+        width, height = load_receipt_image(str(path)).size
+        if width > MAX_IMAGE_DIMENSIONS[0] or height > MAX_IMAGE_DIMENSIONS[1]:
+            raise ValueError(
+                f"Obraz za duży: {width}x{height} "
+                f"(max {MAX_IMAGE_DIMENSIONS[0]}x{MAX_IMAGE_DIMENSIONS[1]})"
+            )
     except Exception as e:
         if isinstance(e, ValueError):
             raise
@@ -14,9 +14,14 @@ from pathlib import Path
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 
-from .llm import client, TIMEOUT_ANALYSIS
+from .llm import interactive_client as client, TIMEOUT_ANALYSIS
 from .prompt_templates import PromptTemplates
 from .config import Config
+from .token_budget import chat_options
+
+# Expected LLM answer lengths in tokens (num_predict, see token_budget)
+SHOPPING_LIST_OUTPUT_TOKENS = 1500
+SUGGESTIONS_OUTPUT_TOKENS = 500
 
 logger = logging.getLogger(__name__)
 
@@ -120,14 +125,17 @@ class SmartShopping:
                 logger.error("Ollama client not available")
                 return self._fallback_shopping_list(planned_meals, budget_pln)
             
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.7,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    SHOPPING_LIST_OUTPUT_TOKENS,
+                    "listy zakupów",
+                    temperature=0.7,
+                ),
             )
             
             if not response or 'message' not in response:
@@ -413,14 +421,17 @@ Zwróć odpowiedź jako listę JSON stringów, np. ["sugestia 1", "sugestia 2"]
 """
         
         try:
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.7,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    SUGGESTIONS_OUTPUT_TOKENS,
+                    "sugestii zakupowych",
+                    temperature=0.7,
+                ),
             )
             
             if not response or 'message' not in response:
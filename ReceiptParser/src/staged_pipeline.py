@@ -0,0 +1,239 @@
+"""
+Wieloetapowy silnik producent/konsument z ograniczonymi kolejkami między etapami.
+
+Każdy etap ma własną liczbę workerów i własną kolejkę wejściową o ograniczonym
+rozmiarze. Gdy kolejny etap nie nadąża, put() na pełnej kolejce blokuje etap
+poprzedni (backpressure), więc pamięć nie rośnie bez ograniczeń, a etapy
+CPU-bound (OCR) i LLM-bound (parsowanie) nakładają się w czasie.
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .config import Config
+from .security import sanitize_log_message
+
+# Znacznik końca strumienia zadań
+_SENTINEL = object()
+
+
+class SkipJob(Exception):
+    """
+    Rzucany przez etap, gdy zadanie nie wymaga dalszego przetwarzania
+    (np. duplikat). Zadanie omija kolejne etapy, ale nie jest liczone jako błąd.
+    """
+
+
+class PipelineJob:
+    """
+    Pojedyncze zadanie przepływające przez etapy.
+
+    Attributes:
+        item: Oryginalny element wejściowy
+        payload: Wynik ostatniego zakończonego etapu
+        error: Opis błędu (None jeśli wszystkie etapy się powiodły)
+        failed_stage: Nazwa etapu, na którym wystąpił błąd
+        skipped: Powód pominięcia (SkipJob) lub None
+        timings: Słownik etap -> czas wykonania w sekundach
+    """
+
+    def __init__(self, item: Any) -> None:
+        self.item = item
+        self.payload = item
+        self.error: Optional[str] = None
+        self.failed_stage: Optional[str] = None
+        self.skipped: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+
+
+class Stage:
+    """
+    Definicja etapu potoku.
+
+    Args:
+        name: Nazwa etapu (używana w statystykach i timings)
+        func: Funkcja payload -> payload; wyjątek oznacza porażkę zadania
+        workers: Liczba wątków obsługujących etap
+        queue_size: Rozmiar kolejki wejściowej (None = domyślny z potoku)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+
+
+class StagedPipeline:
+    """
+    Uruchamia zadania przez sekwencję etapów połączonych ograniczonymi kolejkami.
+
+    Zadanie, którego etap rzucił wyjątek, omija pozostałe etapy i trafia od razu
+    na wyjście z ustawionym error/failed_stage (lub skipped dla SkipJob).
+
+    Przykład:
+        pipeline = StagedPipeline([
+            Stage("ocr", run_ocr, workers=4),
+            Stage("llm", run_llm, workers=2),
+            Stage("db", save, workers=1),
+        ])
+        for job in pipeline.run(files):
+            ...
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: Optional[int] = None) -> None:
+        if not stages:
+            raise ValueError("Potok musi mieć co najmniej jeden etap")
+        self.stages = stages
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _reset_stats(self) -> None:
+        self._stats = {
+            stage.name: {
+                "workers": stage.workers,
+                "processed": 0,
+                "failed": 0,
+                "skipped": 0,
+                "busy_seconds": 0.0,
+                "blocked_seconds": 0.0,
+                "max_queue_depth": 0,
+            }
+            for stage in self.stages
+        }
+
+    def _update_stats(self, name: str, **deltas: float) -> None:
+        with self._stats_lock:
+            stats = self._stats[name]
+            for key, value in deltas.items():
+                if key == "max_queue_depth":
+                    stats[key] = max(stats[key], value)
+                else:
+                    stats[key] += value
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Zwraca statystyki etapów z ostatniego uruchomienia.
+
+        Returns:
+            Słownik etap -> {workers, processed, failed, skipped, busy_seconds,
+            blocked_seconds (czas blokady na pełnej kolejce), max_queue_depth}
+        """
+        with self._stats_lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def run(self, items: Iterable[Any]) -> Iterator[PipelineJob]:
+        """
+        Przepuszcza elementy przez wszystkie etapy.
+
+        Args:
+            items: Elementy wejściowe (mogą być generowane leniwie)
+
+        Yields:
+            PipelineJob w kolejności zakończenia
+        """
+        self._reset_stats()
+        queues = [
+            queue.Queue(maxsize=stage.queue_size or self.queue_size)
+            for stage in self.stages
+        ]
+        output: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+
+        def _put(target: queue.Queue, job: Any, stage_name: Optional[str]) -> None:
+            start = time.perf_counter()
+            target.put(job)
+            if stage_name:
+                self._update_stats(
+                    stage_name, blocked_seconds=time.perf_counter() - start
+                )
+
+        def _feed() -> None:
+            try:
+                for item in items:
+                    _put(queues[0], PipelineJob(item), None)
+                    self._update_stats(
+                        self.stages[0].name, max_queue_depth=queues[0].qsize()
+                    )
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_SENTINEL)
+
+        def _work(index: int) -> None:
+            stage = self.stages[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(self.stages) else output
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+            while True:
+                job = inbox.get()
+                if job is _SENTINEL:
+                    break
+
+                if job.error is None and job.skipped is None:
+                    start = time.perf_counter()
+                    try:
+                        job.payload = stage.func(job.payload)
+                        self._update_stats(stage.name, processed=1)
+                    except SkipJob as e:
+                        job.skipped = str(e)
+                        self._update_stats(stage.name, skipped=1)
+                    except Exception as e:
+                        job.error = sanitize_log_message(str(e))
+                        job.failed_stage = stage.name
+                        self._update_stats(stage.name, failed=1)
+                    duration = time.perf_counter() - start
+                    job.timings[stage.name] = duration
+                    self._update_stats(stage.name, busy_seconds=duration)
+
+                # Zadania z błędem (lub pominięte) omijają kolejne etapy
+                finished = job.error is not None or job.skipped is not None
+                target = outbox if not finished or next_stage is None else output
+                _put(target, job, stage.name)
+                if next_stage is not None and target is outbox:
+                    self._update_stats(next_stage.name, max_queue_depth=outbox.qsize())
+
+            # Ostatni worker etapu zamyka wejście etapu następnego
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last:
+                if next_stage is not None:
+                    for _ in range(next_stage.workers):
+                        outbox.put(_SENTINEL)
+                else:
+                    output.put(_SENTINEL)
+
+        threads = [threading.Thread(target=_feed, daemon=True, name="pipeline-feed")]
+        for index, stage in enumerate(self.stages):
+            for worker_id in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=_work,
+                        args=(index,),
+                        daemon=True,
+                        name=f"pipeline-{stage.name}-{worker_id}",
+                    )
+                )
+        for thread in threads:
+            thread.start()
+
+        # Zadania z błędem mogą trafić na wyjście, zanim ostatni etap się zakończy,
+        # więc czekamy na znacznik końca z ostatniego etapu
+        while True:
+            job = output.get()
+            if job is _SENTINEL:
+                break
+            yield job
+
+        for thread in threads:
+            thread.join()
@@ -4,6 +4,7 @@ from decimal import Decimal
 import re
 from .config import Config
 from .data_models import ParsedData
+from .preprocessing import PreprocessOptions, vision_options
 
 
 class ReceiptStrategy(ABC):
@@ -14,6 +15,16 @@ class ReceiptStrategy(ABC):
         """Zwraca specyficzny prompt dla danego sklepu."""
         pass
 
+    def get_preprocess_options(self) -> Optional[PreprocessOptions]:
+        """
+        Zwraca ustawienia przygotowania obrazu przed modelem wizyjnym (None = oryginał).
+
+        Strategie mogą nadpisać, np. by wyłączyć binaryzację dla paragonów z kolorowym nadrukiem.
+        """
+        if not Config.PREPROCESS_VISION:
+            return None
+        return vision_options()
+
     def post_process(self, data: ParsedData, ocr_text: Optional[str] = None) -> ParsedData:
         """Domyślna implementacja: filtrowanie PTU/VAT i innych nieproduktów."""
         return self._filter_non_products(data)
@@ -227,6 +238,8 @@ class BiedronkaStrategy(ReceiptStrategy):
         
         3. Zadanie: Musisz zrekonstruować te rozsypane bloki w jeden obiekt.
            Jeśli widzisz sekwencję: Nazwa -> Liczba -> Liczba -> "x", to wiesz, że to jeden produkt.
+           Jeśli tekst OCR ma już wiersze z kolumnami rozdzielonymi " | "
+           (np. "Mleko UHT 3,2 1l | 3,49 | 1.000 x | C | 3,49"), każdy taki wiersz to jeden produkt.
         
         4. Rabaty: Często występują w OSOBNEJ linii pod produktem jako:
            "Rabat"
@@ -0,0 +1,273 @@
+"""
+Budżet tokenów żądań do Ollamy (num_ctx, num_predict).
+
+Wywołania miały na sztywno wpisane opcje (np. num_predict=4000), a num_ctx
+zostawał domyślny dla serwera - niezależnie od rzeczywistej długości promptu.
+Za duży kontekst spowalnia model na CPU (pamięć KV cache rośnie z num_ctx),
+za mały jest po cichu obcinany przez serwer (model nie widzi początku
+promptu albo urywa odpowiedź w połowie JSON-a). Tekst OCR był dodatkowo
+obcinany na ślepo do 10000 znaków - także w środku listy pozycji.
+
+Przed każdym client.chat opcje są liczone z wiadomości:
+1. tokeny promptu są szacowane z długości tekstu (LLM_CHARS_PER_TOKEN - polski
+   tekst i JSON dzielą się na więcej tokenów niż angielski) i obrazów
+   (VisionProfile.image_tokens),
+2. num_predict wynika z oczekiwanej długości odpowiedzi - dla paragonu
+   liczba pozycji w tekście OCR x LLM_RECEIPT_ITEM_BYTES,
+3. num_ctx = prompt z zapasem na błąd szacowania + num_predict, zaokrąglone
+   w górę do NUM_CTX_STEP i ograniczone do [LLM_NUM_CTX_MIN, LLM_NUM_CTX_MAX].
+
+Tekst paragonu, który nie mieści się w budżecie, traci najpierw linie
+niebędące pozycjami (stopka, PTU, płatność, separatory); nagłówek, sumy
+i daty zostają. Prompt, który nie mieści się w LLM_NUM_CTX_MAX nawet przy
+odpowiedzi skróconej do MIN_NUM_PREDICT, jest skracany przez chat_options
+(najdłuższa wiadomość, ze znacznikiem PROMPT_TRUNCATED_MARKER) - inaczej
+serwer obciąłby go po cichu. Decyzje trafiają do logu i atrybutów bieżącego
+spanu.
+"""
+import logging
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import Config
+from .tracing import current_span
+from .vision_payload import profile_for_model
+
+logger = logging.getLogger(__name__)
+
+# Narzut szablonu czatu na wiadomość (znaczniki roli, separatory)
+MESSAGE_OVERHEAD_TOKENS = 8
+# Zapas na niedokładność szacowania tokenów promptu
+CTX_MARGIN_RATIO = 0.15
+# Krok zaokrąglenia num_ctx (stałe wartości pozwalają serwerowi reużyć załadowany model)
+NUM_CTX_STEP = 1024
+# Najmniejsze num_predict, na które skracana jest odpowiedź, gdy prompt zajmuje kontekst
+MIN_NUM_PREDICT = 256
+
+# JSON paragonu bez pozycji (sklep_info, paragon_info, klamry)
+RECEIPT_BASE_BYTES = 300
+# Odpowiedź paragonu, gdy w tekście nie da się policzyć pozycji (np. sam obraz)
+DEFAULT_RECEIPT_OUTPUT_TOKENS = 4000
+# Pierwsze niepuste linie tekstu OCR (nazwa i adres sklepu) nie są usuwane
+HEADER_LINES = 5
+TRUNCATED_MARKER = "[... tekst OCR obcięty ...]"
+PROMPT_TRUNCATED_MARKER = "[... prompt obcięty ...]"
+
+# Kwota z groszami: 1,35 / 12.99 / -0,62
+_PRICE_RE = re.compile(r"-?\d+[.,]\d{2}(?!\d)")
+# Linie z kwotą, które nie są pozycjami (podatek, płatność)
+_NON_ITEM_RE = re.compile(
+    r"\b(PTU|VAT|SPRZEDA[ŻZ]|KARTA|GOT[ÓO]WKA|RESZTA|P[ŁL]ATNO|NALE[ŻZ]NO|WYDANO|PRZELEW|BLIK)",
+    re.IGNORECASE,
+)
+# Linie potrzebne poza pozycjami: suma, data zakupu
+_ESSENTIAL_RE = re.compile(
+    r"\b(SUMA|RAZEM|DO\s+ZAP[ŁL]ATY)\b|\d{4}-\d{2}-\d{2}|\d{2}[.-]\d{2}[.-]\d{4}",
+    re.IGNORECASE,
+)
+_LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Szacowana liczba tokenów tekstu (polski tekst, JSON)."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / Config.LLM_CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]], model_name: str = "") -> int:
+    """Szacowana liczba tokenów wiadomości czatu (tekst + obrazy wg profilu modelu)."""
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content"))
+        images = message.get("images")
+        if images:
+            total += len(images) * profile_for_model(model_name).image_tokens
+    return total
+
+
+def _letters(line: str) -> int:
+    return len(_LETTER_RE.findall(line))
+
+
+def classify_receipt_lines(lines: List[str]) -> List[str]:
+    """
+    Rodzaj każdej linii tekstu paragonu.
+
+    Returns:
+        Lista: "item" (pozycja z ceną), "name" (nazwa pozycji z ceną w następnej
+        linii), "essential" (nagłówek, suma, data) albo "other"
+    """
+    kinds = []
+    header_left = HEADER_LINES
+    previous = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            kinds.append("other")
+            continue
+        has_price = bool(_PRICE_RE.search(stripped))
+        if _ESSENTIAL_RE.search(stripped):
+            kind = "essential"
+        elif has_price and not _NON_ITEM_RE.search(stripped):
+            kind = "item"
+            # "0,365 x3,69 1,35C" - ilość i cena pod nazwą z poprzedniej linii
+            if _letters(stripped) < 3 and previous is not None and kinds[previous] == "other":
+                kinds[previous] = "name"
+        elif header_left > 0:
+            kind = "essential"
+        else:
+            kind = "other"
+        header_left -= 1
+        kinds.append(kind)
+        previous = len(kinds) - 1
+    return kinds
+
+
+def count_receipt_items(text: Optional[str]) -> int:
+    """Liczba linii tekstu OCR wyglądających na pozycje paragonu."""
+    if not text:
+        return 0
+    return classify_receipt_lines(text.splitlines()).count("item")
+
+
+def receipt_output_tokens(text: Optional[str]) -> int:
+    """
+    Oczekiwana długość odpowiedzi JSON parsera paragonu w tokenach.
+
+    Liczba pozycji w tekście x LLM_RECEIPT_ITEM_BYTES plus zapas; bez tekstu
+    (albo bez rozpoznanych pozycji) - DEFAULT_RECEIPT_OUTPUT_TOKENS.
+    """
+    items = count_receipt_items(text)
+    if not items:
+        return DEFAULT_RECEIPT_OUTPUT_TOKENS
+    expected = estimate_tokens("x" * (RECEIPT_BASE_BYTES + items * Config.LLM_RECEIPT_ITEM_BYTES))
+    return max(MIN_NUM_PREDICT, math.ceil(expected * (1 + CTX_MARGIN_RATIO)))
+
+
+def fit_receipt_text(text: Optional[str], max_tokens: int) -> Tuple[Optional[str], int]:
+    """
+    Dopasowuje tekst paragonu do budżetu tokenów.
+
+    Usuwa od końca linie niebędące pozycjami ("other"); jeśli to nie wystarczy,
+    obcina koniec tekstu i dodaje znacznik TRUNCATED_MARKER.
+
+    Returns:
+        Krotka (tekst, liczba usuniętych linii)
+    """
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text, 0
+
+    lines = text.splitlines()
+    kinds = classify_receipt_lines(lines)
+    keep = [True] * len(lines)
+    # +1 za znak nowej linii
+    total = sum(len(line) + 1 for line in lines)
+    limit = max_tokens * Config.LLM_CHARS_PER_TOKEN
+    dropped = 0
+    for index in reversed(range(len(lines))):
+        if total <= limit:
+            break
+        if kinds[index] == "other":
+            keep[index] = False
+            total -= len(lines[index]) + 1
+            dropped += 1
+
+    fitted = "\n".join(line for line, kept in zip(lines, keep) if kept)
+    if estimate_tokens(fitted) > max_tokens:
+        cut = max(0, int(limit) - len(TRUNCATED_MARKER) - 2)
+        fitted = fitted[:cut] + "\n\n" + TRUNCATED_MARKER
+    return fitted, dropped
+
+
+def _with_margin(prompt_tokens: int) -> int:
+    return math.ceil(prompt_tokens * (1 + CTX_MARGIN_RATIO))
+
+
+def num_ctx_for(prompt_tokens: int, output_tokens: int) -> int:
+    """num_ctx dla promptu (z zapasem) i odpowiedzi, w krokach NUM_CTX_STEP, w limitach Config."""
+    needed = _with_margin(prompt_tokens) + output_tokens
+    rounded = math.ceil(needed / NUM_CTX_STEP) * NUM_CTX_STEP
+    return max(Config.LLM_NUM_CTX_MIN, min(Config.LLM_NUM_CTX_MAX, rounded))
+
+
+def prompt_budget(prompt_tokens: int, output_tokens: int) -> int:
+    """Ile tokenów zostaje na tekst wejściowy w LLM_NUM_CTX_MAX obok promptu i odpowiedzi."""
+    usable = int((Config.LLM_NUM_CTX_MAX - output_tokens) / (1 + CTX_MARGIN_RATIO))
+    return max(0, usable - prompt_tokens)
+
+
+def _fit_messages(messages: List[Dict[str, Any]], model_name: str, output_tokens: int) -> bool:
+    """
+    Skraca w miejscu najdłuższą wiadomość tak, by prompt zmieścił się w
+    LLM_NUM_CTX_MAX obok odpowiedzi output_tokens.
+
+    Returns:
+        True jeśli wiadomość została skrócona
+    """
+    texts = [m for m in messages if isinstance(m.get("content"), str) and m["content"]]
+    if not texts:
+        return False
+    longest = max(texts, key=lambda m: len(m["content"]))
+    other_tokens = estimate_message_tokens(messages, model_name) - estimate_tokens(longest["content"])
+    limit = int(prompt_budget(other_tokens, output_tokens) * Config.LLM_CHARS_PER_TOKEN)
+    # Obrazy i pozostałe wiadomości same zajmują kontekst - tekstu nie ma z czego skrócić
+    if limit <= len(PROMPT_TRUNCATED_MARKER) + 2:
+        return False
+    cut = limit - len(PROMPT_TRUNCATED_MARKER) - 2
+    longest["content"] = longest["content"][:cut] + "\n\n" + PROMPT_TRUNCATED_MARKER
+    return True
+
+
+def chat_options(
+    model_name: str,
+    messages: List[Dict[str, Any]],
+    output_tokens: int,
+    label: str = "chat",
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Opcje client.chat z num_ctx i num_predict dopasowanymi do żądania.
+
+    Gdy prompt przekracza LLM_NUM_CTX_MAX, najpierw skracana jest odpowiedź
+    (do MIN_NUM_PREDICT), a potem najdłuższa wiadomość - w miejscu, więc
+    messages trzeba wysłać po wywołaniu tej funkcji.
+
+    Args:
+        model_name: Model Ollamy (profil obrazów)
+        messages: Wiadomości, które zostaną wysłane (mogą zostać skrócone)
+        output_tokens: Oczekiwana maksymalna długość odpowiedzi w tokenach
+        label: Nazwa wywołania w logu
+        **options: Pozostałe opcje (np. temperature)
+
+    Returns:
+        Słownik opcji do przekazania jako options=
+    """
+    prompt_tokens = estimate_message_tokens(messages, model_name)
+    num_predict = output_tokens
+    num_ctx = num_ctx_for(prompt_tokens, num_predict)
+    if _with_margin(prompt_tokens) + num_predict > num_ctx:
+        # Prompt nie mieści się z pełną odpowiedzią - najpierw skracamy odpowiedź
+        num_predict = max(MIN_NUM_PREDICT, num_ctx - _with_margin(prompt_tokens))
+        logger.warning(
+            f"{label}: prompt ~{prompt_tokens} tokenów nie mieści się w "
+            f"num_ctx={num_ctx} z odpowiedzią {output_tokens} - num_predict={num_predict}."
+        )
+    if _with_margin(prompt_tokens) + num_predict > num_ctx and _fit_messages(
+        messages, model_name, num_predict
+    ):
+        original_tokens = prompt_tokens
+        prompt_tokens = estimate_message_tokens(messages, model_name)
+        logger.warning(
+            f"{label}: prompt ~{original_tokens} tokenów przekracza LLM_NUM_CTX_MAX="
+            f"{Config.LLM_NUM_CTX_MAX} - skrócono go do ~{prompt_tokens} tokenów."
+        )
+    logger.info(
+        f"Budżet tokenów {label} ({model_name}): prompt ~{prompt_tokens}, "
+        f"num_predict={num_predict}, num_ctx={num_ctx}."
+    )
+    span_obj = current_span()
+    if span_obj is not None:
+        span_obj.set(prompt_tokens_est=prompt_tokens, num_predict=num_predict, num_ctx=num_ctx)
+    return {**options, "num_predict": num_predict, "num_ctx": num_ctx}
@@ -0,0 +1,258 @@
+"""
+Zagnieżdżone pomiary czasu etapów przetwarzania (spany) zapisywane do pliku JSONL.
+
+Każdy span zapisuje czas rzeczywisty (wall), czas CPU bieżącego wątku, liczbę
+bajtów na wejściu/wyjściu i - dla wywołań LLM - liczbę tokenów promptu
+i odpowiedzi (prompt_eval_count / eval_count z odpowiedzi Ollama). Spany
+otwarte wewnątrz innego spanu (także w wątkach uruchomionych przez
+asyncio.to_thread lub z contextvars.copy_context) dziedziczą trace_id i parent_id,
+więc jeden paragon to jedno drzewo spanów.
+
+CLI 'stats' agreguje plik śladów do p50/p95/p99 dla każdego etapu. Plik ma
+limit rozmiaru (TRACE_MAX_MB): po jego przekroczeniu staje się plikiem
+TRACE_PATH.1 (poprzedni jest usuwany), a zapis zaczyna się w nowym pliku.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .config import Config
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_write_lock = threading.Lock()
+
+
+class Span:
+    """
+    Pojedynczy pomiar etapu.
+
+    Attributes:
+        name: Nazwa etapu (np. 'ocr', 'llm.vision')
+        trace_id: Identyfikator drzewa spanów (jeden paragon)
+        span_id: Identyfikator spanu
+        parent_id: span_id spanu nadrzędnego lub None
+        attrs: Dodatkowe atrybuty (model, plik, liczba pozycji...)
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = dict(attrs)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.error: Optional[str] = None
+        self.start = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+
+    def set(self, **attrs: Any) -> None:
+        """Dodaje atrybuty spanu."""
+        self.attrs.update(attrs)
+
+    def add_bytes(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        """Zwiększa liczniki bajtów wejścia/wyjścia."""
+        self.bytes_in += bytes_in or 0
+        self.bytes_out += bytes_out or 0
+
+    def record_llm_response(self, response: Any) -> None:
+        """Zapisuje liczbę tokenów i rozmiar odpowiedzi z odpowiedzi ollama.chat."""
+        try:
+            prompt_tokens = response.get("prompt_eval_count")
+            completion_tokens = response.get("eval_count")
+            content = response["message"]["content"]
+        except (AttributeError, KeyError, TypeError):
+            return
+        if isinstance(prompt_tokens, int):
+            self.prompt_tokens += prompt_tokens
+        if isinstance(completion_tokens, int):
+            self.completion_tokens += completion_tokens
+        if isinstance(content, str):
+            self.bytes_out += len(content.encode("utf-8"))
+
+    def finish(self) -> None:
+        self.wall_s = time.perf_counter() - self._wall_start
+        self.cpu_s = time.thread_time() - self._cpu_start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+def _rotated_path(path: str) -> str:
+    """Ścieżka poprzedniego (zrotowanego) pliku śladów."""
+    return path + ".1"
+
+
+def _write_span(span_obj: Span) -> None:
+    """Dopisuje zakończony span do pliku śladów (błędy zapisu są ignorowane)."""
+    path = Config.TRACE_PATH
+    line = json.dumps(span_obj.to_dict(), ensure_ascii=False, default=str)
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if file_size(path) + len(line) + 1 > Config.TRACE_MAX_MB * 1024 * 1024:
+                os.replace(path, _rotated_path(path))
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"OSTRZEŻENIE: Nie udało się zapisać śladu: {e}")
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Mierzy blok kodu jako span zagnieżdżony w bieżącym spanie (jeśli jest).
+
+    Przykład:
+        with span("ocr", engine="tesseract") as s:
+            text = ...
+            s.add_bytes(bytes_out=len(text))
+    """
+    current = Span(name, _current_span.get(), attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        if Config.TRACE_ENABLED:
+            _write_span(current)
+
+
+def traced(name: str) -> Callable:
+    """Dekorator - całe wywołanie funkcji jest spanem o podanej nazwie."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    """Zwraca bieżący span (None poza spanem)."""
+    return _current_span.get()
+
+
+def file_size(path: Optional[str]) -> int:
+    """Rozmiar pliku w bajtach (0 gdy plik nie istnieje)."""
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def load_spans(path: Optional[str] = None, last_traces: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Wczytuje spany z pliku JSONL i jego poprzedniej części po rotacji
+    (uszkodzone linie są pomijane).
+
+    Args:
+        path: Plik śladów (domyślnie Config.TRACE_PATH)
+        last_traces: Tylko spany z N ostatnich drzew (paragonów)
+
+    Returns:
+        Lista spanów jako słowniki
+    """
+    path = path or Config.TRACE_PATH
+    spans = []
+    for part in (_rotated_path(path), path):
+        if not os.path.exists(part):
+            continue
+        with open(part, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    if last_traces:
+        trace_ids: List[str] = []
+        for item in spans:
+            if item["trace_id"] not in trace_ids:
+                trace_ids.append(item["trace_id"])
+        keep = set(trace_ids[-last_traces:])
+        spans = [item for item in spans if item["trace_id"] in keep]
+    return spans
+
+
+def aggregate_spans(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Agreguje spany po nazwie etapu.
+
+    Returns:
+        Słownik nazwa -> {count, errors, p50, p95, p99 (wall, s), cpu_p50,
+        bytes_in, bytes_out (średnio), prompt_tokens, completion_tokens (suma)}
+    """
+    from .batch_processing import percentile
+
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for item in spans:
+        grouped.setdefault(item["name"], []).append(item)
+
+    stats = {}
+    for name, items in grouped.items():
+        wall = [item["wall_s"] for item in items]
+        cpu = [item["cpu_s"] for item in items]
+        stats[name] = {
+            "count": len(items),
+            "errors": sum(1 for item in items if item.get("error")),
+            "p50": round(percentile(wall, 50), 3),
+            "p95": round(percentile(wall, 95), 3),
+            "p99": round(percentile(wall, 99), 3),
+            "cpu_p50": round(percentile(cpu, 50), 3),
+            "bytes_in": int(sum(item.get("bytes_in", 0) for item in items) / len(items)),
+            "bytes_out": int(sum(item.get("bytes_out", 0) for item in items) / len(items)),
+            "prompt_tokens": sum(item.get("prompt_tokens", 0) for item in items),
+            "completion_tokens": sum(item.get("completion_tokens", 0) for item in items),
+        }
+    return stats
+
+
+def format_stats(stats: Dict[str, Dict[str, float]]) -> str:
+    """Formatuje wynik aggregate_spans jako tabelę do CLI."""
+    lines = [
+        f"{'Etap':<22}{'n':>6}{'bł.':>5}{'p50 [s]':>10}{'p95 [s]':>10}{'p99 [s]':>10}"
+        f"{'CPU p50':>10}{'śr. we [B]':>12}{'śr. wy [B]':>12}{'tok. we':>10}{'tok. wy':>10}"
+    ]
+    for name, item in sorted(stats.items()):
+        lines.append(
+            f"{name:<22}{item['count']:>6}{item['errors']:>5}{item['p50']:>10.3f}"
+            f"{item['p95']:>10.3f}{item['p99']:>10.3f}{item['cpu_p50']:>10.3f}"
+            f"{item['bytes_in']:>12}{item['bytes_out']:>12}"
+            f"{item['prompt_tokens']:>10}{item['completion_tokens']:>10}"
+        )
+    return "\n".join(lines)
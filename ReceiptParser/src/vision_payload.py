@@ -0,0 +1,188 @@
+"""
+Ładunek obrazu dla modelu wizyjnego (Ollama) i Mistral OCR.
+
+Zdjęcie z telefonu (np. 4000x12000) albo sklejony wielostronicowy PDF trafiał
+do serwera w oryginale, który i tak skaluje go do rozdzielczości wejściowej
+modelu - płacimy za przesłanie, zdekodowanie i pocięcie na kafelki pikseli,
+których model nie zobaczy. Przed wysłaniem obraz jest:
+1. zmniejszany do efektywnej rozdzielczości modelu (VisionProfile),
+2. konwertowany do skali szarości (paragony są czarno-białe),
+3. kodowany jako JPEG; jakość, a potem rozdzielczość, są obniżane, aż ładunek
+   zmieści się w budżecie bajtów (VISION_PAYLOAD_MAX_KB).
+
+Oryginał jest wysyłany bez zmian, jeśli już mieści się w limitach. Wynik jest
+liczony raz na obraz i model (ReceiptImage.derived) - ponowienia żądania go nie
+przeliczają.
+"""
+import io
+import time
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from .config import Config
+from .receipt_image import ReceiptImage, load_receipt_image
+from .tracing import span
+
+# Najmniejszy krótszy bok, do którego wolno zmniejszyć obraz przy dopasowaniu do budżetu
+MIN_SHORT_SIDE = 256
+# Krok zmniejszania jakości JPEG i rozdzielczości przy przekroczeniu budżetu
+QUALITY_STEP = 10
+SCALE_STEP = 0.8
+
+
+class VisionProfile:
+    """
+    Efektywna rozdzielczość wejściowa modelu.
+
+    Attributes:
+        max_long_side: Maksymalny dłuższy bok w pikselach
+        max_short_side: Maksymalny krótszy bok w pikselach
+        grayscale: Konwersja do skali szarości
+        max_kb: Budżet bajtów ładunku (None = Config.VISION_PAYLOAD_MAX_KB)
+        accepts_images: False dla modeli tekstowych (obraz nie jest wysyłany)
+        image_tokens: Tokeny kontekstu zajmowane przez obraz (token_budget)
+    """
+
+    def __init__(
+        self,
+        max_long_side: int = 1344,
+        max_short_side: int = 1344,
+        grayscale: bool = True,
+        max_kb: Optional[int] = None,
+        accepts_images: bool = True,
+        image_tokens: int = 1500,
+    ) -> None:
+        self.max_long_side = max_long_side
+        self.max_short_side = max_short_side
+        self.grayscale = grayscale
+        self.max_kb = max_kb
+        self.accepts_images = accepts_images
+        self.image_tokens = image_tokens
+
+    @property
+    def max_bytes(self) -> int:
+        return (self.max_kb if self.max_kb is not None else Config.VISION_PAYLOAD_MAX_KB) * 1024
+
+
+# Profile wg prefiksu nazwy modelu (bez przestrzeni nazw i tagu), por. security.ALLOWED_LLM_MODELS
+VISION_PROFILES: Dict[str, VisionProfile] = {
+    # LLaVA 1.6: kafelki 336 px w siatce do 672x672 lub 336x1344 (do 5 x 576 tokenów)
+    "llava": VisionProfile(max_long_side=1344, max_short_side=672, image_tokens=2880),
+    # Bielik jest modelem tekstowym - wystarcza mu tekst OCR
+    "bielik": VisionProfile(accepts_images=False),
+    # Mistral OCR rozpoznaje drobny druk - wyższa rozdzielczość i większy budżet
+    "mistral-ocr": VisionProfile(max_long_side=4000, max_short_side=2000, max_kb=1500),
+}
+DEFAULT_PROFILE = VisionProfile()
+
+
+def profile_for_model(model_name: str) -> VisionProfile:
+    """Profil modelu wg prefiksu nazwy ('SpeakLeash/bielik-11b...:Q4_K_M' -> 'bielik')."""
+    base_name = model_name.lower().rsplit("/", 1)[-1].split(":", 1)[0]
+    for prefix, profile in VISION_PROFILES.items():
+        if base_name.startswith(prefix):
+            return profile
+    return DEFAULT_PROFILE
+
+
+def _target_size(size: Tuple[int, int], profile: VisionProfile) -> Tuple[int, int]:
+    width, height = size
+    long_side, short_side = max(width, height), min(width, height)
+    scale = min(1.0, profile.max_long_side / long_side, profile.max_short_side / short_side)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _encode_jpeg(img: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def fit_to_budget(image: ReceiptImage, profile: VisionProfile) -> Tuple[bytes, Dict[str, int]]:
+    """
+    Zmniejsza i koduje obraz do limitów profilu.
+
+    Returns:
+        Krotka (bajty ładunku, {"width", "height", "quality"}; quality 0 = oryginał)
+    """
+    width, height = image.size
+    if (width, height) == _target_size((width, height), profile) and len(image.data) <= profile.max_bytes:
+        return image.data, {"width": width, "height": height, "quality": 0}
+
+    img = image.image
+    if profile.grayscale:
+        img = img.convert("L")
+    elif img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+
+    size = _target_size(img.size, profile)
+    quality = Config.VISION_JPEG_QUALITY
+    while True:
+        resized = img if size == img.size else img.resize(size, Image.LANCZOS)
+        data = _encode_jpeg(resized, quality)
+        if len(data) <= profile.max_bytes:
+            break
+        if quality > Config.VISION_JPEG_MIN_QUALITY:
+            quality = max(Config.VISION_JPEG_MIN_QUALITY, quality - QUALITY_STEP)
+            continue
+        if min(size) * SCALE_STEP < MIN_SHORT_SIDE:
+            # Budżet nieosiągalny bez utraty czytelności - wysyłamy najmniejszy czytelny wariant
+            break
+        size = (max(1, round(size[0] * SCALE_STEP)), max(1, round(size[1] * SCALE_STEP)))
+
+    # Oryginał mniejszy od przekodowanego (np. mały PNG z binaryzacji) - bez zmian
+    if len(data) >= len(image.data) and (width, height) == _target_size((width, height), profile):
+        return image.data, {"width": width, "height": height, "quality": 0}
+    return data, {"width": resized.width, "height": resized.height, "quality": quality}
+
+
+def _optimize(image: ReceiptImage, model_name: str, profile: VisionProfile) -> bytes:
+    start = time.perf_counter()
+    with span("vision_payload", model=model_name) as payload_span:
+        payload_span.add_bytes(bytes_in=len(image.data))
+        data, info = fit_to_budget(image, profile)
+        payload_span.add_bytes(bytes_out=len(data))
+        payload_span.set(**info)
+
+    if info["quality"]:
+        saved = 1 - len(data) / len(image.data)
+        print(
+            f"INFO: Obraz dla modelu '{model_name}': {len(image.data) / 1024:.0f} KB "
+            f"{image.width}x{image.height} -> {len(data) / 1024:.0f} KB "
+            f"{info['width']}x{info['height']} (JPEG q={info['quality']}, "
+            f"-{saved:.0%}, {(time.perf_counter() - start) * 1000:.0f} ms)."
+        )
+    return data
+
+
+def prepare_vision_payload(image_path: str, model_name: str) -> Optional[Union[bytes, str]]:
+    """
+    Ładunek obrazu do wysłania modelowi.
+
+    Returns:
+        Bajty obrazu (zoptymalizowane albo oryginalne), None dla modelu tekstowego
+        albo ścieżka, gdy pliku nie da się odczytać (klient zgłosi błąd sam)
+    """
+    profile = profile_for_model(model_name)
+    if not profile.accepts_images:
+        return None
+    try:
+        image = load_receipt_image(image_path)
+    except OSError:
+        return image_path
+    if not Config.VISION_PAYLOAD_OPTIMIZE:
+        return image.data
+
+    key = (
+        "vision_payload",
+        model_name,
+        profile.max_bytes,
+        Config.VISION_JPEG_QUALITY,
+        Config.VISION_JPEG_MIN_QUALITY,
+    )
+    try:
+        return image.derived(key, lambda source: _optimize(source, model_name, profile))
+    except Exception as e:
+        print(f"OSTRZEŻENIE: Nie udało się zmniejszyć obrazu dla modelu, wysyłam oryginał: {e}")
+        return image.data
@@ -18,9 +18,14 @@ from sqlalchemy.orm import Session, joinedload
 from .database import StanMagazynowy, Produkt
 from .food_waste_tracker import FoodWasteTracker
 from .recipe_engine import RecipeEngine
-from .llm import client, TIMEOUT_ANALYSIS
+from .llm import interactive_client as client, TIMEOUT_ANALYSIS
 from .prompt_templates import PromptTemplates
 from .config import Config
+from .token_budget import chat_options
+
+# Expected LLM answer lengths in tokens (num_predict, see token_budget)
+FREEZING_OUTPUT_TOKENS = 400
+WASTE_ANALYSIS_OUTPUT_TOKENS = 600
 
 logger = logging.getLogger(__name__)
 
@@ -200,14 +205,17 @@ Jeśli produkt nie nadaje się do mrożenia, ustaw can_freeze na false i podaj w
                     'thawing_advice': ''
                 }
             
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.5,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    FREEZING_OUTPUT_TOKENS,
+                    "porad mrożenia",
+                    temperature=0.5,
+                ),
             )
             
             if not response or 'message' not in response:
@@ -363,14 +371,17 @@ Bądź konkretny i praktyczny w rekomendacjach.
                     'recommendations': []
                 }
             
+            messages = [{"role": "user", "content": prompt}]
             response = client.chat(
                 model=Config.TEXT_MODEL,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                options={
-                    "temperature": 0.7,
-                }
+                messages=messages,
+                options=chat_options(
+                    Config.TEXT_MODEL,
+                    messages,
+                    WASTE_ANALYSIS_OUTPUT_TOKENS,
+                    "analizy marnowania",
+                    temperature=0.7,
+                ),
             )
             
             if not response or 'message' not in response:
@@ -49,6 +49,7 @@ from gui_modules.dialogs.quick_add_dialog import QuickAddDialog
 from gui_modules.dialogs.add_product_dialog import AddProductDialog
 from gui_modules.dialogs.chat_dialog import BielikChatDialog
 from gui_modules.dialogs.settings_dialog import SettingsDialog
+from gui_modules.dialogs.product_review_dialog import ProductReviewDialog
 from src.gui_optimizations import (
     VirtualScrollableFrame,
     MemoryProfiler,
@@ -59,6 +60,7 @@ from src.gui_optimizations import (
     dialog_manager,
     memory_profiler,
     ToolTip,
+    stream_to_widget,
 )
 import logging
 
@@ -242,6 +244,17 @@ class App(ctk.CTk):
         btn_add_receipt.pack(side="left", padx=AppSpacing.XS)
         ToolTip(btn_add_receipt, "Dodaj nowy paragon do przetworzenia")
 
+        btn_product_review = ctk.CTkButton(
+            buttons_frame,
+            text=f"{Icons.WARNING} Do weryfikacji",
+            command=self.show_product_review_dialog,
+            width=140,
+            fg_color=AppColors.WARNING,
+            hover_color=adjust_color(AppColors.WARNING, -15),
+        )
+        btn_product_review.pack(side="left", padx=AppSpacing.XS)
+        ToolTip(btn_product_review, "Zweryfikuj produkty zapisane z tymczasowym mapowaniem")
+
         btn_refresh = ctk.CTkButton(
             buttons_frame,
             text=f"{Icons.REFRESH} Odśwież",
@@ -318,6 +331,15 @@ class App(ctk.CTk):
         )
         self.init_db_button.pack(side="left", padx=AppSpacing.XS)
 
+        # Nieznane produkty do kolejki weryfikacji zamiast okna dialogowego dla każdego
+        self.deferred_review_var = ctk.BooleanVar(value=Config.DEFERRED_PRODUCT_REVIEW)
+        self.deferred_review_checkbox = ctk.CTkCheckBox(
+            buttons_frame2,
+            text="Weryfikuj nowe produkty później",
+            variable=self.deferred_review_var,
+        )
+        self.deferred_review_checkbox.pack(side="left", padx=AppSpacing.XS)
+
         # Status label i progress bar
         self.status_label = ctk.CTkLabel(
             self.processing_frame, text="Gotowy", anchor="w", font=("Arial", 12)
@@ -425,6 +447,16 @@ class App(ctk.CTk):
             if hasattr(self, "receipts_frame") and self.receipts_frame.winfo_viewable():
                 self.refresh_analytics()
 
+    def show_product_review_dialog(self):
+        """Otwiera kolejkę weryfikacji produktów (odroczona weryfikacja)"""
+        dialog = ProductReviewDialog(self, log_callback=self.log)
+        dialog.wait_window()
+        if dialog.result:
+            self.notifications.show_success(
+                f"Zweryfikowano {dialog.result['confirmed']} pozycji"
+            )
+            self.refresh_analytics()
+
     def show_add_product_dialog(self):
         """Otwiera okno dodawania produktu"""
         # Lazy load dialog
@@ -1158,40 +1190,45 @@ class App(ctk.CTk):
     def ask_bielik_about_expiring(self):
         """Zadaje Bielikowi pytanie o wygasające produkty"""
         try:
+            # Prompt z bazy od razu, odpowiedź modelu strumieniowo w oknie (bez blokowania GUI)
             with BielikAssistant() as assistant:
-                suggestion = assistant.suggest_use_expiring_products()
+                stream = assistant.stream_use_expiring_products()
 
-                # Pokaż odpowiedź w oknie dialogowym
-                dialog = ctk.CTkToplevel(self)
-                dialog.title("🦅 Bielik - Sugestie dla wygasających produktów")
-                dialog.geometry("800x500")
+            # Pokaż odpowiedź w oknie dialogowym
+            dialog = ctk.CTkToplevel(self)
+            dialog.title("🦅 Bielik - Sugestie dla wygasających produktów")
+            dialog.geometry("800x500")
 
-                header = ctk.CTkLabel(
-                    dialog,
-                    text="🦅 Bielik - Sugestie",
-                    font=("Arial", 18, "bold"),
-                )
-                header.pack(pady=AppSpacing.SM)
+            header = ctk.CTkLabel(
+                dialog,
+                text="🦅 Bielik - Sugestie",
+                font=("Arial", 18, "bold"),
+            )
+            header.pack(pady=AppSpacing.SM)
 
-                scrollable = ctk.CTkScrollableFrame(dialog)
-                scrollable.pack(fill="both", expand=True, padx=AppSpacing.LG, pady=AppSpacing.SM)
+            scrollable = ctk.CTkScrollableFrame(dialog)
+            scrollable.pack(fill="both", expand=True, padx=AppSpacing.LG, pady=AppSpacing.SM)
 
-                suggestion_label = ctk.CTkLabel(
-                    scrollable,
-                    text=suggestion,
-                    font=("Arial", 12),
-                    wraplength=700,
-                    justify="left",
-                    anchor="w",
-                )
-                suggestion_label.pack(pady=AppSpacing.SM, padx=AppSpacing.SM, anchor="w")
+            suggestion_label = ctk.CTkLabel(
+                scrollable,
+                text="Bielik myśli...",
+                font=("Arial", 12),
+                wraplength=700,
+                justify="left",
+                anchor="w",
+            )
+            suggestion_label.pack(pady=AppSpacing.SM, padx=AppSpacing.SM, anchor="w")
 
-                ctk.CTkButton(
-                    dialog,
-                    text="Zamknij",
-                    command=dialog.destroy,
-                    width=150,
-                ).pack(pady=AppSpacing.SM)
+            ctk.CTkButton(
+                dialog,
+                text="Zamknij",
+                command=dialog.destroy,
+                width=150,
+            ).pack(pady=AppSpacing.SM)
+
+            stream_to_widget(
+                dialog, stream, on_text=lambda text: suggestion_label.configure(text=text)
+            )
 
         except Exception as e:
             self.notifications.show_error(f"Nie udało się uzyskać sugestii od Bielika: {str(e)}")
@@ -1989,6 +2026,7 @@ class App(ctk.CTk):
                 args=(
                     self.selected_file_path,
                     llm_model,
+                    self.deferred_review_var.get(),
                 ),
             )
             thread.daemon = True
@@ -2001,7 +2039,7 @@ class App(ctk.CTk):
             logger.error(f"Error starting processing: {e}")
             self.notifications.show_error(f"Nie udało się rozpocząć przetwarzania: {e}")
     
-    def _run_processing_with_cleanup(self, file_path, llm_model):
+    def _run_processing_with_cleanup(self, file_path, llm_model, deferred_review=False):
         """Wrapper for processing pipeline that ensures lock is released."""
         try:
             run_processing_pipeline(
@@ -2010,6 +2048,7 @@ class App(ctk.CTk):
                 self.log,
                 self.prompt_user,
                 self.review_user,
+                deferred_review=deferred_review,
             )
         finally:
             self.is_processing = False
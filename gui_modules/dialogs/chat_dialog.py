@@ -2,8 +2,11 @@ import customtkinter as ctk
 import threading
 
 from src.bielik import BielikAssistant
+from src.chat_storage import ChatStorage
+from src.config import Config
+from src.llm import ChatStream
 from src.unified_design_system import AppColors, AppSpacing, Icons
-from src.gui_optimizations import ToolTip
+from src.gui_optimizations import ToolTip, stream_to_widget
 
 class BielikChatDialog(ctk.CTkToplevel):
     """Okno czatu z asystentem Bielik"""
@@ -13,6 +16,9 @@ class BielikChatDialog(ctk.CTkToplevel):
         self.title("🦅 Bielik - Asystent Kulinarny")
         self.geometry("800x600")
         self.assistant = None
+        # Rozmowa w ChatStorage (tworzona przy pierwszym pytaniu)
+        self.conversation_id = None
+        self._storage_lock = threading.Lock()
 
         # Header
         header_frame = ctk.CTkFrame(self)
@@ -72,8 +78,8 @@ class BielikChatDialog(ctk.CTkToplevel):
             else:
                 print(f"Błąd inicjalizacji Bielika: {e}")
 
-    def add_message(self, sender: str, message: str):
-        """Dodaje wiadomość do czatu"""
+    def add_message(self, sender: str, message: str) -> ctk.CTkLabel:
+        """Dodaje wiadomość do czatu i zwraca jej etykietę (do aktualizacji przy strumieniu)"""
         # Ramka dla wiadomości
         msg_frame = ctk.CTkFrame(self.chat_frame)
         msg_frame.pack(fill="x", padx=AppSpacing.XS, pady=AppSpacing.XS)
@@ -97,11 +103,20 @@ class BielikChatDialog(ctk.CTkToplevel):
             anchor="w",
         )
         msg_label.pack(fill="x", padx=AppSpacing.SM, pady=AppSpacing.XS)
+        msg_label.sender_text = sender_text
 
-        # Przewiń do dołu
-        self.chat_frame.update()
+        self._scroll_to_bottom()
+        return msg_label
+
+    def _scroll_to_bottom(self):
+        self.chat_frame.update_idletasks()
         self.chat_frame._parent_canvas.yview_moveto(1.0)
 
+    def _update_message(self, label: ctk.CTkLabel, text: str):
+        """Podmienia treść wiadomości (kolejne fragmenty strumienia)"""
+        label.configure(text=f"{label.sender_text} {text}")
+        self._scroll_to_bottom()
+
     def send_message(self):
         """Wysyła wiadomość do Bielika"""
         question = self.input_entry.get().strip()
@@ -118,33 +133,62 @@ class BielikChatDialog(ctk.CTkToplevel):
         self.send_button.configure(state="disabled")
         self.status_label.configure(text="Bielik myśli...", text_color=AppColors.WARNING)
 
-        # Uruchom w osobnym wątku, żeby nie blokować GUI
-        thread = threading.Thread(target=self.process_question, args=(question,))
-        thread.daemon = True
-        thread.start()
+        # Odpowiedź pojawia się token po tokenie - wątek w tle czyta strumień z Ollamy
+        answer_label = self.add_message("Bielik", "")
+        stream_holder = {}
+        stream_to_widget(
+            self,
+            self._answer_chunks(question, stream_holder),
+            on_text=lambda text: self._update_message(answer_label, text),
+            on_done=lambda text: self._on_answer_done(question, stream_holder.get("stream")),
+        )
 
-    def process_question(self, question: str):
-        """Przetwarza pytanie w osobnym wątku"""
+    def _answer_chunks(self, question: str, stream_holder: dict):
+        """Fragmenty odpowiedzi (w wątku w tle)"""
         try:
             if not self.assistant:
                 self.init_assistant()
-
-            answer = self.assistant.answer_question(question)
-
-            # Aktualizuj GUI w głównym wątku
-            self.after(0, lambda: self.add_message("Bielik", answer))
-            self.after(
-                0,
-                lambda: self.status_label.configure(text="Gotowy", text_color=AppColors.SUCCESS),
-            )
-            self.after(0, lambda: self.send_button.configure(state="normal"))
+            stream = self.assistant.stream_answer_question(question)
         except Exception as e:
-            error_msg = f"Przepraszam, wystąpił błąd: {str(e)}"
-            self.after(0, lambda: self.add_message("Bielik", error_msg))
-            self.after(
-                0, lambda: self.status_label.configure(text="Błąd", text_color=AppColors.ERROR)
-            )
-            self.after(0, lambda: self.send_button.configure(state="normal"))
+            stream = ChatStream(text=f"Przepraszam, wystąpił błąd: {str(e)}")
+        stream_holder["stream"] = stream
+        yield from stream
+
+    def _on_answer_done(self, question: str, stream):
+        """Koniec odpowiedzi (w głównym wątku): status, przycisk, zapis rozmowy"""
+        self.send_button.configure(state="normal")
+        if stream is None or stream.error is not None:
+            self.status_label.configure(text="Błąd", text_color=AppColors.ERROR)
+        else:
+            status = f"Gotowy ({stream.response_time_ms / 1000:.1f} s"
+            if stream.first_token_ms:
+                status += f", pierwszy token po {stream.first_token_ms} ms"
+            self.status_label.configure(text=status + ")", text_color=AppColors.SUCCESS)
+        if stream is not None:
+            thread = threading.Thread(target=self._save_exchange, args=(question, stream))
+            thread.daemon = True
+            thread.start()
+
+    def _save_exchange(self, question: str, stream):
+        """Zapisuje pytanie i odpowiedź (z czasem i liczbą tokenów) w ChatStorage"""
+        with self._storage_lock:
+            try:
+                with ChatStorage() as storage:
+                    if self.conversation_id is None:
+                        self.conversation_id = storage.create_conversation(
+                            title=question[:50], model_used=Config.TEXT_MODEL
+                        )
+                    storage.save_message(self.conversation_id, "user", question)
+                    storage.save_message(
+                        self.conversation_id,
+                        "assistant",
+                        stream.text,
+                        response_time_ms=stream.response_time_ms,
+                        tokens_used=stream.tokens_used,
+                        rag_context_used=True,
+                    )
+            except Exception as e:
+                print(f"BŁĄD: Nie udało się zapisać rozmowy z Bielikiem: {e}")
 
     def on_close(self):
         """Zamyka okno i zwalnia zasoby"""
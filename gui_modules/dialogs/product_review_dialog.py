@@ -0,0 +1,83 @@
+import customtkinter as ctk
+
+from src.product_review import apply_review_decisions, load_pending_reviews
+from src.unified_design_system import AppColors, AppSpacing, Icons, adjust_color
+
+
+class ProductReviewDialog(ctk.CTkToplevel):
+    """
+    Kolejka weryfikacji produktów zapisanych z tymczasowym mapowaniem.
+    Wszystkie decyzje są zapisywane razem, w jednej transakcji.
+    """
+
+    def __init__(self, parent, log_callback=None):
+        super().__init__(parent)
+        self.title("Weryfikacja produktów")
+        self.geometry("800x600")
+        self.log_callback = log_callback
+        self.result = None
+        self.rows = []
+
+        self.pending = load_pending_reviews()
+
+        header = ctk.CTkLabel(
+            self,
+            text=f"Produkty do weryfikacji: {len(self.pending)}",
+            font=("Arial", 16, "bold"),
+        )
+        header.pack(pady=AppSpacing.SM, padx=AppSpacing.SM, anchor="w")
+
+        self.list_frame = ctk.CTkScrollableFrame(self)
+        self.list_frame.pack(fill="both", expand=True, padx=AppSpacing.SM, pady=AppSpacing.XS)
+        self.list_frame.grid_columnconfigure(1, weight=1)
+
+        for col, text in enumerate(["Nazwa z paragonu", "Produkt", "Pozycje", "Pomiń"]):
+            ctk.CTkLabel(self.list_frame, text=text, font=("Arial", 12, "bold")).grid(
+                row=0, column=col, padx=AppSpacing.XS, pady=AppSpacing.XS, sticky="w"
+            )
+
+        for index, entry in enumerate(self.pending, start=1):
+            ctk.CTkLabel(self.list_frame, text=entry["raw_name"], anchor="w").grid(
+                row=index, column=0, padx=AppSpacing.XS, pady=2, sticky="w"
+            )
+            name_entry = ctk.CTkEntry(self.list_frame, width=300)
+            name_entry.grid(row=index, column=1, padx=AppSpacing.XS, pady=2, sticky="ew")
+            if entry["provisional_name"]:
+                name_entry.insert(0, entry["provisional_name"])
+            ctk.CTkLabel(self.list_frame, text=str(entry["count"])).grid(
+                row=index, column=2, padx=AppSpacing.XS, pady=2
+            )
+            skip_var = ctk.BooleanVar(value=False)
+            ctk.CTkCheckBox(self.list_frame, text="", variable=skip_var, width=20).grid(
+                row=index, column=3, padx=AppSpacing.XS, pady=2
+            )
+            self.rows.append((entry["raw_name"], name_entry, skip_var))
+
+        buttons = ctk.CTkFrame(self, fg_color="transparent")
+        buttons.pack(fill="x", padx=AppSpacing.SM, pady=AppSpacing.SM)
+        ctk.CTkButton(
+            buttons,
+            text=f"{Icons.SAVE} Zatwierdź wszystkie",
+            command=self.on_save,
+            fg_color=AppColors.SUCCESS,
+            hover_color=adjust_color(AppColors.SUCCESS, -15),
+            state="normal" if self.pending else "disabled",
+        ).pack(side="right", padx=AppSpacing.XS)
+        ctk.CTkButton(buttons, text="Anuluj", command=self.destroy).pack(
+            side="right", padx=AppSpacing.XS
+        )
+
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+        self.after(100, self.grab_set)  # Make modal
+
+    def on_save(self):
+        decisions = {}
+        for raw_name, name_entry, skip_var in self.rows:
+            name = name_entry.get().strip()
+            if skip_var.get():
+                decisions[raw_name] = None
+            elif name:
+                decisions[raw_name] = name
+            # Puste pole bez zaznaczonego "Pomiń" - pozycja zostaje w kolejce
+        self.result = apply_review_decisions(decisions, self.log_callback or (lambda msg: None))
+        self.destroy()
@@ -2,11 +2,12 @@ import os
 import customtkinter as ctk
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from PIL import Image
+from pdf2image import convert_from_path
 from sqlalchemy.orm import sessionmaker, joinedload
 
 from src.database import engine, AliasProduktu
 from src.normalization_rules import find_static_match
+from src.receipt_image import load_receipt_image
 from src.unified_design_system import AppColors, AppSpacing, Icons, adjust_color
 from src.unified_design_system import AppColors, AppSpacing, Icons, adjust_color
 from src.gui_optimizations import ToolTip
@@ -87,7 +88,12 @@ class ReviewDialog(ctk.CTkToplevel):
             self.preview_scroll.pack(fill="both", expand=True)
             
             try:
-                img = Image.open(file_path)
+                if file_path.lower().endswith(".pdf"):
+                    # PDF bez konwersji (Mistral OCR) - podgląd pierwszej strony
+                    img = convert_from_path(file_path, dpi=100, first_page=1, last_page=1)[0]
+                else:
+                    # Ten sam zdekodowany obraz co w OCR i LLM (bez ponownego czytania pliku)
+                    img = load_receipt_image(file_path).image
                 # Resize for display (width ~450px, keep aspect ratio)
                 # Zwiększamy nieco domyślną szerokość dla lepszej czytelności
                 target_width = 500
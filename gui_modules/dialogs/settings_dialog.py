@@ -2,6 +2,7 @@ import os
 import customtkinter as ctk
 
 from src.config import Config
+from src.ocr import reset_engines
 from src.config_prompts import (
     load_prompts,
     save_prompts,
@@ -43,7 +44,7 @@ class SettingsDialog(ctk.CTkToplevel):
         self.ocr_engine_var = ctk.StringVar(value=Config.OCR_ENGINE)
         self.ocr_engine_combo = ctk.CTkComboBox(
             ocr_frame,
-            values=["tesseract", "easyocr"],
+            values=["tesseract", "tesserocr", "easyocr"],
             variable=self.ocr_engine_var,
             width=200,
         )
@@ -175,6 +176,9 @@ class SettingsDialog(ctk.CTkToplevel):
                 f.writelines(new_lines)
 
             # Aktualizuj Config w pamięci
+            if Config.USE_GPU_OCR != self.use_gpu_var.get():
+                # Załadowane instancje EasyOCR mają zapisany tryb GPU/CPU
+                reset_engines()
             Config.OCR_ENGINE = new_ocr_engine
             Config.USE_GPU_OCR = self.use_gpu_var.get()
 
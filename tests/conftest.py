@@ -4,6 +4,14 @@ Konfiguracja pytest - wspólne fixtures
 import sys
 import os
 
+# Testy nie mogą czytać ani zapisywać trwałego cache parsowania w ReceiptParser/data
+os.environ.setdefault("PARSE_CACHE_ENABLED", "false")
+os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("JOB_STORE_ENABLED", "false")
+os.environ.setdefault("TRACE_ENABLED", "false")
+os.environ.setdefault("OCR_WARMUP", "false")
+
 # Dodaj ścieżkę do modułów
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
 
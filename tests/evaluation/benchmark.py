@@ -0,0 +1,259 @@
+"""
+Benchmark przepustowości pełnego potoku bez Ollamy (lokalny FakeOllamaServer).
+
+Odtwarza paragony z paragony/ oraz przypadki z ground_truth.json (pliki z
+paragony/ lub ReceiptParser/data/receipts, a brakujące są renderowane do PNG
+z danych ground truth) przez pełny potok: PDF -> OCR -> LLM -> normalizacja
+-> zapis do tymczasowej bazy. Serwer zwraca odpowiedź ground truth dla sklepu
+rozpoznanego w treści żądania, z zadanym opóźnieniem i szybkością tokenów.
+
+Raport: paragony/s, p50/p95/p99 etapów (ze spanów tracing), liczba zapytań
+SQL i żądań LLM. Wynik można zapisać jako baseline i porównać z kolejnym
+uruchomieniem:
+
+    python tests/evaluation/benchmark.py --save-baseline baseline.json
+    python tests/evaluation/benchmark.py --compare baseline.json --mode asyncio
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fake_ollama import FakeOllamaServer
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
+GROUND_TRUTH_FILE = os.path.join(os.path.dirname(__file__), "ground_truth.json")
+RECEIPT_DIRS = [
+    os.path.join(PROJECT_ROOT, "paragony"),
+    os.path.join(PROJECT_ROOT, "ReceiptParser", "data", "receipts"),
+]
+RECEIPT_EXTENSIONS = (".png", ".jpg", ".jpeg", ".pdf")
+MODES = ("sequential", "batch", "asyncio")
+
+
+def load_ground_truth() -> Dict[str, Any]:
+    with open(GROUND_TRUTH_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def render_receipt_image(expected: Dict[str, Any], output_path: str) -> str:
+    """Renderuje paragon z danych ground truth jako prosty obraz PNG (dla OCR)."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    shop = expected.get("sklep_info", {})
+    info = expected.get("paragon_info", {})
+    lines = [shop.get("nazwa", ""), shop.get("lokalizacja") or "", info.get("data_zakupu", ""), ""]
+    for item in expected.get("pozycje", []):
+        lines.append(f"{item['nazwa_raw']}  {item['ilosc']} x {item['cena_jedn']}  {item['cena_calk']}")
+        if item.get("rabat") not in (None, "0.00"):
+            lines.append(f"Rabat  -{item['rabat']}")
+    lines += ["", f"SUMA PLN  {info.get('suma_calkowita', '')}"]
+
+    try:
+        font = ImageFont.load_default(size=28)
+    except TypeError:
+        font = ImageFont.load_default()
+    image = Image.new("L", (900, 60 + 40 * len(lines)), color=255)
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((30, 30 + 40 * index), line, fill=0, font=font)
+    image.save(output_path)
+    return output_path
+
+
+def collect_inputs(ground_truth: Dict[str, Any], work_dir: str) -> List[str]:
+    """Kopiuje pliki paragonów do katalogu roboczego (jedna kopia każdego pliku)."""
+    inputs: Dict[str, str] = {}
+    source_dir = os.path.join(PROJECT_ROOT, "paragony")
+    if os.path.isdir(source_dir):
+        for name in sorted(os.listdir(source_dir)):
+            if name.lower().endswith(RECEIPT_EXTENSIONS):
+                inputs[name] = os.path.join(source_dir, name)
+
+    for name, expected in ground_truth.items():
+        if name in inputs:
+            continue
+        found = [os.path.join(d, name) for d in RECEIPT_DIRS if os.path.exists(os.path.join(d, name))]
+        if found:
+            inputs[name] = found[0]
+        else:
+            rendered = os.path.splitext(name)[0] + "_gt.png"
+            inputs[rendered] = render_receipt_image(expected, os.path.join(work_dir, "_" + rendered))
+
+    receipts_dir = os.path.join(work_dir, "receipts")
+    os.makedirs(receipts_dir, exist_ok=True)
+    paths = []
+    for name, path in inputs.items():
+        target = os.path.join(receipts_dir, name)
+        shutil.copyfile(path, target)
+        paths.append(target)
+    return paths
+
+
+def build_responses(ground_truth: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Odpowiedzi serwera: nazwa sklepu -> dane ground truth (pierwszy przypadek jako domyślny)."""
+    responses = {}
+    for expected in ground_truth.values():
+        # Ground truth nie zawiera pola 'jednostka', które model zwraca zawsze
+        for item in expected.get("pozycje", []):
+            item.setdefault("jednostka", None)
+        store = expected.get("sklep_info", {}).get("nazwa")
+        if store:
+            responses.setdefault(store.lower(), expected)
+    default_response = next(iter(ground_truth.values()), {})
+    return responses, default_response
+
+
+def _run_receipts(mode: str, files: List[str], receipts_dir: str, model: str) -> Dict[str, Any]:
+    """Przetwarza paragony w wybranym trybie; zwraca liczbę zapisanych i błędy."""
+    from src.batch_processing import process_directory
+    from src.main import load_processed_receipt, run_processing_pipeline
+    from src.dedup import compute_file_hash
+
+    def log(message: str, progress: Optional[float] = None, status: Optional[str] = None):
+        pass
+
+    def prompt(prompt_text: str, default_value: str, raw_name: str) -> str:
+        return default_value
+
+    if mode == "sequential":
+        for file_path in files:
+            run_processing_pipeline(file_path, model, log, prompt, deferred_review=True)
+        saved = [f for f in files if load_processed_receipt(compute_file_hash(f))]
+        return {"saved": len(saved), "failed": len(files) - len(saved)}
+
+    if mode == "batch":
+        result = process_directory(receipts_dir, model, log, prompt, deferred_review=True)
+    else:
+        from src.async_pipeline import process_receipts
+
+        result = asyncio.run(process_receipts(receipts_dir, model, log, prompt, deferred_review=True))
+    return {"saved": len(result.saved), "failed": len(result.failed) + len(result.skipped)}
+
+
+def run_benchmark(
+    mode: str = "sequential",
+    latency: float = 0.2,
+    token_rate: float = 200.0,
+    model: str = "llava:latest",
+) -> Dict[str, Any]:
+    """
+    Uruchamia benchmark w tymczasowym katalogu (baza, ślady, cache wyłączone).
+
+    Returns:
+        Słownik z wynikami (receipts_per_sec, stages, db_queries, llm_requests...)
+    """
+    ground_truth = load_ground_truth()
+    responses, default_response = build_responses(ground_truth)
+    work_dir = tempfile.mkdtemp(prefix="paragon_bench_")
+    server = FakeOllamaServer(responses, default_response, latency=latency, token_rate=token_rate)
+
+    try:
+        with server:
+            # Konfiguracja musi być ustawiona przed importem src (klient Ollama, baza, ślady)
+            os.environ.update(
+                {
+                    "OLLAMA_HOST": server.url,
+                    "RECEIPTS_DB_PATH": os.path.join(work_dir, "receipts.db"),
+                    "TRACE_ENABLED": "true",
+                    "TRACE_PATH": os.path.join(work_dir, "traces.jsonl"),
+                    "PARSE_CACHE_ENABLED": "false",
+                    "JOB_STORE_ENABLED": "false",
+                }
+            )
+            sys.path.insert(0, os.path.join(PROJECT_ROOT, "ReceiptParser"))
+            from sqlalchemy import event
+
+            from src.database import Base, engine
+            from src.tracing import aggregate_spans, load_spans
+
+            Base.metadata.create_all(bind=engine)
+            files = collect_inputs(ground_truth, work_dir)
+
+            db_queries = {"count": 0}
+
+            def _count_query(*args):
+                db_queries["count"] += 1
+
+            event.listen(engine, "before_cursor_execute", _count_query)
+            start = time.perf_counter()
+            outcome = _run_receipts(mode, files, os.path.dirname(files[0]), model)
+            elapsed = time.perf_counter() - start
+            event.remove(engine, "before_cursor_execute", _count_query)
+
+            stages = aggregate_spans(load_spans(os.environ["TRACE_PATH"]))
+            llm_requests = list(server.requests)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "mode": mode,
+        "latency": latency,
+        "token_rate": token_rate,
+        "receipts": len(files),
+        "saved": outcome["saved"],
+        "failed": outcome["failed"],
+        "elapsed_s": round(elapsed, 3),
+        "receipts_per_sec": round(outcome["saved"] / elapsed, 3) if elapsed > 0 else 0.0,
+        "db_queries": db_queries["count"],
+        "db_queries_per_receipt": round(db_queries["count"] / max(1, len(files)), 1),
+        "llm_requests": len(llm_requests),
+        "llm_prompt_tokens": sum(r["prompt_tokens"] for r in llm_requests),
+        "llm_completion_tokens": sum(r["completion_tokens"] for r in llm_requests),
+        "stages": stages,
+    }
+
+
+def format_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """Formatuje wynik benchmarku (z różnicami względem baseline, jeśli podany)."""
+
+    def _delta(key: str, value: float, reference: Optional[Dict[str, Any]]) -> str:
+        if not reference or not reference.get(key):
+            return ""
+        return f" ({(value - reference[key]) / reference[key]:+.1%})"
+
+    lines = [
+        f"--- Benchmark ({result['mode']}, opóźnienie {result['latency']} s, "
+        f"{result['token_rate']} tok/s) ---",
+        f"Paragony: {result['receipts']} | zapisane: {result['saved']} | błędy: {result['failed']}",
+        f"Czas: {result['elapsed_s']:.2f} s | przepustowość: {result['receipts_per_sec']:.3f} paragonów/s"
+        + _delta("receipts_per_sec", result["receipts_per_sec"], baseline),
+        f"Zapytania SQL: {result['db_queries']} ({result['db_queries_per_receipt']}/paragon)"
+        + _delta("db_queries", result["db_queries"], baseline),
+        f"Żądania LLM: {result['llm_requests']} | tokeny: {result['llm_prompt_tokens']} we / "
+        f"{result['llm_completion_tokens']} wy",
+        f"{'Etap':<26}{'n':>5}{'p50 [s]':>10}{'p95 [s]':>10}{'p99 [s]':>10}",
+    ]
+    base_stages = (baseline or {}).get("stages", {})
+    for name, stats in sorted(result["stages"].items()):
+        lines.append(
+            f"{name:<26}{stats['count']:>5}{stats['p50']:>10.3f}{stats['p95']:>10.3f}"
+            f"{stats['p99']:>10.3f}" + _delta("p50", stats["p50"], base_stages.get(name))
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline pipeline throughput benchmark")
+    parser.add_argument("--mode", choices=MODES, default="sequential", help="Pipeline variant to run")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency per request (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake generation speed (tokens/s)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare results with a saved baseline")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.mode, args.latency, args.token_rate)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(result, baseline))
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Zapisano baseline: {args.save_baseline}")
@@ -0,0 +1,202 @@
+"""
+Lokalny zastępnik serwera Ollama do testów wydajności bez GPU i bez modeli.
+
+Serwer obsługuje POST /api/chat (z i bez strumieniowania) oraz GET /api/tags
+i /api/version. Czas odpowiedzi = latency + liczba tokenów odpowiedzi / token_rate,
+a liczba tokenów (prompt_eval_count / eval_count) jest szacowana jako
+liczba znaków / 4, więc spany LLM mają realistyczne liczniki.
+
+Odpowiedzi:
+- batch normalizacji ("Znormalizuj następujące produkty") - JSON z pierwszym
+  słowem każdej nazwy,
+- normalizacja pojedynczej nazwy - pierwsze słowo nazwy,
+- parsowanie paragonu - gotowy JSON z `responses` wybrany po znaczniku
+  (np. nazwie sklepu) występującym w wiadomościach użytkownika, w przeciwnym razie `default_response`.
+
+Przykład:
+    with FakeOllamaServer(responses={"lidl": lidl_json}, latency=0.5) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+"""
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+BATCH_MARKER = "Znormalizuj następujące produkty"
+SINGLE_NAME_PATTERN = re.compile(r'Nazwa z paragonu: "(.+)"')
+BATCH_NAME_PATTERN = re.compile(r'^\s*- "(.+)"\s*$')
+
+
+def estimate_tokens(text: str) -> int:
+    """Przybliżona liczba tokenów (ok. 4 znaki na token)."""
+    return max(1, len(text) // 4)
+
+
+def _first_word(name: str) -> str:
+    words = name.split()
+    return words[0].capitalize() if words else name
+
+
+class FakeOllamaServer:
+    """
+    Serwer HTTP udający Ollamę, uruchamiany w wątku w tle.
+
+    Attributes:
+        responses: Słownik znacznik (małe litery) -> odpowiedź JSON dla paragonu
+        default_response: Odpowiedź, gdy żaden znacznik nie pasuje
+        latency: Stały czas odpowiedzi w sekundach
+        token_rate: Szybkość generowania w tokenach/s (0 = bez opóźnienia)
+        requests: Lista żądań (model, rodzaj, tokeny) w kolejności obsługi
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, Dict[str, Any]]] = None,
+        default_response: Optional[Dict[str, Any]] = None,
+        latency: float = 0.0,
+        token_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.responses = {marker.lower(): data for marker, data in (responses or {}).items()}
+        self.default_response = default_response or {}
+        self.latency = latency
+        self.token_rate = token_rate
+        self.requests: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def reply(self, messages: List[Dict[str, Any]]) -> tuple:
+        """Zwraca (rodzaj żądania, treść odpowiedzi) dla listy wiadomości."""
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        if BATCH_MARKER in prompt:
+            names_section = prompt.split(BATCH_MARKER, 1)[1]
+            names = [
+                match.group(1)
+                for match in map(BATCH_NAME_PATTERN.match, names_section.splitlines())
+                if match
+            ]
+            return "normalize", json.dumps(
+                {name: _first_word(name) for name in names}, ensure_ascii=False
+            )
+        single = SINGLE_NAME_PATTERN.search(prompt)
+        if single:
+            return "normalize", _first_word(single.group(1))
+
+        # Prompt systemowy zawiera przykłady z nazwami sklepów - szukamy tylko w treści użytkownika
+        lowered = "\n".join(
+            str(message.get("content", "")) for message in messages if message.get("role") != "system"
+        ).lower()
+        for marker, data in self.responses.items():
+            if marker in lowered:
+                return "receipt", json.dumps(data, ensure_ascii=False)
+        return "receipt", json.dumps(self.default_response, ensure_ascii=False)
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload: Dict[str, Any]) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": []})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                messages = request.get("messages") or []
+                kind, content = fake.reply(messages)
+
+                prompt_tokens = sum(
+                    estimate_tokens(str(message.get("content", ""))) for message in messages
+                )
+                completion_tokens = estimate_tokens(content)
+                delay = fake.latency
+                if fake.token_rate > 0:
+                    delay += completion_tokens / fake.token_rate
+                time.sleep(delay)
+                with fake._lock:
+                    fake.requests.append(
+                        {
+                            "model": request.get("model"),
+                            "kind": kind,
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": completion_tokens,
+                        }
+                    )
+
+                final = {
+                    "model": request.get("model", ""),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "done": True,
+                    "done_reason": "stop",
+                    "total_duration": int(delay * 1e9),
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": completion_tokens,
+                }
+                if request.get("stream", True):
+                    chunk = {
+                        "model": final["model"],
+                        "created_at": final["created_at"],
+                        "message": {"role": "assistant", "content": content},
+                        "done": False,
+                    }
+                    body = (
+                        json.dumps(chunk, ensure_ascii=False)
+                        + "\n"
+                        + json.dumps({**final, "message": {"role": "assistant", "content": ""}})
+                        + "\n"
+                    ).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self._send_json({**final, "message": {"role": "assistant", "content": content}})
+
+        return Handler
@@ -0,0 +1,135 @@
+"""
+Benchmark przygotowania obrazu (src.preprocessing) przed OCR i modelem wizyjnym.
+
+Dla każdego paragonu z paragony/ (PDF konwertowane do obrazu) oraz przypadków
+z ground_truth.json (brakujące pliki renderowane i lekko obracane, jak zdjęcie)
+porównuje OCR oryginału i obrazu przygotowanego:
+
+- czas OCR (z czasem przygotowania),
+- trafność: odsetek nazw pozycji z ground truth odnalezionych w tekście OCR,
+- rozmiar pliku trafiającego do OCR i do _call_vision_llm.
+
+    python tests/evaluation/preprocess_benchmark.py
+    python tests/evaluation/preprocess_benchmark.py --skew 3 --vision-dpi 150
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmark import PROJECT_ROOT, collect_inputs, load_ground_truth
+
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "ReceiptParser"))
+
+
+def item_recall(ocr_text: str, expected: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Odsetek nazw pozycji ground truth obecnych w tekście OCR (dopasowanie rozmyte)."""
+    from rapidfuzz import fuzz
+
+    names = [item["nazwa_raw"] for item in (expected or {}).get("pozycje", [])]
+    if not names:
+        return None
+    lines = [line for line in ocr_text.splitlines() if line.strip()]
+    found = sum(1 for name in names if any(fuzz.partial_ratio(name, line) >= 80 for line in lines))
+    return found / len(names)
+
+
+def _as_image(path: str, skew: float) -> str:
+    """
+    PDF -> obraz (None gdy konwersja się nie uda).
+
+    Wyrenderowane przypadki ground truth są obracane o skew stopni.
+    """
+    from PIL import Image
+
+    from src.ocr import convert_pdf_to_image
+
+    if path.lower().endswith(".pdf"):
+        return convert_pdf_to_image(path)
+    if skew and path.endswith("_gt.png"):
+        with Image.open(path) as img:
+            img.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255).save(path)
+    return path
+
+
+def _timed_ocr(image_path: str, options) -> Dict[str, Any]:
+    from src.ocr import extract_text_from_image
+    from src.preprocessing import preprocessed_image
+
+    start = time.perf_counter()
+    with preprocessed_image(image_path, options) as ocr_path:
+        size = os.path.getsize(ocr_path)
+        text = extract_text_from_image(ocr_path)
+    return {"text": text, "seconds": time.perf_counter() - start, "bytes": size}
+
+
+def run_preprocess_benchmark(skew: float = 2.0, vision_dpi: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Zwraca wiersze wyników (plik, czasy, trafność i rozmiary przed/po)."""
+    from src.config import Config
+    from src.preprocessing import ocr_options, preprocess_or_original, vision_options
+
+    if vision_dpi:
+        Config.PREPROCESS_VISION_DPI = vision_dpi
+    ground_truth = load_ground_truth()
+    work_dir = tempfile.mkdtemp(prefix="paragon_preprocess_")
+    rows = []
+    try:
+        for path in collect_inputs(ground_truth, work_dir):
+            name = os.path.basename(path)
+            expected = ground_truth.get(name) or ground_truth.get(name.replace("_gt.png", ".png"))
+            image_path = _as_image(path, skew)
+            if not image_path:
+                print(f"OSTRZEŻENIE: Pomijam {name} (konwersja PDF nie powiodła się)")
+                continue
+
+            raw = _timed_ocr(image_path, None)
+            prepared = _timed_ocr(image_path, ocr_options())
+            vision_path = preprocess_or_original(image_path, vision_options())
+            vision_bytes = os.path.getsize(vision_path)
+            for temp_path in {vision_path, image_path} - {path}:
+                os.unlink(temp_path)
+
+            rows.append(
+                {
+                    "file": name,
+                    "ocr_s": (raw["seconds"], prepared["seconds"]),
+                    "recall": (item_recall(raw["text"], expected), item_recall(prepared["text"], expected)),
+                    "ocr_bytes": (raw["bytes"], prepared["bytes"]),
+                    "vision_bytes": (raw["bytes"], vision_bytes),
+                }
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return rows
+
+
+def format_preprocess_report(rows: List[Dict[str, Any]]) -> str:
+    def _pair(values, fmt: str) -> str:
+        return " -> ".join("-" if v is None else format(v, fmt) for v in values)
+
+    lines = [
+        f"{'Plik':<28}{'OCR [s]':>18}{'trafność':>16}{'OCR [kB]':>18}{'wizja [kB]':>18}",
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['file'][:27]:<28}{_pair(row['ocr_s'], '.2f'):>18}{_pair(row['recall'], '.0%'):>16}"
+            f"{_pair([b / 1024 for b in row['ocr_bytes']], '.0f'):>18}"
+            f"{_pair([b / 1024 for b in row['vision_bytes']], '.0f'):>18}"
+        )
+    if rows:
+        total_raw = sum(row["ocr_s"][0] for row in rows)
+        total_prepared = sum(row["ocr_s"][1] for row in rows)
+        lines.append(f"Łączny czas OCR: {total_raw:.2f} s -> {total_prepared:.2f} s")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR/vision image preprocessing benchmark")
+    parser.add_argument("--skew", type=float, default=2.0, help="Rotation applied to rendered receipts (deg)")
+    parser.add_argument("--vision-dpi", type=int, help="Override PREPROCESS_VISION_DPI")
+    args = parser.parse_args()
+
+    print(format_preprocess_report(run_preprocess_benchmark(args.skew, args.vision_dpi)))
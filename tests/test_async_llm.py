@@ -0,0 +1,143 @@
+"""
+Testy dla async_llm.py (asynchroniczny klient Ollama)
+"""
+import sys
+import os
+import asyncio
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import async_llm
+from src.llm import DEFAULT_VISION_SYSTEM_PROMPT
+
+
+RESPONSE = json.dumps(
+    {
+        "sklep_info": {"nazwa": "Lidl", "lokalizacja": None},
+        "paragon_info": {"data_zakupu": "2024-12-27", "suma_calkowita": "3,59"},
+        "pozycje": [
+            {
+                "nazwa_raw": "Produkt",
+                "ilosc": "1.0",
+                "cena_jedn": "3.59",
+                "cena_calk": "3.59",
+                "rabat": None,
+                "cena_po_rab": "3.59",
+            }
+        ],
+    }
+)
+
+
+class FakeAsyncClient:
+    """Zastępuje ollama.AsyncClient - liczy instancje i żądania w locie."""
+
+    instances = []
+
+    def __init__(self, host=None, **kwargs):
+        self.kwargs = kwargs
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+        FakeAsyncClient.instances.append(self)
+
+    async def chat(self, **kwargs):
+        self.calls.append(kwargs)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        content = kwargs["messages"][-1]["content"]
+        if "Znormalizuj" in content:
+            names = [
+                line.strip()[3:-1]
+                for line in content.splitlines()
+                if line.strip().startswith('- "') and "->" not in line
+            ]
+            return {"message": {"content": json.dumps({n: n.split()[0] for n in names})}}
+        return {"message": {"content": RESPONSE}}
+
+    async def close(self):
+        self.closed = True
+
+
+def _run(coro_factory):
+    """Uruchamia korutynę z podmienionym AsyncClient i zwraca (wynik, klienci)."""
+    FakeAsyncClient.instances = []
+
+    async def _main():
+        try:
+            return await coro_factory()
+        finally:
+            await async_llm.close_async_client()
+
+    with patch("src.async_llm.ollama.AsyncClient", FakeAsyncClient):
+        result = asyncio.run(_main())
+    return result, FakeAsyncClient.instances
+
+
+class TestAsyncParseReceipt:
+    """async parse_receipt / parse_receipt_from_text"""
+
+    def test_parse_receipt_converts_types(self, tmp_path):
+        image = tmp_path / "paragon.png"
+        image.write_bytes(b"obraz")
+
+        result, clients = _run(
+            lambda: async_llm.parse_receipt(str(image), "llava:latest", ocr_text="LIDL")
+        )
+
+        assert result["paragon_info"]["suma_calkowita"] == Decimal("3.59")
+        assert result["pozycje"][0]["rabat"] == Decimal("0.00")
+        call = clients[0].calls[0]
+        assert call["format"] == "json"
+        assert call["messages"][0]["content"] == DEFAULT_VISION_SYSTEM_PROMPT
+        assert call["messages"][1]["images"] == [b"obraz"]
+        assert clients[0].closed
+
+    def test_concurrent_requests_share_one_client_and_respect_limit(self, tmp_path):
+        image = tmp_path / "paragon.png"
+        image.write_bytes(b"obraz")
+
+        async def _many():
+            return await asyncio.gather(
+                *(async_llm.parse_receipt(str(image), "llava:latest") for _ in range(6)),
+                async_llm.parse_receipt_from_text("LIDL 3,59"),
+            )
+
+        with patch.object(async_llm.Config, "ASYNC_LLM_MAX_CONCURRENCY", 2):
+            results, clients = _run(_many)
+
+        assert all(r is not None for r in results)
+        assert len(clients) == 1
+        assert len(clients[0].calls) == 7
+        assert clients[0].max_in_flight == 2
+        assert clients[0].kwargs["limits"].max_connections == 2
+
+    def test_missing_image_returns_none_without_request(self, tmp_path):
+        result, clients = _run(
+            lambda: async_llm.parse_receipt(str(tmp_path / "brak.png"), "llava:latest")
+        )
+
+        assert result is None
+        assert clients == []
+
+
+class TestAsyncNormalization:
+    """async normalize_products_batch"""
+
+    @patch("src.async_llm.get_learning_examples", return_value=[])
+    def test_batches_are_sent_concurrently_and_merged(self, _mock_examples):
+        names = [f"Produkt{i} 500g" for i in range(7)]
+
+        result, clients = _run(
+            lambda: async_llm.normalize_products_batch(names, session=None, batch_size=3)
+        )
+
+        assert len(clients[0].calls) == 3
+        assert clients[0].max_in_flight == 3
+        assert result == {name: name.split()[0] for name in names}
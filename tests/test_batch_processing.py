@@ -0,0 +1,143 @@
+"""
+Testy dla batch_processing.py (przetwarzanie wsadowe katalogu paragonów)
+"""
+import sys
+import os
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.batch_processing import (
+    collect_receipt_files,
+    percentile,
+    process_directory,
+    BatchResult,
+)
+from src.dedup import compute_file_hash
+
+
+class TestCollectReceiptFiles:
+    """Testy wyszukiwania plików paragonów"""
+
+    def test_directory_filters_extensions(self, tmp_path):
+        (tmp_path / "a.pdf").write_bytes(b"x")
+        (tmp_path / "b.PNG").write_bytes(b"x")
+        (tmp_path / "notes.txt").write_text("x")
+
+        files = collect_receipt_files(str(tmp_path))
+
+        assert [os.path.basename(f) for f in files] == ["a.pdf", "b.PNG"]
+
+    def test_glob_pattern(self, tmp_path):
+        (tmp_path / "a.pdf").write_bytes(b"x")
+        (tmp_path / "b.jpg").write_bytes(b"x")
+
+        files = collect_receipt_files(str(tmp_path / "*.pdf"))
+
+        assert [os.path.basename(f) for f in files] == ["a.pdf"]
+
+
+class TestBatchStats:
+    """Testy statystyk przepustowości"""
+
+    def test_percentile(self):
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert percentile(values, 50) == 3.0
+        assert percentile(values, 95) == 4.8
+        assert percentile([], 50) == 0.0
+
+    def test_receipts_per_minute(self):
+        result = BatchResult()
+        result.saved = ["a", "b"]
+        result.elapsed = 30.0
+        assert result.receipts_per_minute == 4.0
+        assert "paragonów/min" in result.format_summary()
+
+
+class TestProcessDirectory:
+    """Testy process_directory z mockami etapów"""
+
+    @patch("src.main.load_processed_receipt", return_value=None)
+    @patch("src.main.save_parsed_receipt")
+    @patch("src.main.parse_receipt_text")
+    @patch("src.main.extract_receipt_text")
+    def test_processes_all_files(self, mock_ocr, mock_parse, mock_save, mock_load, tmp_path):
+        for name in ["a.png", "b.png", "c.png"]:
+            (tmp_path / name).write_bytes(name.encode())
+        mock_ocr.return_value = "LIDL"
+        mock_parse.side_effect = lambda path, model, text, log, job=None, **kwargs: {"pozycje": []}
+        mock_save.return_value = True
+
+        result = process_directory(
+            str(tmp_path),
+            "llava:latest",
+            lambda msg: None,
+            lambda *args: "",
+            ocr_workers=2,
+            llm_concurrency=2,
+            use_processes=False,
+        )
+
+        assert len(result.saved) == 3
+        assert result.failed == {}
+        assert mock_save.call_count == 3
+        stats = result.get_stats()
+        assert stats["ocr"]["count"] == 3
+        assert stats["db"]["count"] == 3
+
+    @patch("src.main.load_processed_receipt", return_value=None)
+    @patch("src.main.save_parsed_receipt")
+    @patch("src.main.parse_receipt_text")
+    @patch("src.main.extract_receipt_text")
+    def test_failed_llm_does_not_stop_batch(self, mock_ocr, mock_parse, mock_save, mock_load, tmp_path):
+        (tmp_path / "ok.png").write_bytes(b"ok")
+        (tmp_path / "bad.png").write_bytes(b"bad")
+        mock_ocr.return_value = "tekst"
+
+        def parse(path, model, text, log, job=None, **kwargs):
+            if path.endswith("bad.png"):
+                raise Exception("Parsowanie za pomocą LLM nie zwróciło danych.")
+            return {"pozycje": []}
+
+        mock_parse.side_effect = parse
+        mock_save.return_value = True
+
+        result = process_directory(
+            str(tmp_path),
+            "llava:latest",
+            lambda msg: None,
+            lambda *args: "",
+            use_processes=False,
+        )
+
+        assert [os.path.basename(f) for f in result.saved] == ["ok.png"]
+        assert [os.path.basename(f) for f in result.failed] == ["bad.png"]
+        assert mock_save.call_count == 1
+
+    @patch("src.main.load_processed_receipt")
+    @patch("src.main.save_parsed_receipt")
+    @patch("src.main.parse_receipt_text")
+    @patch("src.main.extract_receipt_text")
+    def test_duplicates_skipped_before_ocr(self, mock_ocr, mock_parse, mock_save, mock_load, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"paragon")
+        (tmp_path / "a_kopia.png").write_bytes(b"paragon")
+        (tmp_path / "stary.png").write_bytes(b"stary")
+        mock_load.side_effect = lambda file_hash: (7, {}) if file_hash == compute_file_hash(
+            str(tmp_path / "stary.png")
+        ) else None
+        mock_ocr.return_value = "tekst"
+        mock_parse.return_value = {"pozycje": []}
+        mock_save.return_value = True
+
+        result = process_directory(
+            str(tmp_path),
+            "llava:latest",
+            lambda msg: None,
+            lambda *args: "",
+            use_processes=False,
+        )
+
+        assert len(result.saved) == 1
+        assert len(result.skipped) == 2
+        assert mock_ocr.call_count == 1
+        assert "paragon ID: 7" in result.skipped[str(tmp_path / "stary.png")]
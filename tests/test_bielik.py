@@ -473,6 +473,62 @@ class TestBielikAssistantAnswerQuestion:
             self.assistant.close()
 
 
+class TestBielikAssistantStreaming:
+    """Testy strumieniowania odpowiedzi (ChatStream)"""
+
+    def setup_method(self):
+        self.assistant = BielikAssistant(session=MagicMock())
+        self.assistant._search_products_rag = Mock(return_value=[])
+        self.assistant.get_available_products = Mock(return_value=[])
+
+    @patch("src.bielik.client")
+    def test_stream_answer_question_yields_tokens(self, mock_client):
+        """Fragmenty od pierwszego tokenu, pełny tekst i liczba tokenów na końcu"""
+        mock_client.chat.return_value = iter(
+            [
+                {"message": {"content": "Masz "}, "done": False},
+                {"message": {"content": "mleko."}, "done": False},
+                {"message": {"content": ""}, "done": True, "prompt_eval_count": 40, "eval_count": 2},
+            ]
+        )
+
+        stream = self.assistant.stream_answer_question("co mam?")
+        assert mock_client.chat.call_count == 0  # żądanie dopiero przy czytaniu
+
+        assert list(stream) == ["Masz ", "mleko."]
+        assert stream.text == "Masz mleko."
+        assert stream.tokens_used == 42
+        assert stream.first_token_ms is not None and stream.response_time_ms >= stream.first_token_ms
+        assert mock_client.chat.call_args.kwargs["stream"] is True
+
+    @patch("src.bielik.client")
+    def test_stream_error_appends_message(self, mock_client):
+        """Zerwany strumień - zachowana część odpowiedzi i komunikat błędu"""
+
+        def broken():
+            yield {"message": {"content": "Masz"}, "done": False}
+            raise ConnectionError("zerwane połączenie")
+
+        mock_client.chat.return_value = broken()
+
+        stream = self.assistant.stream_answer_question("co mam?")
+        text = stream.read()
+
+        assert text.startswith("Masz") and "wystąpił błąd" in text
+        assert isinstance(stream.error, ConnectionError)
+
+    @patch("src.bielik.client", None)
+    def test_stream_without_client(self):
+        """Brak klienta - gotowy komunikat bez wywołania modelu"""
+        stream = self.assistant.stream_answer_question("co mam?")
+
+        assert "Ollama" in stream.read()
+        assert stream.response_time_ms == 0
+
+    def teardown_method(self):
+        self.assistant.close()
+
+
 class TestBielikHelperFunctions:
     """Testy dla funkcji pomocniczych"""
 
@@ -0,0 +1,179 @@
+"""
+Testy zbiorczego zapisu paragonu (save_to_database + bulk_write.py)
+"""
+import sys
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.database import (
+    Base,
+    AliasProduktu,
+    KategoriaProduktu,
+    Paragon,
+    Produkt,
+    StanMagazynowy,
+)
+from src.main import save_to_database
+
+
+class QueryCounter:
+    """Zlicza zapytania SQL wysłane do silnika."""
+
+    def __init__(self, engine):
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split()[0].upper())
+
+    def count(self, kind=None):
+        if kind is None:
+            return len(self.statements)
+        return self.statements.count(kind)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def session(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+def _item(name, ilosc="1.0", data_waznosci=None):
+    item = {
+        "nazwa_raw": name,
+        "ilosc": Decimal(ilosc),
+        "jednostka": None,
+        "cena_jedn": Decimal("2.00"),
+        "cena_calk": Decimal("2.00"),
+        "rabat": None,
+        "cena_po_rab": Decimal("2.00"),
+    }
+    if data_waznosci:
+        item["data_waznosci"] = data_waznosci
+    return item
+
+
+def _receipt(items):
+    return {
+        "sklep_info": {"nazwa": "Lidl", "lokalizacja": None},
+        "paragon_info": {
+            "data_zakupu": datetime(2024, 12, 27),
+            "suma_calkowita": Decimal("10.00"),
+        },
+        "pozycje": items,
+    }
+
+
+def _add_known_products(session, count):
+    kategoria = KategoriaProduktu(nazwa_kategorii="Nabiał")
+    for i in range(count):
+        produkt = Produkt(znormalizowana_nazwa=f"Produkt {i}", kategoria=kategoria)
+        session.add(AliasProduktu(nazwa_z_paragonu=f"RAW {i}", produkt=produkt))
+        session.add(StanMagazynowy(produkt=produkt, ilosc=Decimal("1.0")))
+    session.commit()
+
+
+def _save(session, items, prompt=lambda text, default, raw: default):
+    save_to_database(session, _receipt(items), "/tmp/p.png", lambda msg: None, prompt)
+    session.commit()
+
+
+class TestBulkSaveQueryCount:
+    """Liczba zapytań nie rośnie z liczbą pozycji"""
+
+    @pytest.mark.parametrize("count", [5, 60])
+    def test_known_products_constant_selects(self, engine, session, count):
+        _add_known_products(session, count)
+        counter = QueryCounter(engine)
+
+        _save(session, [_item(f"RAW {i}") for i in range(count)])
+
+        # Sklep + aliasy (z produktami) + stany magazynowe
+        assert counter.count("SELECT") == 3
+        # Wszystkie stany magazynowe aktualizowane jednym executemany
+        assert counter.count("UPDATE") == 1
+        # Sklep + paragon + pozycje (SQLite nie łączy INSERT ... RETURNING w batch)
+        assert counter.count("INSERT") == count + 2
+        assert session.query(StanMagazynowy).filter(StanMagazynowy.ilosc == 2).count() == count
+
+    @patch("src.main.get_product_metadata", return_value={"kategoria": "Pieczywo", "can_freeze": True})
+    @patch("src.llm.normalize_products_batch")
+    def test_new_products_single_flush(self, mock_batch, mock_meta, engine, session):
+        names = [f"Nowy {i}" for i in range(20)]
+        mock_batch.return_value = {name: f"Chleb {name}" for name in names}
+        counter = QueryCounter(engine)
+
+        _save(session, [_item(name) for name in names])
+
+        # Sklep, aliasy, produkty, kategorie (stany - brak, produkty są nowe)
+        assert counter.count("SELECT") == 4
+        assert session.query(Produkt).count() == 20
+        assert session.query(AliasProduktu).count() == 20
+        assert session.query(KategoriaProduktu).count() == 1
+
+
+class TestBulkSaveSemantics:
+    """Zachowanie identyczne z zapisem pozycja po pozycji"""
+
+    def test_stock_merged_by_product_and_expiry(self, session):
+        _add_known_products(session, 1)
+        expiry = date(2025, 1, 10)
+
+        _save(
+            session,
+            [
+                _item("RAW 0", "2.0"),
+                _item("RAW 0", "1.0"),
+                _item("RAW 0", "3.0", data_waznosci=expiry),
+            ],
+        )
+
+        stany = session.query(StanMagazynowy).order_by(StanMagazynowy.stan_id).all()
+        assert [s.ilosc for s in stany] == [Decimal("4.00"), Decimal("3.00")]
+        assert stany[1].data_waznosci == expiry
+        paragon = session.query(Paragon).one()
+        assert len(paragon.pozycje) == 3
+        assert stany[0].pozycja_paragonu_id == paragon.pozycje[1].pozycja_id
+
+    @patch("src.main.get_product_metadata", return_value={"kategoria": "Nabiał", "can_freeze": None})
+    @patch("src.llm.normalize_products_batch")
+    def test_prompt_once_per_raw_name_and_skip(self, mock_batch, mock_meta, session):
+        _add_known_products(session, 1)
+        mock_batch.return_value = {"XYZ 2%": "Produkt 0", "Reklamówka": "POMIŃ"}
+        prompts = []
+
+        def prompt(text, default, raw):
+            prompts.append(raw)
+            return default
+
+        _save(
+            session,
+            [_item("XYZ 2%"), _item("XYZ 2%"), _item("Reklamówka")],
+            prompt=prompt,
+        )
+
+        assert prompts == ["XYZ 2%"]
+        # Istniejący produkt, nowy alias, bez nowej kategorii
+        assert session.query(Produkt).count() == 1
+        assert session.query(KategoriaProduktu).count() == 1
+        alias = session.query(AliasProduktu).filter_by(nazwa_z_paragonu="XYZ 2%").one()
+        assert alias.produkt.znormalizowana_nazwa == "Produkt 0"
+        assert len(session.query(Paragon).one().pozycje) == 2
+        stan = session.query(StanMagazynowy).one()
+        assert stan.ilosc == Decimal("3.00")
@@ -0,0 +1,166 @@
+"""
+Testy cache zapytań z tagami tabel (db_cache + PurchaseAnalytics / FoodWasteTracker)
+"""
+import sys
+import os
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import db_cache
+from src.database import Base, Paragon, PozycjaParagonu, Produkt, Sklep, StanMagazynowy
+from src.db_cache import cached_query, clear_query_cache, get_cache_stats
+from src.food_waste_tracker import FoodWasteTracker
+from src.purchase_analytics import PurchaseAnalytics
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    clear_query_cache()
+    yield
+    clear_query_cache()
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+def _add_receipt(session, store, total):
+    sklep = session.query(Sklep).filter_by(nazwa_sklepu=store).first() or Sklep(nazwa_sklepu=store)
+    paragon = Paragon(
+        sklep=sklep, data_zakupu=date.today(), suma_paragonu=Decimal(total), plik_zrodlowy="p.png"
+    )
+    session.add(paragon)
+    session.commit()
+    return paragon
+
+
+class TestCachedQuery:
+    """cached_query - TTL, statystyki, kopie wyników"""
+
+    def test_ttl_is_honoured(self):
+        calls = []
+
+        @cached_query(max_age_seconds=60)
+        def query(value):
+            calls.append(value)
+            return [value]
+
+        with patch("src.db_cache.time.monotonic", return_value=1000.0):
+            assert query(1) == [1]
+            result = query(1)
+        result.append("zmiana")
+        with patch("src.db_cache.time.monotonic", return_value=1059.0):
+            assert query(1) == [1]
+        with patch("src.db_cache.time.monotonic", return_value=1061.0):
+            assert query(1) == [1]
+
+        assert calls == [1, 1]
+        assert query.cache_stats() == {"hits": 2, "misses": 2, "expired": 1, "hit_rate": 50.0}
+        assert get_cache_stats()["functions"][f"{__name__}.{query.__qualname__}"]["misses"] == 2
+
+    def test_none_result_is_cached(self):
+        calls = []
+
+        @cached_query()
+        def query():
+            calls.append(1)
+            return None
+
+        query()
+        query()
+        assert len(calls) == 1
+
+
+class TestWriteInvalidation:
+    """Zapis do tabeli unieważnia wyniki, które ją czytają"""
+
+    def test_commit_invalidates_analytics(self, Session):
+        _add_receipt(Session(), "Lidl", "10.00")
+        analytics = PurchaseAnalytics(Session())
+
+        assert analytics.get_spending_by_store() == [("Lidl", 10.0)]
+        analytics.get_spending_by_store()
+        assert PurchaseAnalytics.get_spending_by_store.cache_stats()["hits"] == 1
+
+        # Zapis z innej sesji (np. save_to_database) - wynik nie może być nieaktualny
+        _add_receipt(Session(), "Biedronka", "25.00")
+        assert analytics.get_spending_by_store() == [("Biedronka", 25.0), ("Lidl", 10.0)]
+        assert analytics.get_total_statistics()["total_receipts"] == 2
+
+    def test_unrelated_table_write_keeps_entries(self, Session):
+        _add_receipt(Session(), "Lidl", "10.00")
+        analytics = PurchaseAnalytics(Session())
+        analytics.get_spending_by_store()
+
+        session = Session()
+        session.add(Produkt(znormalizowana_nazwa="Mleko"))
+        session.commit()
+
+        analytics.get_spending_by_store()
+        assert PurchaseAnalytics.get_spending_by_store.cache_stats()["hits"] == 1
+
+    def test_bulk_update_and_rollback_invalidate_inventory(self, Session):
+        session = Session()
+        produkt = Produkt(znormalizowana_nazwa="Jogurt")
+        session.add(StanMagazynowy(produkt=produkt, ilosc=Decimal("2"), data_waznosci=date.today()))
+        session.commit()
+        tracker = FoodWasteTracker(Session())
+
+        assert tracker.get_expiring_products()[0]["ilosc"] == 2.0
+
+        # Masowy UPDATE (bez flush) przez sesję
+        writer = Session()
+        writer.execute(update(StanMagazynowy).values(ilosc=Decimal("5")))
+        writer.commit()
+        assert tracker.get_expiring_products()[0]["ilosc"] == 5.0
+
+        # Zmiana widoczna w tej samej sesji przed commit, wycofana przez rollback
+        stan = tracker.session.query(StanMagazynowy).one()
+        stan.ilosc = Decimal("7")
+        assert tracker.get_expiring_products()[0]["ilosc"] == 7.0
+        tracker.session.rollback()
+        assert tracker.get_expiring_products()[0]["ilosc"] == 5.0
+
+    def test_separate_databases_do_not_share_entries(self, Session):
+        _add_receipt(Session(), "Lidl", "10.00")
+        other = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=other)
+
+        assert PurchaseAnalytics(Session()).get_total_statistics()["total_receipts"] == 1
+        assert PurchaseAnalytics(sessionmaker(bind=other)()).get_total_statistics()["total_receipts"] == 0
+
+    def test_manual_invalidation(self, Session):
+        _add_receipt(Session(), "Lidl", "10.00")
+        analytics = PurchaseAnalytics(Session())
+        analytics.get_monthly_statistics()
+
+        assert db_cache.invalidate_tables(Paragon) == 1
+        assert db_cache.invalidate_tables(PozycjaParagonu) == 0
+
+    def test_backup_restore_clears_cache(self, Session, tmp_path):
+        from src.export_import import DatabaseBackup
+
+        _add_receipt(Session(), "Lidl", "10.00")
+        PurchaseAnalytics(Session()).get_spending_by_store()
+        backup = tmp_path / "backup.db"
+        Base.metadata.create_all(bind=create_engine(f"sqlite:///{backup}"))
+
+        # Podmiana pliku bazy omija sesję - listenery jej nie widzą
+        with patch("src.database.db_path", str(tmp_path / "receipts.db")):
+            assert DatabaseBackup.restore_backup(str(backup))
+        assert get_cache_stats()["size"] == 0
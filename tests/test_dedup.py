@@ -0,0 +1,123 @@
+"""
+Testy dla dedup.py (deduplikacja paragonów po hashu pliku)
+"""
+import sys
+import os
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.database import Base, Sklep, Paragon, PozycjaParagonu
+from src.dedup import compute_file_hash, find_receipt_by_hash, receipt_to_parsed_data
+from src.main import run_processing_pipeline
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _add_receipt(session, file_hash):
+    sklep = Sklep(nazwa_sklepu="Lidl", lokalizacja="Poznań")
+    paragon = Paragon(
+        sklep=sklep,
+        data_zakupu=date(2024, 12, 27),
+        suma_paragonu=Decimal("7.18"),
+        plik_zrodlowy="/tmp/lidl.png",
+        hash_pliku=file_hash,
+    )
+    paragon.pozycje.append(
+        PozycjaParagonu(
+            nazwa_z_paragonu_raw="HummusChipsy",
+            ilosc=Decimal("2.00"),
+            cena_jednostkowa=Decimal("3.59"),
+            cena_calkowita=Decimal("7.18"),
+            rabat=Decimal("0.00"),
+            cena_po_rabacie=Decimal("7.18"),
+        )
+    )
+    session.add(paragon)
+    session.commit()
+    return paragon
+
+
+class TestDedup:
+    """Testy hasha i wyszukiwania duplikatów"""
+
+    def test_compute_file_hash(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        path.write_bytes(b"zawartosc")
+        assert compute_file_hash(str(path)) == hashlib.sha256(b"zawartosc").hexdigest()
+
+    def test_find_and_replay(self, session):
+        _add_receipt(session, "abc")
+
+        paragon = find_receipt_by_hash(session, "abc")
+        data = receipt_to_parsed_data(paragon)
+
+        assert find_receipt_by_hash(session, "xyz") is None
+        assert data["sklep_info"]["nazwa"] == "Lidl"
+        assert data["paragon_info"]["data_zakupu"] == datetime(2024, 12, 27)
+        assert data["pozycje"][0]["nazwa_raw"] == "HummusChipsy"
+        assert data["pozycje"][0]["cena_po_rab"] == Decimal("7.18")
+
+    def test_unique_hash_index(self, session):
+        _add_receipt(session, "abc")
+        with pytest.raises(IntegrityError):
+            _add_receipt(session, "abc")
+
+
+class TestPipelineDuplicate:
+    """Testy pomijania duplikatów w run_processing_pipeline"""
+
+    @patch("src.main.extract_text_from_image")
+    @patch("src.main.load_processed_receipt")
+    def test_duplicate_skips_ocr(self, mock_load, mock_ocr, tmp_path):
+        path = tmp_path / "paragon.png"
+        path.write_bytes(b"x")
+        mock_load.return_value = (3, {"pozycje": []})
+        messages = []
+
+        run_processing_pipeline(
+            str(path), "llava:latest", messages.append, lambda *args: ""
+        )
+
+        mock_ocr.assert_not_called()
+        assert any("już przetworzony" in msg for msg in messages)
+
+    @patch("src.main.extract_text_from_image")
+    @patch("src.main.load_processed_receipt")
+    def test_replay_calls_review(self, mock_load, mock_ocr, tmp_path):
+        path = tmp_path / "paragon.png"
+        path.write_bytes(b"x")
+        stored = {
+            "sklep_info": {"nazwa": "Lidl", "lokalizacja": None},
+            "paragon_info": {"data_zakupu": datetime(2024, 1, 1), "suma_calkowita": Decimal("1.00")},
+            "pozycje": [],
+        }
+        mock_load.return_value = (3, stored)
+        reviewed = []
+
+        run_processing_pipeline(
+            str(path),
+            "llava:latest",
+            lambda msg: None,
+            lambda *args: "",
+            review_callback=reviewed.append,
+            on_duplicate="replay",
+        )
+
+        mock_ocr.assert_not_called()
+        assert reviewed == [stored]
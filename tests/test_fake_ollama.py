@@ -0,0 +1,51 @@
+"""
+Testy dla tests/evaluation/fake_ollama.py (lokalny zastępnik Ollamy do benchmarku)
+"""
+import sys
+import os
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+import ollama
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "evaluation"))
+
+from fake_ollama import FakeOllamaServer
+from benchmark import build_responses, load_ground_truth
+from src.llm import normalize_batch, parse_receipt_from_text
+
+
+@pytest.fixture
+def server():
+    responses, default_response = build_responses(load_ground_truth())
+    with FakeOllamaServer(responses, default_response, latency=0.05) as fake:
+        with patch("src.llm.client", ollama.Client(host=fake.url)):
+            yield fake
+
+
+class TestFakeOllamaServer:
+    """Odpowiedzi serwera przez prawdziwego klienta ollama"""
+
+    def test_receipt_response_selected_by_store_name(self, server):
+        start = time.perf_counter()
+        result = parse_receipt_from_text("BIEDRONKA Kostrzyn\nSUMA PLN 114,14")
+
+        assert time.perf_counter() - start >= 0.05
+        assert result["sklep_info"]["nazwa"] == "Biedronka"
+        assert result["paragon_info"]["suma_calkowita"] == Decimal("114.14")
+        assert server.requests[0]["kind"] == "receipt"
+        assert server.requests[0]["prompt_tokens"] > 0
+
+    def test_unknown_store_gets_default_response(self, server):
+        result = parse_receipt_from_text("SKLEP XYZ\nSUMA 1,00")
+
+        assert result["sklep_info"]["nazwa"] == "Lidl"
+
+    def test_batch_normalization_returns_mapping(self, server):
+        result = normalize_batch(["Kozel 0% piwo", "Mleko UHT 3,2 1l"], learning_examples=[])
+
+        assert result == {"Kozel 0% piwo": "Kozel", "Mleko UHT 3,2 1l": "Mleko"}
+        assert [r["kind"] for r in server.requests] == ["normalize"]
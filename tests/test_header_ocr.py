@@ -0,0 +1,109 @@
+"""
+Testy szybkiego OCR nagłówka (wykrywanie sklepu przed pełnym OCR)
+"""
+import sys
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr
+from src.config import Config
+from src.main import detect_store_from_header, extract_with_strategy_setup
+from src.strategies import LidlStrategy
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "paragon.png"
+    Image.new("RGB", (1200, 5000), color="white").save(path)
+    return str(path)
+
+
+class TestHeaderOcr:
+    """header_band / extract_header_text"""
+
+    def test_band_is_top_of_receipt_at_low_resolution(self):
+        with patch.object(Config, "HEADER_OCR_BAND_RATIO", 0.5), patch.object(Config, "HEADER_OCR_WIDTH", 300):
+            band = ocr.header_band(Image.new("RGB", (1200, 5000)))
+
+        assert band.size == (300, 150)
+        assert band.mode == "L"
+
+    @patch("src.ocr.pytesseract")
+    def test_tesseract_reads_header_with_restricted_charset(self, mock_pytesseract, image_path):
+        mock_pytesseract.image_to_string.return_value = "LIDL sp. z o.o."
+        ocr.reset_engines()
+
+        with patch.object(Config, "OCR_ENGINE", "tesseract"):
+            assert ocr.extract_header_text(image_path) == "LIDL sp. z o.o."
+
+        img = mock_pytesseract.image_to_string.call_args.args[0]
+        config = mock_pytesseract.image_to_string.call_args.kwargs["config"]
+        assert img.width == Config.HEADER_OCR_WIDTH
+        assert "tessedit_char_whitelist=" in config and "--psm 6" in config
+        ocr.reset_engines()
+
+    @patch("src.main.extract_header_text")
+    def test_store_detected_only_when_known(self, mock_header, image_path):
+        mock_header.return_value = "LIDL sp. z o.o.\nPoznańska 48"
+        assert isinstance(detect_store_from_header(image_path, "llava:latest"), LidlStrategy)
+        assert detect_store_from_header(image_path, "mistral-ocr") is None
+
+        mock_header.return_value = "SKLEP XYZ"
+        assert detect_store_from_header(image_path, "llava:latest") is None
+
+
+class TestStrategySetup:
+    """extract_with_strategy_setup - pełny OCR równolegle z wykrywaniem sklepu"""
+
+    @patch("src.main.extract_header_text")
+    def test_header_detection_overlaps_full_ocr(self, mock_header, image_path):
+        ocr_started = threading.Event()
+        header_done = threading.Event()
+        waited = {}
+
+        def header(path):
+            waited["header"] = ocr_started.wait(timeout=5)
+            header_done.set()
+            return "LIDL"
+
+        def full_ocr():
+            ocr_started.set()
+            waited["ocr"] = header_done.wait(timeout=5)
+            return "LIDL pełny tekst"
+
+        mock_header.side_effect = header
+        with patch.object(Config, "HEADER_OCR", True):
+            text, strategy, vision_image_path = extract_with_strategy_setup(
+                image_path, "llava:latest", full_ocr
+            )
+
+        try:
+            assert waited == {"header": True, "ocr": True}
+            assert text == "LIDL pełny tekst"
+            assert isinstance(strategy, LidlStrategy)
+            assert vision_image_path and os.path.exists(vision_image_path)
+        finally:
+            if vision_image_path != image_path:
+                os.unlink(vision_image_path)
+
+    @patch("src.main.extract_header_text", return_value="LIDL")
+    @patch("src.main.preprocess_or_original")
+    def test_prepared_image_removed_when_ocr_fails(self, mock_prepare, _mock_header, image_path, tmp_path):
+        prepared = tmp_path / "wizja.png"
+        prepared.write_bytes(b"x")
+        mock_prepare.return_value = str(prepared)
+
+        def failing_ocr():
+            raise RuntimeError("OCR nie działa")
+
+        with patch.object(Config, "HEADER_OCR", True):
+            with pytest.raises(RuntimeError):
+                extract_with_strategy_setup(image_path, "llava:latest", failing_ocr)
+
+        assert not prepared.exists()
@@ -0,0 +1,119 @@
+"""
+Testy dla job_store.py (zadania z punktami kontrolnymi etapów i wznawianie potoku)
+"""
+import sys
+import os
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.job_store import (
+    STAGE_IMAGE,
+    STAGE_NORMALIZATION,
+    STAGE_OCR,
+    STAGE_PARSED,
+    STATUS_DONE,
+    STATUS_FAILED,
+    JobStore,
+)
+from src.main import run_processing_pipeline
+
+
+PARSED = {
+    "sklep_info": {"nazwa": "Lidl", "lokalizacja": None},
+    "paragon_info": {"data_zakupu": datetime(2024, 12, 27, 16, 34), "suma_calkowita": Decimal("3.59")},
+    "pozycje": [
+        {
+            "nazwa_raw": "XYZ Produkt",
+            "ilosc": Decimal("1.0"),
+            "jednostka": None,
+            "cena_jedn": Decimal("3.59"),
+            "cena_calk": Decimal("3.59"),
+            "rabat": Decimal("0.00"),
+            "cena_po_rab": Decimal("3.59"),
+        }
+    ],
+}
+
+
+def _store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"), str(tmp_path / "artifacts"))
+
+
+class TestJobStore:
+    """Testy rekordów zadań i artefaktów"""
+
+    def test_artifacts_roundtrip_decimal_and_datetime(self, tmp_path):
+        job = _store(tmp_path).start("abc", "paragon.png", "llava")
+        job.save(STAGE_PARSED, PARSED)
+
+        assert job.load(STAGE_PARSED) == PARSED
+        assert job.load(STAGE_OCR) is None
+
+    def test_restart_keeps_artifacts_unless_model_changes(self, tmp_path):
+        store = _store(tmp_path)
+        store.start("abc", "paragon.png", "llava").save(STAGE_OCR, "LIDL")
+
+        assert store.start("abc", "paragon.png", "llava").load(STAGE_OCR) == "LIDL"
+        assert store.list_jobs()[0]["attempts"] == 2
+        assert store.start("abc", "paragon.png", "bielik").load(STAGE_OCR) is None
+
+    def test_done_removes_artifacts_and_kept_image(self, tmp_path):
+        store = _store(tmp_path)
+        temp_image = tmp_path / "temp.png"
+        temp_image.write_bytes(b"obraz")
+        job = store.start("abc", "paragon.pdf", "llava")
+        kept = job.keep_image(str(temp_image))
+
+        assert job.load_image() == kept
+        job.done()
+
+        assert not os.path.exists(kept)
+        assert store.get_artifact("abc", STAGE_IMAGE) is None
+        assert store.list_jobs() == []
+        assert store.list_jobs(incomplete_only=False)[0]["status"] == STATUS_DONE
+
+
+class TestPipelineResume:
+    """Wznawianie run_processing_pipeline od ostatniego ukończonego etapu"""
+
+    @patch("src.main.load_processed_receipt", return_value=None)
+    @patch("src.main.save_parsed_receipt")
+    @patch("src.main.parse_receipt_with_llm")
+    @patch("src.main.extract_receipt_text", return_value="LIDL sp. z o.o.")
+    def test_db_failure_resumes_without_ocr_and_llm(
+        self, mock_ocr, mock_llm, mock_save, _mock_load, tmp_path
+    ):
+        path = tmp_path / "paragon.png"
+        path.write_bytes(b"x")
+        store = _store(tmp_path)
+        mock_llm.side_effect = lambda *args, **kwargs: {
+            **PARSED,
+            "pozycje": [dict(p) for p in PARSED["pozycje"]],
+        }
+
+        def fail_after_normalization(*args, normalization_map, **kwargs):
+            normalization_map["XYZ Produkt"] = "Produkt"
+            return False
+
+        mock_save.side_effect = fail_after_normalization
+        with patch("src.main.get_job_store", return_value=store):
+            run_processing_pipeline(str(path), "llava:latest", lambda msg: None, lambda *a: "")
+
+            job = store.list_jobs()[0]
+            assert job["status"] == STATUS_FAILED
+            assert store.get_artifact(job["job_id"], STAGE_NORMALIZATION) == {
+                "XYZ Produkt": "Produkt"
+            }
+
+            mock_save.side_effect = None
+            mock_save.return_value = True
+            run_processing_pipeline(str(path), "llava:latest", lambda msg: None, lambda *a: "")
+
+        assert mock_ocr.call_count == 1
+        assert mock_llm.call_count == 1
+        assert mock_save.call_args.kwargs["normalization_map"] == {"XYZ Produkt": "Produkt"}
+        assert mock_save.call_args.args[0]["paragon_info"]["suma_calkowita"] == Decimal("3.59")
+        assert store.list_jobs() == []
@@ -0,0 +1,136 @@
+"""
+Testy OCR z układem (ramki słów -> wiersze paragonu, src.layout)
+"""
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import layout, ocr
+from src.config import Config
+from src.layout import make_word
+from src.ocr_cache import OCRResultCache
+
+
+def _biedronka_words(top=100):
+    """Pozycja Biedronki: kolumny z nierównymi górnymi krawędziami (lekki przekos)."""
+    return [
+        make_word("Mleko", 10, top, 70, top + 20),
+        make_word("UHT", 78, top + 1, 115, top + 21),
+        make_word("3,2", 123, top + 1, 150, top + 21),
+        make_word("3,49", 300, top + 2, 340, top + 22),
+        make_word("1.000", 380, top + 2, 430, top + 22),
+        make_word("x", 436, top + 3, 446, top + 23),
+        make_word("C", 500, top + 3, 512, top + 23),
+        make_word("3,49", 560, top + 4, 600, top + 24),
+    ]
+
+
+class TestRows:
+    """group_rows / layout_text"""
+
+    def test_scattered_columns_become_one_row(self):
+        words = _biedronka_words() + [
+            make_word("Rabat", 10, 130, 65, 150),
+            make_word("-0,50", 560, 131, 605, 151),
+        ]
+
+        text = layout.layout_text(list(reversed(words)))
+
+        assert text.splitlines() == [
+            "Mleko UHT 3,2 | 3,49 | 1.000 x | C | 3,49",
+            "Rabat | -0,50",
+        ]
+
+    def test_tesseract_data_skips_structure_entries(self):
+        data = {
+            "text": ["", "LIDL", "  "],
+            "conf": [-1, 91.5, 40],
+            "left": [0, 10, 50],
+            "top": [0, 5, 5],
+            "width": [600, 40, 10],
+            "height": [800, 20, 20],
+        }
+
+        words = layout.words_from_tesseract_data(data, offset_y=1000)
+
+        assert words == [{"text": "LIDL", "box": [10, 1005, 50, 1025], "conf": 91.5}]
+
+
+class TestStripWords:
+    """_ocr_words_in_strips - słowa z zakładki pasów brane tylko raz"""
+
+    def test_words_are_offset_and_not_duplicated(self):
+        img = Image.new("L", (200, 2000), color=255)
+        draw = ImageDraw.Draw(img)
+        for top in (100, 990, 1900):
+            draw.rectangle((10, top, 50, top + 20), fill=0)
+
+        def recognize_words(strip):
+            # "Słowo" w każdym ciągłym pasie wierszy z tuszem
+            ink_rows = np.flatnonzero((np.asarray(strip) < 128).any(axis=1))
+            groups = np.split(ink_rows, np.flatnonzero(np.diff(ink_rows) > 1) + 1)
+            return [make_word("słowo", 10, rows[0], 50, rows[-1] + 1) for rows in groups if rows.size]
+
+        with patch.object(Config, "OCR_STRIP_HEIGHT", 1000), patch.object(Config, "OCR_STRIP_OVERLAP", 40):
+            words = ocr._ocr_words_in_strips(img, recognize_words)
+
+        # Słowo na zakładce pasów (990) występuje tylko raz
+        assert sorted(word["box"][1] for word in words) == [100, 990, 1900]
+
+
+class TestLayoutMode:
+    """extract_text_from_image z OCR_LAYOUT=true"""
+
+    @pytest.fixture
+    def image_path(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        Image.new("L", (640, 300), color=255).save(path)
+        return str(path)
+
+    @patch("src.ocr.pytesseract")
+    def test_layout_text_and_boxes_are_cached(self, mock_pytesseract, image_path, tmp_path):
+        words = _biedronka_words()
+        mock_pytesseract.image_to_data.return_value = {
+            "text": [word["text"] for word in words],
+            "conf": [90] * len(words),
+            "left": [word["box"][0] for word in words],
+            "top": [word["box"][1] for word in words],
+            "width": [word["box"][2] - word["box"][0] for word in words],
+            "height": [word["box"][3] - word["box"][1] for word in words],
+        }
+        cache = OCRResultCache(str(tmp_path / "ocr.db"))
+        ocr.reset_engines()
+
+        with patch("src.ocr.get_ocr_cache", return_value=cache), patch.object(
+            Config, "OCR_ENGINE", "tesseract"
+        ), patch.object(Config, "OCR_LAYOUT", True):
+            first = ocr.extract_text_from_image(image_path)
+            second = ocr.extract_text_from_image(image_path)
+
+        ocr.reset_engines()
+        assert first == second == "Mleko UHT 3,2 | 3,49 | 1.000 x | C | 3,49"
+        mock_pytesseract.image_to_data.assert_called_once()
+        mock_pytesseract.image_to_string.assert_not_called()
+        key = (ocr._image_hash_for_cache(image_path), "tesseract", ocr._ocr_cache_params("tesseract", None, True))
+        assert len(cache.get(*key)["boxes"]) == len(words)
+
+    def test_engine_without_boxes_falls_back_to_plain_text(self, image_path):
+        class PlainEngine(ocr.OCREngine):
+            name = "plain"
+
+            def read_text(self, image_path):
+                return "zwykły tekst"
+
+        ocr.register_engine("plain", PlainEngine)
+        try:
+            with patch.object(Config, "OCR_ENGINE", "plain"), patch.object(Config, "OCR_LAYOUT", True):
+                assert ocr.extract_text_from_image(image_path) == "zwykły tekst"
+        finally:
+            ocr._engine_factories.pop("plain", None)
+            ocr.reset_engines()
@@ -0,0 +1,107 @@
+"""
+Testy trwałego cache odpowiedzi LLM (llm_cache.PersistentLLMResponseCache)
+"""
+import sys
+import os
+import multiprocessing
+import sqlite3
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import llm_cache
+from src.config import Config
+from src.llm_cache import LLMResponseCache, PersistentLLMResponseCache
+
+RESPONSE = {"message": {"role": "assistant", "content": "Mleko"}}
+
+
+def _write_from_other_process(db_path):
+    PersistentLLMResponseCache(db_path).set("Mleko UHT 3,2%", "bielik", RESPONSE)
+
+
+class TestPersistentCache:
+    """Klucz, TTL, limity rozmiaru i eviction"""
+
+    def test_shared_between_processes_with_same_key(self, tmp_path):
+        db_path = str(tmp_path / "llm.db")
+        process = multiprocessing.get_context("spawn").Process(
+            target=_write_from_other_process, args=(db_path,)
+        )
+        process.start()
+        process.join(timeout=60)
+
+        cache = PersistentLLMResponseCache(db_path)
+        # Ten sam znormalizowany prompt (białe znaki) co w pamięciowym LRU
+        assert cache.get("  Mleko   UHT 3,2% ", "bielik") == RESPONSE
+        assert cache._generate_key("Mleko UHT 3,2%", "bielik") == LLMResponseCache()._generate_key(
+            "Mleko  UHT 3,2%", "bielik"
+        )
+        assert cache.get("Mleko UHT 3,2%", "llava") is None
+
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 50.0)
+        assert stats["bytes_saved"] > len("Mleko UHT 3,2%")
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_expired_entries_miss_and_are_evicted(self, tmp_path):
+        cache = PersistentLLMResponseCache(str(tmp_path / "llm.db"), evict_interval=3600)
+        cache.set("krótki", "bielik", RESPONSE, ttl=0.05)
+        cache.set("długi", "bielik", RESPONSE)
+        time.sleep(0.1)
+
+        assert cache.get("krótki", "bielik") is None
+        cache.evict()
+        assert cache.get_stats()["size"] == 1
+
+    def test_size_limits_evict_least_recently_used_in_background(self, tmp_path):
+        probe = PersistentLLMResponseCache(str(tmp_path / "probe.db"))
+        probe.set("a", "bielik", RESPONSE)
+        entry_size = probe.get_stats()["total_bytes"]
+
+        cache = PersistentLLMResponseCache(
+            str(tmp_path / "llm.db"), max_bytes=2 * entry_size, evict_interval=3600
+        )
+        cache.set("a", "bielik", RESPONSE)
+        cache.set("b", "bielik", RESPONSE)
+        cache.get("a", "bielik")
+        cache.set("c", "bielik", RESPONSE)
+
+        deadline = time.time() + 5
+        while cache.get_stats()["size"] > 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get("b", "bielik") is None
+        assert cache.get("a", "bielik") == RESPONSE
+
+        too_big = PersistentLLMResponseCache(str(tmp_path / "big.db"), max_entry_bytes=10)
+        too_big.set("a", "bielik", RESPONSE)
+        assert too_big.get_stats()["size"] == 0
+
+    def test_database_errors_are_misses_not_exceptions(self, tmp_path):
+        corrupt = tmp_path / "llm.db"
+        corrupt.write_bytes(b"to nie jest baza SQLite" * 100)
+        cache = PersistentLLMResponseCache(str(corrupt))
+
+        # Uszkodzony plik nie może przerwać zapisu paragonu
+        cache.set("Mleko", "bielik", RESPONSE)
+        assert cache.get("Mleko", "bielik") is None
+        assert cache.misses == 1
+
+
+class TestGlobalCache:
+    """get_llm_cache / get_llm_cache_stats"""
+
+    def test_backend_follows_config(self, tmp_path):
+        with patch.object(Config, "LLM_CACHE_ENABLED", False):
+            assert llm_cache.get_llm_cache_stats()["backend"] == "memory"
+
+        with patch.object(Config, "LLM_CACHE_ENABLED", True), patch.object(
+            Config, "LLM_CACHE_PATH", str(tmp_path / "llm.db")
+        ), patch.object(llm_cache, "_persistent_cache", None):
+            llm_cache.get_llm_cache().set("Chleb", "bielik", RESPONSE)
+            assert llm_cache.get_llm_cache().get("Chleb", "bielik") == RESPONSE
+            stats = llm_cache.get_llm_cache_stats()
+
+        assert stats["backend"] == "sqlite" and stats["hit_rate"] == 100.0
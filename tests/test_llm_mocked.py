@@ -10,6 +10,9 @@ import json
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
 
+from src import llm_cache
+from src.config import Config
+from src.prompt_templates import PromptTemplates
 from src.llm import get_llm_suggestion, parse_receipt_with_llm, parse_receipt_from_text, _convert_types
 
 
@@ -50,6 +53,47 @@ class TestLLMSuggestion:
         
         assert result == "POMIŃ"
 
+    @patch('src.llm.client')
+    def test_get_llm_suggestion_uses_persistent_cache(self, mock_client, tmp_path):
+        """Test zapisu do trwałego cache i trafienia bez wywołania modelu"""
+        mock_client.chat.return_value = {
+            "message": {"content": "Kefir"}
+        }
+
+        with patch.object(Config, "LLM_CACHE_ENABLED", True), patch.object(
+            Config, "LLM_CACHE_PATH", str(tmp_path / "llm.db")
+        ), patch.object(llm_cache, "_persistent_cache", None):
+            first = get_llm_suggestion("Kefir naturalny 400g")
+            assert llm_cache.get_llm_cache_stats()["size"] == 1
+
+            second = get_llm_suggestion("Kefir naturalny 400g")
+            stats = llm_cache.get_llm_cache_stats()
+
+        assert first == second == "Kefir"
+        mock_client.chat.assert_called_once()
+        messages = mock_client.chat.call_args.kwargs["messages"]
+        assert messages[0]["role"] == "system" and "POMIŃ" in messages[0]["content"]
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    @patch('src.llm.client')
+    def test_get_llm_suggestion_cache_keyed_by_system_prompt(self, mock_client, tmp_path):
+        """Test zmiany promptu systemowego - wpis z poprzednim promptem nie jest używany"""
+        mock_client.chat.side_effect = [
+            {"message": {"content": "Kefir"}},
+            {"message": {"content": "Kefir naturalny"}},
+        ]
+
+        with patch.object(Config, "LLM_CACHE_ENABLED", True), patch.object(
+            Config, "LLM_CACHE_PATH", str(tmp_path / "llm.db")
+        ), patch.object(llm_cache, "_persistent_cache", None):
+            assert get_llm_suggestion("Kefir naturalny 400g") == "Kefir"
+            with patch.object(
+                PromptTemplates, "NORMALIZATION_SYSTEM_PROMPT", "Nowy prompt systemowy"
+            ):
+                assert get_llm_suggestion("Kefir naturalny 400g") == "Kefir naturalny"
+
+        assert mock_client.chat.call_count == 2
+
     @patch('src.llm.client', None)
     def test_get_llm_suggestion_no_client(self):
         """Test gdy klient Ollama nie jest dostępny"""
@@ -0,0 +1,193 @@
+"""
+Testy harmonogramu żądań LLM (src.llm_scheduler)
+"""
+import sys
+import os
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.llm_scheduler import (
+    LLMRequestCancelled,
+    LLMScheduler,
+    Priority,
+    ScheduledClient,
+    _parse_model_limits,
+    llm_priority,
+)
+
+
+def _wait_queued(scheduler, count):
+    deadline = time.time() + 5
+    while scheduler.get_stats()["queued"] < count and time.time() < deadline:
+        time.sleep(0.005)
+    assert scheduler.get_stats()["queued"] == count
+
+
+def _start(scheduler, model, priority, started, results=None, **kwargs):
+    def run():
+        try:
+            with scheduler.slot(model, priority, **kwargs):
+                started.append((model, priority))
+        except LLMRequestCancelled:
+            if results is not None:
+                results.append("anulowane")
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+class TestScheduling:
+    """Kolejność, limity per model, awans w kolejce"""
+
+    def test_priority_order_and_fifo_within_class(self):
+        scheduler = LLMScheduler(max_concurrent=1, aging_seconds=0)
+        started = []
+        blocker = scheduler.acquire("bielik", Priority.RECEIPT)
+
+        threads = []
+        for index, priority in enumerate(
+            [Priority.BATCH, Priority.RECEIPT, Priority.INTERACTIVE, Priority.BATCH]
+        ):
+            threads.append(_start(scheduler, f"m{index}", priority, started))
+            _wait_queued(scheduler, index + 1)
+
+        scheduler.release(blocker)
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert started == [
+            ("m2", Priority.INTERACTIVE),
+            ("m1", Priority.RECEIPT),
+            ("m0", Priority.BATCH),
+            ("m3", Priority.BATCH),
+        ]
+        stats = scheduler.get_stats()
+        assert stats["priorities"]["batch"]["started"] == 2
+        assert stats["priorities"]["batch"]["max_wait_ms"] > 0
+        assert stats["active"] == 0 and stats["queued"] == 0
+
+    def test_busy_model_does_not_block_other_models(self):
+        scheduler = LLMScheduler(max_concurrent=2, model_limits={"llava": 1})
+        started = []
+        blocker = scheduler.acquire("llava", Priority.INTERACTIVE)
+
+        llava = _start(scheduler, "llava", Priority.INTERACTIVE, started)
+        _wait_queued(scheduler, 1)
+        bielik = _start(scheduler, "bielik", Priority.BATCH, started)
+        bielik.join(timeout=5)
+
+        assert started == [("bielik", Priority.BATCH)]
+        assert scheduler.get_stats()["active_by_model"] == {"llava": 1}
+
+        scheduler.release(blocker)
+        llava.join(timeout=5)
+        assert started[-1] == ("llava", Priority.INTERACTIVE)
+
+    def test_waiting_request_is_promoted_by_aging(self):
+        scheduler = LLMScheduler(max_concurrent=1, aging_seconds=0.05)
+        started = []
+        blocker = scheduler.acquire("m", Priority.INTERACTIVE)
+        batch = _start(scheduler, "batch", Priority.BATCH, started)
+        _wait_queued(scheduler, 1)
+        time.sleep(0.12)
+        receipt = _start(scheduler, "receipt", Priority.RECEIPT, started)
+        _wait_queued(scheduler, 2)
+
+        scheduler.release(blocker)
+        batch.join(timeout=5)
+        receipt.join(timeout=5)
+
+        assert [model for model, _ in started] == ["batch", "receipt"]
+
+    def test_model_limits_parsing(self):
+        limits = _parse_model_limits("llava:latest=1, SpeakLeash/bielik:Q4_K_M=2,zle")
+        assert limits == {"llava:latest": 1, "SpeakLeash/bielik:Q4_K_M": 2}
+
+
+class TestCancellation:
+    """Anulowanie żądań czekających w kolejce"""
+
+    def test_cancel_event_and_cancel_pending(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        started, results = [], []
+        blocker = scheduler.acquire("m", Priority.RECEIPT)
+
+        cancel = threading.Event()
+        by_event = _start(scheduler, "a", Priority.RECEIPT, started, results, cancel_event=cancel)
+        by_class = _start(scheduler, "b", Priority.BATCH, started, results)
+        kept = _start(scheduler, "c", Priority.INTERACTIVE, started, results)
+        _wait_queued(scheduler, 3)
+
+        cancel.set()
+        by_event.join(timeout=5)
+        assert scheduler.cancel_pending(Priority.BATCH) == 1
+        by_class.join(timeout=5)
+        scheduler.release(blocker)
+        kept.join(timeout=5)
+
+        assert results == ["anulowane", "anulowane"]
+        assert started == [("c", Priority.INTERACTIVE)]
+        stats = scheduler.get_stats()["priorities"]
+        assert stats["receipt"]["cancelled"] == 1 and stats["batch"]["cancelled"] == 1
+
+    def test_async_task_cancellation_leaves_queue(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+
+        async def scenario():
+            blocker = await scheduler.acquire_async("m", Priority.RECEIPT)
+            waiting = asyncio.create_task(scheduler.acquire_async("m", Priority.BATCH))
+            await asyncio.sleep(0.01)
+            assert scheduler.get_stats()["queued"] == 1
+
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            scheduler.release(blocker)
+
+            async with scheduler.slot_async("m", Priority.INTERACTIVE):
+                return scheduler.get_stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["active"] == 1 and stats["queued"] == 0
+        assert stats["priorities"]["batch"]["cancelled"] == 1
+
+
+class TestScheduledClient:
+    """ScheduledClient - chat/generate przez harmonogram"""
+
+    def test_priority_from_client_and_context(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        inner = MagicMock()
+        client = ScheduledClient(inner, scheduler=scheduler)
+
+        client.chat(model="bielik", messages=[])
+        client.with_priority(Priority.INTERACTIVE).chat(model="bielik", messages=[])
+        with llm_priority(Priority.BATCH):
+            client.with_priority(Priority.INTERACTIVE).generate(model="bielik", prompt="x")
+
+        started = {
+            name: values["started"] for name, values in scheduler.get_stats()["priorities"].items()
+        }
+        assert started == {"interactive": 1, "receipt": 1, "batch": 1}
+        inner.chat.assert_called_with(model="bielik", messages=[])
+        assert client.list is inner.list
+
+    def test_stream_holds_slot_until_consumed(self):
+        scheduler = LLMScheduler(max_concurrent=1)
+        inner = MagicMock()
+        inner.chat.return_value = iter([{"message": {"content": "A"}}, {"message": {"content": "B"}}])
+        client = ScheduledClient(inner, scheduler=scheduler)
+
+        stream = client.chat(model="bielik", messages=[], stream=True)
+        assert next(stream)["message"]["content"] == "A"
+        assert scheduler.get_stats()["active"] == 1
+
+        assert [part["message"]["content"] for part in stream] == ["B"]
+        assert scheduler.get_stats()["active"] == 0
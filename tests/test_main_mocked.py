@@ -7,8 +7,12 @@ from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 from decimal import Decimal
 
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
 
+from src.database import Base, AliasProduktu, Produkt
 from src.main import save_to_database, resolve_product
 from src.data_models import ParsedData
 
@@ -53,9 +57,9 @@ class TestSaveToDatabase:
         def mock_prompt(prompt_text, default, raw_name):
             return prompt_responses.get(raw_name, default)
         
-        # Mock resolve_product
-        with patch('src.main.resolve_product') as mock_resolve:
-            mock_resolve.return_value = 1  # produkt_id
+        # Mock wyboru produktu (alias / sugestia / prompt)
+        with patch('src.main._choose_product_name') as mock_choose:
+            mock_choose.return_value = "Mleko"  # znormalizowana nazwa
             
             save_to_database(
                 mock_session,
@@ -112,23 +116,24 @@ class TestSaveToDatabase:
             assert len(add_calls) == 0
 
 
+def _memory_session():
+    """Sesja na pustej bazie w pamięci (resolve_product zapisuje przez ReceiptWriteCache)."""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
 class TestResolveProduct:
-    """Testy dla resolve_product z mockami"""
+    """Testy dla resolve_product (ta sama ścieżka zapisu co save_to_database)"""
 
     @patch('src.main.get_product_metadata')
     @patch('src.main.find_static_match')
     def test_resolve_existing_alias(self, mock_find_static, mock_get_metadata):
         """Test gdy alias już istnieje w bazie"""
-        mock_session = MagicMock()
-        
-        # Mock aliasu
-        mock_alias = MagicMock()
-        mock_alias.produkt_id = 5
-        mock_produkt = MagicMock()
-        mock_produkt.znormalizowana_nazwa = "Mleko"
-        mock_alias.produkt = mock_produkt
-        
-        mock_session.query.return_value.options.return_value.filter_by.return_value.first.return_value = mock_alias
+        session = _memory_session()
+        produkt = Produkt(znormalizowana_nazwa="Mleko")
+        session.add(AliasProduktu(nazwa_z_paragonu="Mleko UHT", produkt=produkt))
+        session.flush()
         
         log_messages = []
         
@@ -138,68 +143,20 @@ class TestResolveProduct:
         def mock_prompt(prompt_text, default, raw_name):
             return default
         
-        result = resolve_product(mock_session, "Mleko UHT", mock_log, mock_prompt)
+        result = resolve_product(session, "Mleko UHT", mock_log, mock_prompt)
         
-        assert result == 5
+        assert result == produkt.produkt_id
         assert "Znaleziono alias" in log_messages[0]
+        mock_find_static.assert_not_called()
 
     @patch('src.main.get_product_metadata')
     @patch('src.main.find_static_match')
     def test_resolve_static_match(self, mock_find_static, mock_get_metadata):
         """Test gdy produkt pasuje do reguły statycznej"""
-        mock_session = MagicMock()
-        
-        # Brak aliasu
-        mock_query_alias = MagicMock()
-        mock_query_alias.options.return_value.filter_by.return_value.first.return_value = None
+        session = _memory_session()
         
         # Reguła statyczna zwraca "Mleko"
         mock_find_static.return_value = "Mleko"
-        
-        # Brak produktu w bazie
-        mock_query_produkt = MagicMock()
-        mock_query_produkt.filter_by.return_value.first.return_value = None
-        
-        # Mock kategorii
-        mock_query_kategoria = MagicMock()
-        mock_kategoria = MagicMock()
-        mock_kategoria.kategoria_id = 1
-        mock_query_kategoria.filter_by.return_value.first.return_value = mock_kategoria
-        
-        # Konfiguracja query chain - musimy użyć callable który zwraca odpowiednie query
-        def query_side_effect(model_class):
-            if 'AliasProduktu' in str(model_class):
-                return mock_query_alias
-            elif 'Produkt' in str(model_class):
-                return mock_query_produkt
-            elif 'KategoriaProduktu' in str(model_class):
-                return mock_query_kategoria
-            return MagicMock()
-        
-        mock_session.query = query_side_effect
-        
-        # Mock produktu który zostanie utworzony
-        mock_product = MagicMock()
-        mock_product.produkt_id = 10
-        
-        # Mock add - symuluje dodanie obiektów
-        added_objects = []
-        def add_side_effect(obj):
-            added_objects.append(obj)
-            # Jeśli to produkt, ustaw produkt_id
-            if hasattr(obj, 'znormalizowana_nazwa') and hasattr(obj, 'kategoria_id'):
-                obj.produkt_id = 10
-        mock_session.add = add_side_effect
-        
-        # Mock flush - po flush produkt ma ID
-        def flush_side_effect():
-            for obj in added_objects:
-                if hasattr(obj, 'znormalizowana_nazwa') and not hasattr(obj, 'produkt_id'):
-                    obj.produkt_id = 10
-                elif hasattr(obj, 'nazwa_kategorii') and not hasattr(obj, 'kategoria_id'):
-                    obj.kategoria_id = 1
-        mock_session.flush = flush_side_effect
-        
         mock_get_metadata.return_value = {"kategoria": "Nabiał", "can_freeze": True}
         
         log_messages = []
@@ -210,70 +167,32 @@ class TestResolveProduct:
         def mock_prompt(prompt_text, default, raw_name):
             return "Mleko"  # Użytkownik akceptuje sugestię
         
-        result = resolve_product(mock_session, "Mleko UHT 3,2%", mock_log, mock_prompt)
+        result = resolve_product(session, "Mleko UHT 3,2%", mock_log, mock_prompt)
         
-        # Powinno utworzyć nowy produkt i alias
-        assert len(added_objects) >= 2  # Kategoria + Produkt + Alias
-        assert result == 10  # produkt_id
+        # Powinno utworzyć kategorię, produkt i alias
+        produkt = session.query(Produkt).filter_by(znormalizowana_nazwa="Mleko").one()
+        alias = session.query(AliasProduktu).filter_by(nazwa_z_paragonu="Mleko UHT 3,2%").one()
+        assert result == produkt.produkt_id
+        assert alias.produkt_id == produkt.produkt_id
+        assert produkt.kategoria.nazwa_kategorii == "Nabiał"
 
     @patch('src.main.get_llm_suggestion')
     @patch('src.main.get_product_metadata')
     @patch('src.main.find_static_match')
     def test_resolve_llm_suggestion(self, mock_find_static, mock_get_metadata, mock_llm):
         """Test gdy używa się sugestii LLM"""
-        mock_session = MagicMock()
-        
-        # Brak aliasu
-        mock_query_alias = MagicMock()
-        mock_query_alias.options.return_value.filter_by.return_value.first.return_value = None
+        session = _memory_session()
         
-        # Brak reguły statycznej
+        # Brak reguły statycznej, LLM sugeruje "Chleb"
         mock_find_static.return_value = None
-        
-        # LLM sugeruje "Chleb"
         mock_llm.return_value = "Chleb"
-        
-        # Brak produktu w bazie
-        mock_query_produkt = MagicMock()
-        mock_query_produkt.filter_by.return_value.first.return_value = None
-        
-        # Mock kategorii
-        mock_query_kategoria = MagicMock()
-        mock_kategoria = MagicMock()
-        mock_kategoria.kategoria_id = 2
-        mock_query_kategoria.filter_by.return_value.first.return_value = mock_kategoria
-        
-        def query_side_effect(model_class):
-            if 'AliasProduktu' in str(model_class):
-                return mock_query_alias
-            elif 'Produkt' in str(model_class):
-                return mock_query_produkt
-            elif 'KategoriaProduktu' in str(model_class):
-                return mock_query_kategoria
-            return MagicMock()
-        
-        mock_session.query = query_side_effect
-        
-        # Mock add - symuluje dodanie obiektów
-        added_objects = []
-        def add_side_effect(obj):
-            added_objects.append(obj)
-            # Jeśli to produkt, ustaw produkt_id
-            if hasattr(obj, 'znormalizowana_nazwa') and hasattr(obj, 'kategoria_id'):
-                obj.produkt_id = 20
-        mock_session.add = add_side_effect
-        
-        # Mock flush - po flush produkt ma ID
-        def flush_side_effect():
-            for obj in added_objects:
-                if hasattr(obj, 'znormalizowana_nazwa') and not hasattr(obj, 'produkt_id'):
-                    obj.produkt_id = 20
-                elif hasattr(obj, 'nazwa_kategorii') and not hasattr(obj, 'kategoria_id'):
-                    obj.kategoria_id = 2
-        mock_session.flush = flush_side_effect
-        
         mock_get_metadata.return_value = {"kategoria": "Pieczywo", "can_freeze": True}
         
+        # Produkt już istnieje w bazie - nowy jest tylko alias
+        chleb = Produkt(znormalizowana_nazwa="Chleb")
+        session.add(chleb)
+        session.flush()
+        
         log_messages = []
         
         def mock_log(msg):
@@ -282,16 +201,17 @@ class TestResolveProduct:
         def mock_prompt(prompt_text, default, raw_name):
             return "Chleb"
         
-        result = resolve_product(mock_session, "Chleb Baltonowski", mock_log, mock_prompt)
+        with patch('src.llm.get_learning_examples', return_value=[]):
+            result = resolve_product(session, "Chleb Baltonowski", mock_log, mock_prompt)
         
         assert "Sugestia (LLM)" in str(log_messages)
-        assert result == 20  # produkt_id
+        assert result == chleb.produkt_id
+        assert chleb.kategoria.nazwa_kategorii == "Pieczywo"
 
     @patch('src.main.find_static_match')
     def test_resolve_skip_product(self, mock_find_static):
         """Test gdy produkt powinien być pominięty"""
-        mock_session = MagicMock()
-        mock_session.query.return_value.options.return_value.filter_by.return_value.first.return_value = None
+        session = _memory_session()
         mock_find_static.return_value = "POMIŃ"
         
         log_messages = []
@@ -302,7 +222,7 @@ class TestResolveProduct:
         def mock_prompt(prompt_text, default, raw_name):
             return ""  # Użytkownik pomija
         
-        result = resolve_product(mock_session, "Reklamówka", mock_log, mock_prompt)
+        result = resolve_product(session, "Reklamówka", mock_log, mock_prompt)
         
         assert result is None
-
+        assert session.query(AliasProduktu).count() == 0
@@ -0,0 +1,95 @@
+"""
+Testy dla ocr_cache.py (trwały cache wyników OCR)
+"""
+import sys
+import os
+import zlib
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr
+from src.config import Config
+from src.ocr_cache import OCRResultCache
+from src.preprocessing import PreprocessOptions
+
+
+class TestOCRResultCache:
+    """Testy klucza, kompresji i eviction"""
+
+    def test_roundtrip_with_boxes_and_stats(self, tmp_path):
+        cache = OCRResultCache(str(tmp_path / "ocr.db"))
+        text = "LIDL\n" + "Mleko 3,49\n" * 50
+        boxes = [{"text": "LIDL", "box": [10, 10, 80, 30]}]
+
+        assert cache.get("abc", "tesseract", {"languages": "pol+eng"}) is None
+        cache.set("abc", "tesseract", {"languages": "pol+eng"}, text, boxes)
+
+        assert cache.get("abc", "tesseract", {"languages": "pol+eng"}) == {"text": text, "boxes": boxes}
+        stats = cache.get_stats()
+        assert (stats["entries"], stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 1, 50.0)
+        assert stats["total_bytes"] < len(text)
+
+    def test_key_depends_on_image_engine_and_params(self, tmp_path):
+        cache = OCRResultCache(str(tmp_path / "ocr.db"))
+        cache.set("abc", "tesseract", {"languages": "pol+eng"}, "tekst")
+
+        assert cache.get("abd", "tesseract", {"languages": "pol+eng"}) is None
+        assert cache.get("abc", "easyocr", {"languages": "pol+eng"}) is None
+        assert cache.get("abc", "tesseract", {"languages": "pol"}) is None
+
+    def test_size_based_eviction_removes_least_recently_used(self, tmp_path):
+        texts = {name: f"paragon {name} " + "0123456789abcdef" for name in "abc"}
+        entry_size = len(zlib.compress(texts["a"].encode("utf-8")))
+        cache = OCRResultCache(str(tmp_path / "ocr.db"), max_bytes=2 * entry_size)
+        for name in ["a", "b"]:
+            cache.set(name, "tesseract", None, texts[name])
+        cache.get("a", "tesseract")
+        cache.set("c", "tesseract", None, texts["c"])
+
+        assert cache.get("a", "tesseract") is not None
+        assert cache.get("b", "tesseract") is None
+        assert cache.get("c", "tesseract") is not None
+
+
+class TestTransparentCache:
+    """extract_text_from_image korzysta z cache bez zmian po stronie wywołujących"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = OCRResultCache(str(tmp_path / "ocr.db"))
+        with patch("src.ocr.get_ocr_cache", return_value=cache), patch.object(Config, "OCR_ENGINE", "tesseract"):
+            yield cache
+
+    @pytest.fixture
+    def image_path(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        Image.new("L", (200, 300), color=255).save(path)
+        return str(path)
+
+    @patch("src.ocr.extract_text_from_image_tesseract", return_value="LIDL\nSUMA 3,49")
+    def test_second_call_skips_engine(self, mock_tesseract, cache, image_path):
+        assert ocr.extract_text_from_image(image_path) == "LIDL\nSUMA 3,49"
+        assert ocr.extract_text_from_image(image_path) == "LIDL\nSUMA 3,49"
+
+        mock_tesseract.assert_called_once()
+        assert cache.get_stats()["hits"] == 1
+
+    @patch("src.ocr.extract_text_from_image_tesseract", return_value="LIDL")
+    def test_preprocessing_params_are_part_of_key(self, mock_tesseract, cache, image_path):
+        ocr.extract_text_from_image(image_path, preprocess=PreprocessOptions(target_dpi=300))
+        ocr.extract_text_from_image(image_path, preprocess=PreprocessOptions(target_dpi=200))
+        ocr.extract_text_from_image(image_path, preprocess=PreprocessOptions(target_dpi=200))
+
+        assert mock_tesseract.call_count == 2
+
+    @patch("src.ocr.extract_text_from_image_tesseract", return_value="")
+    def test_failed_ocr_is_not_cached(self, mock_tesseract, cache, image_path):
+        ocr.extract_text_from_image(image_path)
+        ocr.extract_text_from_image(image_path)
+
+        assert mock_tesseract.call_count == 2
+        assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,113 @@
+"""
+Testy rejestru silników OCR (ocr.get_engine, pule ciepłych instancji)
+"""
+import sys
+import os
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr
+from src.config import Config
+
+
+class FakeEngine(ocr.OCREngine):
+    """Silnik liczący ładowania i maksymalną liczbę równoległych wywołań."""
+
+    name = "fake"
+    loads = 0
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def load(self):
+        FakeEngine.loads += 1
+
+    def read_text(self, image_path):
+        with FakeEngine.lock:
+            FakeEngine.in_flight += 1
+            FakeEngine.max_in_flight = max(FakeEngine.max_in_flight, FakeEngine.in_flight)
+        time.sleep(0.02)
+        with FakeEngine.lock:
+            FakeEngine.in_flight -= 1
+        return f"tekst {os.path.basename(image_path)}"
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    FakeEngine.loads = FakeEngine.in_flight = FakeEngine.max_in_flight = 0
+    ocr.reset_engines()
+    yield
+    ocr._engine_factories.pop("fake", None)
+    ocr.reset_engines()
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "paragon.png"
+    Image.new("L", (40, 40), color=255).save(path)
+    return str(path)
+
+
+class TestEngineRegistry:
+    """get_engine / register_engine / warm_up_ocr_engine"""
+
+    def test_easyocr_reader_is_built_once(self, image_path):
+        reader = MagicMock()
+        reader.readtext.return_value = ["LIDL", "SUMA 3,59"]
+        easyocr = MagicMock()
+        easyocr.Reader.return_value = reader
+        torch = MagicMock()
+        torch.cuda.is_available.return_value = False
+
+        with patch.dict(sys.modules, {"easyocr": easyocr, "torch": torch}):
+            results = [ocr.extract_text_from_image_gpu(image_path) for _ in range(3)]
+
+        assert results == ["LIDL\nSUMA 3,59"] * 3
+        easyocr.Reader.assert_called_once()
+        assert ocr.get_engine_stats()["easyocr"]["calls"] == 3
+
+    def test_pool_is_bounded_and_shared_by_threads(self, image_path):
+        ocr.register_engine("fake", FakeEngine)
+
+        with patch.object(Config, "OCR_ENGINE_POOL_SIZE", 2), patch.object(Config, "OCR_ENGINE", "fake"):
+            threads = [
+                threading.Thread(target=ocr.extract_text_from_image, args=(image_path,))
+                for _ in range(6)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert ocr.get_engine("fake") is ocr.get_engine("fake")
+        stats = ocr.get_engine_stats()["fake"]
+        assert (stats["instances"], stats["calls"], stats["in_use"]) == (2, 6, 0)
+        assert FakeEngine.loads == 2
+        assert FakeEngine.max_in_flight == 2
+
+    def test_warm_up_loads_once_and_failed_load_frees_slot(self, image_path):
+        ocr.register_engine("fake", FakeEngine)
+
+        with patch.object(Config, "OCR_WARMUP", True):
+            ocr.warm_up_ocr_engine("fake")
+            ocr.warm_up_ocr_engine("fake")
+        assert FakeEngine.loads == 1
+
+        with patch.object(FakeEngine, "load", side_effect=RuntimeError("brak modelu")):
+            ocr.reset_engines()
+            with patch.object(Config, "OCR_ENGINE_POOL_SIZE", 1):
+                with pytest.raises(RuntimeError):
+                    ocr.get_engine("fake").read_text(image_path)
+                assert ocr.get_engine_stats()["fake"]["instances"] == 0
+
+        assert ocr.get_engine("fake").read_text(image_path) == "tekst paragon.png"
+
+    def test_unknown_engine_raises(self):
+        with pytest.raises(ValueError):
+            ocr.get_engine("nieistniejacy")
@@ -0,0 +1,110 @@
+"""
+Testy dla parse_cache.py (trwały cache wyników parsowania LLM)
+"""
+import sys
+import os
+import json
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.parse_cache import ParseResultCache
+from src.llm import parse_receipt_with_llm, parse_receipt_from_text
+
+
+RESPONSE = json.dumps(
+    {
+        "sklep_info": {"nazwa": "Lidl", "lokalizacja": None},
+        "paragon_info": {"data_zakupu": "2024-12-27", "suma_calkowita": "3.59"},
+        "pozycje": [
+            {
+                "nazwa_raw": "Produkt",
+                "ilosc": "1.0",
+                "cena_jedn": "3.59",
+                "cena_calk": "3.59",
+                "rabat": "0.00",
+                "cena_po_rab": "3.59",
+            }
+        ],
+    }
+)
+
+
+class TestParseResultCache:
+    """Testy klucza, odczytu/zapisu i eviction"""
+
+    def test_get_set_roundtrip(self, tmp_path):
+        cache = ParseResultCache(str(tmp_path / "cache.db"))
+
+        assert cache.get("abc", "llava", "prompt", "ocr") is None
+        cache.set("abc", "llava", "prompt", "ocr", RESPONSE)
+
+        assert cache.get("abc", "llava", "prompt", "ocr") == RESPONSE
+        stats = cache.get_stats()
+        assert stats["entries"] == 1
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_key_depends_on_all_parts(self, tmp_path):
+        cache = ParseResultCache(str(tmp_path / "cache.db"))
+        cache.set("abc", "llava", "prompt", "ocr", RESPONSE)
+
+        assert cache.get("abd", "llava", "prompt", "ocr") is None
+        assert cache.get("abc", "llava:13b", "prompt", "ocr") is None
+        assert cache.get("abc", "llava", "inny prompt", "ocr") is None
+        assert cache.get("abc", "llava", "prompt", "inny ocr") is None
+
+    def test_size_based_eviction_removes_least_recently_used(self, tmp_path):
+        cache = ParseResultCache(str(tmp_path / "cache.db"), max_bytes=250)
+        payload = "x" * 100
+        cache.set("a", "m", "p", "", payload)
+        cache.set("b", "m", "p", "", payload)
+        cache.get("a", "m", "p", "")  # "a" staje się ostatnio używanym
+        cache.set("c", "m", "p", "", payload)
+
+        assert cache.get("a", "m", "p", "") == payload
+        assert cache.get("b", "m", "p", "") is None
+        assert cache.get("c", "m", "p", "") == payload
+        assert cache.get_stats()["total_bytes"] <= 250
+
+    def test_purge_by_model(self, tmp_path):
+        cache = ParseResultCache(str(tmp_path / "cache.db"))
+        cache.set("a", "llava", "p", "", RESPONSE)
+        cache.set("a", "bielik", "p", "", RESPONSE)
+
+        assert cache.purge(model="llava") == 1
+        assert [e["model"] for e in cache.list_entries()] == ["bielik"]
+        assert cache.purge() == 1
+        assert cache.get_stats()["entries"] == 0
+
+
+class TestParseCacheIntegration:
+    """Cache w parse_receipt_with_llm / parse_receipt_from_text"""
+
+    @patch("src.llm.client")
+    def test_second_parse_of_same_image_skips_llm(self, mock_client, tmp_path):
+        image = tmp_path / "paragon.png"
+        image.write_bytes(b"obraz")
+        mock_client.chat.return_value = {"message": {"content": RESPONSE}}
+        cache = ParseResultCache(str(tmp_path / "cache.db"))
+
+        with patch("src.llm.get_parse_cache", return_value=cache):
+            first = parse_receipt_with_llm(str(image), "llava:latest", ocr_text="LIDL")
+            second = parse_receipt_with_llm(str(image), "llava:latest", ocr_text="LIDL")
+            parse_receipt_with_llm(str(image), "llava:latest", ocr_text="LIDL 2")
+
+        assert mock_client.chat.call_count == 2
+        assert first == second
+        assert cache.get_stats()["entries"] == 2
+
+    @patch("src.llm.client")
+    def test_invalid_json_is_not_cached(self, mock_client, tmp_path):
+        mock_client.chat.return_value = {"message": {"content": "To nie jest JSON"}}
+        cache = ParseResultCache(str(tmp_path / "cache.db"))
+
+        with patch("src.llm.get_parse_cache", return_value=cache):
+            assert parse_receipt_from_text("Tekst paragonu") is None
+            assert parse_receipt_from_text("Tekst paragonu") is None
+
+        assert mock_client.chat.call_count == 2
+        assert cache.get_stats()["entries"] == 0
@@ -0,0 +1,108 @@
+"""
+Testy strumieniowej konwersji PDF (strony renderowane partiami, OCR per strona)
+"""
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr
+from src.config import Config
+from src.main import prepare_receipt_image
+
+
+PAGE_SIZES = [(300, 400), (200, 500), (300, 100)]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "paragon.pdf"
+    path.write_bytes(b"%PDF-1.4\n")
+    return str(path)
+
+
+def _fake_convert(pdf_path, first_page, last_page, output_folder, output_file, **kwargs):
+    """Udaje pdftoppm z paths_only=True - zapisuje strony jako pliki JPEG."""
+    paths = []
+    for page in range(first_page, last_page + 1):
+        path = os.path.join(output_folder, f"{output_file}{page}.jpg")
+        Image.new("RGB", PAGE_SIZES[page - 1], color=(page * 40, 0, 0)).save(path, "JPEG")
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def fake_pdf():
+    with patch("src.ocr.pdfinfo_from_path", return_value={"Pages": len(PAGE_SIZES)}), patch(
+        "src.ocr.convert_from_path", side_effect=_fake_convert
+    ) as mock_convert:
+        yield mock_convert
+
+
+class TestPdfPages:
+    """iter_pdf_pages / merge_page_images / convert_pdf_to_image"""
+
+    def test_pages_are_rendered_lazily_in_chunks(self, fake_pdf, tmp_path):
+        pages = ocr.iter_pdf_pages("paragon.pdf", str(tmp_path), dpi=150, thread_count=2)
+
+        first = next(pages)
+        assert fake_pdf.call_count == 1
+        rest = list(pages)
+
+        assert len([first] + rest) == 3
+        ranges = [(c.kwargs["first_page"], c.kwargs["last_page"]) for c in fake_pdf.call_args_list]
+        assert ranges == [(1, 2), (3, 3)]
+        assert all(c.kwargs["paths_only"] and c.kwargs["dpi"] == 150 for c in fake_pdf.call_args_list)
+
+    def test_convert_merges_page_files_and_removes_them(self, fake_pdf, pdf_path):
+        result = ocr.convert_pdf_to_image(pdf_path)
+
+        try:
+            with Image.open(result) as merged:
+                assert merged.size == (300, 1000)
+            assert not os.path.exists(fake_pdf.call_args.kwargs["output_folder"])
+        finally:
+            os.unlink(result)
+
+    def test_single_page_is_copied_without_reencoding(self, tmp_path):
+        page = tmp_path / "page1.jpg"
+        Image.new("RGB", (50, 80)).save(page, "JPEG")
+
+        result = ocr.merge_page_images([str(page)])
+
+        try:
+            assert open(result, "rb").read() == page.read_bytes()
+        finally:
+            os.unlink(result)
+
+
+class TestPdfOcr:
+    """OCR PDF strona po stronie bez sklejania"""
+
+    def test_pages_are_recognized_in_order(self, fake_pdf, pdf_path):
+        class PageEngine(ocr.OCREngine):
+            def read_text(self, image_path):
+                with Image.open(image_path) as page:
+                    return f"strona {page.height}"
+
+        ocr.register_engine("page", PageEngine)
+        try:
+            with patch.object(Config, "OCR_ENGINE", "page"), patch.object(
+                Config, "OCR_ENGINE_POOL_SIZE", 3
+            ), patch("src.ocr.convert_pdf_to_image") as mock_merge:
+                text = ocr.extract_text_from_pdf(pdf_path)
+        finally:
+            ocr._engine_factories.pop("page", None)
+            ocr.reset_engines()
+
+        assert text == "strona 400\nstrona 500\nstrona 100"
+        mock_merge.assert_not_called()
+
+    @patch("src.main.convert_pdf_to_image")
+    def test_mistral_ocr_skips_merged_image(self, mock_convert, pdf_path):
+        assert prepare_receipt_image(pdf_path, lambda msg: None, "mistral-ocr") == (pdf_path, None)
+        mock_convert.assert_not_called()
@@ -0,0 +1,146 @@
+"""
+Testy przygotowania obrazu przed OCR i modelem wizyjnym (src.preprocessing)
+"""
+import sys
+import os
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import preprocessing
+from src.config import Config
+from src.main import extract_receipt_text
+from src.preprocessing import PreprocessOptions
+from src.strategies import GenericStrategy
+
+
+def _receipt_image(width=1200, height=900, margin=150):
+    """Białe tło z 'liniami tekstu' (czarne paski) i szerokimi pustymi marginesami."""
+    img = Image.new("L", (width, height), color=255)
+    draw = ImageDraw.Draw(img)
+    for top in range(margin, height - margin, 60):
+        draw.rectangle((margin, top, width - margin, top + 20), fill=0)
+    return img
+
+
+class TestSteps:
+    """Poszczególne kroki przygotowania"""
+
+    def test_skew_is_detected_and_corrected(self):
+        skewed = _receipt_image().rotate(3, resample=Image.BICUBIC, expand=True, fillcolor=255)
+
+        assert abs(preprocessing.estimate_skew(np.asarray(skewed)) - 3.0) <= 0.25
+        assert preprocessing.estimate_skew(np.asarray(_receipt_image())) == 0.0
+
+        straightened = preprocessing.preprocess(
+            skewed, PreprocessOptions(binarize=False, crop_margins=False, target_dpi=None)
+        )
+        assert preprocessing.estimate_skew(np.asarray(straightened)) == 0.0
+
+    def test_binarization_follows_local_background(self):
+        # Lewa połowa jasna, prawa ciemniejsza (cień) - tekst ciemniejszy od tła w obu
+        gray = np.full((100, 200), 230, dtype=np.uint8)
+        gray[:, 100:] = 120
+        gray[40:50, 20:80] = 150
+        gray[40:50, 120:180] = 40
+
+        binary = preprocessing.adaptive_binarize(gray, block_size=31, offset=10)
+
+        assert set(np.unique(binary)) == {0, 255}
+        assert (binary[45, 30:70] == 0).all() and (binary[45, 130:170] == 0).all()
+        assert (binary[10, 10:80] == 255).all() and (binary[10, 120:190] == 255).all()
+
+    def test_margins_are_cropped_and_image_downscaled(self):
+        result = preprocessing.preprocess(
+            _receipt_image(width=3000, height=2000, margin=500), PreprocessOptions(target_dpi=200)
+        )
+
+        assert result.width == int(preprocessing.RECEIPT_PRINT_WIDTH_MM / 25.4 * 200)
+        assert result.height < 2000 * result.width / 3000
+        assert result.mode == "L"
+
+    def test_ink_threshold_follows_histogram(self):
+        # Szary papier (170) z szarym tekstem (110) - stały próg 128 uznałby całość za tło
+        gray = np.full((200, 300), 170, dtype=np.uint8)
+        gray[50:60, 20:280] = 110
+
+        threshold = preprocessing.otsu_threshold(gray)
+
+        assert 110 < threshold <= 170
+        cropped = preprocessing.crop_to_ink(gray, pad=0, threshold=threshold)
+        assert cropped.shape == (10, 260)
+        assert preprocessing.otsu_threshold(np.full((10, 10), 200, dtype=np.uint8)) == preprocessing.INK_THRESHOLD
+
+    def test_receipt_on_dark_table_keeps_target_dpi(self):
+        # Zdjęcie 3000x6000: paragon szeroki na 1000 px leżący na ciemnym stole
+        photo = Image.new("L", (3000, 6000), color=60)
+        photo.paste(_receipt_image(width=1000, height=5000, margin=80), (1000, 500))
+
+        assert preprocessing.find_paper(np.asarray(photo)) == (500, 5500, 1000, 2000)
+        result = preprocessing.preprocess(photo, PreprocessOptions(binarize=False, target_dpi=300))
+
+        # Tekst paragonu (840 z 1000 px) ma szerokość druku w 300 DPI
+        assert result.width == int(preprocessing.RECEIPT_PRINT_WIDTH_MM / 25.4 * 300)
+
+    def test_downscale_skipped_without_paper_edge(self):
+        # Jasny obiekt na jasnym tle, ale bez jednoznacznej krawędzi papieru
+        noise = np.random.default_rng(0).integers(0, 256, size=(1500, 2000), dtype=np.uint8)
+
+        assert preprocessing.find_paper(noise) is None
+        result = preprocessing.preprocess(
+            Image.fromarray(noise), PreprocessOptions(binarize=False, deskew=False, target_dpi=100)
+        )
+        assert result.width > int(preprocessing.RECEIPT_PRINT_WIDTH_MM / 25.4 * 100)
+
+
+class TestPreprocessedImage:
+    """preprocessed_image / preprocess_or_original"""
+
+    def test_temp_file_is_removed_after_block(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        _receipt_image().save(path)
+
+        with preprocessing.preprocessed_image(str(path), PreprocessOptions()) as prepared:
+            assert prepared != str(path) and os.path.exists(prepared)
+        assert not os.path.exists(prepared)
+
+    def test_failure_and_larger_result_fall_back_to_original(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        path.write_bytes(b"x" * 100)
+        larger = tmp_path / "wynik.png"
+        larger.write_bytes(b"x" * 1000)
+        missing = str(tmp_path / "brak.png")
+
+        assert preprocessing.preprocess_or_original(missing, PreprocessOptions()) == missing
+        with patch("src.preprocessing.preprocess_image_file", return_value=str(larger)):
+            options = PreprocessOptions(only_if_smaller=True)
+            assert preprocessing.preprocess_or_original(str(path), options) == str(path)
+        assert not larger.exists()
+
+    def test_strategy_options_follow_config(self):
+        with patch.object(Config, "PREPROCESS_VISION", True):
+            options = GenericStrategy().get_preprocess_options()
+        assert not options.binarize and options.target_dpi == Config.PREPROCESS_VISION_DPI
+
+        with patch.object(Config, "PREPROCESS_VISION", False):
+            assert GenericStrategy().get_preprocess_options() is None
+
+    @patch("src.ocr.extract_text_from_image_tesseract")
+    def test_ocr_receives_preprocessed_image(self, mock_ocr, tmp_path):
+        path = tmp_path / "paragon.png"
+        _receipt_image(width=3000, height=1500, margin=400).save(path)
+        seen = {}
+
+        def _ocr(image_path):
+            with Image.open(image_path) as img:
+                seen["size"] = img.size
+            return "LIDL"
+
+        mock_ocr.side_effect = _ocr
+        with patch.object(Config, "PREPROCESS_OCR", True), patch.object(Config, "OCR_ENGINE", "tesseract"):
+            assert extract_receipt_text(str(path), "llava:latest", lambda *a, **k: None) == "LIDL"
+
+        assert seen["size"][0] < 3000
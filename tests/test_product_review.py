@@ -0,0 +1,173 @@
+"""
+Testy odroczonej weryfikacji produktów (save_to_database(deferred_review=True) + product_review.py)
+"""
+import sys
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.database import (
+    Base,
+    AliasProduktu,
+    PozycjaParagonu,
+    Produkt,
+    StanMagazynowy,
+)
+from src.main import save_to_database
+from src.product_review import get_pending_reviews, resolve_pending_reviews
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+def _receipt(names):
+    return {
+        "sklep_info": {"nazwa": "Lidl", "lokalizacja": None},
+        "paragon_info": {
+            "data_zakupu": datetime(2024, 12, 27),
+            "suma_calkowita": Decimal("10.00"),
+        },
+        "pozycje": [
+            {
+                "nazwa_raw": name,
+                "ilosc": Decimal("1.0"),
+                "jednostka": None,
+                "cena_jedn": Decimal("2.00"),
+                "cena_calk": Decimal("2.00"),
+                "rabat": None,
+                "cena_po_rab": Decimal("2.00"),
+            }
+            for name in names
+        ],
+    }
+
+
+def _fail_prompt(*args):
+    raise AssertionError("prompt_callback nie powinien być wywołany")
+
+
+def _save_deferred(session, names):
+    save_to_database(
+        session,
+        _receipt(names),
+        "/tmp/p.png",
+        lambda msg: None,
+        _fail_prompt,
+        deferred_review=True,
+    )
+    session.commit()
+
+
+@patch("src.main.get_product_metadata", return_value={"kategoria": "Nabiał", "can_freeze": None})
+@patch("src.main.get_llm_suggestion", return_value=None)
+@patch("src.llm.normalize_products_batch")
+class TestDeferredReview:
+    """Zapis bez promptów i zbiorcze rozstrzyganie kolejki"""
+
+    def test_unknown_items_saved_with_flag_and_no_stock(
+        self, mock_batch, mock_llm, mock_meta, session
+    ):
+        mock_batch.return_value = {"XYZ Kef": "Kefir", "QQ 77": None}
+
+        _save_deferred(session, ["XYZ Kef", "QQ 77"])
+
+        pozycje = session.query(PozycjaParagonu).order_by(PozycjaParagonu.pozycja_id).all()
+        assert [p.do_weryfikacji for p in pozycje] == [True, True]
+        assert pozycje[0].produkt.znormalizowana_nazwa == "Kefir"
+        assert pozycje[1].produkt is None
+        assert session.query(AliasProduktu).one().do_weryfikacji is True
+        assert session.query(StanMagazynowy).count() == 0
+
+        pending = get_pending_reviews(session)
+        assert [(p["raw_name"], p["provisional_name"], p["count"]) for p in pending] == [
+            ("XYZ Kef", "Kefir", 1),
+            ("QQ 77", None, 1),
+        ]
+
+    def test_provisional_alias_reused_without_llm(
+        self, mock_batch, mock_llm, mock_meta, session
+    ):
+        mock_batch.return_value = {"XYZ Kef": "Kefir"}
+        _save_deferred(session, ["XYZ Kef"])
+        mock_batch.reset_mock()
+
+        _save_deferred(session, ["XYZ Kef"])
+
+        mock_batch.assert_not_called()
+        assert get_pending_reviews(session)[0]["count"] == 2
+
+    def test_resolve_in_bulk(self, mock_batch, mock_llm, mock_meta, session):
+        mock_batch.return_value = {"XYZ Kef": "Kefir", "QQ 77": None, "Torba": "Torba"}
+        _save_deferred(session, ["XYZ Kef", "XYZ Kef", "QQ 77", "Torba"])
+
+        stats = resolve_pending_reviews(
+            session, {"XYZ Kef": "Kefir naturalny", "QQ 77": "Jogurt", "Torba": "POMIŃ"}
+        )
+        session.commit()
+
+        assert stats == {"confirmed": 3, "removed": 1, "products": 2}
+        assert get_pending_reviews(session) == []
+        alias = session.query(AliasProduktu).filter_by(nazwa_z_paragonu="XYZ Kef").one()
+        assert alias.do_weryfikacji is False
+        assert alias.produkt.znormalizowana_nazwa == "Kefir naturalny"
+        assert session.query(AliasProduktu).filter_by(nazwa_z_paragonu="Torba").count() == 0
+        stany = {
+            s.produkt.znormalizowana_nazwa: s.ilosc for s in session.query(StanMagazynowy).all()
+        }
+        assert stany == {"Kefir naturalny": Decimal("2.00"), "Jogurt": Decimal("1.00")}
+        assert session.query(PozycjaParagonu).count() == 3
+        # Tymczasowe produkty bez pozycji i aliasów są usuwane ("Torba" też)
+        assert sorted(p.znormalizowana_nazwa for p in session.query(Produkt)) == [
+            "Jogurt",
+            "Kefir naturalny",
+        ]
+
+    def test_provisional_product_kept_when_still_referenced(
+        self, mock_batch, mock_llm, mock_meta, session
+    ):
+        mock_batch.return_value = {"XYZ Kef": "Kefir", "Kefir 1L": "Kefir"}
+        _save_deferred(session, ["XYZ Kef", "Kefir 1L"])
+
+        resolve_pending_reviews(session, {"XYZ Kef": "Kefir naturalny"})
+        session.commit()
+
+        kefir = session.query(Produkt).filter_by(znormalizowana_nazwa="Kefir").one()
+        assert [a.nazwa_z_paragonu for a in kefir.aliasy] == ["Kefir 1L"]
+
+    def test_expiry_date_moves_to_stock(self, mock_batch, mock_llm, mock_meta, session):
+        mock_batch.return_value = {"XYZ Kef": "Kefir"}
+        receipt = _receipt(["XYZ Kef"])
+        receipt["pozycje"][0]["data_waznosci"] = date(2025, 1, 3)
+        save_to_database(
+            session, receipt, "/tmp/p.png", lambda msg: None, _fail_prompt, deferred_review=True
+        )
+        session.commit()
+
+        resolve_pending_reviews(session, {"XYZ Kef": "Kefir"})
+        session.commit()
+
+        assert session.query(StanMagazynowy).one().data_waznosci == date(2025, 1, 3)
+
+    def test_undecided_names_stay_pending(
+        self, mock_batch, mock_llm, mock_meta, session
+    ):
+        mock_batch.return_value = {"XYZ Kef": "Kefir", "QQ 77": None}
+        _save_deferred(session, ["XYZ Kef", "QQ 77"])
+
+        resolve_pending_reviews(session, {"XYZ Kef": "Kefir"})
+        session.commit()
+
+        assert [p["raw_name"] for p in get_pending_reviews(session)] == ["QQ 77"]
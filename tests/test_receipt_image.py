@@ -0,0 +1,113 @@
+"""
+Testy wspólnego obrazu paragonu (src.receipt_image - odczyt i dekodowanie raz)
+"""
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr, receipt_image
+from src.config import Config
+from src.dedup import compute_file_hash
+from src.llm import _vision_messages
+from src.preprocessing import PreprocessOptions, preprocessed_image
+from src.receipt_image import ReceiptImage, load_receipt_image
+from src.security import validate_image
+
+
+@pytest.fixture(autouse=True)
+def _clear_images():
+    receipt_image.clear_receipt_images()
+    yield
+    receipt_image.clear_receipt_images()
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "paragon.png"
+    Image.new("RGB", (400, 900), color="white").save(path)
+    return str(path)
+
+
+class TestLoadReceiptImage:
+    """load_receipt_image - jeden obiekt na plik"""
+
+    def test_same_object_until_file_changes(self, image_path):
+        image = load_receipt_image(image_path)
+
+        assert load_receipt_image(image_path) is image
+        assert image.sha256 == compute_file_hash(image_path)
+        assert image.size == (400, 900)
+
+        Image.new("RGB", (300, 200), color="white").save(image_path)
+        os.utime(image_path, ns=(0, 0))
+        assert load_receipt_image(image_path).size == (300, 200)
+
+    def test_lru_eviction_and_forget(self, tmp_path):
+        paths = []
+        for index in range(receipt_image.RECEIPT_IMAGE_CACHE_SIZE + 1):
+            path = tmp_path / f"p{index}.png"
+            Image.new("L", (10, 10)).save(path)
+            paths.append(str(path))
+        first = load_receipt_image(paths[0])
+        for path in paths[1:]:
+            load_receipt_image(path)
+
+        assert load_receipt_image(paths[0]) is not first
+
+        kept = load_receipt_image(paths[-1])
+        receipt_image.forget_receipt_image(paths[-1])
+        assert load_receipt_image(paths[-1]) is not kept
+
+
+class TestPipelineSharing:
+    """Etapy potoku korzystają z jednego odczytu i jednego dekodowania"""
+
+    @patch("src.ocr.pytesseract")
+    def test_file_read_and_decoded_once(self, mock_pytesseract, image_path):
+        mock_pytesseract.image_to_string.return_value = "LIDL"
+        ocr.reset_engines()
+        original_from_path = ReceiptImage.from_path
+
+        with patch.object(ReceiptImage, "from_path", side_effect=original_from_path) as mock_read, patch(
+            "src.receipt_image.Image.open", side_effect=Image.open
+        ) as mock_open, patch.object(Config, "OCR_ENGINE", "tesseract"):
+            validate_image(image_path)
+            assert ocr.extract_header_text(image_path) == "LIDL"
+            with preprocessed_image(image_path, PreprocessOptions(deskew=False)):
+                pass
+            messages = _vision_messages("prompt", image_path, None, "llava:latest")
+
+        ocr.reset_engines()
+        mock_read.assert_called_once()
+        # Nagłówek (wymiary przy walidacji) + jedno pełne dekodowanie
+        assert mock_open.call_count == 2
+        with open(image_path, "rb") as f:
+            assert messages[1]["images"] == [f.read()]
+
+    @patch("src.main.save_parsed_receipt", return_value=True)
+    @patch("src.main.load_processed_receipt", return_value=None)
+    @patch("src.main.setup_store_strategy", return_value=(None, None))
+    def test_pipeline_releases_images_when_done(self, mock_setup, mock_load, mock_save, image_path):
+        from src.main import run_processing_pipeline
+
+        def _ocr(path, *args, **kwargs):
+            load_receipt_image(path).pixels("L")
+            return "LIDL"
+
+        with patch("src.main.extract_receipt_text", side_effect=_ocr), patch(
+            "src.main.parse_receipt_text", return_value={"pozycje": []}
+        ):
+            run_processing_pipeline(image_path, "llava:latest", lambda msg: None, lambda *a: "")
+
+        mock_save.assert_called_once()
+        assert len(receipt_image._images) == 0
+
+    def test_vision_message_falls_back_to_path(self, tmp_path):
+        missing = str(tmp_path / "brak.png")
+
+        assert _vision_messages("prompt", missing, None, "llava:latest")[1]["images"] == [missing]
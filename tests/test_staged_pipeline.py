@@ -0,0 +1,95 @@
+"""
+Testy dla staged_pipeline.py (potok etapów z ograniczonymi kolejkami)
+"""
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.staged_pipeline import Stage, StagedPipeline
+
+
+class TestStagedPipeline:
+    """Testy silnika producent/konsument"""
+
+    def test_all_items_pass_through_stages(self):
+        pipeline = StagedPipeline(
+            [
+                Stage("double", lambda x: x * 2, workers=2),
+                Stage("inc", lambda x: x + 1, workers=3),
+            ]
+        )
+
+        jobs = list(pipeline.run(range(10)))
+
+        assert sorted(job.payload for job in jobs) == [x * 2 + 1 for x in range(10)]
+        assert all(set(job.timings) == {"double", "inc"} for job in jobs)
+        stats = pipeline.get_stats()
+        assert stats["double"]["processed"] == 10
+        assert stats["inc"]["processed"] == 10
+
+    def test_failed_job_skips_remaining_stages(self):
+        calls = []
+
+        def fail_on_three(x):
+            if x == 3:
+                raise ValueError("zły paragon")
+            return x
+
+        def record(x):
+            calls.append(x)
+            return x
+
+        pipeline = StagedPipeline(
+            [Stage("ocr", fail_on_three), Stage("db", record)]
+        )
+
+        jobs = list(pipeline.run(range(5)))
+
+        failed = [job for job in jobs if job.error]
+        assert len(jobs) == 5
+        assert len(failed) == 1
+        assert failed[0].item == 3
+        assert failed[0].failed_stage == "ocr"
+        assert sorted(calls) == [0, 1, 2, 4]
+        assert pipeline.get_stats()["ocr"]["failed"] == 1
+
+    def test_stages_overlap(self):
+        """Etap 1 kolejnego zadania działa równolegle z etapem 2 poprzedniego."""
+
+        def slow(x):
+            time.sleep(0.05)
+            return x
+
+        pipeline = StagedPipeline([Stage("ocr", slow), Stage("llm", slow)])
+
+        start = time.perf_counter()
+        jobs = list(pipeline.run(range(6)))
+        elapsed = time.perf_counter() - start
+
+        assert len(jobs) == 6
+        # Sekwencyjnie: 12 * 0.05 = 0.6 s, potokowo: ok. 7 * 0.05 = 0.35 s
+        assert elapsed < 0.5
+
+    def test_backpressure_bounds_queue(self):
+        release = threading.Event()
+
+        def blocked(x):
+            release.wait(timeout=2)
+            return x
+
+        pipeline = StagedPipeline(
+            [Stage("fast", lambda x: x), Stage("slow", blocked, queue_size=1)],
+            queue_size=1,
+        )
+
+        threading.Timer(0.2, release.set).start()
+        jobs = list(pipeline.run(range(8)))
+
+        assert len(jobs) == 8
+        stats = pipeline.get_stats()
+        assert stats["slow"]["max_queue_depth"] <= 1
+        # Szybki etap musiał czekać na pełnej kolejce
+        assert stats["fast"]["blocked_seconds"] > 0.1
@@ -0,0 +1,95 @@
+"""
+Testy OCR Tesseract w poziomych pasach (wysokie paragony)
+"""
+import sys
+import os
+import itertools
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr
+from src.config import Config
+
+
+def _receipt_array(height=1000, width=200, text_rows=range(0, 1000, 50), line_height=20):
+    """Biały obraz z 'liniami tekstu' (czarne paski) co 50 px."""
+    gray = np.full((height, width), 255, dtype=np.uint8)
+    for top in text_rows:
+        gray[top : top + line_height, 10:190] = 0
+    return gray
+
+
+class TestStripBounds:
+    """find_strip_bounds"""
+
+    def test_cuts_fall_on_blank_rows_and_cover_image(self):
+        gray = _receipt_array()
+
+        bounds = ocr.find_strip_bounds(gray, strip_height=300, overlap=5)
+
+        assert bounds[0][0] == 0 and bounds[-1][1] == 1000
+        for (_, end), (start, _) in zip(bounds[:-1], bounds[1:]):
+            cut = end - 5
+            assert start == cut - 5
+            assert (gray[cut] == 255).all()
+
+    def test_without_blank_rows_cuts_at_target_height(self):
+        gray = np.zeros((1000, 100), dtype=np.uint8)
+
+        bounds = ocr.find_strip_bounds(gray, strip_height=300, overlap=10)
+
+        assert bounds == [(0, 310), (290, 610), (590, 910), (890, 1000)]
+
+
+class TestMergeStripTexts:
+    """merge_strip_texts"""
+
+    def test_overlap_lines_are_removed(self):
+        texts = [
+            "LIDL\nMleko 3,49\nChleb 4,99",
+            "Chleb 4,99\nMaslo 7,99",
+            "Masło 7,99\n\nSUMA PLN 16,47",
+        ]
+
+        assert ocr.merge_strip_texts(texts) == "LIDL\nMleko 3,49\nChleb 4,99\nMaslo 7,99\nSUMA PLN 16,47"
+
+    def test_repeated_items_inside_strip_are_kept(self):
+        texts = ["Woda 1,99\nWoda 1,99", "SUMA 3,98"]
+
+        assert ocr.merge_strip_texts(texts) == "Woda 1,99\nWoda 1,99\nSUMA 3,98"
+
+
+class TestTesseractStrips:
+    """TesseractEngine.read_text dla wysokich obrazów"""
+
+    @patch("src.ocr.pytesseract")
+    def test_tall_image_is_recognized_in_parallel_strips(self, mock_pytesseract, tmp_path):
+        path = tmp_path / "paragon.png"
+        Image.fromarray(_receipt_array(height=4000, text_rows=range(0, 4000, 50))).save(path)
+        counter = itertools.count()
+        mock_pytesseract.image_to_string.side_effect = lambda img, lang: f"pas {next(counter)}"
+
+        with patch.object(Config, "OCR_STRIP_PARALLEL", True), patch.object(
+            Config, "OCR_STRIP_MIN_HEIGHT", 3000
+        ), patch.object(Config, "OCR_STRIP_HEIGHT", 1000):
+            text = ocr.TesseractEngine().read_text(str(path))
+
+        heights = [call.args[0].height for call in mock_pytesseract.image_to_string.call_args_list]
+        assert len(heights) == 4
+        assert sum(heights) >= 4000
+        assert len(text.splitlines()) == 4
+
+    @patch("src.ocr.pytesseract")
+    def test_short_image_uses_single_call(self, mock_pytesseract, tmp_path):
+        path = tmp_path / "paragon.png"
+        Image.fromarray(_receipt_array()).save(path)
+        mock_pytesseract.image_to_string.return_value = "LIDL"
+
+        with patch.object(Config, "OCR_STRIP_MIN_HEIGHT", 3000):
+            assert ocr.TesseractEngine().read_text(str(path)) == "LIDL"
+
+        mock_pytesseract.image_to_string.assert_called_once()
@@ -0,0 +1,132 @@
+"""
+Testy silnika 'tesserocr' (Tesseract w procesie, obraz jako bufor pikseli)
+"""
+import sys
+import os
+import shutil
+import threading
+import time
+import types
+from unittest.mock import patch
+
+import pytest
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import ocr
+from src.config import Config
+
+
+class FakeApi:
+    """Udaje tesserocr.PyTessBaseAPI - zapamiętuje bufory i ustawienia."""
+
+    created = 0
+    lock = threading.Lock()
+
+    def __init__(self, lang):
+        with FakeApi.lock:
+            FakeApi.created += 1
+        self.lang = lang
+        self.images = []
+        self.variables = {}
+        self.psm = 3
+        self.busy = False
+
+    def SetImageBytes(self, data, width, height, bytes_per_pixel, bytes_per_line):
+        assert len(data) == height * bytes_per_line == height * width * bytes_per_pixel
+        self.images.append((width, height, bytes_per_pixel))
+
+    def SetVariable(self, name, value):
+        self.variables[name] = value
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def GetUTF8Text(self):
+        # Uchwyt nie może być używany przez dwa wątki naraz
+        assert not self.busy
+        self.busy = True
+        time.sleep(0.02)
+        self.busy = False
+        width, height, _ = self.images[-1]
+        return f"obraz {width}x{height}\n"
+
+
+@pytest.fixture
+def fake_tesserocr():
+    FakeApi.created = 0
+    module = types.SimpleNamespace(
+        PyTessBaseAPI=FakeApi, PSM=types.SimpleNamespace(AUTO=3, SINGLE_BLOCK=6)
+    )
+    ocr.reset_engines()
+    with patch.dict(sys.modules, {"tesserocr": module}), patch.object(Config, "OCR_ENGINE", "tesserocr"):
+        yield module
+    ocr.reset_engines()
+
+
+def _save(tmp_path, size, mode="RGB"):
+    path = tmp_path / "paragon.png"
+    Image.new(mode, size, color="white").save(path)
+    return str(path)
+
+
+class TestTesserocrEngine:
+    """TesserocrEngine przez rejestr silników"""
+
+    def test_handle_is_reused_and_no_temp_files(self, fake_tesserocr, tmp_path):
+        path = _save(tmp_path, (120, 80))
+
+        with patch("src.ocr.create_secure_temp_file") as mock_temp, patch("src.ocr.pytesseract") as mock_cli:
+            texts = [ocr.extract_text_from_image(path) for _ in range(3)]
+
+        assert texts == ["obraz 120x80\n"] * 3
+        assert FakeApi.created == 1
+        mock_temp.assert_not_called()
+        mock_cli.image_to_string.assert_not_called()
+
+    def test_grayscale_buffer_has_one_byte_per_pixel(self, fake_tesserocr, tmp_path):
+        path = _save(tmp_path, (50, 40), mode="L")
+        engine = ocr.TesserocrEngine()
+        engine.load()
+
+        engine.read_text(path)
+
+        assert engine._apis.get_nowait().images == [(50, 40, 1)]
+
+    def test_tall_image_strips_get_own_handles(self, fake_tesserocr, tmp_path):
+        path = _save(tmp_path, (100, 4000))
+
+        with patch.object(Config, "OCR_STRIP_MIN_HEIGHT", 3000), patch.object(
+            Config, "OCR_STRIP_HEIGHT", 1000
+        ), patch.object(Config, "OCR_STRIP_WORKERS", 2):
+            text = ocr.extract_text_from_image(path)
+
+        assert FakeApi.created == 2
+        assert all(line.startswith("obraz 100x") for line in text.splitlines())
+
+    def test_header_settings_are_restored(self, fake_tesserocr):
+        engine = ocr.TesserocrEngine()
+        engine.load()
+
+        assert engine.read_header(Image.new("L", (60, 20))) == "obraz 60x20\n"
+
+        api = engine._apis.get_nowait()
+        assert api.psm == 3
+        assert api.variables["tessedit_char_whitelist"] == ""
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="brak binarki tesseract")
+def test_same_text_as_pytesseract(tmp_path):
+    pytest.importorskip("tesserocr")
+    path = tmp_path / "paragon.png"
+    img = Image.new("L", (600, 200), color=255)
+    draw = ImageDraw.Draw(img)
+    draw.text((20, 40), "LIDL sp. z o.o.", fill=0)
+    draw.text((20, 100), "SUMA PLN 3,49", fill=0)
+    img.save(path)
+
+    cli_engine, api_engine = ocr.TesseractEngine(), ocr.TesserocrEngine()
+    api_engine.load()
+
+    assert api_engine.read_text(str(path)).strip() == cli_engine.read_text(str(path)).strip()
@@ -0,0 +1,141 @@
+"""
+Testy budżetu tokenów żądań LLM (src.token_budget)
+"""
+import sys
+import os
+import json
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.config import Config
+from src.llm import parse_receipt_from_text
+from src.token_budget import (
+    CTX_MARGIN_RATIO,
+    DEFAULT_RECEIPT_OUTPUT_TOKENS,
+    MIN_NUM_PREDICT,
+    PROMPT_TRUNCATED_MARKER,
+    TRUNCATED_MARKER,
+    chat_options,
+    classify_receipt_lines,
+    count_receipt_items,
+    estimate_message_tokens,
+    fit_receipt_text,
+    receipt_output_tokens,
+)
+
+RECEIPT = """LIDL sp. z o.o. sp.k.
+ul. Poznańska 48
+Jankowice
+NIP 781-18-97-358
+2025-01-13 nr wydr. 123
+PARAGON FISKALNY
+Marchew Luz C 0,365 x3,69 1,35C
+Mleko UHT 3,2% Łaciate
+1 x3,49 3,49C
+Rabat -0,62
+-------------------
+SPRZEDAŻ OPODATKOWANA C 4,84
+PTU C 5,00% 0,23
+SUMA PLN 4,22
+Karta płatnicza 4,22
+Dziękujemy za zakupy"""
+
+
+class TestReceiptLines:
+    """Rozpoznawanie pozycji i usuwanie zbędnych linii"""
+
+    def test_classification_and_expected_output(self):
+        kinds = classify_receipt_lines(RECEIPT.splitlines())
+
+        assert kinds[6:10] == ["item", "name", "item", "item"]
+        assert kinds[13] == "essential"  # SUMA
+        assert kinds[11:13] == ["other", "other"]  # sprzedaż opodatkowana, PTU
+        assert count_receipt_items(RECEIPT) == 3
+        assert receipt_output_tokens(RECEIPT) < receipt_output_tokens(RECEIPT + "\nSer 9,99" * 40)
+        assert receipt_output_tokens(None) == DEFAULT_RECEIPT_OUTPUT_TOKENS
+
+    def test_fit_drops_non_item_lines_first(self):
+        assert fit_receipt_text(RECEIPT, 10_000) == (RECEIPT, 0)
+
+        fitted, dropped = fit_receipt_text(RECEIPT, 70)
+
+        assert dropped > 0 and TRUNCATED_MARKER not in fitted
+        for kept in ("LIDL", "Marchew Luz", "Mleko UHT", "1 x3,49", "Rabat", "SUMA PLN"):
+            assert kept in fitted
+        assert "Dziękujemy" not in fitted and "PTU" not in fitted
+
+        truncated, _ = fit_receipt_text(RECEIPT, 40)
+        assert truncated.endswith(TRUNCATED_MARKER)
+        assert len(truncated) <= 40 * Config.LLM_CHARS_PER_TOKEN
+
+
+class TestChatOptions:
+    """num_ctx i num_predict wg rozmiaru żądania"""
+
+    def test_small_prompt_gets_small_context(self):
+        messages = [{"role": "user", "content": "Mleko UHT 3,2%"}]
+        options = chat_options("bielik", messages, 64, "test", temperature=0)
+
+        assert options == {"temperature": 0, "num_predict": 64, "num_ctx": Config.LLM_NUM_CTX_MIN}
+
+    def test_context_grows_with_prompt_and_images(self):
+        text = [{"role": "user", "content": "x" * 9000}]
+        image = [{"role": "user", "content": "x", "images": [b"jpeg"]}]
+
+        assert estimate_message_tokens(image, "llava:latest") > estimate_message_tokens(image, "bielik")
+        assert chat_options("bielik", text, 1000)["num_ctx"] == 5120
+        assert chat_options("llava:latest", image, 1000)["num_ctx"] == 5120
+
+    def test_oversized_prompt_shortens_answer_within_max(self):
+        messages = [{"role": "user", "content": "x" * 18000}]
+        options = chat_options("bielik", messages, 2000)
+
+        assert options["num_ctx"] == Config.LLM_NUM_CTX_MAX
+        assert MIN_NUM_PREDICT <= options["num_predict"] < 2000
+        assert messages[0]["content"] == "x" * 18000
+
+    def test_prompt_over_max_is_trimmed_not_overflowed(self):
+        system = {"role": "system", "content": "Jesteś asystentem."}
+        messages = [system, {"role": "user", "content": "x" * 60000}]
+        options = chat_options("bielik", messages, 2000)
+
+        assert options["num_ctx"] == Config.LLM_NUM_CTX_MAX
+        assert options["num_predict"] == MIN_NUM_PREDICT
+        assert messages[0] is system and system["content"] == "Jesteś asystentem."
+        assert messages[1]["content"].endswith(PROMPT_TRUNCATED_MARKER)
+        prompt_tokens = estimate_message_tokens(messages, "bielik")
+        assert prompt_tokens * (1 + CTX_MARGIN_RATIO) + MIN_NUM_PREDICT <= Config.LLM_NUM_CTX_MAX
+
+    def test_generate_fallback_sends_trimmed_prompt(self):
+        from src.normalization_rules import NormalizationPipeline
+
+        pipeline = NormalizationPipeline(llm_client=object())
+        with patch.object(Config, "LLM_NUM_CTX_MAX", 1024), patch(
+            "ollama.generate", return_value={"response": "Mleko"}
+        ) as mock_generate:
+            assert pipeline._llm_normalize("Mleko " * 1000)[0] == "Mleko"
+
+        kwargs = mock_generate.call_args.kwargs
+        assert kwargs["prompt"].endswith(PROMPT_TRUNCATED_MARKER)
+        prompt_tokens = estimate_message_tokens([{"role": "user", "content": kwargs["prompt"]}], "bielik")
+        assert prompt_tokens + kwargs["options"]["num_predict"] <= kwargs["options"]["num_ctx"]
+
+
+class TestReceiptParsing:
+    """Parsowanie paragonu przekazuje opcje z budżetu"""
+
+    @patch("src.llm.client")
+    def test_text_parsing_sends_sized_options(self, mock_client):
+        mock_client.chat.return_value = {
+            "message": {"content": json.dumps({"sklep_info": {}, "paragon_info": {}, "pozycje": []})}
+        }
+        with patch("src.llm._parse_cache_lookup", return_value=None), patch(
+            "src.llm._parse_cache_store"
+        ):
+            parse_receipt_from_text(RECEIPT, model_name="bielik")
+
+        options = mock_client.chat.call_args.kwargs["options"]
+        assert options["temperature"] == 0
+        assert options["num_predict"] == receipt_output_tokens(RECEIPT)
+        assert Config.LLM_NUM_CTX_MIN <= options["num_ctx"] <= Config.LLM_NUM_CTX_MAX
@@ -0,0 +1,111 @@
+"""
+Testy dla tracing.py (spany etapów, plik śladów JSONL, agregacja do p50/p95/p99)
+"""
+import sys
+import os
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src.config import Config
+from src.tracing import aggregate_spans, load_spans, span
+from src.llm import normalize_products_batch
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    with patch.object(Config, "TRACE_ENABLED", True), patch.object(Config, "TRACE_PATH", path):
+        yield path
+
+
+class TestSpans:
+    """Zagnieżdżanie spanów i zapis do pliku"""
+
+    def test_nested_spans_share_trace_and_record_counters(self, trace_file):
+        with span("pipeline", file="paragon.png"):
+            with span("ocr") as ocr_span:
+                ocr_span.add_bytes(bytes_in=100, bytes_out=20)
+            with span("llm.vision") as llm_span:
+                llm_span.record_llm_response(
+                    {"message": {"content": "{}"}, "prompt_eval_count": 812, "eval_count": 95}
+                )
+
+        spans = {item["name"]: item for item in load_spans(trace_file)}
+        root = spans["pipeline"]
+        assert root["parent_id"] is None
+        assert root["attrs"] == {"file": "paragon.png"}
+        assert spans["ocr"]["parent_id"] == root["span_id"]
+        assert spans["llm.vision"]["trace_id"] == root["trace_id"]
+        assert (spans["ocr"]["bytes_in"], spans["ocr"]["bytes_out"]) == (100, 20)
+        assert spans["llm.vision"]["prompt_tokens"] == 812
+        assert spans["llm.vision"]["completion_tokens"] == 95
+        assert spans["llm.vision"]["bytes_out"] == 2
+
+    def test_error_is_recorded_and_reraised(self, trace_file):
+        with pytest.raises(ValueError):
+            with span("save_to_database"):
+                raise ValueError("błąd")
+
+        assert load_spans(trace_file)[0]["error"] == "ValueError"
+
+    def test_disabled_tracing_writes_nothing(self, tmp_path):
+        path = str(tmp_path / "traces.jsonl")
+        with patch.object(Config, "TRACE_ENABLED", False), patch.object(Config, "TRACE_PATH", path):
+            with span("ocr"):
+                pass
+
+        assert not os.path.exists(path)
+
+    def test_file_rotates_at_size_limit(self, trace_file):
+        with span("ocr"):
+            pass
+        line_size = os.path.getsize(trace_file)
+
+        # Limit mieści ok. 3 spany - starsze przechodzą do traces.jsonl.1, najstarsze znikają
+        with patch.object(Config, "TRACE_MAX_MB", 3.5 * line_size / (1024 * 1024)):
+            for _ in range(8):
+                with span("ocr"):
+                    pass
+
+        rotated = trace_file + ".1"
+        assert os.path.getsize(trace_file) <= 3.5 * line_size
+        assert os.path.getsize(rotated) <= 3.5 * line_size
+        with open(trace_file) as f, open(rotated) as g:
+            kept = len(f.readlines()) + len(g.readlines())
+        assert kept < 9
+        assert len(load_spans(trace_file)) == kept
+
+
+class TestAggregation:
+    """Agregacja spanów dla CLI 'stats'"""
+
+    def test_percentiles_and_last_traces(self, trace_file):
+        for _ in range(5):
+            with span("pipeline"):
+                with span("ocr"):
+                    pass
+
+        stats = aggregate_spans(load_spans(trace_file))
+        assert stats["ocr"]["count"] == 5
+        assert stats["pipeline"]["p50"] <= stats["pipeline"]["p99"]
+        assert len(load_spans(trace_file, last_traces=2)) == 4
+
+    @patch("src.llm.client")
+    def test_normalization_batches_nest_under_batch_span(self, mock_client, trace_file):
+        mock_client.chat.return_value = {
+            "message": {"content": '{"A": "A"}'},
+            "prompt_eval_count": 10,
+            "eval_count": 3,
+        }
+
+        normalize_products_batch(["A", "B", "C"], session=None, batch_size=1, max_workers=3)
+
+        spans = load_spans(trace_file)
+        parent = next(item for item in spans if item["name"] == "normalize_products_batch")
+        batches = [item for item in spans if item["name"] == "llm.normalize"]
+        assert len(batches) == 3
+        assert all(item["parent_id"] == parent["span_id"] for item in batches)
+        assert aggregate_spans(spans)["llm.normalize"]["prompt_tokens"] == 30
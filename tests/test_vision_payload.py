@@ -0,0 +1,88 @@
+"""
+Testy ładunku obrazu dla modelu wizyjnego (src.vision_payload)
+"""
+import sys
+import os
+import io
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../ReceiptParser"))
+
+from src import receipt_image, vision_payload
+from src.config import Config
+from src.llm import _vision_messages
+from src.security import ALLOWED_LLM_MODELS
+
+
+@pytest.fixture(autouse=True)
+def _clear_images():
+    receipt_image.clear_receipt_images()
+    yield
+    receipt_image.clear_receipt_images()
+
+
+def _save_noise(tmp_path, size, name="paragon.png"):
+    """Szum - źle się kompresuje, więc wymusza obniżanie jakości/rozdzielczości."""
+    rng = np.random.default_rng(0)
+    path = tmp_path / name
+    Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)).save(path)
+    return str(path)
+
+
+class TestProfiles:
+    """profile_for_model"""
+
+    def test_every_allowed_model_has_profile(self):
+        profiles = {model: vision_payload.profile_for_model(model) for model in ALLOWED_LLM_MODELS}
+
+        assert profiles["llava:latest"].max_short_side == 672
+        assert not profiles["SpeakLeash/bielik-11b-v2.3-instruct:Q4_K_M"].accepts_images
+        assert profiles["mistral-ocr"].max_long_side > profiles["llava:latest"].max_long_side
+        assert vision_payload.profile_for_model("inny-model:7b") is vision_payload.DEFAULT_PROFILE
+
+
+class TestPayload:
+    """prepare_vision_payload"""
+
+    def test_large_photo_is_downscaled_to_model_and_budget(self, tmp_path):
+        path = _save_noise(tmp_path, (1500, 4500))
+
+        with patch.object(Config, "VISION_PAYLOAD_MAX_KB", 200):
+            data = vision_payload.prepare_vision_payload(path, "llava:latest")
+
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.format == "JPEG" and img.mode == "L"
+            assert max(img.size) <= 1344 and min(img.size) <= 672
+            assert img.height / img.width == pytest.approx(3, rel=0.01)
+        assert len(data) <= 200 * 1024
+
+    def test_small_image_is_sent_unchanged(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        Image.new("L", (400, 1000), color=255).save(path)
+
+        assert vision_payload.prepare_vision_payload(str(path), "llava:latest") == path.read_bytes()
+
+    def test_payload_computed_once_per_image_and_model(self, tmp_path):
+        path = _save_noise(tmp_path, (800, 2000))
+
+        with patch("src.vision_payload.fit_to_budget", wraps=vision_payload.fit_to_budget) as mock_fit:
+            first = vision_payload.prepare_vision_payload(path, "llava:latest")
+            second = vision_payload.prepare_vision_payload(path, "llava:latest")
+
+        assert first is second
+        mock_fit.assert_called_once()
+
+    def test_text_model_gets_no_image(self, tmp_path):
+        path = tmp_path / "paragon.png"
+        Image.new("L", (100, 100)).save(path)
+
+        messages = _vision_messages(
+            "prompt", str(path), "LIDL 3,49", "SpeakLeash/bielik-11b-v2.3-instruct:Q4_K_M"
+        )
+
+        assert "images" not in messages[1]
+        assert "LIDL 3,49" in messages[1]["content"]